@@ -2,14 +2,17 @@ from fastapi import FastAPI, Header, HTTPException, Depends, Request, Security
 from fastapi.security import HTTPAuthorizationCredentials
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from typing import Literal
 from src.auth.jwt_handler import verify_token, security 
 from src.schemas.internal import UserSession 
 from src.core.logger import setup_logging, get_logger
 from src.services.agent_orchestrator import AgentOrchestrator, get_orchestrator
+from src.utils.stream_writer import StreamWriter
 import uuid
 from src.core.context import set_request_id
 from src.core.schemas import APIErrorResponse
 from src.core.exceptions import AppException
+from src.core.config import settings
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 # 🔥 LOGGING & APP SETUP
@@ -121,9 +124,28 @@ async def app_check_middleware(request: Request, call_next):
 async def startup_event():
     """Minimal startup - just log."""
     logger.info("SYD Brain API starting on port 8080...")
+    # ⏱️ Event loop responsiveness probe (event_loop.lag_ms in /metrics)
+    from src.core.loop_monitor import loop_monitor
+    loop_monitor.start()
+    # 💰 Token/cost rollups flushed to the configured sink (USAGE_SINK)
+    from src.core.usage import usage_flusher
+    usage_flusher.start()
     # NOTE: Firebase validation and Agent Graph initialization happen lazily on first request
     # This ensures the container binds to port 8080 immediately for Cloud Run health checks
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Drain write-behind chat persistence before the worker exits."""
+    from src.repositories.message_buffer import drain_pending_flushes
+    from src.core.loop_monitor import loop_monitor
+    from src.core.usage import usage_flusher
+    from src.core.genai_clients import genai_registry
+    await drain_pending_flushes()
+    await loop_monitor.stop()
+    await usage_flusher.stop()
+    # 🔌 Pooled Gemini connections are closed on the serving loop
+    await genai_registry.aclose()
+
 # Register Routers
 from src.api.upload import router as upload_router
 app.include_router(upload_router)
@@ -186,6 +208,8 @@ class ChatRequest(BaseModel):
     media_metadata: dict[str, dict] | None = Field(None, alias="mediaMetadata") # New: Trim Ranges
     # 🎬 NEW: Native Video Support (File API URIs)
     video_file_uris: list[str] | None = Field(None, alias="videoFileUris")  # File API URIs from /upload endpoint
+    # ⚡ Optional per-request graph topology ("two_tier" | "fast"); defaults to AGENT_GRAPH_MODE
+    graph_mode: Literal["two_tier", "fast"] | None = Field(None, alias="graphMode")
     
     model_config = {"populate_by_name": True}
     
@@ -202,6 +226,13 @@ def health_check():
     """Health check endpoint for Cloud Run."""
     return {"status": "ok", "service": "syd-brain"}
 
+@app.get("/metrics")
+def metrics_snapshot():
+    """In-process performance metrics (per worker)."""
+    from src.core.metrics import metrics
+    from src.core.usage import usage_accountant
+    return {**metrics.snapshot(), "usage": usage_accountant.snapshot()}
+
 async def chat_stream_generator(
     request: ChatRequest, 
     credentials: HTTPAuthorizationCredentials | None,
@@ -209,8 +240,16 @@ async def chat_stream_generator(
 ):
     """
     Delegates streaming to the AgentOrchestrator.
+    On client disconnect StreamingResponse cancels this generator, which cancels the graph.
+    Frames go through the StreamWriter (heartbeats, backpressure, coalescing).
     """
-    async for chunk in orchestrator.stream_chat(request, credentials):
+    writer = StreamWriter(
+        orchestrator.stream_chat(request, credentials),
+        heartbeat_interval=settings.CHAT_HEARTBEAT_INTERVAL_S,
+        queue_size=settings.CHAT_STREAM_QUEUE_SIZE,
+        max_write_bytes=settings.CHAT_STREAM_MAX_WRITE_BYTES
+    )
+    async for chunk in writer:
         yield chunk
 
 @app.post("/chat/stream")
@@ -0,0 +1,98 @@
+"""
+Export anonymized, weakly-labeled user turns for the intent router.
+
+For each user message of the sampled sessions:
+- "reasoning" if the assistant answered the turn with tool calls,
+- "execution" if it answered with text only,
+- skipped if the message carried media (always routed to reasoning),
+  was cancelled, or is empty.
+
+URLs, e-mails, phone numbers and attachment markers are stripped before the
+text is written; review the file (names, addresses) before committing it.
+
+Usage:
+    python scripts/export_intent_transcripts.py --out transcripts.jsonl [--sessions 500]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+from dotenv import load_dotenv
+
+# Load env
+load_dotenv()
+
+# Ensure we can import from src
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.cloud import firestore
+from src.db.firebase_client import get_async_firestore_client
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ANONYMIZERS = [
+    (re.compile(r"\[(?:Immagine|Video) allegat[oa]: [^\]]+\]"), ""),
+    (re.compile(r"https?://\S+"), "<url>"),
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+"), "<email>"),
+    (re.compile(r"\+?\d[\d\s-]{7,}\d"), "<telefono>"),
+]
+
+
+def anonymize(text: str) -> str:
+    for pattern, replacement in ANONYMIZERS:
+        text = pattern.sub(replacement, text)
+    return " ".join(text.split())
+
+
+def label_turns(messages: list) -> list:
+    """[(user text, label)] from one session's ordered messages."""
+    rows = []
+    for i, msg in enumerate(messages):
+        if msg.get("role") != "user" or msg.get("attachments"):
+            continue
+        text = anonymize(msg.get("content") or "")
+        if not text:
+            continue
+        replies = []
+        for reply in messages[i + 1:]:
+            if reply.get("role") == "user":
+                break
+            replies.append(reply)
+        if not replies or any((r.get("metadata") or {}).get("cancelled") for r in replies):
+            continue
+        used_tools = any(r.get("role") == "assistant" and r.get("tool_calls") for r in replies)
+        rows.append((text, "reasoning" if used_tools else "execution"))
+    return rows
+
+
+async def export(out_path: str, max_sessions: int):
+    db = get_async_firestore_client()
+    written = 0
+    with open(out_path, "w", encoding="utf-8") as out:
+        sessions = db.collection("sessions").limit(max_sessions)
+        async for session in sessions.stream():
+            messages_ref = session.reference.collection("messages").order_by(
+                "timestamp", direction=firestore.Query.ASCENDING
+            )
+            messages = [doc.to_dict() async for doc in messages_ref.stream()]
+            for text, label in label_turns(messages):
+                out.write(json.dumps({"text": text, "label": label}, ensure_ascii=False) + "\n")
+                written += 1
+    logger.info(f"✅ Exported {written} turns to {out_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--sessions", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(export(args.out, args.sessions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Train the gatekeeper intent router (hashed n-grams + logistic regression).
+
+Input: JSONL rows {"text": ..., "label": "execution" | "reasoning"}, e.g. the
+bundled seed set plus transcripts exported with scripts/export_intent_transcripts.py.
+Output: the .npz weights loaded by src/services/intent_router.py.
+
+Usage:
+    python scripts/train_intent_router.py
+    python scripts/train_intent_router.py --data transcripts.jsonl --data src/services/intent_data/seed_intents.jsonl
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+from pathlib import Path
+
+# Ensure we can import from src
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.intent_router import DEFAULT_MODEL_PATH, HashedNgramFeaturizer, IntentRouter, load_dataset
+
+SEED_DATA = DEFAULT_MODEL_PATH.parent / "seed_intents.jsonl"
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def holdout_accuracy(texts, labels, args) -> float:
+    """Accuracy on a 20% stratified holdout (argmax, threshold 0.5)."""
+    rng = random.Random(args.seed)
+    train, test = [], []
+    for label in set(labels):
+        rows = [(t, l) for t, l in zip(texts, labels) if l == label]
+        rng.shuffle(rows)
+        cut = max(1, len(rows) // 5)
+        test += rows[:cut]
+        train += rows[cut:]
+    router = IntentRouter.train(
+        [t for t, _ in train], [l for _, l in train],
+        featurizer=HashedNgramFeaturizer(dim=2 ** args.bits), epochs=args.epochs, seed=args.seed
+    )
+    correct = sum(router.route(t, 0.5)[0] == l for t, l in test)
+    return correct / len(test)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", action="append", type=Path, help="JSONL dataset (repeatable; default: bundled seed set)")
+    parser.add_argument("--out", type=Path, default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--bits", type=int, default=14, help="Hash space = 2**bits features")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args()
+
+    texts, labels = load_dataset(args.data or [SEED_DATA])
+    logger.info(f"📚 {len(texts)} examples ({labels.count('execution')} execution / {labels.count('reasoning')} reasoning)")
+    logger.info(f"🎯 Holdout accuracy: {holdout_accuracy(texts, labels, args):.3f}")
+
+    router = IntentRouter.train(
+        texts, labels, featurizer=HashedNgramFeaturizer(dim=2 ** args.bits), epochs=args.epochs, seed=args.seed
+    )
+    router.save(args.out)
+    logger.info(f"💾 Saved {args.out} ({args.out.stat().st_size / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
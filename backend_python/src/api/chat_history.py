@@ -12,7 +12,7 @@ from firebase_admin import firestore
 
 from src.auth.jwt_handler import verify_token
 from src.schemas.internal import UserSession
-from src.db.firebase_client import get_firestore_client
+from src.db.firebase_client import get_async_firestore_client
 
 logger = logging.getLogger(__name__)
 
@@ -59,12 +59,12 @@ async def get_chat_history(
         HTTPException: If session not found or access denied
     """
     try:
-        db = get_firestore_client()
+        db = get_async_firestore_client()
         user_id = user_session.uid
         
         # 🛡️ SECURITY: Verify user owns this session
         session_ref = db.collection('sessions').document(session_id)
-        session_doc = session_ref.get()
+        session_doc = await session_ref.get()
         
         if not session_doc.exists:
             # If session doesn't exist, it's a "fresh" session.
@@ -93,13 +93,13 @@ async def get_chat_history(
         
         # Apply cursor-based pagination
         if cursor:
-            cursor_doc = db.collection('sessions').document(session_id).collection('messages').document(cursor).get()
+            cursor_doc = await db.collection('sessions').document(session_id).collection('messages').document(cursor).get()
             if cursor_doc.exists:
                 messages_ref = messages_ref.start_after(cursor_doc)
         
         # Fetch one extra to check for more
         messages_ref = messages_ref.limit(limit + 1)
-        docs = list(messages_ref.stream())
+        docs = [doc async for doc in messages_ref.stream()]
         
         # Check if there are more messages
         has_more = len(docs) > limit
@@ -3,30 +3,22 @@ import logging
 import asyncio
 import base64
 from typing import Optional, Dict, Any, List
-from google import genai
 from google.genai import types
 from google.api_core import exceptions as google_exceptions
 
+from src.core.admission import AdmissionTimeout, admission_controller
+from src.core.genai_clients import IMAGE_TOKENS, genai_registry
+from src.core.usage import usage_accountant
+
 logger = logging.getLogger(__name__)
 
 # Configure Gemini API
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Create client with API key (Lazy)
-_client = None
-
-def _get_client():
-    """Lazy-load GenAI client."""
-    global _client
-    if _client is None:
-        if not GEMINI_API_KEY:
-            raise Exception("GEMINI_API_KEY not configured in environment")
-        _client = genai.Client(api_key=GEMINI_API_KEY)
-    return _client
-
 # Models for image generation
 T2I_MODEL = "gemini-3-pro-image-preview"  # User requested: High Quality T2I
 I2I_MODEL = "gemini-3-pro-image-preview"  # User requested: Gemini 3 Pro Image (Multimodal I2I)
+OUTPUT_IMAGE_TOKENS = 1290  # Generated image, reserved against the TPM bucket
 
 
 async def generate_image_t2i(
@@ -46,10 +38,10 @@ async def generate_image_t2i(
     Raises:
         Exception: If API call fails or no API key configured
     """
-    # Create fresh client for this request (avoids Event Loop conflicts in sync wrappers)
+    # Shared pooled client (kept alive across requests, closed on shutdown)
     if not GEMINI_API_KEY:
         raise Exception("GEMINI_API_KEY not configured in environment")
-    client = genai.Client(api_key=GEMINI_API_KEY)
+    client = genai_registry.client()
     
     try:
         # Build full prompt
@@ -65,14 +57,17 @@ async def generate_image_t2i(
         logger.info(f"Generating T2I image with prompt length: {len(full_prompt)} chars")
         
         # Generate content with new SDK (Async)
-        response = await client.aio.models.generate_content(
-            model=T2I_MODEL,
-            contents=full_prompt,
-            config=types.GenerateContentConfig(
-                response_modalities=["IMAGE", "TEXT"],
-                temperature=0.4,
+        async with admission_controller.slot(T2I_MODEL, len(full_prompt) // 4 + OUTPUT_IMAGE_TOKENS) as ticket:
+            response = await client.aio.models.generate_content(
+                model=T2I_MODEL,
+                contents=full_prompt,
+                config=types.GenerateContentConfig(
+                    response_modalities=["IMAGE", "TEXT"],
+                    temperature=0.4,
+                )
             )
-        )
+            ticket.settle(response)
+        usage_accountant.record_genai(T2I_MODEL, response, operation="generate_image_t2i")
         
         # Extract image from response
         if not response.candidates or not response.candidates[0].content.parts:
@@ -106,15 +101,12 @@ async def generate_image_t2i(
     except google_exceptions.InvalidArgument as e:
         logger.error(f"[Gemini] ❌ Invalid Argument (400): {e}")
         raise Exception("Errore nell'immagine o nel prompt. Riprova con parametri diversi.")
-    except google_exceptions.ResourceExhausted as e:
+    except (google_exceptions.ResourceExhausted, AdmissionTimeout) as e:
         logger.error(f"[Gemini] ❌ Quota Exceeded (429): {e}")
         raise Exception("Il sistema è molto carico. Riprova tra qualcche minuto.")
     except Exception as e:
         logger.error(f"[Gemini] ❌ T2I generation failed: {str(e)}", exc_info=True)
         raise Exception(f"Errore di sistema nella generazione immagine: {str(e)}")
-    finally:
-        # Crucial: Close the client to release resources before loop closes
-        client.close()
 
 
 async def generate_image_i2i(
@@ -140,10 +132,10 @@ async def generate_image_i2i(
     Raises:
         Exception: If API call fails or no API key configured
     """
-    # Create fresh client for this request
+    # Shared pooled client (kept alive across requests, closed on shutdown)
     if not GEMINI_API_KEY:
         raise Exception("GEMINI_API_KEY not configured in environment")
-    client = genai.Client(api_key=GEMINI_API_KEY)
+    client = genai_registry.client()
     
     try:
         # Build I2I prompt with geometry preservation instructions
@@ -178,22 +170,26 @@ async def generate_image_i2i(
         
         # Call API Async with explicit configuration and timeout
         try:
-            response = await asyncio.wait_for(
-                client.aio.models.generate_content(
-                    model=I2I_MODEL,
-                    contents=contents,
-                    config=types.GenerateContentConfig(
-                        response_modalities=["IMAGE", "TEXT"],
-                        temperature=0.4,
-                    )
-                ),
-                timeout=90.0  # Generative tasks can be slow, 90s is safe
-            )
+            estimated_tokens = len(full_prompt) // 4 + IMAGE_TOKENS + OUTPUT_IMAGE_TOKENS
+            async with admission_controller.slot(I2I_MODEL, estimated_tokens) as ticket:
+                response = await asyncio.wait_for(
+                    client.aio.models.generate_content(
+                        model=I2I_MODEL,
+                        contents=contents,
+                        config=types.GenerateContentConfig(
+                            response_modalities=["IMAGE", "TEXT"],
+                            temperature=0.4,
+                        )
+                    ),
+                    timeout=90.0  # Generative tasks can be slow, 90s is safe
+                )
+                ticket.settle(response)
         except asyncio.TimeoutError:
             logger.error("[Gemini] ❌ I2I Request timed out after 90s")
             raise Exception("La generazione dell'immagine ha impiegato troppo tempo. Riprova.")
         
         logger.info("[Gemini] ✅ API Response received!")
+        usage_accountant.record_genai(I2I_MODEL, response, operation="generate_image_i2i")
         
         if not response.candidates:
              raise Exception("No candidates returned from API")
@@ -234,12 +230,9 @@ async def generate_image_i2i(
     except google_exceptions.InvalidArgument as e:
         logger.error(f"[Gemini] ❌ Invalid Argument (400): {e}")
         raise Exception("L'immagine caricata non è valida o il prompt è incorretto.")
-    except google_exceptions.ResourceExhausted as e:
+    except (google_exceptions.ResourceExhausted, AdmissionTimeout) as e:
         logger.error(f"[Gemini] ❌ Quota Exceeded (429): {e}")
         raise Exception("Server sovraccarico. Riprova tra poco.")
     except Exception as e:
         logger.error(f"[Gemini] ❌ I2I generation failed: {str(e)}", exc_info=True)
         raise Exception(f"Errore imprevisto durante la generazione: {str(e)}")
-    finally:
-        # Crucial: Close the client to release resources
-        client.close()
@@ -0,0 +1,389 @@
+"""
+Model Admission Control
+
+Every Gemini call is admitted here first, per model:
+- Token buckets: requests per minute (RPM) and tokens per minute (TPM) from
+  settings.GENAI_RATE_LIMITS. A call reserves its estimated tokens up front;
+  the estimate is corrected with the real usage when the call ends.
+- Adaptive concurrency (AIMD): the in-flight limit grows by ~1 per window of
+  successful calls and is halved on a 429 / overload (at most once per window
+  of calls started before the last decrease). Calls slower than the model's
+  latency target shrink it gently.
+- FIFO queue with deadlines: a call waits its turn until `deadline_s`, then
+  fails with AdmissionTimeout instead of hitting the provider with a request
+  bound to be throttled.
+
+Exported per model: admission.<model>.queue_depth / in_flight / limit gauges,
+wait_ms summary, admitted / timeouts / overloads counters.
+
+Waiters may be coroutines (event loop) or worker threads (sync graph nodes);
+state is guarded by one lock per model and waiters are woken explicitly.
+"""
+import asyncio
+import contextlib
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional
+
+from src.core.config import settings
+from src.core.exceptions import QuotaExceeded
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+OVERLOAD_CODES = (429, 503)
+_OVERLOAD_RE = re.compile(r"RESOURCE_EXHAUSTED|\b429\b")
+
+
+class AdmissionTimeout(QuotaExceeded):
+    """The call could not be admitted before its deadline."""
+    error_code = "MODEL_BUSY"
+
+
+def is_overload(error: BaseException) -> bool:
+    """True for provider throttling (429 / RESOURCE_EXHAUSTED / 503), also when wrapped."""
+    seen = 0
+    while error is not None and seen < 5:
+        code = getattr(error, "code", None) or getattr(error, "status_code", None)
+        if code in OVERLOAD_CODES or code == "RESOURCE_EXHAUSTED":
+            return True
+        if _OVERLOAD_RE.search(str(error)):
+            return True
+        error = error.__cause__ or error.__context__
+        seen += 1
+    return False
+
+
+class TokenBucket:
+    """Refills `rate_per_s` up to `capacity`; may go negative when usage is corrected upwards."""
+
+    def __init__(self, rate_per_s: float, capacity: float):
+        self.rate_per_s = rate_per_s
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate_per_s)
+        self._updated = now
+
+    def wait_for(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 = available now)."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate_per_s)
+
+    def take(self, amount: float) -> None:
+        self.tokens -= amount
+
+    def adjust(self, delta: float) -> None:
+        """Charges (delta > 0) or refunds (delta < 0) the difference from the estimate."""
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class AIMDLimit:
+    """Additive-increase / multiplicative-decrease concurrency limit."""
+
+    def __init__(
+        self,
+        initial: float,
+        minimum: float = 1,
+        maximum: float = 64,
+        backoff: float = 0.5,
+        latency_target_s: Optional[float] = None,
+        latency_backoff: float = 0.9
+    ):
+        self.value = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.latency_target_s = latency_target_s
+        self.latency_backoff = latency_backoff
+        self.decreased_at = 0.0
+
+    def on_success(self, latency_s: float) -> None:
+        if self.latency_target_s and latency_s > self.latency_target_s:
+            self.value = max(self.minimum, self.value * self.latency_backoff)
+        else:
+            self.value = min(self.maximum, self.value + 1.0 / self.value)
+
+    def on_overload(self, started_at: float) -> bool:
+        """Halves the limit unless the call started before the previous decrease."""
+        if started_at < self.decreased_at:
+            return False
+        self.value = max(self.minimum, self.value * self.backoff)
+        self.decreased_at = time.monotonic()
+        return True
+
+
+class _Waiter:
+    __slots__ = ("tokens", "deadline", "event", "loop")
+
+    def __init__(self, tokens: float, deadline: float, loop: Optional[asyncio.AbstractEventLoop]):
+        self.tokens = tokens
+        self.deadline = deadline
+        self.loop = loop
+        self.event = asyncio.Event() if loop else threading.Event()
+
+    def wake(self) -> None:
+        if self.loop:
+            with contextlib.suppress(RuntimeError):  # Loop already closed
+                self.loop.call_soon_threadsafe(self.event.set)
+        else:
+            self.event.set()
+
+
+class Ticket:
+    """An admitted call. `used_tokens` (or settle()) corrects the TPM reservation."""
+    __slots__ = ("model", "tokens", "started_at", "used_tokens")
+
+    def __init__(self, model: str, tokens: float, started_at: float):
+        self.model = model
+        self.tokens = tokens
+        self.started_at = started_at
+        self.used_tokens: Optional[int] = None
+
+    def settle(self, response: Any) -> None:
+        """Takes the real usage from a google-genai response."""
+        total = getattr(getattr(response, "usage_metadata", None), "total_token_count", None)
+        self.used_tokens = total if isinstance(total, int) else None
+
+
+class ModelGate:
+    """Buckets, AIMD limit and FIFO queue of one model."""
+
+    def __init__(
+        self,
+        model: str,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        latency_target_s: Optional[float] = None
+    ):
+        self.model = model
+        self.requests = TokenBucket(rpm / 60.0, max(1.0, rpm / 60.0)) if rpm else None
+        self.tokens = TokenBucket(tpm / 60.0, tpm / 60.0 * 10) if tpm else None  # ~10s of burst
+        self.limit = AIMDLimit(
+            initial=max_concurrency, minimum=min_concurrency, maximum=max_concurrency,
+            latency_target_s=latency_target_s,
+        )
+        self.in_flight = 0
+        self._queue: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    # --- State transitions (caller holds the lock) ---
+
+    def _try_admit(self, waiter: _Waiter, now: float) -> Optional[float]:
+        """0 = admitted; > 0 = bucket wait; None = wait for a slot or our turn."""
+        if self._queue[0] is not waiter or self.in_flight >= int(self.limit.value):
+            return None
+        wait = 0.0
+        if self.requests:
+            wait = self.requests.wait_for(1, now)
+        if self.tokens:
+            wait = max(wait, self.tokens.wait_for(waiter.tokens, now))
+        if wait > 0:
+            return wait
+        if self.requests:
+            self.requests.take(1)
+        if self.tokens:
+            self.tokens.take(waiter.tokens)
+        self.in_flight += 1
+        self._queue.popleft()
+        self._wake_head()  # The next call may fit too
+        return 0.0
+
+    def _wake_head(self) -> None:
+        if self._queue:
+            self._queue[0].wake()
+
+    def _leave(self, waiter: _Waiter) -> None:
+        was_head = bool(self._queue) and self._queue[0] is waiter
+        with contextlib.suppress(ValueError):
+            self._queue.remove(waiter)
+        if was_head:
+            self._wake_head()
+
+    def _publish(self) -> None:
+        prefix = f"admission.{self.model}"
+        metrics.set_gauge(f"{prefix}.queue_depth", len(self._queue))
+        metrics.set_gauge(f"{prefix}.in_flight", self.in_flight)
+        metrics.set_gauge(f"{prefix}.limit", round(self.limit.value, 2))
+
+    def _step(self, waiter: _Waiter) -> Optional[float]:
+        """One admission attempt: 0 = admitted, else seconds to wait (None = until woken / deadline)."""
+        now = time.monotonic()
+        with self._lock:
+            wait = self._try_admit(waiter, now)
+            if wait == 0:
+                self._publish()
+                return 0.0
+            remaining = waiter.deadline - now
+            if remaining <= 0 or (wait is not None and wait > remaining):
+                self._leave(waiter)
+                self._publish()
+                raise AdmissionTimeout(
+                    f"Model {self.model} is busy, retry shortly",
+                    detail={"model": self.model, "queue_depth": len(self._queue)},
+                )
+            return min(wait, remaining) if wait is not None else remaining
+
+    def _enqueue(self, tokens: float, deadline_s: float, loop) -> _Waiter:
+        capacity = self.tokens.capacity if self.tokens else tokens
+        waiter = _Waiter(min(tokens, capacity), time.monotonic() + deadline_s, loop)
+        with self._lock:
+            self._queue.append(waiter)
+            self._publish()
+        return waiter
+
+    def _admitted(self, waiter: _Waiter, enqueued_at: float) -> Ticket:
+        now = time.monotonic()
+        metrics.observe(f"admission.{self.model}.wait_ms", (now - enqueued_at) * 1000)
+        metrics.increment(f"admission.{self.model}.admitted")
+        return Ticket(self.model, waiter.tokens, now)
+
+    def _timed_out(self) -> None:
+        metrics.increment(f"admission.{self.model}.timeouts")
+        logger.warning(f"🚦 Admission timeout for {self.model} (queue {len(self._queue)}, in flight {self.in_flight})")
+
+    # --- Public API ---
+
+    async def acquire(self, tokens: float, deadline_s: float) -> Ticket:
+        enqueued_at = time.monotonic()
+        waiter = self._enqueue(tokens, deadline_s, asyncio.get_running_loop())
+        try:
+            while True:
+                waiter.event.clear()
+                wait = self._step(waiter)
+                if wait == 0:
+                    return self._admitted(waiter, enqueued_at)
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(waiter.event.wait(), timeout=wait)
+        except AdmissionTimeout:
+            self._timed_out()
+            raise
+        except BaseException:  # Cancelled while queued
+            with self._lock:
+                self._leave(waiter)
+                self._publish()
+            raise
+
+    def acquire_sync(self, tokens: float, deadline_s: float) -> Ticket:
+        enqueued_at = time.monotonic()
+        waiter = self._enqueue(tokens, deadline_s, None)
+        try:
+            while True:
+                waiter.event.clear()
+                wait = self._step(waiter)
+                if wait == 0:
+                    return self._admitted(waiter, enqueued_at)
+                waiter.event.wait(timeout=wait)
+        except AdmissionTimeout:
+            self._timed_out()
+            raise
+        except BaseException:
+            with self._lock:
+                self._leave(waiter)
+                self._publish()
+            raise
+
+    def release(self, ticket: Ticket, error: Optional[BaseException] = None) -> None:
+        latency_s = time.monotonic() - ticket.started_at
+        with self._lock:
+            self.in_flight -= 1
+            if self.tokens and ticket.used_tokens is not None:
+                self.tokens.adjust(ticket.used_tokens - ticket.tokens)
+            if error is None:
+                self.limit.on_success(latency_s)
+            elif is_overload(error):
+                metrics.increment(f"admission.{self.model}.overloads")
+                if self.limit.on_overload(ticket.started_at):
+                    logger.warning(f"🚦 {self.model} overloaded: concurrency limit -> {self.limit.value:.1f}")
+            self._publish()
+            self._wake_head()
+
+
+class AdmissionController:
+    """Per-model gates, created on first use from the configured limits."""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Dict[str, Any]]] = None,
+        default_concurrency: int = 16,
+        deadline_s: float = 30.0,
+        enabled: bool = True
+    ):
+        self.limits = limits or {}
+        self.default_concurrency = default_concurrency
+        self.deadline_s = deadline_s
+        self.enabled = enabled
+        self._gates: Dict[str, ModelGate] = {}
+        self._lock = threading.Lock()
+
+    def gate(self, model: str) -> ModelGate:
+        model = model.removeprefix("models/")
+        with self._lock:
+            gate = self._gates.get(model)
+            if gate is None:
+                config = self.limits.get(model, {})
+                gate = ModelGate(
+                    model,
+                    rpm=config.get("rpm"),
+                    tpm=config.get("tpm"),
+                    max_concurrency=int(config.get("max_concurrency", self.default_concurrency)),
+                    min_concurrency=int(config.get("min_concurrency", 1)),
+                    latency_target_s=config.get("latency_target_s"),
+                )
+                self._gates[model] = gate
+            return gate
+
+    @contextlib.asynccontextmanager
+    async def slot(self, model: str, tokens: float = 0, deadline_s: Optional[float] = None) -> AsyncIterator[Ticket]:
+        """`async with admission.slot(model, tokens=...) as ticket:` around one provider call."""
+        if not self.enabled:
+            yield Ticket(model, tokens, time.monotonic())
+            return
+        gate = self.gate(model)
+        ticket = await gate.acquire(tokens, deadline_s or self.deadline_s)
+        try:
+            yield ticket
+        except BaseException as e:
+            gate.release(ticket, e)
+            raise
+        gate.release(ticket)
+
+    @contextlib.contextmanager
+    def slot_sync(self, model: str, tokens: float = 0, deadline_s: Optional[float] = None) -> Iterator[Ticket]:
+        """Blocking variant for worker threads (sync graph nodes)."""
+        if not self.enabled:
+            yield Ticket(model, tokens, time.monotonic())
+            return
+        gate = self.gate(model)
+        ticket = gate.acquire_sync(tokens, deadline_s or self.deadline_s)
+        try:
+            yield ticket
+        except BaseException as e:
+            gate.release(ticket, e)
+            raise
+        gate.release(ticket)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            gates = list(self._gates.values())
+        return {
+            gate.model: {"limit": round(gate.limit.value, 2), "in_flight": gate.in_flight, "queue_depth": len(gate._queue)}
+            for gate in gates
+        }
+
+
+# Singleton instance (shared by every model call of the worker)
+admission_controller = AdmissionController(
+    limits=settings.GENAI_RATE_LIMITS,
+    default_concurrency=settings.ADMISSION_DEFAULT_CONCURRENCY,
+    deadline_s=settings.ADMISSION_DEADLINE_S,
+    enabled=settings.ADMISSION_ENABLED,
+)
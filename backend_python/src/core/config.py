@@ -19,6 +19,109 @@ class Settings(BaseSettings):
     # Feature Flags
     ENABLE_APP_CHECK: bool = Field(default=False, description="Enable Firebase App Check")
     
+    # Chat Streaming
+    CHAT_STREAM_MODE: str = Field(default="tokens", description="Chat streaming granularity: tokens (LLM deltas) or nodes (legacy, whole messages)")
+    CHAT_HEARTBEAT_INTERVAL_S: float = Field(default=10.0, description="Heartbeat data frame after this many idle seconds (0 disables)")
+    CHAT_STREAM_QUEUE_SIZE: int = Field(default=64, description="Frames buffered ahead of the transport before the producer waits")
+    CHAT_STREAM_MAX_WRITE_BYTES: int = Field(default=16384, description="Upper bound of a coalesced write")
+    
+    # Agent Graph
+    AGENT_ASYNC_NODES: bool = Field(default=True, description="Use non-blocking (ainvoke) reasoning/execution nodes")
+    AGENT_SPECULATIVE_EXECUTION: bool = Field(default=False, description="Start the conversational execution call while reasoning runs; committed only on ask_user (async nodes only)")
+    AGENT_GRAPH_MODE: str = Field(default="two_tier", description="Default graph topology: two_tier (reasoning + execution) or fast (single tool-calling pass)")
+    
+    # Intent Router (gatekeeper: execution vs reasoning)
+    INTENT_ROUTER_ENABLED: bool = Field(default=True, description="Use the learned n-gram router in the gatekeeper (heuristics otherwise)")
+    INTENT_ROUTER_MODEL_PATH: str = Field(default="", description="Router weights (.npz); empty = bundled model")
+    INTENT_ROUTER_THRESHOLD: float = Field(default=0.8, description="Minimum P(execution) to skip the reasoning node")
+    
+    # Prompt Cache (static system-prompt prefix, see src/services/prompt_cache.py)
+    PROMPT_CACHE_BACKEND: str = Field(default="none", description="Explicit context caching: none | local | gemini")
+    PROMPT_CACHE_TTL_S: int = Field(default=3600, description="TTL of a cached-content handle")
+    PROMPT_CACHE_MIN_TOKENS: int = Field(default=1024, description="Smaller prefixes are not cached explicitly")
+    
+    # Usage Accounting (tokens & cost per turn, node, tool; see src/core/usage.py)
+    USAGE_SINK: str = Field(default="log", description="Where usage rollups are flushed: none | log | firestore")
+    USAGE_FLUSH_INTERVAL_S: float = Field(default=60.0, description="Seconds between rollup flushes")
+    USAGE_PRICES_USD_PER_MTOK: dict[str, list[float]] = Field(
+        default={
+            "gemini-2.5-flash": [0.30, 0.03, 2.50],
+            "gemini-3-flash-preview": [0.50, 0.05, 3.00],
+            "gemini-3-pro-image-preview": [2.00, 0.20, 120.00],
+            "gemini-1.5-pro-latest": [1.25, 0.3125, 5.00],
+        },
+        description="USD per 1M tokens [input, cached input, output] per model (update with list prices)"
+    )
+    
+    # GenAI Clients (process-wide registry, see src/core/genai_clients.py)
+    GENAI_MAX_CONNECTIONS: int = Field(default=32, description="Connection pool size per shared client")
+    GENAI_MAX_KEEPALIVE: int = Field(default=16, description="Idle keep-alive connections kept per shared client")
+    GENAI_KEEPALIVE_EXPIRY_S: float = Field(default=60.0, description="Seconds an idle pooled connection stays open")
+    GENAI_MODEL_CONFIG: dict[str, dict[str, float | int | str]] = Field(
+        default={},
+        description='Per-model chat model defaults, e.g. {"gemini-3-flash-preview": {"timeout": 60, "max_retries": 2}}'
+    )
+    
+    # Model Admission (per-model rate & concurrency control, see src/core/admission.py)
+    ADMISSION_ENABLED: bool = Field(default=True, description="Admit every Gemini call through the per-model gates")
+    ADMISSION_DEADLINE_S: float = Field(default=30.0, description="Max seconds a call waits in the queue before failing")
+    ADMISSION_DEFAULT_CONCURRENCY: int = Field(default=16, description="Concurrency ceiling for models without limits")
+    GENAI_RATE_LIMITS: dict[str, dict[str, float]] = Field(
+        default={
+            "gemini-2.5-flash": {"rpm": 1000, "tpm": 1_000_000, "max_concurrency": 32, "latency_target_s": 30},
+            "gemini-3-flash-preview": {"rpm": 1000, "tpm": 1_000_000, "max_concurrency": 16, "latency_target_s": 60},
+            "gemini-3-pro-image-preview": {"rpm": 20, "tpm": 100_000, "max_concurrency": 4},
+            "gemini-1.5-pro-latest": {"rpm": 150, "tpm": 2_000_000, "max_concurrency": 8},
+        },
+        description="Per-model quota: rpm, tpm, max_concurrency, min_concurrency, latency_target_s (match the project's tier)"
+    )
+    
+    # Triage Cache (content-addressed triage results, see src/vision/triage_cache.py)
+    TRIAGE_CACHE_ENABLED: bool = Field(default=True, description="Reuse successful triage results of identical images")
+    TRIAGE_CACHE_MAX_ENTRIES: int = Field(default=512, description="Results kept in the in-process LRU tier")
+    TRIAGE_CACHE_STORE: str = Field(default="none", description="Persistent tier: none, file (dev) or firestore (production)")
+    TRIAGE_CACHE_DIR: str = Field(default=".triage_cache", description="Directory of the file store")
+    TRIAGE_CACHE_TTL_S: float = Field(default=30 * 86400, description="Seconds a persisted result stays valid")
+    
+    # Tool Execution (parallel tool calls of one message)
+    TOOL_MAX_CONCURRENCY: int = Field(default=8, description="Tool calls running at once per process")
+    TOOL_CONCURRENCY_LIMITS: dict[str, int] = Field(
+        default={"generate_render": 4, "generate_cad": 2},
+        description="Per-process concurrency cap of expensive tools"
+    )
+    TOOL_USER_CONCURRENCY_LIMITS: dict[str, int] = Field(
+        default={"generate_render": 1, "generate_cad": 1},
+        description="Per-user concurrency cap of expensive tools (extra calls queue)"
+    )
+    
+    # Tool Result Memo (per session, idempotent tools only)
+    TOOL_MEMO_ENABLED: bool = Field(default=True, description="Answer repeated idempotent tool calls from a per-session memo")
+    TOOL_MEMO_TTLS: dict[str, float] = Field(
+        default={"analyze_room": 1800, "get_market_prices": 3600, "list_project_files": 120, "show_project_gallery": 120},
+        description="Memo TTL (seconds) per tool; tools not listed are never memoized"
+    )
+    TOOL_MEMO_MAX_SESSIONS: int = Field(default=1000, description="Sessions kept in the tool memo (LRU)")
+    
+    # Agent Checkpoints (turns resume from the last graph state)
+    AGENT_CHECKPOINTER: str = Field(default="none", description="Graph checkpoint store: none, sqlite (dev/tests) or firestore (production)")
+    CHECKPOINT_SQLITE_PATH: str = Field(default="agent_checkpoints.sqlite", description="SQLite file for the sqlite checkpointer")
+    CHECKPOINT_KEEP_LAST: int = Field(default=4, description="Checkpoints kept per conversation thread")
+    CHECKPOINT_MAX_MESSAGES: int = Field(default=40, description="Messages kept in the checkpointed state (oldest turns are dropped)")
+    
+    # Conversation Context Cache
+    CONTEXT_CACHE_MAX_SESSIONS: int = Field(default=1000, description="Sessions kept in the in-process context cache (LRU)")
+    CONTEXT_CACHE_TTL_S: float = Field(default=900, description="Seconds a cached session window stays valid")
+    CONTEXT_CACHE_WINDOW: int = Field(default=60, description="Most recent messages cached per session (keep >= CONTEXT_HISTORY_MAX_MESSAGES)")
+    
+    # Context Compaction
+    CONTEXT_KEEP_TURNS: int = Field(default=3, description="Past turns kept verbatim; older ones are folded into the session summary")
+    CONTEXT_TOOL_OUTPUT_MAX_CHARS: int = Field(default=1500, description="Tool outputs of past turns are condensed to this length")
+    CONTEXT_SUMMARY_MAX_TOKENS: int = Field(default=800, description="Cap of the running conversation summary")
+    CONTEXT_HISTORY_MIN_MESSAGES: int = Field(default=16, description="Messages loaded per turn at least (well above the kept turns)")
+    CONTEXT_HISTORY_MAX_MESSAGES: int = Field(default=60, description="Messages loaded per turn at most (unsummarized backlog)")
+    CONTEXT_BUDGET_REASONING_TOKENS: int | None = Field(default=12000, description="Prompt token budget of the Reasoning Node (None = unbounded)")
+    CONTEXT_BUDGET_EXECUTION_TOKENS: int | None = Field(default=16000, description="Prompt token budget of the Execution Node (None = unbounded)")
+    
     # Auth & Infrastructure
     RP_ID: str | None = Field(None, description="WebAuthn Relying Party ID")
     FIREBASE_CREDENTIALS: str | None = Field(None, description="Path to firebase credentials json")
@@ -0,0 +1,199 @@
+"""
+GenAI Client Registry
+
+One process-wide place for Gemini clients instead of a new client (and TLS
+handshake) per call:
+- client(api_version): shared google-genai Client per API version, with a
+  keep-alive connection pool (sync and async transports).
+- chat_model(model, **overrides): shared ChatGoogleGenerativeAI per model and
+  configuration; settings.GENAI_MODEL_CONFIG holds the per-model defaults.
+
+Created lazily on first use; aclose() on shutdown closes every transport on the
+serving loop, and later calls create fresh clients.
+
+Chat models are AdmittedChatModel instances: every generate / stream call
+(also through bind_tools / with_structured_output copies) first takes a slot
+from the admission controller (src/core/admission.py).
+"""
+import logging
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+from google import genai
+from google.genai import types
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_google_genai import ChatGoogleGenerativeAI
+from pydantic import Field
+
+from src.core.admission import AdmissionController, admission_controller
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.services.context_compactor import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+IMAGE_TOKENS = 258  # Gemini bills an image part as ~258 input tokens
+
+
+def estimate_request_tokens(messages: List[BaseMessage]) -> int:
+    """Input tokens reserved against the model's TPM bucket before the call."""
+    total = 0
+    for message in messages:
+        total += estimate_tokens(message.content)
+        if isinstance(message.content, list):
+            total += IMAGE_TOKENS * sum(
+                1 for part in message.content if isinstance(part, dict) and part.get("type") in ("image_url", "media")
+            )
+    return total
+
+
+def _usage_tokens(message: Any) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+class AdmittedChatModel(ChatGoogleGenerativeAI):
+    """ChatGoogleGenerativeAI whose provider calls go through the admission controller."""
+
+    admission: Optional[AdmissionController] = Field(default=None, exclude=True)
+
+    def _gate(self) -> AdmissionController:
+        return self.admission or admission_controller
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        with self._gate().slot_sync(self.model, estimate_request_tokens(messages)) as ticket:
+            result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            if result.generations:
+                ticket.used_tokens = _usage_tokens(result.generations[0].message)
+            return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        async with self._gate().slot(self.model, estimate_request_tokens(messages)) as ticket:
+            result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            if result.generations:
+                ticket.used_tokens = _usage_tokens(result.generations[0].message)
+            return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        with self._gate().slot_sync(self.model, estimate_request_tokens(messages)) as ticket:
+            used = 0
+            for chunk in super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                used += _usage_tokens(chunk.message) or 0
+                yield chunk
+            if used:
+                ticket.used_tokens = used
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        async with self._gate().slot(self.model, estimate_request_tokens(messages)) as ticket:
+            used = 0
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                used += _usage_tokens(chunk.message) or 0
+                yield chunk
+            if used:
+                ticket.used_tokens = used
+
+
+class GenAIClientRegistry:
+    """Shared, pooled google-genai clients and LangChain chat models."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model_config: Optional[Dict[str, Dict[str, Any]]] = None,
+        max_connections: int = 32,
+        max_keepalive: int = 16,
+        keepalive_expiry_s: float = 60.0,
+        admission: Optional[AdmissionController] = None
+    ):
+        self._api_key = api_key
+        self.admission = admission
+        self._model_config = model_config
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry_s,
+        )
+        self._clients: Dict[Optional[str], genai.Client] = {}
+        self._chat_models: Dict[Tuple, AdmittedChatModel] = {}
+        self._lock = threading.Lock()  # Sync tools resolve clients from worker threads
+
+    @property
+    def api_key(self) -> str:
+        return self._api_key or settings.api_key
+
+    @property
+    def model_config(self) -> Dict[str, Dict[str, Any]]:
+        return self._model_config if self._model_config is not None else settings.GENAI_MODEL_CONFIG
+
+    def _pool_args(self) -> Dict[str, Any]:
+        return {"limits": self.limits}
+
+    def client(self, api_version: Optional[str] = None) -> genai.Client:
+        """Shared google-genai Client (one per API version)."""
+        with self._lock:
+            client = self._clients.get(api_version)
+            if client is None:
+                client = genai.Client(
+                    api_key=self.api_key,
+                    http_options=types.HttpOptions(
+                        api_version=api_version,
+                        client_args=self._pool_args(),
+                        async_client_args=self._pool_args(),
+                    ),
+                )
+                self._clients[api_version] = client
+                metrics.increment("genai.clients.created")
+                logger.info(f"🔌 GenAI client created (api_version={api_version or 'default'})")
+            return client
+
+    def chat_model(self, model: str, **overrides: Any) -> AdmittedChatModel:
+        """Shared, admission-controlled chat model: GENAI_MODEL_CONFIG[model] defaults, then `overrides`."""
+        config = {**self.model_config.get(model, {}), **overrides}
+        key = (model, tuple(sorted(config.items())))
+        with self._lock:
+            llm = self._chat_models.get(key)
+            if llm is None:
+                llm = AdmittedChatModel(
+                    model=model,
+                    google_api_key=self.api_key,
+                    client_args=self._pool_args(),
+                    admission=self.admission,
+                    **config,
+                )
+                self._chat_models[key] = llm
+                metrics.increment("genai.chat_models.created")
+                logger.info(f"🔌 Chat model created: {model} {config or ''}")
+            return llm
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"clients": len(self._clients), "chat_models": len(self._chat_models)}
+
+    async def aclose(self) -> None:
+        """Closes every pooled transport (call on the serving loop, at shutdown)."""
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+            chat_models, self._chat_models = list(self._chat_models.values()), {}
+        for client in clients:
+            try:
+                await client.aio.aclose()
+                client.close()
+            except Exception as e:
+                logger.warning(f"⚠️ GenAI client close failed: {e}")
+        for llm in chat_models:
+            try:
+                await llm.aclose()
+            except Exception as e:
+                logger.warning(f"⚠️ Chat model close failed: {e}")
+        if clients or chat_models:
+            logger.info(f"🔌 GenAI registry closed ({len(clients)} clients, {len(chat_models)} chat models)")
+
+
+# Singleton instance (closed on app shutdown)
+genai_registry = GenAIClientRegistry(
+    max_connections=settings.GENAI_MAX_CONNECTIONS,
+    max_keepalive=settings.GENAI_MAX_KEEPALIVE,
+    keepalive_expiry_s=settings.GENAI_KEEPALIVE_EXPIRY_S,
+)
@@ -0,0 +1,77 @@
+"""
+Event Loop Lag Monitor
+
+Periodically sleeps for a fixed interval and measures how late the event loop
+wakes the task up. Any blocking call (sync Firestore, CPU-heavy parsing) on the
+loop shows up directly as lag, exposed as the `event_loop.lag_ms` summary.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """Background probe measuring event loop responsiveness."""
+
+    def __init__(
+        self,
+        interval: float = 0.25,
+        warn_threshold_ms: float = 100.0,
+        metric_name: str = "event_loop.lag_ms"
+    ):
+        self.interval = interval
+        self.warn_threshold_ms = warn_threshold_ms
+        self.metric_name = metric_name
+        self.max_lag_ms = 0.0
+        self.samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the probe on the running loop (idempotent)."""
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"⏱️ Loop lag monitor started (interval={self.interval}s)")
+
+    async def stop(self) -> None:
+        """Stop the probe and wait for it to exit."""
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def reset(self) -> None:
+        self.max_lag_ms = 0.0
+        self.samples = 0
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected_wakeup = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, (loop.time() - expected_wakeup) * 1000))
+
+    def record(self, lag_ms: float) -> None:
+        lag_ms = round(lag_ms, 2)
+        self.samples += 1
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        metrics.observe(self.metric_name, lag_ms)
+        metrics.set_gauge(self.metric_name, lag_ms)
+        if lag_ms > self.warn_threshold_ms:
+            logger.warning(f"⚠️ Event loop blocked for ~{lag_ms}ms")
+
+
+# Singleton instance (started on app startup)
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,96 @@
+"""
+In-Process Metrics Registry
+
+Lightweight counters, gauges and latency summaries for the chat pipeline.
+Values are kept in memory per worker and exposed via the /metrics endpoint.
+"""
+import threading
+from collections import deque
+from typing import Dict, Any, Deque
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of named metrics.
+
+    - Counters: monotonically increasing totals (e.g. cache hits).
+    - Gauges: last observed value (e.g. cache size).
+    - Summaries: count/sum/min/max plus p50/p95 over a sliding window of samples.
+    """
+
+    def __init__(self, window_size: int = 512):
+        self._lock = threading.Lock()
+        self._window_size = window_size
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Add `value` to the counter `name`."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set the gauge `name` to `value`."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record a sample (typically a latency in ms) for the summary `name`."""
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = {"count": 0, "sum": 0.0, "min": value, "max": value}
+                self._summaries[name] = summary
+                self._samples[name] = deque(maxlen=self._window_size)
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["min"] = min(summary["min"], value)
+            summary["max"] = max(summary["max"], value)
+            self._samples[name].append(value)
+
+    def get_counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def get_gauge(self, name: str) -> float:
+        with self._lock:
+            return self._gauges.get(name, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a JSON-serializable copy of all metrics."""
+        with self._lock:
+            summaries = {}
+            for name, summary in self._summaries.items():
+                samples = sorted(self._samples[name])
+                summaries[name] = {
+                    **summary,
+                    "avg": round(summary["sum"] / summary["count"], 2) if summary["count"] else 0.0,
+                    "p50": _percentile(samples, 0.50),
+                    "p95": _percentile(samples, 0.95),
+                }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": summaries,
+            }
+
+    def reset(self) -> None:
+        """Clear all metrics (used by tests)."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+            self._samples.clear()
+
+
+def _percentile(sorted_samples: list, fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return round(sorted_samples[index], 2)
+
+
+# Singleton instance
+metrics = MetricsRegistry()
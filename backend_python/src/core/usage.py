@@ -0,0 +1,370 @@
+"""
+Token & Cost Accounting
+
+Every model call reports its usage metadata here, attributed to the turn
+(request, session, user), the graph node, the tool and the call site
+(`operation`, e.g. "analyze_image_triage").
+
+- Per turn: totals observed as usage.turn.* summaries when the turn ends.
+- Per node / tool / model: cumulative usage.* counters on /metrics.
+- Rollups (session, user, node, tool, operation, model) aggregate in memory and
+  are flushed periodically to a sink (log or Firestore) by UsageFlusher.
+
+Attribution travels in context variables: the orchestrator opens the turn,
+ToolExecutor sets the tool, and tasks / worker threads inherit both.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import threading
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Protocol, Tuple
+
+from src.core.config import settings
+from src.core.context import get_request_id
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TokenUsage:
+    """Token counts of one or more calls (input includes cached, output includes thoughts)."""
+    calls: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    thoughts_tokens: int = 0
+    cost_usd: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def add(self, other: "TokenUsage") -> None:
+        self.calls += other.calls
+        self.input_tokens += other.input_tokens
+        self.cached_tokens += other.cached_tokens
+        self.output_tokens += other.output_tokens
+        self.thoughts_tokens += other.thoughts_tokens
+        self.cost_usd += other.cost_usd
+
+    @classmethod
+    def from_langchain(cls, usage: Optional[Dict[str, Any]]) -> Optional["TokenUsage"]:
+        """From an AIMessage.usage_metadata dict."""
+        if not usage:
+            return None
+        return cls(
+            calls=1,
+            input_tokens=usage.get("input_tokens") or 0,
+            cached_tokens=(usage.get("input_token_details") or {}).get("cache_read") or 0,
+            output_tokens=usage.get("output_tokens") or 0,
+            thoughts_tokens=(usage.get("output_token_details") or {}).get("reasoning") or 0,
+        )
+
+    @classmethod
+    def from_genai(cls, usage: Any) -> Optional["TokenUsage"]:
+        """From a google-genai GenerateContentResponse.usage_metadata."""
+        if usage is None:
+            return None
+        thoughts = getattr(usage, "thoughts_token_count", None) or 0
+        return cls(
+            calls=1,
+            input_tokens=(getattr(usage, "prompt_token_count", None) or 0)
+            + (getattr(usage, "tool_use_prompt_token_count", None) or 0),
+            cached_tokens=getattr(usage, "cached_content_token_count", None) or 0,
+            output_tokens=(getattr(usage, "candidates_token_count", None) or 0) + thoughts,
+            thoughts_tokens=thoughts,
+        )
+
+
+@dataclass
+class TurnUsage:
+    """Usage of one /chat/stream turn, shared by every task of the turn."""
+    request_id: str
+    session_id: str
+    user_id: str
+    total: TokenUsage = field(default_factory=TokenUsage)
+    by_step: Dict[str, TokenUsage] = field(default_factory=dict)  # node or tool -> usage
+
+
+_turn_ctx_var: ContextVar[Optional[TurnUsage]] = ContextVar("usage_turn", default=None)
+_scope_ctx_var: ContextVar[Tuple[Optional[str], Optional[str]]] = ContextVar("usage_scope", default=(None, None))
+
+
+@contextlib.contextmanager
+def usage_scope(node: Optional[str] = None, tool: Optional[str] = None) -> Iterator[None]:
+    """Attributes the model calls made inside the block to `node` / `tool`."""
+    current_node, current_tool = _scope_ctx_var.get()
+    token = _scope_ctx_var.set((node or current_node, tool or current_tool))
+    try:
+        yield
+    finally:
+        _scope_ctx_var.reset(token)
+
+
+def _model_key(model: Optional[str]) -> str:
+    return (model or "unknown").removeprefix("models/")
+
+
+class UsageSink(Protocol):
+    async def write(self, rows: List[Dict[str, Any]]) -> None:
+        ...
+
+
+class LogUsageSink:
+    """One structured log line per rollup row."""
+
+    async def write(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            logger.info(f"💰 Usage {json.dumps(row, sort_keys=True)}", extra={"event": "usage_rollup", **row})
+
+
+class FirestoreUsageSink:
+    """Rollup rows appended to a Firestore collection (batched)."""
+
+    BATCH_SIZE = 400  # Firestore caps a batch at 500 writes
+
+    def __init__(self, db: Any = None, collection: str = "usage_rollups"):
+        self._db = db
+        self.collection = collection
+
+    @property
+    def db(self):
+        if self._db is None:
+            from src.db.firebase_client import get_async_firestore_client
+            self._db = get_async_firestore_client()
+        return self._db
+
+    async def write(self, rows: List[Dict[str, Any]]) -> None:
+        collection = self.db.collection(self.collection)
+        for start in range(0, len(rows), self.BATCH_SIZE):
+            batch = self.db.batch()
+            for row in rows[start:start + self.BATCH_SIZE]:
+                batch.set(collection.document(), row)
+            await batch.commit()
+
+
+class UsageAccountant:
+    """Thread-safe aggregation of model usage (turn totals, metrics, flushable rollups)."""
+
+    def __init__(self, prices: Optional[Dict[str, List[float]]] = None):
+        self._prices = prices
+        self._lock = threading.Lock()
+        self._rollups: Dict[Tuple[str, ...], TokenUsage] = {}
+        self._window_start = datetime.now(timezone.utc)
+
+    @property
+    def prices(self) -> Dict[str, List[float]]:
+        return self._prices if self._prices is not None else settings.USAGE_PRICES_USD_PER_MTOK
+
+    def cost(self, model: str, usage: TokenUsage) -> float:
+        """USD cost from the per-million-token prices [input, cached input, output]."""
+        price = self.prices.get(model)
+        if not price:
+            return 0.0
+        input_price, cached_price, output_price = price
+        billed_input = usage.input_tokens - usage.cached_tokens
+        return (billed_input * input_price + usage.cached_tokens * cached_price + usage.output_tokens * output_price) / 1e6
+
+    # ━━━ Turn scope ━━━
+
+    def start_turn(self, session_id: str, user_id: str) -> TurnUsage:
+        """Opens the turn in the current context (inherited by the graph's tasks)."""
+        turn = TurnUsage(request_id=get_request_id(), session_id=session_id, user_id=user_id)
+        _turn_ctx_var.set(turn)
+        return turn
+
+    def finish_turn(self, turn: Optional[TurnUsage] = None) -> Optional[TurnUsage]:
+        """Observes the turn totals (usage.turn.*) and closes the turn."""
+        turn = turn or _turn_ctx_var.get()
+        if turn is None:
+            return None
+        _turn_ctx_var.set(None)
+        total = turn.total
+        metrics.observe("usage.turn.llm_calls", total.calls)
+        metrics.observe("usage.turn.total_tokens", total.total_tokens)
+        metrics.observe("usage.turn.cost_usd", round(total.cost_usd, 6))
+        if total.calls:
+            by_step = " ".join(f"{step}={u.total_tokens}" for step, u in turn.by_step.items())
+            logger.info(
+                f"💰 Turn usage: {total.calls} calls, {total.total_tokens} tokens "
+                f"({total.cached_tokens} cached), ${total.cost_usd:.5f} [{by_step}]",
+                extra={"request_id": turn.request_id}
+            )
+        return turn
+
+    # ━━━ Recording ━━━
+
+    def record(
+        self,
+        model: Optional[str],
+        usage: Optional[TokenUsage],
+        node: Optional[str] = None,
+        tool: Optional[str] = None,
+        operation: Optional[str] = None
+    ) -> None:
+        """Attributes one call's usage; node / tool default to the current usage_scope."""
+        if usage is None:
+            return
+        scope_node, scope_tool = _scope_ctx_var.get()
+        node = node or scope_node or "unscoped"
+        tool = tool or scope_tool
+        model = _model_key(model)
+        usage.cost_usd = self.cost(model, usage)
+        turn = _turn_ctx_var.get()
+
+        for dimension, name in (("node", node), ("tool", tool), ("model", model)):
+            if name:
+                metrics.increment(f"usage.{dimension}.{name}.input_tokens", usage.input_tokens)
+                metrics.increment(f"usage.{dimension}.{name}.cached_tokens", usage.cached_tokens)
+                metrics.increment(f"usage.{dimension}.{name}.output_tokens", usage.output_tokens)
+                metrics.increment(f"usage.{dimension}.{name}.cost_usd", usage.cost_usd)
+
+        key = (
+            turn.session_id if turn else "",
+            turn.user_id if turn else "",
+            node, tool or "", operation or node, model
+        )
+        with self._lock:
+            self._rollups.setdefault(key, TokenUsage()).add(usage)
+            if turn is not None:
+                turn.total.add(usage)
+                turn.by_step.setdefault(tool or node, TokenUsage()).add(usage)
+
+    def record_message(self, model: Optional[str], message: Any, **attribution: Any) -> None:
+        """Usage of a LangChain chat-model response (AIMessage.usage_metadata)."""
+        self.record(model, TokenUsage.from_langchain(getattr(message, "usage_metadata", None)), **attribution)
+
+    def record_genai(self, model: Optional[str], response: Any, **attribution: Any) -> None:
+        """Usage of a google-genai generate_content response."""
+        self.record(model, TokenUsage.from_genai(getattr(response, "usage_metadata", None)), **attribution)
+
+    # ━━━ Rollups ━━━
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Rollup rows since the last drain (and resets them)."""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            rollups, self._rollups = self._rollups, {}
+            window_start, self._window_start = self._window_start, now
+        rows = []
+        for (session_id, user_id, node, tool, operation, model), usage in rollups.items():
+            rows.append({
+                "window_start": window_start.isoformat(),
+                "window_end": now.isoformat(),
+                "session_id": session_id,
+                "user_id": user_id,
+                "node": node,
+                "tool": tool,
+                "operation": operation,
+                "model": model,
+                **asdict(usage),
+                "cost_usd": round(usage.cost_usd, 6),
+            })
+        return rows
+
+    def restore(self, rows: List[Dict[str, Any]]) -> None:
+        """Merges drained rows back (the sink write failed)."""
+        with self._lock:
+            for row in rows:
+                key = (row["session_id"], row["user_id"], row["node"], row["tool"], row["operation"], row["model"])
+                self._rollups.setdefault(key, TokenUsage()).add(TokenUsage(
+                    calls=row["calls"], input_tokens=row["input_tokens"], cached_tokens=row["cached_tokens"],
+                    output_tokens=row["output_tokens"], thoughts_tokens=row["thoughts_tokens"], cost_usd=row["cost_usd"],
+                ))
+
+    def snapshot(self, top: int = 10) -> Dict[str, Any]:
+        """Most expensive sessions / users / operations since the last flush (for /metrics)."""
+        with self._lock:
+            rollups = list(self._rollups.items())
+        totals: Dict[str, Dict[str, TokenUsage]] = {"sessions": {}, "users": {}, "operations": {}}
+        for (session_id, user_id, _node, _tool, operation, _model), usage in rollups:
+            for dimension, name in (("sessions", session_id), ("users", user_id), ("operations", operation)):
+                if name:
+                    totals[dimension].setdefault(name, TokenUsage()).add(usage)
+        return {
+            "window_start": self._window_start.isoformat(),
+            **{
+                dimension: [
+                    {"name": name, "calls": u.calls, "tokens": u.total_tokens, "cost_usd": round(u.cost_usd, 6)}
+                    for name, u in sorted(by_name.items(), key=lambda kv: kv[1].cost_usd or kv[1].total_tokens, reverse=True)[:top]
+                ]
+                for dimension, by_name in totals.items()
+            },
+        }
+
+
+class UsageFlusher:
+    """
+    Background task draining the accountant's rollups to a sink every `interval` seconds.
+    Without a sink the rollups are dropped each interval (they only feed /metrics).
+    """
+
+    def __init__(self, accountant: UsageAccountant, sink: Optional[UsageSink] = None, interval: float = 60.0):
+        self.accountant = accountant
+        self.sink = sink
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start flushing on the running loop (idempotent)."""
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"💰 Usage flusher started (interval={self.interval}s, sink={type(self.sink).__name__})")
+
+    async def stop(self) -> None:
+        """Stop the task and flush what is left."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> int:
+        """Writes the pending rollups; on failure they are merged back for the next flush."""
+        rows = self.accountant.drain()
+        if not rows or self.sink is None:
+            return 0
+        try:
+            await self.sink.write(rows)
+        except Exception as e:
+            logger.warning(f"⚠️ Usage flush failed ({len(rows)} rows kept): {e}")
+            metrics.increment("usage.flush.errors")
+            self.accountant.restore(rows)
+            return 0
+        metrics.increment("usage.flush.rows", len(rows))
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+
+def build_usage_sink(sink: Optional[str] = None) -> Optional[UsageSink]:
+    """Sink for settings.USAGE_SINK ("none" | "log" | "firestore")."""
+    sink = (sink or settings.USAGE_SINK).lower()
+    if sink == "log":
+        return LogUsageSink()
+    if sink == "firestore":
+        return FirestoreUsageSink()
+    if sink != "none":
+        logger.warning(f"⚠️ Unknown usage sink '{sink}'. Rollups are not flushed.")
+    return None
+
+
+# Singleton instances (flusher started on app startup)
+usage_accountant = UsageAccountant()
+usage_flusher = UsageFlusher(usage_accountant, build_usage_sink(), interval=settings.USAGE_FLUSH_INTERVAL_S)
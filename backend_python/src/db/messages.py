@@ -2,7 +2,8 @@ import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from firebase_admin import firestore
-from src.db.firebase_client import get_firestore_client
+from google.cloud.firestore_v1 import FieldFilter
+from src.db.firebase_client import get_firestore_client, get_async_firestore_client
 from src.db.projects import sync_project_cover
 
 logger = logging.getLogger(__name__)
@@ -18,7 +19,7 @@ async def save_message(
 ) -> None:
     """Save a message to Firestore with tool support and media attachments."""
     try:
-        db = get_firestore_client()
+        db = get_async_firestore_client()
         
         message_data = {
             'role': role,
@@ -39,11 +40,11 @@ async def save_message(
             message_data['attachments'] = attachments
         
         # Add to messages subcollection
-        db.collection('sessions').document(session_id).collection('messages').add(message_data)
+        await db.collection('sessions').document(session_id).collection('messages').add(message_data)
         
         # Update session metadata
         session_ref = db.collection('sessions').document(session_id)
-        session_doc = session_ref.get()
+        session_doc = await session_ref.get()
         
         session_update = {
             'updatedAt': firestore.SERVER_TIMESTAMP,
@@ -54,7 +55,7 @@ async def save_message(
         if not session_doc.exists:
             session_update['createdAt'] = firestore.SERVER_TIMESTAMP
             
-        session_ref.set(session_update, merge=True)
+        await session_ref.set(session_update, merge=True)
         
         logger.info(f"[Firestore] Saved {role} message to session {session_id}")
         
@@ -69,7 +70,7 @@ async def get_conversation_context(
 ) -> List[Dict[str, Any]]:
     """Retrieve conversation history including tool data and attachments."""
     try:
-        db = get_firestore_client()
+        db = get_async_firestore_client()
         
         messages_ref = (
             db.collection('sessions')
@@ -79,10 +80,8 @@ async def get_conversation_context(
             .limit(limit)
         )
         
-        docs = messages_ref.stream()
-        
         messages = []
-        for doc in docs:
+        async for doc in messages_ref.stream():
             data = doc.to_dict()
             msg = {
                 'role': data.get('role', 'user'),
@@ -151,16 +150,16 @@ async def ensure_session(session_id: str, user_id: Optional[str] = None) -> None
         user_id: Optional Firebase UID of the owner
     """
     try:
-        db = get_firestore_client()
+        db = get_async_firestore_client()
         
         session_ref = db.collection('sessions').document(session_id)
-        doc = session_ref.get()
+        doc = await session_ref.get()
         
         if not doc.exists:
             # Determine owner: use provided user_id or generate guest ID
             owner_id = user_id if user_id else f"guest_{session_id[:8]}"
             
-            session_ref.set({
+            await session_ref.set({
                 'sessionId': session_id,
                 'userId': owner_id,  # 🆕 Project owner
                 'title': 'Nuovo Progetto',  # 🆕 Default title
@@ -175,8 +174,8 @@ async def ensure_session(session_id: str, user_id: Optional[str] = None) -> None
             # 🔥 SYNC: Create corresponding Project document
             # This ensures the session appears in the Global Gallery project list
             project_ref = db.collection('projects').document(session_id)
-            if not project_ref.get().exists:
-                project_ref.set({
+            if not (await project_ref.get()).exists:
+                await project_ref.set({
                     'id': session_id,
                     'name': 'Nuovo Progetto', 
                     'userId': owner_id,
@@ -188,9 +187,9 @@ async def ensure_session(session_id: str, user_id: Optional[str] = None) -> None
         else:
             # Check if project exists even if session exists (backfill logic)
             project_ref = db.collection('projects').document(session_id)
-            if not project_ref.get().exists:
+            if not (await project_ref.get()).exists:
                  session_data = doc.to_dict()
-                 project_ref.set({
+                 await project_ref.set({
                     'id': session_id,
                     'name': session_data.get('title', 'Progetto Recuperato'), 
                     'userId': session_data.get('userId', user_id or 'unknown'),
@@ -215,7 +214,7 @@ async def save_file_metadata(
     This ensures files appear in the Global Gallery.
     """
     try:
-        db = get_firestore_client()
+        db = get_async_firestore_client()
         
         # Ensure 'files' subcollection under the project
         # Using projects/{project_id}/files ensures compatibility with GlobalGallery
@@ -223,7 +222,7 @@ async def save_file_metadata(
         
         # Check if file already exists (by URL) to prevent duplicates
         # This is a basic check; stricter checks could rely on hash or storage ID
-        existing_docs = files_ref.where('url', '==', file_data['url']).limit(1).get()
+        existing_docs = await files_ref.where(filter=FieldFilter('url', '==', file_data['url'])).limit(1).get()
         if len(existing_docs) > 0:
             logger.info(f"[Firestore] File already exists in gallery: {file_data.get('name', 'unknown')}")
             return
@@ -242,7 +241,7 @@ async def save_file_metadata(
             'thumbnailUrl': file_data.get('thumbnailUrl') # Video thumbnails
         }
         
-        files_ref.add(doc_data)
+        await files_ref.add(doc_data)
         logger.info(f"[Firestore] 🖼️ Saved file metadata to project {project_id}: {doc_data['name']}")
         
         # 🔄 Trigger Smart Cover Sync
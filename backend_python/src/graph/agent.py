@@ -1,8 +1,12 @@
 import logging
-from langchain_google_genai import ChatGoogleGenerativeAI
 from src.core.config import settings
+from src.core.genai_clients import genai_registry
 from src.graph.tools_registry import ALL_TOOLS
 from src.graph.factory import AgentGraphFactory
+from src.services.context_compactor import ContextCompactor
+from src.graph.tool_memo import tool_result_memo
+from src.graph.checkpointer import build_checkpointer
+from src.services.prompt_cache import build_prompt_cache
 
 logger = logging.getLogger(__name__)
 
@@ -15,11 +19,7 @@ def _get_llm():
     global _llm
     if _llm is None:
         logger.info("⚡ Initializing Execution LLM...")
-        _llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash", 
-            google_api_key=settings.api_key,
-            temperature=0.1,
-        )
+        _llm = genai_registry.chat_model("gemini-2.5-flash", temperature=0.1)
     return _llm
 
 def _get_reasoning_llm():
@@ -27,25 +27,29 @@ def _get_reasoning_llm():
     global _reasoning_llm
     if _reasoning_llm is None:
         logger.info("🧠 Initializing Reasoning LLM...")
-        _reasoning_llm = ChatGoogleGenerativeAI(
-            # Using 2.5 Flash for improved reasoning & unified quota
-            model="gemini-2.5-flash", 
-            google_api_key=settings.api_key,
-            temperature=0.0, # Strict Logic
-        )
+        # Using 2.5 Flash for improved reasoning & unified quota
+        _reasoning_llm = genai_registry.chat_model("gemini-2.5-flash", temperature=0.0) # Strict Logic
     return _reasoning_llm
 
-# Singleton Graph Instance
-_agent_graph = None
+# Singleton Factory & Compiled Graphs (one per topology mode)
+_factory = None
+_agent_graphs = {}
+
+GRAPH_MODES = ("two_tier", "fast")
 
-def get_agent_graph():
+def get_agent_graph(mode: str | None = None):
     """
-    Lazy loads the agent graph. 
+    Lazy loads the agent graph for `mode` (defaults to settings.AGENT_GRAPH_MODE).
     Act as the Composition Root for the Agent subsystem.
     """
-    global _agent_graph
+    global _factory
     
-    if _agent_graph is None:
+    mode = mode or settings.AGENT_GRAPH_MODE
+    if mode not in GRAPH_MODES:
+        logger.warning(f"⚠️ Unknown graph mode '{mode}'. Using two_tier.")
+        mode = "two_tier"
+    
+    if _factory is None:
         logger.info("🏭 Construction: Building Agent Graph via Factory...")
         
         # 1. Instantiate Dependencies
@@ -53,15 +57,29 @@ def get_agent_graph():
         reasoning_llm = _get_reasoning_llm()
         tools = ALL_TOOLS
         
-        # 2. Create Factory
-        factory = AgentGraphFactory(
+        # 2. Create Factory (shared by all modes, so they share the tool-binding cache)
+        _factory = AgentGraphFactory(
             llm=llm, 
             reasoning_llm=reasoning_llm, 
-            tools=tools
+            tools=tools,
+            use_async_nodes=settings.AGENT_ASYNC_NODES,
+            speculative_execution=settings.AGENT_SPECULATIVE_EXECUTION,
+            reasoning_token_budget=settings.CONTEXT_BUDGET_REASONING_TOKENS,
+            execution_token_budget=settings.CONTEXT_BUDGET_EXECUTION_TOKENS,
+            compactor=ContextCompactor(
+                tool_output_max_chars=settings.CONTEXT_TOOL_OUTPUT_MAX_CHARS
+            ),
+            tool_memo=tool_result_memo if settings.TOOL_MEMO_ENABLED else None,
+            tool_concurrency=settings.TOOL_MAX_CONCURRENCY,
+            tool_limits=settings.TOOL_CONCURRENCY_LIMITS,
+            tool_user_limits=settings.TOOL_USER_CONCURRENCY_LIMITS,
+            checkpointer=build_checkpointer(),
+            prompt_cache=build_prompt_cache()
         )
-        
+    
+    if mode not in _agent_graphs:
         # 3. Compile Graph
-        _agent_graph = factory.create_graph()
-        logger.info("✅ Agent Graph Successfully Initialized")
+        _agent_graphs[mode] = _factory.create_graph(mode=mode)
+        logger.info(f"✅ Agent Graph Successfully Initialized (mode={mode})")
         
-    return _agent_graph
+    return _agent_graphs[mode]
@@ -0,0 +1,558 @@
+"""
+Agent Graph Checkpointers
+
+LangGraph checkpoint savers for the agent graph, so a turn resumes from the
+state saved by the previous one (messages, plan, thought log) instead of
+rebuilding AgentState from the Firestore history.
+
+- SQLiteCheckpointSaver: stdlib sqlite3, a local file (or ":memory:"). Dev / tests /
+  single-instance deployments.
+- FirestoreCheckpointSaver: async Firestore client, shared by all instances (production).
+
+Both store each checkpoint as one serialized document (channel values included),
+so loading the latest state is a single read, and keep only the last N
+checkpoints per thread: the conversation of record stays in Firestore history.
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from google.cloud.firestore_v1 import FieldFilter
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.utils.async_utils import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# (task_id, channel, type, value, task_path) as stored
+_StoredWrite = Tuple[str, str, str, bytes, str]
+
+
+def _thread_config(thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]) -> Optional[RunnableConfig]:
+    if not checkpoint_id:
+        return None
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+def _matches(metadata: CheckpointMetadata, filter: Optional[Dict[str, Any]]) -> bool:
+    return not filter or all(metadata.get(key) == value for key, value in filter.items())
+
+
+class _SerializingSaver(BaseCheckpointSaver[str]):
+    """Row <-> CheckpointTuple conversion shared by the backends."""
+
+    def __init__(self, keep_last: int = 4):
+        super().__init__()
+        self.keep_last = max(1, keep_last)
+
+    def _dump_checkpoint(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata) -> Dict[str, Any]:
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        return {
+            "thread_id": config["configurable"]["thread_id"],
+            "checkpoint_ns": config["configurable"].get("checkpoint_ns", ""),
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+            "type": checkpoint_type,
+            "checkpoint": checkpoint_blob,
+            "metadata_type": metadata_type,
+            "metadata": metadata_blob,
+        }
+
+    def _dump_writes(self, writes: Sequence[Tuple[str, Any]]) -> List[Tuple[int, str, str, bytes]]:
+        """(idx, channel, type, value); special channels (errors, interrupts) get fixed negative idx."""
+        dumped = []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, value_blob = self.serde.dumps_typed(value)
+            dumped.append((WRITES_IDX_MAP.get(channel, idx), channel, value_type, value_blob))
+        return dumped
+
+    def _load_tuple(self, row: Dict[str, Any], writes: List[_StoredWrite]) -> CheckpointTuple:
+        thread_id, checkpoint_ns = row["thread_id"], row["checkpoint_ns"]
+        return CheckpointTuple(
+            config=_thread_config(thread_id, checkpoint_ns, row["checkpoint_id"]),
+            checkpoint=self.serde.loads_typed((row["type"], row["checkpoint"])),
+            metadata=self.serde.loads_typed((row["metadata_type"], row["metadata"])),
+            parent_config=_thread_config(thread_id, checkpoint_ns, row["parent_checkpoint_id"]),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value, _ in writes
+            ],
+        )
+
+
+class SQLiteCheckpointSaver(_SerializingSaver):
+    """
+    Checkpoint saver on a local SQLite file (":memory:" for tests).
+    One connection guarded by a lock; the async API runs it on a worker thread.
+    """
+
+    def __init__(self, path: str = ":memory:", keep_last: int = 4):
+        super().__init__(keep_last=keep_last)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS checkpoints (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    checkpoint_id TEXT NOT NULL,
+                    parent_checkpoint_id TEXT,
+                    type TEXT,
+                    checkpoint BLOB,
+                    metadata_type TEXT,
+                    metadata BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS writes (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    checkpoint_id TEXT NOT NULL,
+                    task_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    channel TEXT NOT NULL,
+                    type TEXT,
+                    value BLOB,
+                    task_path TEXT NOT NULL DEFAULT '',
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+                )"""
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # --- Sync API ---
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        started = time.perf_counter()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        query = "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        params: List[Any] = [thread_id, checkpoint_ns]
+        if checkpoint_id:
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        query += " ORDER BY checkpoint_id DESC LIMIT 1"
+
+        with self._lock:
+            row = self._fetch_rows(query, params)
+            writes = self._fetch_writes(thread_id, checkpoint_ns, row[0]["checkpoint_id"]) if row else []
+        checkpoint_tuple = self._load_tuple(row[0], writes) if row else None
+        metrics.observe("agent.checkpoint.get_ms", round((time.perf_counter() - started) * 1000, 2))
+        return checkpoint_tuple
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query, params = "SELECT * FROM checkpoints WHERE 1 = 1", []
+        if config:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if "checkpoint_ns" in config["configurable"]:
+                query += " AND checkpoint_ns = ?"
+                params.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._fetch_rows(query, params)
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            checkpoint_tuple = self._load_tuple(row, [])
+            if not _matches(checkpoint_tuple.metadata, filter):
+                continue
+            if limit is not None:
+                limit -= 1
+            with self._lock:
+                writes = self._fetch_writes(row["thread_id"], row["checkpoint_ns"], row["checkpoint_id"])
+            yield self._load_tuple(row, writes)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        started = time.perf_counter()
+        row = self._dump_checkpoint(config, checkpoint, metadata)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (:thread_id, :checkpoint_ns, :checkpoint_id, "
+                ":parent_checkpoint_id, :type, :checkpoint, :metadata_type, :metadata)",
+                row,
+            )
+            self._prune(row["thread_id"], row["checkpoint_ns"])
+        metrics.observe("agent.checkpoint.put_ms", round((time.perf_counter() - started) * 1000, 2))
+        return _thread_config(row["thread_id"], row["checkpoint_ns"], row["checkpoint_id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        key = (configurable["thread_id"], configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"])
+        with self._lock, self._conn:
+            for idx, channel, value_type, value in self._dump_writes(writes):
+                # Regular writes are kept on retry; special ones (error, interrupt) are replaced
+                verb = "INSERT OR IGNORE" if idx >= 0 else "INSERT OR REPLACE"
+                self._conn.execute(
+                    f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (*key, task_id, idx, channel, value_type, value, task_path),
+                )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+    # --- Async API (worker thread) ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await run_blocking(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await run_blocking(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await run_blocking(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await run_blocking(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await run_blocking(self.delete_thread, thread_id)
+
+    # --- Internals (caller holds the lock) ---
+
+    def _fetch_rows(self, query: str, params: Sequence[Any]) -> List[Dict[str, Any]]:
+        cursor = self._conn.execute(query, params)
+        columns = [c[0] for c in cursor.description]
+        return [dict(zip(columns, values)) for values in cursor.fetchall()]
+
+    def _fetch_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[_StoredWrite]:
+        cursor = self._conn.execute(
+            "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+        rows = sorted(cursor.fetchall(), key=lambda r: writes_sort_key(r[5], r[0], r[1]))
+        return [(task_id, channel, value_type, value, task_path) for task_id, _, channel, value_type, value, task_path in rows]
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        stale = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_last),
+        ).fetchall()
+        for (checkpoint_id,) in stale:
+            key = (thread_id, checkpoint_ns, checkpoint_id)
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", key)
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", key)
+
+
+class FirestoreCheckpointSaver(_SerializingSaver):
+    """
+    Checkpoint saver on Firestore (async client). The sync API bridges to the
+    event loop the client runs on, so it can be called from worker threads
+    (sync graph runs), never from that loop itself.
+
+    Layout:
+        agent_checkpoints/{thread_id}                  -> {"latest": {ns: id}, "recent": {ns: [ids]}}
+        agent_checkpoints/{thread_id}/checkpoints/{ns|id}
+        agent_checkpoints/{thread_id}/writes/{ns|id|task_id|idx}
+
+    The thread document points at the latest checkpoint, so a resume is two
+    point reads plus the (usually empty) writes query, with no composite index.
+    A checkpoint document must stay under Firestore's 1 MiB limit: the
+    orchestrator trims the checkpointed messages (CHECKPOINT_MAX_MESSAGES).
+    """
+
+    ROOT_NS = "__root__"  # Map keys cannot be empty strings
+
+    def __init__(self, db: Any = None, collection: str = "agent_checkpoints", keep_last: int = 4):
+        super().__init__(keep_last=keep_last)
+        self._db = db
+        self.collection = collection
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def db(self):
+        if self._loop is None:
+            # The async client is bound to the loop it is first used on
+            try:
+                self._loop = asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+        if self._db is None:
+            from src.db.firebase_client import get_async_firestore_client
+            self._db = get_async_firestore_client()
+        return self._db
+
+    def _thread_ref(self, thread_id: str):
+        return self.db.collection(self.collection).document(thread_id)
+
+    @staticmethod
+    def _checkpoint_key(checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"{checkpoint_ns}|{checkpoint_id}"
+
+    def _ns_key(self, checkpoint_ns: str) -> str:
+        return checkpoint_ns or self.ROOT_NS
+
+    # --- Async API ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        started = time.perf_counter()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        thread_ref = self._thread_ref(thread_id)
+        checkpoint_id = get_checkpoint_id(config)
+        if not checkpoint_id:
+            thread_doc = await thread_ref.get()
+            latest = (thread_doc.to_dict() or {}).get("latest", {}) if thread_doc.exists else {}
+            checkpoint_id = latest.get(self._ns_key(checkpoint_ns))
+            if not checkpoint_id:
+                return None
+
+        key = self._checkpoint_key(checkpoint_ns, checkpoint_id)
+        doc = await thread_ref.collection("checkpoints").document(key).get()
+        if not doc.exists:
+            return None
+        writes = await self._aload_writes(thread_ref, key)
+        checkpoint_tuple = self._load_tuple(doc.to_dict(), writes)
+        metrics.observe("agent.checkpoint.get_ms", round((time.perf_counter() - started) * 1000, 2))
+        return checkpoint_tuple
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        if not config:
+            raise ValueError("FirestoreCheckpointSaver.alist requires a thread_id")
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns")
+        checkpoint_id = get_checkpoint_id(config)
+        before_id = get_checkpoint_id(before) if before else None
+        thread_ref = self._thread_ref(thread_id)
+
+        # At most keep_last checkpoints per namespace: filter and sort client side
+        rows = [doc.to_dict() async for doc in thread_ref.collection("checkpoints").stream()]
+        rows.sort(key=lambda r: r["checkpoint_id"], reverse=True)
+        for row in rows:
+            if checkpoint_ns is not None and row["checkpoint_ns"] != checkpoint_ns:
+                continue
+            if (checkpoint_id and row["checkpoint_id"] != checkpoint_id) or (before_id and row["checkpoint_id"] >= before_id):
+                continue
+            if limit is not None and limit <= 0:
+                break
+            if not _matches(self.serde.loads_typed((row["metadata_type"], row["metadata"])), filter):
+                continue
+            if limit is not None:
+                limit -= 1
+            key = self._checkpoint_key(row["checkpoint_ns"], row["checkpoint_id"])
+            yield self._load_tuple(row, await self._aload_writes(thread_ref, key))
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        started = time.perf_counter()
+        row = self._dump_checkpoint(config, checkpoint, metadata)
+        thread_id, checkpoint_ns, checkpoint_id = row["thread_id"], row["checkpoint_ns"], row["checkpoint_id"]
+        thread_ref = self._thread_ref(thread_id)
+        ns_key = self._ns_key(checkpoint_ns)
+
+        thread_doc = await thread_ref.get()
+        recent = ((thread_doc.to_dict() or {}).get("recent", {}) if thread_doc.exists else {}).get(ns_key, [])
+        recent = sorted(set(recent) | {checkpoint_id})
+        stale, recent = recent[:-self.keep_last], recent[-self.keep_last:]
+
+        batch = self.db.batch()
+        batch.set(thread_ref.collection("checkpoints").document(self._checkpoint_key(checkpoint_ns, checkpoint_id)), row)
+        batch.set(thread_ref, {"latest": {ns_key: recent[-1]}, "recent": {ns_key: recent}}, merge=True)
+        for stale_id in stale:
+            batch.delete(thread_ref.collection("checkpoints").document(self._checkpoint_key(checkpoint_ns, stale_id)))
+        await batch.commit()
+
+        for stale_id in stale:
+            await self._adelete_writes(thread_ref, self._checkpoint_key(checkpoint_ns, stale_id))
+        metrics.observe("agent.checkpoint.put_ms", round((time.perf_counter() - started) * 1000, 2))
+        return _thread_config(thread_id, checkpoint_ns, checkpoint_id)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        checkpoint_key = self._checkpoint_key(configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"])
+        writes_ref = self._thread_ref(configurable["thread_id"]).collection("writes")
+        batch = self.db.batch()
+        for idx, channel, value_type, value in self._dump_writes(writes):
+            # Deterministic ids: a retried task overwrites instead of duplicating
+            batch.set(writes_ref.document(f"{checkpoint_key}|{task_id}|{idx}"), {
+                "checkpoint_key": checkpoint_key,
+                "task_id": task_id,
+                "idx": idx,
+                "channel": channel,
+                "type": value_type,
+                "value": value,
+                "task_path": task_path,
+            })
+        await batch.commit()
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        thread_ref = self._thread_ref(thread_id)
+        for name in ("checkpoints", "writes"):
+            async for doc in thread_ref.collection(name).stream():
+                await doc.reference.delete()
+        await thread_ref.delete()
+
+    # --- Sync API (bridged to the client's event loop) ---
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self._run_sync(self.aget_tuple(config))
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        async def collect() -> List[CheckpointTuple]:
+            return [t async for t in self.alist(config, filter=filter, before=before, limit=limit)]
+        yield from self._run_sync(collect())
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self._run_sync(self.aput(config, checkpoint, metadata, new_versions))
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self._run_sync(self.aput_writes(config, writes, task_id, task_path))
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._run_sync(self.adelete_thread(thread_id))
+
+    # --- Internals ---
+
+    def _run_sync(self, coro):
+        """Runs `coro` on the client's event loop and waits for it (from another thread)."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None and running is self._loop:
+            coro.close()
+            raise asyncio.InvalidStateError(
+                "FirestoreCheckpointSaver sync API called on its own event loop (would deadlock): use the async API"
+            )
+        if self._loop is None or self._loop.is_closed():
+            # Sync-only use: the client lives on a private background loop
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name="firestore-checkpointer", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _aload_writes(self, thread_ref, checkpoint_key: str) -> List[_StoredWrite]:
+        query = thread_ref.collection("writes").where(filter=FieldFilter("checkpoint_key", "==", checkpoint_key))
+        rows = [doc.to_dict() async for doc in query.stream()]
+        rows.sort(key=lambda r: writes_sort_key(r["task_path"], r["task_id"], r["idx"]))
+        return [(r["task_id"], r["channel"], r["type"], r["value"], r["task_path"]) for r in rows]
+
+    async def _adelete_writes(self, thread_ref, checkpoint_key: str) -> None:
+        query = thread_ref.collection("writes").where(filter=FieldFilter("checkpoint_key", "==", checkpoint_key))
+        async for doc in query.stream():
+            await doc.reference.delete()
+
+
+def build_checkpointer(backend: Optional[str] = None) -> Optional[BaseCheckpointSaver]:
+    """Checkpointer for settings.AGENT_CHECKPOINTER ("none" | "sqlite" | "firestore")."""
+    backend = (backend or settings.AGENT_CHECKPOINTER).lower()
+    if backend == "sqlite":
+        logger.info(f"💾 Agent checkpoints: SQLite ({settings.CHECKPOINT_SQLITE_PATH})")
+        return SQLiteCheckpointSaver(settings.CHECKPOINT_SQLITE_PATH, keep_last=settings.CHECKPOINT_KEEP_LAST)
+    if backend == "firestore":
+        logger.info("💾 Agent checkpoints: Firestore")
+        return FirestoreCheckpointSaver(keep_last=settings.CHECKPOINT_KEEP_LAST)
+    if backend != "none":
+        logger.warning(f"⚠️ Unknown checkpointer '{backend}'. Checkpointing disabled.")
+    return None
@@ -1,18 +1,22 @@
-import re
 import json
 import logging
-from typing import List, Any
+from typing import List, Any, NamedTuple
 from langchain_core.messages import ToolMessage
 from src.graph.state import AgentState
+from src.graph.media_index import latest_media
 from src.prompts.system_prompts import SystemPrompts
 
 logger = logging.getLogger(__name__)
 
+class PromptSegments(NamedTuple):
+    static: str   # Base instruction: identical for every turn
+    dynamic: str  # Media / project / summary / status blocks of this turn
+
 class ContextBuilder:
     """
     Responsible for constructing the final System Prompt by combining:
     1. Static Base Instruction (Persona, Tools, Rules)
-    2. Dynamic Context (Auth, Project, Media)
+    2. Dynamic Context (Auth, Project, Media, Conversation Summary)
     3. System Status (Loop Guard, Last Tool Execution)
     """
 
@@ -21,8 +25,23 @@ class ContextBuilder:
         """
         Dynamically assembles the authoritative system prompt.
         """
+        segments = ContextBuilder.build_prompt_segments(state)
+        return f"{segments.static}\n\n{segments.dynamic}".strip()
+
+    @staticmethod
+    def static_prefix() -> str:
+        """Base instruction shared by every turn (the cacheable prefix)."""
         # Supports future A/B testing via state['prompt_version'] if needed
-        base_instruction = SystemPrompts.get_instruction("default")
+        return SystemPrompts.get_instruction("default")
+
+    @staticmethod
+    def build_prompt_segments(state: AgentState) -> PromptSegments:
+        """
+        The system prompt as (static prefix, dynamic suffix).
+        The static prefix is byte-identical across turns, sessions and nodes
+        (provider prefix caching); everything per-turn goes in the suffix.
+        """
+        base_instruction = ContextBuilder.static_prefix()
         
         # 1. Media Context
         media_context = ContextBuilder._build_media_context(state)
@@ -30,35 +49,21 @@ class ContextBuilder:
         # 2. Project/Auth Context
         project_context = ContextBuilder._build_project_context(state)
         
-        # 3. System Status (Loop Guard)
+        # 3. Conversation Summary (older turns folded by the ContextCompactor)
+        summary_context = ContextBuilder._build_summary_context(state)
+        
+        # 4. System Status (Loop Guard)
         system_status = ContextBuilder._build_system_status(state)
         
         # Assemble
-        final_prompt = f"{base_instruction}\n\n{media_context}\n\n{project_context}\n\n{system_status}"
-        return final_prompt.strip()
+        dynamic = f"{media_context}\n\n{project_context}\n\n{summary_context}\n\n{system_status}"
+        return PromptSegments(static=base_instruction, dynamic=dynamic.strip())
 
     @staticmethod
     def _build_media_context(state: AgentState) -> str:
-        messages = state["messages"]
-        found_images = []
+        # Indexed when the turn's messages were loaded: only newer messages are scanned
+        found_images = latest_media(state["messages"], state.get("media_index"))
         
-        # Robust image scanning (Reverse order to find latest)
-        for msg in reversed(messages):
-            if hasattr(msg, 'content') and isinstance(msg.content, str):
-                matches = re.findall(r'\[(?:Immagine|Video) allegat[oa]: (https?://[^\]]+)\]', msg.content)
-                found_images.extend(matches)
-            elif hasattr(msg, 'content') and isinstance(msg.content, list):
-                for part in msg.content:
-                   if isinstance(part, dict):
-                       if part.get("type") == "image_url":
-                           url_data = part.get("image_url")
-                           if isinstance(url_data, dict): found_images.append(url_data.get("url"))
-                           else: found_images.append(url_data)
-                       elif part.get("type") == "file_data": 
-                           # Handle native file URIs if needed in context
-                           pass
-            if found_images: break
-            
         if found_images:
             return f"[[ACTIVE CONTEXT]]\nLAST_UPLOADED_IMAGE_URL=\"{found_images[-1]}\"\nAVAILABLE_IMAGES={json.dumps(found_images)}"
         return ""
@@ -69,6 +74,13 @@ class ContextBuilder:
         is_authenticated = str(state.get('is_authenticated', False)).upper()
         return f"[[PROJECT CONTEXT]]\nSession ID: {session_id}\nIS_AUTHENTICATED={is_authenticated}"
 
+    @staticmethod
+    def _build_summary_context(state: AgentState) -> str:
+        summary = state.get("conversation_summary")
+        if not summary:
+            return ""
+        return f"[[CONVERSATION SUMMARY]]\nEarlier in this conversation:\n{summary}"
+
     @staticmethod
     def _build_system_status(state: AgentState) -> str:
         messages = state["messages"]
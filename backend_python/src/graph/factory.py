@@ -1,9 +1,14 @@
+import asyncio
 import logging
-from typing import List
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
-from langchain_core.messages import SystemMessage, ToolMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
 from langchain_core.tools import BaseTool
 
 from src.graph.state import AgentState
@@ -12,101 +17,376 @@ from src.services.intent_classifier import IntentClassifier
 from src.graph.edges import route_step
 from src.agents.sop_manager import SOPManager
 from src.models.reasoning import ReasoningStep
+from src.core.metrics import metrics
+from src.services.context_compactor import ContextCompactor, count_tokens
+from src.graph.tool_memo import ToolResultMemo
+from src.graph.tool_executor import ToolExecutor
+from src.services.prompt_cache import PromptCache, PromptUsageRecorder, model_name
 
 logger = logging.getLogger(__name__)
 
+CACHED_REASONING_MODELS_MAX = 4  # Live cached-content handles (one per model / prefix version)
+
 class AgentGraphFactory:
     """
     Factory for creating the LangGraph Agent.
     Decouples graph definition from global state and specific LLM instances.
     """
 
-    def __init__(self, llm: BaseChatModel, reasoning_llm: BaseChatModel, tools: List[BaseTool]):
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        reasoning_llm: BaseChatModel,
+        tools: List[BaseTool],
+        use_async_nodes: bool = True,
+        tool_binding_cache_size: int = 32,
+        speculative_execution: bool = False,
+        reasoning_token_budget: Optional[int] = None,
+        execution_token_budget: Optional[int] = None,
+        compactor: Optional[ContextCompactor] = None,
+        tool_memo: Optional[ToolResultMemo] = None,
+        tool_concurrency: int = 8,
+        tool_limits: Optional[Dict[str, int]] = None,
+        tool_user_limits: Optional[Dict[str, int]] = None,
+        checkpointer: Optional[BaseCheckpointSaver] = None,
+        prompt_cache: Optional[PromptCache] = None
+    ):
         self.llm = llm
         self.reasoning_llm = reasoning_llm
         self.tools = tools
+        # Async nodes await the model (ainvoke) instead of blocking a worker thread
+        self.use_async_nodes = use_async_nodes
+        # 🔮 Run the conversational execution call alongside reasoning (async nodes only)
+        self.speculative_execution = speculative_execution
+        # ✂️ Per-node prompt budgets (None = unbounded)
+        self.token_budgets = {"reasoning": reasoning_token_budget, "execution": execution_token_budget}
+        self.compactor = compactor or ContextCompactor()
+        # 🧠 Per-session memo of idempotent tool results (None = always run the tool)
+        self.tool_memo = tool_memo
+        # ⚡ Parallel tool calls: process-wide, per-tool and per-user-per-tool limits
+        self.tool_concurrency = tool_concurrency
+        self.tool_limits = tool_limits or {}
+        self.tool_user_limits = tool_user_limits or {}
+        # 💾 Graph state persisted per conversation thread (None = stateless turns)
+        self.checkpointer = checkpointer
+        # 🗄️ Explicit context cache of the static prompt prefix (reasoning only; None = implicit caching)
+        self.prompt_cache = prompt_cache
+        self._execution_usage = [PromptUsageRecorder("execution")]
+        self._reasoning_usage = [PromptUsageRecorder("reasoning")]
         # Bind tools once for the execution model
         self.llm_with_tools = self.llm.bind_tools(tools)
+        # Structured-output model is turn-independent: build it once
+        self.reasoning_model = self._structured_reasoning_model(self.reasoning_llm)
+        # cached-content handle -> structured-output model reading the prefix from it (LRU)
+        self._cached_reasoning_models: "OrderedDict[str, Runnable]" = OrderedDict()
+        self._cached_reasoning_models_lock = threading.Lock()  # sync nodes run on worker threads
+        
+        # ⚡ Tool-binding cache: (frozenset(tool names), tool_choice) -> bound runnable
+        # bind_tools() rebuilds every tool JSON schema, so turns reuse prebuilt runnables.
+        self._bound_llms: "OrderedDict[tuple, Runnable]" = OrderedDict()
+        self._bound_llms_max = tool_binding_cache_size
+        self._bound_llms_lock = threading.Lock()  # sync nodes run on worker threads
+        self.tool_binding_hits = 0
+        self.tool_binding_misses = 0
+
+    # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+    # 🧩 NODE BUILDING BLOCKS (shared by sync & async variants)
+    # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+    def _with_system_prompt(self, state: AgentState, node: str = "execution", cached: bool = False) -> list:
+        """
+        Filter stale system messages, fit the node's token budget & prepend the freshly built prompt.
+        The static prefix always comes first and unchanged (provider prefix caching); with
+        `cached=True` it lives in a cached-content handle and only the dynamic suffix is sent.
+        """
+        segments = ContextBuilder.build_prompt_segments(state)
+        cleaned_messages = [msg for msg in state["messages"] if not isinstance(msg, SystemMessage)]
+        cleaned_messages = self.compactor.fit_to_budget(
+            f"{segments.static}\n\n{segments.dynamic}", cleaned_messages, self.token_budgets.get(node), node
+        )
+        if cached:
+            # A cached-content request cannot carry a system instruction
+            context = [HumanMessage(content=f"[[CONTEXT]]\n{segments.dynamic}")] if segments.dynamic else []
+            return context + cleaned_messages
+        prompt = [SystemMessage(content=segments.static)]
+        if segments.dynamic:
+            prompt.append(SystemMessage(content=segments.dynamic))
+        return prompt + cleaned_messages
 
-    def create_graph(self):
-        """Builds and compiles the StateGraph."""
+    def _structured_reasoning_model(self, llm: BaseChatModel) -> Runnable:
+        return llm.with_structured_output(ReasoningStep).with_config(callbacks=self._reasoning_usage)
+
+    def _bind_tools_cached(self, tools: List[BaseTool], tool_choice: Optional[str] = None) -> Runnable:
+        """Returns the execution LLM bound to `tools`, reusing a cached binding (LRU)."""
+        key = (frozenset(t.name for t in tools), tool_choice)
+        
+        with self._bound_llms_lock:
+            bound = self._bound_llms.get(key)
+            if bound is not None:
+                self._bound_llms.move_to_end(key)
+                self.tool_binding_hits += 1
+                metrics.increment("agent.tool_binding_cache.hits")
+                return bound
+            self.tool_binding_misses += 1
+        metrics.increment("agent.tool_binding_cache.misses")
+        
+        if tool_choice:
+            bound = self.llm.bind_tools(tools, tool_choice=tool_choice)
+        else:
+            bound = self.llm.bind_tools(tools)
+        bound = bound.with_config(callbacks=self._execution_usage)
+        
+        with self._bound_llms_lock:
+            self._bound_llms[key] = bound
+            while len(self._bound_llms) > self._bound_llms_max:
+                self._bound_llms.popitem(last=False)
+            metrics.set_gauge("agent.tool_binding_cache.size", len(self._bound_llms))
+        return bound
+
+    def tool_binding_cache_stats(self) -> dict:
+        """Hit/miss counters of the tool-binding cache."""
+        with self._bound_llms_lock:
+            lookups = self.tool_binding_hits + self.tool_binding_misses
+            return {
+                "hits": self.tool_binding_hits,
+                "misses": self.tool_binding_misses,
+                "hit_rate": round(self.tool_binding_hits / lookups, 3) if lookups else 0.0,
+                "size": len(self._bound_llms),
+                "max_size": self._bound_llms_max,
+            }
+
+    def _reasoning_call(self, state: AgentState, cache_handle: Optional[str] = None):
+        """Returns (runnable, messages) for the Reasoning Node."""
+        if cache_handle:
+            return self._cached_reasoning_model(cache_handle), self._with_system_prompt(state, node="reasoning", cached=True)
+        return self.reasoning_model, self._with_system_prompt(state, node="reasoning")
+
+    def _cached_reasoning_model(self, handle: str) -> Runnable:
+        """Structured-output reasoning model bound to a cached-content handle (one per handle)."""
+        with self._cached_reasoning_models_lock:
+            model = self._cached_reasoning_models.get(handle)
+            if model is not None:
+                self._cached_reasoning_models.move_to_end(handle)
+                return model
+
+        llm = self.reasoning_llm.model_copy(update={"cached_content": handle})
+        model = self._structured_reasoning_model(llm)
+
+        with self._cached_reasoning_models_lock:
+            model = self._cached_reasoning_models.setdefault(handle, model)
+            self._cached_reasoning_models.move_to_end(handle)
+            # Handles rotate on TTL / prompt changes: keep only the most recent ones
+            while len(self._cached_reasoning_models) > CACHED_REASONING_MODELS_MAX:
+                self._cached_reasoning_models.popitem(last=False)
+        return model
+
+    def _reasoning_cache_handle(self) -> Optional[str]:
+        if self.prompt_cache is None:
+            return None
+        return self.prompt_cache.handle_for(model_name(self.reasoning_llm), ContextBuilder.static_prefix())
+
+    async def _areasoning_cache_handle(self) -> Optional[str]:
+        if self.prompt_cache is None:
+            return None
+        return await self.prompt_cache.ahandle_for(model_name(self.reasoning_llm), ContextBuilder.static_prefix())
+
+    @staticmethod
+    def _plan_update(step: ReasoningStep) -> dict:
+        logger.info(f"💡 Thought: {step.analysis}")
+        logger.info(f"👉 Action: {step.action} (Tool: {step.tool_name})")
+        return {
+            "internal_plan": [step.model_dump()],
+            "thought_log": [step.analysis]
+        }
+
+    @staticmethod
+    def _plan_error_update(error: Exception) -> dict:
+        logger.error(f"❌ Reasoning Failed: {error}")
+        return {
+            "internal_plan": [{
+                "analysis": "Internal Reasoning Error",
+                "action": "terminate",
+                "validation_passed": False
+            }]
+        }
+
+    def _start_speculation(self, state: AgentState) -> dict:
+        """Starts the conversational (no forced tool) execution call concurrently with reasoning."""
+        # Empty plan -> pure conversation path, whatever the previous step planned
+        model, exec_messages = self._execution_call({**state, "internal_plan": []})
+        started_at = time.perf_counter()
+
+        async def run():
+            response = await model.ainvoke(exec_messages)
+            return response, time.perf_counter()
+
+        metrics.increment("agent.speculation.started")
+        return {"task": asyncio.create_task(run()), "started_at": started_at, "messages": exec_messages}
+
+    async def _resolve_speculation(self, speculation: dict, plan: dict, reasoning_done_at: float) -> dict:
+        """Keeps the speculative reply if the plan is 'ask_user', cancels it otherwise."""
+        task = speculation["task"]
+        started_at = speculation["started_at"]
+        
+        if plan.get("action") == "ask_user":
+            try:
+                response, finished_at = await task
+            except Exception as e:
+                logger.warning(f"⚠️ Speculative execution failed, falling back: {e}")
+                metrics.increment("agent.speculation.failed")
+                return {"speculative_message": None}
+            # Sequential cost = reasoning + execution; speculative cost = max(reasoning, execution)
+            saved_ms = min(reasoning_done_at - started_at, finished_at - started_at) * 1000
+            metrics.observe("agent.speculation.latency_saved_ms", round(saved_ms, 2))
+            return {"speculative_message": response}
+        
+        # Plan needs a tool (or terminates): the speculative reply is discarded
+        metrics.increment("agent.speculation.cancelled")
+        if task.done() and not task.cancelled() and task.exception() is None:
+            response, _ = task.result()
+            usage = getattr(response, "usage_metadata", None) or {}
+            wasted = usage.get("total_tokens") or count_tokens(speculation["messages"] + [response])
+        else:
+            task.cancel()
+            # Prompt tokens are billed even when the call is cut short
+            wasted = count_tokens(speculation["messages"])
+        metrics.increment("agent.speculation.wasted_tokens", wasted)
+        return {"speculative_message": None}
+
+
+    def _execution_call(self, state: AgentState):
+        """Returns (runnable, messages) for the Execution Node, applying plan routing & RBTA."""
+        internal_plan = state.get("internal_plan", [])
+        latest_plan = internal_plan[-1] if internal_plan else None
+        
+        exec_messages = self._with_system_prompt(state)
+        
+        # Deterministic routing based on plan
+        tool_to_call = None
+        if latest_plan and latest_plan.get("action") == "call_tool":
+            tool_to_call = latest_plan.get("tool_name")
+        
+        if tool_to_call:
+            # Repeated identical calls are answered from the tool memo (ToolExecutor)
+            # RBTA Check
+            available_tools = SOPManager.get_available_tools(state)
+            target_tool = next((t for t in available_tools if t.name == tool_to_call), None)
+            
+            if target_tool:
+                 return self._bind_tools_cached([target_tool], tool_choice=tool_to_call), exec_messages
+            logger.warning(f"🛑 Security Block: Tool '{tool_to_call}' not allowed.")
+            return self.llm, exec_messages + [SystemMessage(content=f"SYSTEM ALERT: Tool {tool_to_call} disallowed.")]
+        
+        # Pure conversation
+        available_tools = SOPManager.get_available_tools(state)
+        return self._bind_tools_cached(available_tools), exec_messages
+
+    def _fast_plan_update(self, response: AIMessage) -> dict:
+        """Derives the ReasoningStep of a fast-mode turn from the tool-calling response itself."""
+        tool_calls = getattr(response, "tool_calls", None) or []
+        first_call = tool_calls[0] if tool_calls else None
+        text = response.content if isinstance(response.content, str) else ""
+        
+        try:
+            step = ReasoningStep(
+                analysis=(f"Fast plan: {text}" if text else "Fast plan: single-pass turn")[:500],
+                action="call_tool" if first_call else "ask_user",
+                tool_name=first_call["name"] if first_call else None,
+                tool_args=first_call.get("args") if first_call else None,
+                confidence_score=1.0,
+            )
+        except Exception as e:
+            # Tool is already restricted by RBTA binding; just record the unvalidated plan
+            logger.warning(f"⚠️ Fast plan validation failed: {e}")
+            return {
+                "internal_plan": [{
+                    "analysis": "Fast plan: unvalidated tool call",
+                    "action": "call_tool" if first_call else "ask_user",
+                    "tool_name": first_call["name"] if first_call else None,
+                    "validation_passed": False
+                }]
+            }
+        return {"internal_plan": [step.model_dump()]}
+
+    def _fast_call(self, state: AgentState):
+        """Returns (runnable, messages) for the single-pass node: all RBTA tools, model picks."""
+        available_tools = SOPManager.get_available_tools(state)
+        return self._bind_tools_cached(available_tools), self._with_system_prompt(state)
+
+    def _tools_node(self) -> ToolExecutor:
+        """Tools node: memo-aware, runs the calls of one message concurrently (bounded)."""
+        return ToolExecutor(
+            self.tools,
+            max_concurrency=self.tool_concurrency,
+            tool_limits=self.tool_limits,
+            user_limits=self.tool_user_limits,
+            memo=self.tool_memo,
+        )
+
+    def create_graph(self, mode: str = "two_tier"):
+        """
+        Builds and compiles the StateGraph.
+        
+        Modes:
+        - "two_tier": Reasoning (structured plan) -> Execution -> Tools -> Reasoning ... (default)
+        - "fast": one tool-calling Execution call per step; the plan is derived from its
+          response, and tools loop straight back to Execution (~half the LLM round trips).
+        """
+        if mode == "fast":
+            return self._create_fast_graph()
+        if mode != "two_tier":
+            logger.warning(f"⚠️ Unknown graph mode '{mode}'. Falling back to two_tier.")
         
         # 1. Define Nodes
         
         def reasoning_node(state: AgentState):
             """Tier 1: High-level planning."""
-            messages = state["messages"]
-            
-            # Context Injection
-            active_prompt = ContextBuilder.build_system_prompt(state)
-            
-            # Filter system messages & Prepend new one
-            cleaned_messages = [msg for msg in messages if not isinstance(msg, SystemMessage)]
-            reasoning_messages = [SystemMessage(content=active_prompt)] + cleaned_messages
-            
-            # Logic Model
-            reasoning_model = self.reasoning_llm.with_structured_output(ReasoningStep)
-            
+            reasoning_model, reasoning_messages = self._reasoning_call(state, self._reasoning_cache_handle())
             try:
                 logger.info("🤔 Reasoning Node: Thinking...")
                 step = reasoning_model.invoke(reasoning_messages)
-                
-                logger.info(f"💡 Thought: {step.analysis}")
-                logger.info(f"👉 Action: {step.action} (Tool: {step.tool_name})")
-                
-                return {
-                    "internal_plan": [step.model_dump()],
-                    "thought_log": [step.analysis]
-                }
+                return self._plan_update(step)
             except Exception as e:
-                logger.error(f"❌ Reasoning Failed: {e}")
-                return {
-                    "internal_plan": [{
-                        "analysis": "Internal Reasoning Error",
-                        "action": "terminate",
-                        "validation_passed": False
-                    }]
-                }
+                return self._plan_error_update(e)
+
+        async def areasoning_node(state: AgentState):
+            """Tier 1: High-level planning (non-blocking)."""
+            reasoning_model, reasoning_messages = self._reasoning_call(state, await self._areasoning_cache_handle())
+            speculation = self._start_speculation(state) if self.speculative_execution else None
+            try:
+                try:
+                    logger.info("🤔 Reasoning Node: Thinking...")
+                    step = await reasoning_model.ainvoke(reasoning_messages)
+                    update = self._plan_update(step)
+                except Exception as e:
+                    update = self._plan_error_update(e)
+                
+                if speculation:
+                    update.update(await self._resolve_speculation(
+                        speculation, update["internal_plan"][-1], time.perf_counter()
+                    ))
+                return update
+            finally:
+                # Never leave a speculative call running (e.g. the turn was cancelled)
+                if speculation and not speculation["task"].done():
+                    speculation["task"].cancel()
 
         def execution_node(state: AgentState):
             """Tier 3: Execution and Tool Calling."""
-            messages = state["messages"]
-            internal_plan = state.get("internal_plan", [])
-            latest_plan = internal_plan[-1] if internal_plan else None
-            
-            # Context Injection
-            active_prompt = ContextBuilder.build_system_prompt(state)
-            
-            # Filter & Prepend
-            cleaned_messages = [msg for msg in messages if not isinstance(msg, SystemMessage)]
-            exec_messages = [SystemMessage(content=active_prompt)] + cleaned_messages
-            
-            # Deterministic routing based on plan
-            tool_to_call = None
-            if latest_plan and latest_plan.get("action") == "call_tool":
-                tool_to_call = latest_plan.get("tool_name")
+            model, exec_messages = self._execution_call(state)
+            response = model.invoke(exec_messages)
+            return {"messages": [response], "phase": "EXECUTION"}
+
+        async def aexecution_node(state: AgentState):
+            """Tier 3: Execution and Tool Calling (non-blocking)."""
+            speculative = state.get("speculative_message")
+            if speculative is not None:
+                # 🔮 Reply was already produced while reasoning: commit it
+                metrics.increment("agent.speculation.committed")
+                return {"messages": [speculative], "phase": "EXECUTION", "speculative_message": None}
             
-            if tool_to_call:
-                # 🛡️ Loop Guard Check (Simplified for Factory)
-                last_msg = messages[-1] if messages else None
-                if isinstance(last_msg, ToolMessage) and last_msg.name == tool_to_call:
-                     # Check redundancy logic (omitted for brevity, can re-import if complex)
-                     pass
-
-                # RBTA Check
-                available_tools = SOPManager.get_available_tools(state)
-                target_tool = next((t for t in available_tools if t.name == tool_to_call), None)
-                
-                if target_tool:
-                     response = self.llm.bind_tools([target_tool], tool_choice=tool_to_call).invoke(exec_messages)
-                else:
-                     logger.warning(f"🛑 Security Block: Tool '{tool_to_call}' not allowed.")
-                     response = self.llm.invoke(exec_messages + [SystemMessage(content=f"SYSTEM ALERT: Tool {tool_to_call} disallowed.")])
-            else:
-                # Pure conversation
-                available_tools = SOPManager.get_available_tools(state)
-                response = self.llm.bind_tools(available_tools).invoke(exec_messages)
-                
+            model, exec_messages = self._execution_call(state)
+            response = await model.ainvoke(exec_messages)
             return {"messages": [response], "phase": "EXECUTION"}
 
         async def gatekeeper(state: AgentState) -> str:
@@ -123,9 +403,13 @@ class AgentGraphFactory:
         # 2. Build Graph
         workflow = StateGraph(AgentState)
         
-        workflow.add_node("reasoning", reasoning_node)
-        workflow.add_node("execution", execution_node)
-        workflow.add_node("tools", ToolNode(self.tools))
+        if self.use_async_nodes:
+            workflow.add_node("reasoning", areasoning_node)
+            workflow.add_node("execution", aexecution_node)
+        else:
+            workflow.add_node("reasoning", reasoning_node)
+            workflow.add_node("execution", execution_node)
+        workflow.add_node("tools", self._tools_node())
         
         # Edges
         # Note: set_conditional_entry_point supports async functions
@@ -148,4 +432,36 @@ class AgentGraphFactory:
         
         workflow.add_edge("tools", "reasoning")
         
-        return workflow.compile()
+        return workflow.compile(checkpointer=self.checkpointer)
+
+    def _create_fast_graph(self):
+        """Builds the single-pass topology: execution <-> tools."""
+        
+        def fast_execution_node(state: AgentState):
+            """Single pass: planning and execution in one tool-calling call."""
+            model, exec_messages = self._fast_call(state)
+            response = model.invoke(exec_messages)
+            return {"messages": [response], "phase": "EXECUTION", **self._fast_plan_update(response)}
+
+        async def afast_execution_node(state: AgentState):
+            """Single pass: planning and execution in one tool-calling call (non-blocking)."""
+            model, exec_messages = self._fast_call(state)
+            response = await model.ainvoke(exec_messages)
+            return {"messages": [response], "phase": "EXECUTION", **self._fast_plan_update(response)}
+
+        def should_continue(state: AgentState) -> str:
+            last_message = state["messages"][-1]
+            if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
+                return "tools"
+            return END
+
+        workflow = StateGraph(AgentState)
+        # Node keeps the "execution" name: the orchestrator streams that node's tokens
+        workflow.add_node("execution", afast_execution_node if self.use_async_nodes else fast_execution_node)
+        workflow.add_node("tools", self._tools_node())
+        
+        workflow.set_entry_point("execution")
+        workflow.add_conditional_edges("execution", should_continue, {"tools": "tools", END: END})
+        workflow.add_edge("tools", "execution")
+        
+        return workflow.compile(checkpointer=self.checkpointer)
@@ -0,0 +1,57 @@
+"""
+Media Index
+
+Media references (uploaded image / video URLs) of the conversation, extracted
+once when messages are loaded instead of re-scanning the whole history every
+time the system prompt is built.
+
+The index is carried on AgentState["media_index"]:
+    {"urls": [...media of the latest message that has any...], "last_id": <id of the last indexed message>}
+
+Lookups walk back from the newest message only until `last_id`, so a node sees
+just the few messages appended since the turn started.
+"""
+import re
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage
+
+MEDIA_MARKER_RE = re.compile(r'\[(?:Immagine|Video) allegat[oa]: (https?://[^\]]+)\]')
+
+
+def extract_media(message: BaseMessage) -> List[str]:
+    """Media URLs of one message: text markers or image_url parts."""
+    content = getattr(message, "content", None)
+    if isinstance(content, str):
+        return MEDIA_MARKER_RE.findall(content) if "allegat" in content else []
+    urls = []
+    if isinstance(content, list):
+        for part in content:
+            if isinstance(part, dict) and part.get("type") == "image_url":
+                url_data = part.get("image_url")
+                urls.append(url_data.get("url") if isinstance(url_data, dict) else url_data)
+    return urls
+
+
+def latest_media(messages: Sequence[BaseMessage], index: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Media of the newest message that has any, reusing `index` for the already-indexed part."""
+    last_id = (index or {}).get("last_id")
+    for message in reversed(messages):
+        if last_id and message.id == last_id:
+            return list(index.get("urls") or [])
+        urls = extract_media(message)
+        if urls:
+            return urls
+    return []
+
+
+def index_media(messages: Sequence[BaseMessage], index: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Builds (or advances) the media index of `messages`."""
+    if not messages:
+        return dict(index or {"urls": [], "last_id": None})
+    last = messages[-1]
+    if last.id is None:
+        # Same id add_messages would assign: lets later lookups stop here
+        last.id = str(uuid.uuid4())
+    return {"urls": latest_media(messages, index), "last_id": last.id}
@@ -2,6 +2,17 @@ from typing import TypedDict, Annotated, Sequence
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 
+# Plan / thought entries kept in state (they accumulate across checkpointed turns)
+PLAN_HISTORY_LIMIT = 20
+
+def append_recent(left: list | None, right: list | None) -> list:
+    """Appends the node's entries, keeping the last PLAN_HISTORY_LIMIT."""
+    return ((left or []) + (right or []))[-PLAN_HISTORY_LIMIT:]
+
+# Appended at the start of a resumed turn: the previous turn's last step
+# (e.g. "call_tool") must not drive the new message's execution.
+NEW_TURN_STEP = {"analysis": "New user turn", "action": "new_turn"}
+
 class AgentState(TypedDict):
     """State for the conversational AI agent."""
     messages: Annotated[Sequence[BaseMessage], add_messages]
@@ -16,7 +27,10 @@ class AgentState(TypedDict):
     is_authenticated: bool # 🔥 NEW: Auth Gatingdified
     generated_render_url: str # Last render URL (to prevent duplicates)
     quote_data: dict    # Partial quote data collected
+    conversation_summary: str # Running summary of turns folded out of the history
+    media_index: dict   # Media URLs indexed when messages are loaded (see graph/media_index.py)
     
     # 🧠 CoT & Reasoning (Tier 1 Integration)
-    internal_plan: list[dict] # Stores serialized ReasoningStep objects
-    thought_log: list[str]    # Private chain of thought history
+    internal_plan: Annotated[list[dict], append_recent] # Stores serialized ReasoningStep objects
+    thought_log: Annotated[list[str], append_recent]    # Private chain of thought history
+    speculative_message: BaseMessage | None  # Conversational reply computed during reasoning (committed on ask_user)
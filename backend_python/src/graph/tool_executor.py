@@ -0,0 +1,168 @@
+"""
+Tool Executor Node
+
+Replaces the plain ToolNode of the graph:
+1. Memo: repeated idempotent calls are answered from the session's ToolResultMemo.
+2. Parallelism: the tool calls of one AIMessage run concurrently, bounded by a
+   process-wide limit, a per-tool limit and a per-user per-tool limit (the
+   expensive generate_render / generate_cad get small ones).
+3. Streaming: each result is emitted as soon as it completes through the LangGraph
+   custom stream ({"event": "tool_result", ...}); the node output keeps the
+   tool-call order, so persisted history is deterministic.
+
+Every call still runs through ToolNode (argument validation, tool error handling).
+"""
+import asyncio
+import logging
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+from langgraph.config import get_stream_writer
+from langgraph.prebuilt import ToolNode
+
+from src.core.metrics import metrics
+from src.core.usage import usage_scope
+from src.graph.state import AgentState
+from src.graph.tool_memo import ToolResultMemo
+
+logger = logging.getLogger(__name__)
+
+
+def _noop_writer(_: Any) -> None:
+    pass
+
+
+class ToolExecutor:
+    """Memo-aware, concurrency-bounded tools node (async)."""
+
+    def __init__(
+        self,
+        tools: List[BaseTool],
+        max_concurrency: int = 8,
+        tool_limits: Optional[Dict[str, int]] = None,
+        user_limits: Optional[Dict[str, int]] = None,
+        memo: Optional[ToolResultMemo] = None
+    ):
+        self.tool_node = ToolNode(tools)
+        self.memo = memo
+        self.user_limits = dict(user_limits or {})
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._per_tool = {name: asyncio.Semaphore(limit) for name, limit in (tool_limits or {}).items()}
+        # (user_id, tool) -> semaphore; entries vanish once no call holds them
+        self._per_user: "weakref.WeakValueDictionary[Tuple[str, str], asyncio.Semaphore]" = weakref.WeakValueDictionary()
+        self._inflight = 0
+
+    async def __call__(self, state: AgentState, config: RunnableConfig) -> dict:
+        tool_calls = state["messages"][-1].tool_calls
+        session_id = state.get("session_id", "default")
+        user_id = state.get("user_id") or "anonymous"
+        write = self._stream_writer()
+
+        results: Dict[str, ToolMessage] = {}
+        pending = []
+        for tc in tool_calls:
+            cached = self.memo.get(user_id, session_id, tc["name"], tc.get("args")) if self.memo else None
+            if cached is None:
+                pending.append(tc)
+                continue
+            logger.info(f"🧠 Tool memo hit: {tc['name']} (session {session_id})")
+            results[tc["id"]] = ToolMessage(
+                content=cached, name=tc["name"], tool_call_id=tc["id"],
+                additional_kwargs={"memo_hit": True}
+            )
+            write(self._result_event(results[tc["id"]]))
+
+        if len(pending) > 1:
+            metrics.increment("agent.tools.parallel_batches")
+            logger.info(f"⚡ Running {len(pending)} tool calls concurrently")
+
+        async def run_and_stream(tc: dict) -> Optional[ToolMessage]:
+            message = await self._run_bounded(tc, user_id, config)
+            if message is not None:
+                write(self._result_event(message))
+            return message
+
+        tasks = [asyncio.create_task(run_and_stream(tc)) for tc in pending]
+        try:
+            messages = await asyncio.gather(*tasks)
+        except BaseException:
+            # A failing tool (or a cancelled turn) stops its siblings too
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        executed = zip(pending, messages)
+        executed = [(tc, message) for tc, message in executed if message is not None]
+        for tc, message in executed:
+            results[tc["id"]] = message
+            if self.memo:
+                self.memo.put(user_id, session_id, tc["name"], tc.get("args"), message)
+        if self.memo:
+            # Invalidate after storing: a render run alongside a file listing makes it stale
+            for tc, _ in executed:
+                self.memo.record_execution(user_id, session_id, tc["name"])
+
+        return {"messages": [results[tc["id"]] for tc in tool_calls if tc["id"] in results]}
+
+    async def _run_bounded(self, tool_call: dict, user_id: str, config: RunnableConfig) -> Optional[ToolMessage]:
+        """Runs one tool call under the global, per-tool and per-user limits."""
+        name = tool_call["name"]
+        semaphores = [self._global]
+        if name in self._per_tool:
+            semaphores.append(self._per_tool[name])
+        if name in self.user_limits:
+            semaphores.append(self._user_semaphore(user_id, name))
+
+        queued_at = time.perf_counter()
+        acquired = []
+        try:
+            # Narrowest limit first, so a queued render does not hold a global slot
+            for semaphore in reversed(semaphores):
+                await semaphore.acquire()
+                acquired.append(semaphore)
+            metrics.observe("agent.tools.queue_wait_ms", round((time.perf_counter() - queued_at) * 1000, 2))
+
+            self._inflight += 1
+            metrics.set_gauge("agent.tools.inflight", self._inflight)
+            started = time.perf_counter()
+            try:
+                with usage_scope(node="tools", tool=name):
+                    output = await self.tool_node.ainvoke([{**tool_call, "type": "tool_call"}], config)
+            finally:
+                self._inflight -= 1
+                metrics.set_gauge("agent.tools.inflight", self._inflight)
+                metrics.observe(f"agent.tools.{name}.duration_ms", round((time.perf_counter() - started) * 1000, 2))
+        finally:
+            for semaphore in acquired:
+                semaphore.release()
+
+        messages = output.get("messages", []) if isinstance(output, dict) else output
+        return next((m for m in messages if isinstance(m, ToolMessage)), None)
+
+    def _user_semaphore(self, user_id: str, tool_name: str) -> asyncio.Semaphore:
+        key = (user_id, tool_name)
+        semaphore = self._per_user.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.user_limits[tool_name])
+            self._per_user[key] = semaphore
+        return semaphore
+
+    @staticmethod
+    def _stream_writer() -> Callable[[Any], None]:
+        try:
+            return get_stream_writer()
+        except Exception:
+            return _noop_writer  # Not running inside a streaming graph
+
+    @staticmethod
+    def _result_event(message: ToolMessage) -> dict:
+        return {
+            "event": "tool_result",
+            "tool_call_id": message.tool_call_id,
+            "name": message.name,
+            "content": message.content,
+        }
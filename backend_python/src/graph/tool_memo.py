@@ -0,0 +1,165 @@
+"""
+Tool Result Memo
+
+Per-session memo of idempotent tool results, scoped by (user_id, session_id):
+    (tool_name, canonicalized args) -> ToolMessage content
+
+A repeated call (same tool, same arguments, same user and session) within the
+tool's TTL is answered from the memo without running the tool. The session id
+comes from the client, so the user is part of the scope: a result computed
+under one user's ownership checks is never served to another. Only tools with a TTL are
+memoized; results that look like failures are never stored. Tools that change
+project state (e.g. generate_render adds a file) invalidate the listing tools.
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from langchain_core.messages import ToolMessage
+
+from src.core.config import settings
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Prefixes the tools use for user-facing failures ("❌ Errore: ...", quota "⏳ ...")
+FAILURE_PREFIXES = ("❌", "⏳", "Error:", "Errore")
+
+
+@dataclass
+class _MemoEntry:
+    content: Any
+    expires_at: float
+
+
+def canonical_args(args: Optional[Dict[str, Any]]) -> str:
+    """Order-independent, whitespace-free JSON of the tool arguments."""
+    return json.dumps(args or {}, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class ToolResultMemo:
+    """
+    LRU (by user + session) + TTL (by tool) memo, event-loop confined.
+
+    - ttls: seconds per memoizable tool name.
+    - invalidations: tool name -> memoized tools whose results it makes stale.
+    """
+
+    def __init__(
+        self,
+        ttls: Dict[str, float],
+        invalidations: Optional[Dict[str, Iterable[str]]] = None,
+        max_sessions: int = 1000,
+        max_entries_per_session: int = 64
+    ):
+        self.ttls = {name: ttl for name, ttl in ttls.items() if ttl and ttl > 0}
+        self.invalidations = {name: set(tools) for name, tools in (invalidations or {}).items()}
+        self.max_sessions = max_sessions
+        self.max_entries_per_session = max_entries_per_session
+        self._sessions: "OrderedDict[Tuple[str, str], OrderedDict[Tuple[str, str], _MemoEntry]]" = OrderedDict()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    def is_memoizable(self, tool_name: str) -> bool:
+        return tool_name in self.ttls
+
+    def get(self, user_id: str, session_id: str, tool_name: str, args: Optional[Dict[str, Any]]) -> Optional[Any]:
+        """Returns the memoized content, or None (miss / expired / not memoizable)."""
+        if not self.is_memoizable(tool_name):
+            return None
+        scope = (user_id, session_id)
+        entries = self._sessions.get(scope)
+        key = (tool_name, canonical_args(args))
+        entry = entries.get(key) if entries else None
+        if entry is not None and entry.expires_at < time.monotonic():
+            del entries[key]
+            entry = None
+
+        if entry is None:
+            self.misses[tool_name] = self.misses.get(tool_name, 0) + 1
+            metrics.increment("agent.tool_memo.misses")
+            return None
+
+        self._sessions.move_to_end(scope)
+        self.hits[tool_name] = self.hits.get(tool_name, 0) + 1
+        metrics.increment("agent.tool_memo.hits")
+        metrics.increment(f"agent.tool_memo.hits.{tool_name}")
+        return entry.content
+
+    def put(
+        self, user_id: str, session_id: str, tool_name: str, args: Optional[Dict[str, Any]], message: ToolMessage
+    ) -> bool:
+        """Stores a successful result; returns False if it was not memoizable."""
+        if not self.is_memoizable(tool_name) or not self._is_success(message):
+            return False
+        scope = (user_id, session_id)
+        entries = self._sessions.setdefault(scope, OrderedDict())
+        entries[(tool_name, canonical_args(args))] = _MemoEntry(
+            content=message.content,
+            expires_at=time.monotonic() + self.ttls[tool_name],
+        )
+        while len(entries) > self.max_entries_per_session:
+            entries.popitem(last=False)
+        self._sessions.move_to_end(scope)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        metrics.set_gauge("agent.tool_memo.sessions", len(self._sessions))
+        return True
+
+    def record_execution(self, user_id: str, session_id: str, tool_name: str) -> None:
+        """Drops the results made stale by a tool that just ran (e.g. render -> file list)."""
+        stale = self.invalidations.get(tool_name)
+        if stale:
+            self.invalidate(user_id, session_id, stale)
+
+    def invalidate(self, user_id: str, session_id: str, tool_names: Optional[Set[str]] = None) -> None:
+        """Drops the user's memo for the session (only `tool_names` entries, if given)."""
+        scope = (user_id, session_id)
+        entries = self._sessions.get(scope)
+        if not entries:
+            return
+        if tool_names is None:
+            del self._sessions[scope]
+            return
+        for key in [k for k in entries if k[0] in tool_names]:
+            del entries[key]
+
+    def clear(self) -> None:
+        self._sessions.clear()
+        self.hits.clear()
+        self.misses.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            "hits_by_tool": dict(self.hits),
+            "sessions": len(self._sessions),
+        }
+
+    @staticmethod
+    def _is_success(message: ToolMessage) -> bool:
+        if getattr(message, "status", "success") == "error":
+            return False
+        content = message.content
+        return not (isinstance(content, str) and content.lstrip().startswith(FAILURE_PREFIXES))
+
+
+# Listing tools go stale when a tool adds files to the project (or the user uploads)
+LISTING_TOOLS = {"list_project_files", "show_project_gallery"}
+INVALIDATIONS = {
+    "generate_render": LISTING_TOOLS,
+    "generate_cad": LISTING_TOOLS,
+}
+
+# Singleton instance (shared by all graph modes of the worker)
+tool_result_memo = ToolResultMemo(
+    ttls=settings.TOOL_MEMO_TTLS,
+    invalidations=INVALIDATIONS,
+    max_sessions=settings.TOOL_MEMO_MAX_SESSIONS,
+)
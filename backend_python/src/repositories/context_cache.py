@@ -0,0 +1,163 @@
+"""
+Session Context Cache
+
+In-process LRU + TTL cache of the most recent messages of each chat session.
+Entries carry a version (the session's messageCount): a read whose version
+does not match, or that has no version to check, falls through to Firestore. Saved messages are appended
+in place, so a session's next turn is normally served without a query.
+"""
+import logging
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+from src.core.config import settings
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _CacheEntry:
+    messages: Deque[Dict[str, Any]]
+    version: Optional[int]
+    expires_at: float
+    # True while the entry holds the whole session (nothing older exists)
+    exhaustive: bool = False
+    size_bytes: int = field(default=0)
+
+
+def _message_size(message: Dict[str, Any]) -> int:
+    """Approximate in-memory footprint of a cached message."""
+    return len(str(message))
+
+
+class SessionContextCache:
+    """
+    Recent-window message cache (event-loop confined, no locking).
+
+    - window: messages kept per session (the most recent ones); a larger read is kept whole.
+    - version: messageCount of the session when the window was last in sync.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 900, window: int = 60):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.window = window
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: str, limit: int, version: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """Returns the last `limit` messages, or None on miss / expiry / missing or mismatched version."""
+        entry = self._entries.get(session_id)
+        reason = None
+        if entry is None:
+            reason = "miss"
+        elif version is None:
+            # Unknown messageCount: freshness cannot be checked (the entry itself is kept)
+            self.misses += 1
+            metrics.increment("context_cache.unversioned")
+            return None
+        elif entry.expires_at < time.monotonic():
+            reason = "expired"
+        elif entry.version != version:
+            reason = "stale"
+        elif len(entry.messages) < limit and not entry.exhaustive:
+            reason = "short"
+
+        if reason:
+            if entry is not None:
+                self._drop(session_id)
+            self.misses += 1
+            metrics.increment(f"context_cache.{reason}")
+            self._publish()
+            return None
+
+        self._entries.move_to_end(session_id)
+        self.hits += 1
+        metrics.increment("context_cache.hits")
+        return list(entry.messages)[-limit:] if limit > 0 else []
+
+    def put(self, session_id: str, messages: List[Dict[str, Any]], version: Optional[int], exhaustive: bool) -> None:
+        """Stores the most recent window of a session (as read from Firestore); unversioned reads are not cached."""
+        self._drop(session_id)
+        if version is None:
+            self._publish()
+            return
+        # Keep everything that was fetched: a read above `window` must hit next turn too
+        maxlen = max(self.window, len(messages))
+        window = deque(messages[-maxlen:], maxlen=maxlen)
+        entry = _CacheEntry(
+            messages=window,
+            version=version,
+            expires_at=time.monotonic() + self.ttl_seconds,
+            exhaustive=exhaustive,
+            size_bytes=sum(_message_size(m) for m in window),
+        )
+        self._entries[session_id] = entry
+        self._size_bytes += entry.size_bytes
+        while len(self._entries) > self.max_sessions:
+            oldest, _ = next(iter(self._entries.items()))
+            self._drop(oldest)
+        self._publish()
+
+    def append(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Appends saved messages to a cached session and bumps its version."""
+        entry = self._entries.get(session_id)
+        if entry is None or not messages:
+            return
+        for message in messages:
+            if len(entry.messages) == entry.messages.maxlen:
+                evicted = entry.messages[0]
+                entry.size_bytes -= _message_size(evicted)
+                self._size_bytes -= _message_size(evicted)
+                entry.exhaustive = False
+            entry.messages.append(message)
+            size = _message_size(message)
+            entry.size_bytes += size
+            self._size_bytes += size
+        if entry.version is not None:
+            entry.version += len(messages)
+        entry.expires_at = time.monotonic() + self.ttl_seconds
+        self._entries.move_to_end(session_id)
+        self._publish()
+
+    def invalidate(self, session_id: str) -> None:
+        self._drop(session_id)
+        self._publish()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "sessions": len(self._entries),
+            "size_bytes": self._size_bytes,
+        }
+
+    def _drop(self, session_id: str) -> None:
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._size_bytes -= entry.size_bytes
+
+    def _publish(self) -> None:
+        metrics.set_gauge("context_cache.sessions", len(self._entries))
+        metrics.set_gauge("context_cache.size_bytes", self._size_bytes)
+
+
+# Singleton instance (shared by the per-request repositories)
+session_context_cache = SessionContextCache(
+    max_sessions=settings.CONTEXT_CACHE_MAX_SESSIONS,
+    ttl_seconds=settings.CONTEXT_CACHE_TTL_S,
+    window=settings.CONTEXT_CACHE_WINDOW,
+)
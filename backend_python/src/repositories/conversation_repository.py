@@ -1,25 +1,95 @@
+import asyncio
 import logging
+from dataclasses import dataclass
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from firebase_admin import firestore
-from src.db.firebase_client import get_firestore_client
+from google.cloud.firestore_v1 import FieldFilter
+from src.db.firebase_client import get_firestore_client, get_async_firestore_client
 from src.db.projects import sync_project_cover
+from src.repositories.context_cache import SessionContextCache, session_context_cache
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass
+class SessionSnapshot:
+    """Prefetched session state (see ConversationRepository.load_session)."""
+    data: Optional[Dict[str, Any]]  # Session document, None if it does not exist
+    project_exists: bool
+
+
 class ConversationRepository:
     """
     Repository for managing conversation data, sessions, and file metadata.
     Abstracts Firestore access for chat-related operations.
+    Uses the async Firestore client so no call blocks the event loop.
+    Recent history is served from the in-process SessionContextCache when in sync.
     """
     
+    # Shared across the per-request repository instances
+    context_cache: SessionContextCache = session_context_cache
+    
     def __init__(self):
         # We could inject the db client here if we wanted to be pure, 
         # but for now usage of the singleton getter is consistent with the codebase.
         pass
 
     def _get_db(self):
-        return get_firestore_client()
+        return get_async_firestore_client()
+
+    @staticmethod
+    def build_message_data(
+        role: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        tool_calls: Optional[List[Dict[str, Any]]] = None,
+        tool_call_id: Optional[str] = None,
+        attachments: Optional[List[Dict[str, Any]]] = None,
+        timestamp: Any = None
+    ) -> Dict[str, Any]:
+        """Builds the Firestore document of a message (server timestamp unless one is given)."""
+        # 🛡️ Defense: Ensure Pydantic models are dumped
+        if tool_calls:
+            tool_calls = [tc.model_dump() if hasattr(tc, 'model_dump') else tc for tc in tool_calls]
+        
+        if attachments:
+            attachments = [att.model_dump() if hasattr(att, 'model_dump') else att for att in attachments]
+
+        message_data = {
+            'role': role,
+            'content': content,
+            'timestamp': timestamp or firestore.SERVER_TIMESTAMP,
+        }
+        
+        if metadata:
+            message_data['metadata'] = metadata
+            
+        if tool_calls:
+            message_data['tool_calls'] = tool_calls
+            
+        if tool_call_id:
+            message_data['tool_call_id'] = tool_call_id
+
+        if attachments:
+            message_data['attachments'] = attachments
+            
+        return message_data
+
+    @staticmethod
+    def _to_context_message(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Projects a stored message document onto the shape returned by get_context()."""
+        msg = {
+            'role': data.get('role', 'user'),
+            'content': data.get('content', '')
+        }
+        if 'tool_calls' in data:
+            msg['tool_calls'] = data['tool_calls']
+        if 'tool_call_id' in data:
+            msg['tool_call_id'] = data['tool_call_id']
+        if 'attachments' in data:
+            msg['attachments'] = data['attachments']
+        return msg
 
     async def save_message(
         self,
@@ -35,37 +105,20 @@ class ConversationRepository:
         try:
             db = self._get_db()
             
-            # 🛡️ Defense: Ensure Pydantic models are dumped
-            if tool_calls:
-                tool_calls = [tc.model_dump() if hasattr(tc, 'model_dump') else tc for tc in tool_calls]
-            
-            if attachments:
-                attachments = [att.model_dump() if hasattr(att, 'model_dump') else att for att in attachments]
-
-            message_data = {
-                'role': role,
-                'content': content,
-                'timestamp': firestore.SERVER_TIMESTAMP,
-            }
-            
-            if metadata:
-                message_data['metadata'] = metadata
-                
-            if tool_calls:
-                message_data['tool_calls'] = tool_calls
-                
-            if tool_call_id:
-                message_data['tool_call_id'] = tool_call_id
-
-            if attachments:
-                message_data['attachments'] = attachments
+            message_data = self.build_message_data(
+                role, content,
+                metadata=metadata,
+                tool_calls=tool_calls,
+                tool_call_id=tool_call_id,
+                attachments=attachments
+            )
             
             # Add to messages subcollection
-            db.collection('sessions').document(session_id).collection('messages').add(message_data)
+            await db.collection('sessions').document(session_id).collection('messages').add(message_data)
             
             # Update session metadata
             session_ref = db.collection('sessions').document(session_id)
-            session_doc = session_ref.get()
+            session_doc = await session_ref.get()
             
             session_update = {
                 'updatedAt': firestore.SERVER_TIMESTAMP,
@@ -76,71 +129,138 @@ class ConversationRepository:
             if not session_doc.exists:
                 session_update['createdAt'] = firestore.SERVER_TIMESTAMP
                 
-            session_ref.set(session_update, merge=True)
+            await session_ref.set(session_update, merge=True)
+            self.context_cache.append(session_id, [self._to_context_message(message_data)])
             
             logger.info(f"[Repo] Saved {role} message to session {session_id}")
             
         except Exception as e:
             logger.error(f"[Repo] Error saving message: {str(e)}", exc_info=True)
 
+    async def save_messages_batch(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        """
+        Persist several messages with ONE atomic batch write.
+        Each entry is a message document plus its pre-allocated 'id'.
+        The session gets a single messageCount increment and updatedAt write.
+        Raises on failure so the caller (TurnMessageBuffer) can retry.
+        """
+        if not messages:
+            return
+        
+        db = self._get_db()
+        batch = db.batch()
+        
+        session_ref = db.collection('sessions').document(session_id)
+        messages_ref = session_ref.collection('messages')
+        
+        for message in messages:
+            message_data = dict(message)
+            doc_id = message_data.pop('id')
+            # Deterministic IDs: a retried batch overwrites instead of duplicating
+            batch.set(messages_ref.document(doc_id), message_data)
+        
+        # Session doc is created by ensure_session(); merge only the turn's delta
+        batch.set(session_ref, {
+            'updatedAt': firestore.SERVER_TIMESTAMP,
+            'sessionId': session_id,
+            'messageCount': firestore.Increment(len(messages))
+        }, merge=True)
+        
+        await batch.commit()
+        self.context_cache.append(session_id, [self._to_context_message(m) for m in messages])
+        logger.info(f"[Repo] Saved {len(messages)} messages (batch) to session {session_id}")
+
     async def get_context(
         self,
         session_id: str,
-        limit: int = 10
+        limit: int = 10,
+        version: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        """Retrieve conversation history including tool data and attachments."""
+        """
+        Retrieve the `limit` most recent messages (oldest first), including tool data and attachments.
+        `version` is the session's messageCount (from ensure_session); a cached window
+        with the same version is returned without querying Firestore.
+        """
+        cached = self.context_cache.get(session_id, limit, version)
+        if cached is not None:
+            logger.info(f"[Repo] Context cache hit for session {session_id} ({len(cached)} messages)")
+            return cached
+        
         try:
             db = self._get_db()
             
+            # Newest first + limit = the true recent window, even on long sessions
+            fetch_limit = max(limit, self.context_cache.window)
             messages_ref = (
                 db.collection('sessions')
                 .document(session_id)
                 .collection('messages')
-                .order_by('timestamp', direction=firestore.Query.ASCENDING)
-                .limit(limit)
+                .order_by('timestamp', direction=firestore.Query.DESCENDING)
+                .limit(fetch_limit)
             )
             
-            docs = messages_ref.stream()
-            
             messages = []
-            for doc in docs:
-                data = doc.to_dict()
-                msg = {
-                    'role': data.get('role', 'user'),
-                    'content': data.get('content', '')
-                }
-                if 'tool_calls' in data:
-                    msg['tool_calls'] = data['tool_calls']
-                if 'tool_call_id' in data:
-                    msg['tool_call_id'] = data['tool_call_id']
-                if 'attachments' in data:
-                    msg['attachments'] = data['attachments']
-                    
-                messages.append(msg)
+            async for doc in messages_ref.stream():
+                messages.append(self._to_context_message(doc.to_dict()))
+            messages.reverse()
+            
+            self.context_cache.put(session_id, messages, version, exhaustive=len(messages) < fetch_limit)
             
             logger.info(f"[Repo] Retrieved {len(messages)} messages for session {session_id}")
-            return messages
+            return messages[-limit:] if limit > 0 else []
             
         except Exception as e:
             logger.error(f"[Repo] Error retrieving messages: {str(e)}", exc_info=True)
             return []
 
-    async def ensure_session(self, session_id: str, user_id: Optional[str] = None) -> None:
+    async def load_session(self, session_id: str) -> Optional[SessionSnapshot]:
+        """
+        Read-only prefetch: session doc and project existence, fetched concurrently.
+        Safe to run before auth completes (no writes).
+        """
+        try:
+            db = self._get_db()
+            session_doc, project_doc = await asyncio.gather(
+                db.collection('sessions').document(session_id).get(),
+                db.collection('projects').document(session_id).get()
+            )
+            return SessionSnapshot(
+                data=(session_doc.to_dict() or {}) if session_doc.exists else None,
+                project_exists=project_doc.exists
+            )
+        except Exception as e:
+            logger.error(f"[Repo] Error loading session: {str(e)}", exc_info=True)
+            return None
+
+    async def ensure_session(
+        self,
+        session_id: str,
+        user_id: Optional[str] = None,
+        snapshot: Optional[SessionSnapshot] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         Ensure session document exists in Firestore.
         If user_id is provided and the session doesn't exist, it's created with that owner.
+        A `snapshot` from load_session() skips the reads: only missing docs are written.
+        Returns the session document (messageCount = context cache version, running
+        summary), or None on error.
         """
         try:
             db = self._get_db()
             
+            if snapshot is None:
+                snapshot = await self.load_session(session_id)
+                if snapshot is None:
+                    return None
+            
             session_ref = db.collection('sessions').document(session_id)
-            doc = session_ref.get()
+            project_ref = db.collection('projects').document(session_id)
             
-            if not doc.exists:
+            if snapshot.data is None:
                 # Determine owner
                 owner_id = user_id if user_id else f"guest_{session_id[:8]}"
                 
-                session_ref.set({
+                await session_ref.set({
                     'sessionId': session_id,
                     'userId': owner_id,
                     'title': 'Nuovo Progetto',
@@ -153,9 +273,8 @@ class ConversationRepository:
                 logger.info(f"[Repo] Created new session {session_id} for user {owner_id}")
                 
                 # Sync to Projects collection
-                project_ref = db.collection('projects').document(session_id)
-                if not project_ref.get().exists:
-                    project_ref.set({
+                if not snapshot.project_exists:
+                    await project_ref.set({
                         'id': session_id,
                         'name': 'Nuovo Progetto', 
                         'userId': owner_id,
@@ -164,12 +283,12 @@ class ConversationRepository:
                         'status': 'active'
                     })
                     logger.info(f"[Repo] 🚀 Sync: Created project {session_id} from session")
+                return {'messageCount': 0}
             else:
                 # Backfill check
-                project_ref = db.collection('projects').document(session_id)
-                if not project_ref.get().exists:
-                     session_data = doc.to_dict()
-                     project_ref.set({
+                if not snapshot.project_exists:
+                     session_data = snapshot.data
+                     await project_ref.set({
                         'id': session_id,
                         'name': session_data.get('title', 'Progetto Recuperato'), 
                         'userId': session_data.get('userId', user_id or 'unknown'),
@@ -178,9 +297,23 @@ class ConversationRepository:
                         'status': 'active'
                     })
                      logger.info(f"[Repo] 🚀 Sync: Backfilled missing project {session_id}")
+                return snapshot.data
                 
         except Exception as e:
             logger.error(f"[Repo] Error ensuring session: {str(e)}", exc_info=True)
+            return None
+
+    async def save_session_summary(self, session_id: str, summary: str, summary_message_count: int) -> None:
+        """Persist the running conversation summary (and how many messages it covers)."""
+        try:
+            db = self._get_db()
+            await db.collection('sessions').document(session_id).set({
+                'summary': summary,
+                'summaryMessageCount': summary_message_count
+            }, merge=True)
+            logger.info(f"[Repo] Updated summary for session {session_id} (covers {summary_message_count} messages)")
+        except Exception as e:
+            logger.error(f"[Repo] Error saving summary: {str(e)}", exc_info=True)
 
     async def save_file_metadata(
         self,
@@ -196,7 +329,7 @@ class ConversationRepository:
             files_ref = db.collection('projects').document(project_id).collection('files')
             
             # Check for existing
-            existing_docs = files_ref.where('url', '==', file_data['url']).limit(1).get()
+            existing_docs = await files_ref.where(filter=FieldFilter('url', '==', file_data['url'])).limit(1).get()
             if len(existing_docs) > 0:
                 logger.debug(f"[Repo] File already exists: {file_data.get('name')}")
                 return
@@ -213,7 +346,7 @@ class ConversationRepository:
                 'thumbnailUrl': file_data.get('thumbnailUrl')
             }
             
-            files_ref.add(doc_data)
+            await files_ref.add(doc_data)
             logger.info(f"[Repo] 🖼️ Saved file metadata: {doc_data['name']}")
             
             # Trigger sync (Coupled for now)
@@ -224,10 +357,10 @@ class ConversationRepository:
 
     def get_history_sync(self, session_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         """
-        SYNCHRONOUS retrieval for legacy wrappers.
+        SYNCHRONOUS retrieval for legacy wrappers (sync client).
         """
         try:
-            db = self._get_db()
+            db = get_firestore_client()
             
             messages_ref = (
                 db.collection('sessions')
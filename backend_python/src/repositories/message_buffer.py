@@ -0,0 +1,104 @@
+"""
+Write-Behind Message Buffer
+
+Collects the messages of one chat turn in order and persists them with a single
+Firestore batch, off the streaming path. Flushes run as independent tasks, so a
+client disconnect (which cancels the streaming generator) does not lose the turn.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from src.core.metrics import metrics
+from src.repositories.conversation_repository import ConversationRepository
+
+logger = logging.getLogger(__name__)
+
+# 🛡️ Strong references to in-flight flushes (prevents GC, enables drain on shutdown)
+_pending_flushes: Set[asyncio.Task] = set()
+
+
+class TurnMessageBuffer:
+    """
+    Per-turn, ordered message buffer.
+
+    - add() is synchronous and never touches Firestore.
+    - Timestamps are taken client-side at add() time and kept strictly increasing,
+      so messages written in the same batch keep their order in get_context().
+    - flush() writes everything pending in one batch, retrying with backoff.
+    """
+
+    def __init__(
+        self,
+        repo: ConversationRepository,
+        session_id: str,
+        max_retries: int = 3,
+        retry_base_delay: float = 0.2
+    ):
+        self.repo = repo
+        self.session_id = session_id
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self._pending: List[Dict[str, Any]] = []
+        self._last_timestamp: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, role: str, content: str, **fields: Any) -> None:
+        """Queue a message (same keyword arguments as ConversationRepository.save_message)."""
+        timestamp = datetime.now(timezone.utc)
+        if self._last_timestamp and timestamp <= self._last_timestamp:
+            timestamp = self._last_timestamp + timedelta(microseconds=1)
+        self._last_timestamp = timestamp
+
+        message_data = ConversationRepository.build_message_data(role, content, timestamp=timestamp, **fields)
+        self._pending.append({"id": uuid.uuid4().hex, **message_data})
+
+    async def flush(self) -> bool:
+        """Persist pending messages in one batch. Returns False if every retry failed."""
+        async with self._lock:
+            if not self._pending:
+                return True
+
+            batch = list(self._pending)
+            for attempt in range(1, self.max_retries + 1):
+                start = time.perf_counter()
+                try:
+                    await self.repo.save_messages_batch(self.session_id, batch)
+                except Exception as e:
+                    logger.warning(f"[MessageBuffer] Flush attempt {attempt}/{self.max_retries} failed: {e}")
+                    metrics.increment("chat.persist.retries")
+                    if attempt < self.max_retries:
+                        await asyncio.sleep(self.retry_base_delay * 2 ** (attempt - 1))
+                    continue
+
+                del self._pending[:len(batch)]
+                metrics.observe("chat.persist.flush_ms", round((time.perf_counter() - start) * 1000, 2))
+                metrics.increment("chat.persist.messages", len(batch))
+                return True
+
+            metrics.increment("chat.persist.failures")
+            logger.error(f"[MessageBuffer] ❌ Could not persist {len(batch)} messages for session {self.session_id}")
+            return False
+
+    def flush_in_background(self) -> asyncio.Task:
+        """Schedule flush() as an independent task (survives cancellation of the caller)."""
+        task = asyncio.create_task(self.flush())
+        _pending_flushes.add(task)
+        task.add_done_callback(_pending_flushes.discard)
+        return task
+
+
+async def drain_pending_flushes(timeout: float = 10.0) -> None:
+    """Wait for in-flight background flushes (called on shutdown)."""
+    if not _pending_flushes:
+        return
+    logger.info(f"[MessageBuffer] Draining {len(_pending_flushes)} pending flushes...")
+    _, still_pending = await asyncio.wait(set(_pending_flushes), timeout=timeout)
+    if still_pending:
+        logger.error(f"[MessageBuffer] ❌ {len(still_pending)} flushes did not complete before shutdown")
@@ -2,29 +2,43 @@
 import logging
 import asyncio
 import os
+import time
 from typing import AsyncGenerator, Dict, Any, List, Optional
 from datetime import datetime
 from urllib.parse import unquote, urlparse
 
 from fastapi import HTTPException
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, RemoveMessage, ToolMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
 
 from src.repositories.conversation_repository import ConversationRepository
+from src.repositories.message_buffer import TurnMessageBuffer
 from src.graph.agent import get_agent_graph
-from src.graph.state import AgentState
+from src.graph.media_index import index_media
+from src.graph.state import NEW_TURN_STEP, AgentState
+from src.graph.tool_memo import LISTING_TOOLS, tool_result_memo
 from src.utils.stream_protocol import (
-    stream_text,
-    stream_tool_call,
-    stream_tool_result,
-    stream_error
+    encode_batch,
+    encode_error,
+    encode_text,
+    encode_tool_result
 )
 from src.utils.context import set_current_user_id, set_current_media_metadata
 from src.models.chat import MediaAttachment
 from src.core.config import settings
+from src.core.metrics import metrics
+from src.core.usage import usage_accountant
+from src.services.context_compactor import ContextCompactor
+from src.services.cancellation import WorkTracker
 
 logger = logging.getLogger(__name__)
 
 from src.core.telemetry import trace_span
+from src.utils.async_utils import run_blocking
+
+# ⏱️ Moving average of model / tool step durations (shared across turns, per worker)
+_work_duration_averages: Dict[str, float] = {}
 
 class AgentOrchestrator:
     """
@@ -38,6 +52,13 @@ class AgentOrchestrator:
     
     def __init__(self, repository: ConversationRepository):
         self.repo = repository
+        self.compactor = ContextCompactor(
+            keep_turns=settings.CONTEXT_KEEP_TURNS,
+            tool_output_max_chars=settings.CONTEXT_TOOL_OUTPUT_MAX_CHARS,
+            summary_max_tokens=settings.CONTEXT_SUMMARY_MAX_TOKENS,
+            min_window=settings.CONTEXT_HISTORY_MIN_MESSAGES,
+            max_window=settings.CONTEXT_HISTORY_MAX_MESSAGES
+        )
         # 🛡️ Prevent GC of fire-and-forget tasks
         self._background_tasks = set()
 
@@ -49,49 +70,87 @@ class AgentOrchestrator:
     ) -> AsyncGenerator[str, None]:
         """
         Main generator for the chat stream.
+        A client disconnect cancels it (StreamingResponse's listener), which cancels the running graph.
         """
+        turn_start = time.perf_counter()
+        ttft: Dict[str, float] = {}
+        # 💾 Write-behind persistence: one batch per turn, flushed off the streaming path
+        turn_buffer = TurnMessageBuffer(self.repo, request.session_id)
+        # 🛑 In-flight model/tool work (model-seconds saved on cancellation)
+        work = WorkTracker(_work_duration_averages)
+        accumulated_response = ""
+        pending_deltas: List[str] = []
+        usage_turn = None
         try:
             # ⚡ Send immediate keep-alive
             yield '0:"..."\n'
 
-            # ✅ AUTH VERIFICATION (Zero Latency)
+            # ⚡ CONCURRENT PREFETCH: auth (worker thread) ‖ session read -> history
+            timings: Dict[str, float] = {}
+            prefetch_start = time.perf_counter()
+            history_task = asyncio.create_task(self._prefetch_history(request.session_id, timings))
+            
+            # ✅ AUTH VERIFICATION (overlaps the Firestore reads)
             try:
                 from src.auth.jwt_handler import verify_token
-                user_session = verify_token(credentials)
+                user_session = await self._timed("auth", timings, run_blocking(verify_token, credentials))
                 user_id = user_session.uid
             except Exception as auth_error:
+                history_task.cancel()
                 logger.warning(f"[Orchestrator] Auth failed: {auth_error}")
-                async for chunk in stream_error("Authentication failed. Please refresh."):
-                    yield chunk
+                yield encode_error("Authentication failed. Please refresh.")
                 return
 
             # ✅ Context Setup
             set_current_user_id(user_id)
+            # 💰 Model calls of this turn (graph nodes, tools) are accounted to it
+            usage_turn = usage_accountant.start_turn(request.session_id, user_id)
             if request.media_metadata:
                  set_current_media_metadata(request.media_metadata)
             
-            # 🔥 Ensure Session & Load History
-            await self.repo.ensure_session(request.session_id)
-            conversation_history = await self.repo.get_context(request.session_id, limit=10)
+            # 🔥 Ensure Session (writes only what is missing) & Load History
+            snapshot, conversation_history = await history_task
+            session_data = await self._timed(
+                "session_write", timings,
+                self.repo.ensure_session(request.session_id, snapshot=snapshot)
+            ) or {}
+            timings["prefetch"] = round((time.perf_counter() - prefetch_start) * 1000, 2)
             logger.info(f"[Orchestrator] Loaded {len(conversation_history)} messages")
             
+            # ✂️ Compaction: last N turns verbatim, older ones folded into the running summary
+            compaction = self.compactor.compact_history(conversation_history, session_data)
+            conversation_history = compaction.history
+            if compaction.summary_changed:
+                self._save_summary_bg(request.session_id, compaction.summary, compaction.summary_message_count)
+            logger.info(f"[Orchestrator] History tokens {compaction.tokens_before} -> {compaction.tokens_after}")
+            
             # 🔥 Process User Message & Attachments
             latest_user_message = request.messages[-1] if request.messages else {"role": "user", "content": ""}
             user_content = self._parse_content(latest_user_message.get("content", ""))
             
             attachments_data, user_content_with_markers = self._process_attachments(request, user_id, user_content)
+            if attachments_data:
+                # New uploads make memoized file listings stale
+                tool_result_memo.invalidate(user_id, request.session_id, LISTING_TOOLS)
             
-            # 🔥 Persist User Message
-            await self.repo.save_message(
-                request.session_id, 
+            # 🔥 Persist User Message (flushed in background, overlapping graph start)
+            turn_buffer.add(
                 "user", 
                 user_content_with_markers,
                 attachments=attachments_data
             )
+            turn_buffer.flush_in_background()
             
-            # 🔥 Prepare LangChain Messages
-            lc_messages = self._prepare_langchain_messages(
-                conversation_history, 
+            # 💾 Checkpointed graph: resume from the saved state when it matches the history
+            agent_graph = get_agent_graph(getattr(request, "graph_mode", None))
+            graph_config, checkpoint_prefix, resumed = await self._timed(
+                "checkpoint", timings,
+                self._load_checkpoint(agent_graph, request, conversation_history)
+            )
+            
+            # 🔥 Prepare LangChain Messages (only the new one when resuming)
+            lc_messages = checkpoint_prefix + self._prepare_langchain_messages(
+                [] if resumed else conversation_history, 
                 user_content_with_markers, 
                 attachments_data, # Use data to reconstruct LC attachments if needed
                 request # passed for native video check
@@ -101,16 +160,62 @@ class AgentOrchestrator:
             state: AgentState = {
                 "messages": lc_messages,
                 "session_id": request.session_id,
-                "user_id": user_id
+                "user_id": user_id,
+                "conversation_summary": compaction.summary or ""
             }
+            if not resumed:
+                # 🖼️ Index media once; a resumed thread keeps its saved index
+                state["media_index"] = index_media(lc_messages)
+            if graph_config:
+                # The saved plan survives; the new turn must not replay its last step
+                state["internal_plan"] = [NEW_TURN_STEP]
+            
+            self._record_bootstrap(turn_start, timings)
             
             # 🔥 Execute Graph & Stream
-            accumulated_response = ""
-            agent_graph = get_agent_graph()
+            stream_tokens = settings.CHAT_STREAM_MODE == "tokens"
             
-            async for event in agent_graph.astream(state):
-                for node_name, node_output in event.items():
-                    if "messages" not in node_output: continue
+            if stream_tokens:
+                # ⚡ Token-level: LLM deltas ("messages"), node outputs ("updates"),
+                # tool results as each parallel call completes ("custom")
+                graph_events = agent_graph.astream(state, config=graph_config, stream_mode=["messages", "updates", "custom"])
+            else:
+                graph_events = self._as_updates(agent_graph.astream(state, config=graph_config))
+            work.start("llm", "llm")
+            
+            # True once the current execution step has streamed real deltas
+            streamed_tokens = False
+            # Tool results already streamed from the custom channel (persisted with the node update)
+            streamed_results = set()
+            
+            async for mode, payload in graph_events:
+                # CASE 0b: A tool call completed (results arrive in completion order)
+                if mode == "custom":
+                    if isinstance(payload, dict) and payload.get("event") == "tool_result":
+                        work.finish(payload["tool_call_id"])
+                        streamed_results.add(payload["tool_call_id"])
+                        yield encode_tool_result(payload["tool_call_id"], payload["content"])
+                    continue
+                
+                # CASE 0: Token delta from the Execution Node
+                if mode == "messages":
+                    chunk, chunk_metadata = payload
+                    if chunk_metadata.get("langgraph_node") != "execution":
+                        continue  # Reasoning output is internal (structured plan)
+                    if not isinstance(chunk, AIMessageChunk):
+                        continue
+                    
+                    delta = self._extract_delta_text(chunk.content)
+                    if delta:
+                        streamed_tokens = True
+                        pending_deltas.append(delta)
+                        self._record_first_token(turn_start, ttft)
+                        yield encode_text(delta)
+                    continue
+                
+                for node_name, node_output in payload.items():
+                    self._track_work(work, node_name, node_output)
+                    if not node_output or "messages" not in node_output: continue
                     
                     messages = node_output["messages"]
                     if not messages: continue
@@ -130,57 +235,194 @@ class AgentOrchestrator:
                             }
                             for tc in tool_calls
                         ]
-                        await self.repo.save_message(request.session_id, "assistant", last_msg.content or "", tool_calls=serialized)
+                        turn_buffer.add("assistant", last_msg.content or "", tool_calls=serialized)
                         
-                        # Stream Event '9'
-                        for tool_call in tool_calls:
-                            async for chunk in stream_tool_call(
-                                tool_call_id=tool_call.get("id", "unknown"),
-                                tool_name=tool_call.get("name", "unknown"),
-                                args=tool_call.get("args", {})
-                            ):
-                                yield chunk
+                        # Stream Event '9' (parallel calls encoded into one write)
+                        yield encode_batch(
+                            ("tool_call", (tc.get("id", "unknown"), tc.get("name", "unknown"), tc.get("args", {})))
+                            for tc in tool_calls
+                        )
                                 
-                    # CASE 2: Tool Result
+                    # CASE 2: Tool Results (node output keeps the tool-call order)
                     elif isinstance(last_msg, ToolMessage):
-                        # Persist
-                        await self.repo.save_message(request.session_id, "tool", last_msg.content, tool_call_id=last_msg.tool_call_id)
-                        
-                        # Stream Event 'a'
-                        async for chunk in stream_tool_result(
-                            tool_call_id=last_msg.tool_call_id,
-                            result=last_msg.content
-                        ):
-                            yield chunk
+                        for tool_msg in messages:
+                            if not isinstance(tool_msg, ToolMessage):
+                                continue
+                            # Persist
+                            turn_buffer.add("tool", tool_msg.content, tool_call_id=tool_msg.tool_call_id)
+                            
+                            # Stream Event 'a' (unless already streamed on completion)
+                            if tool_msg.tool_call_id not in streamed_results:
+                                yield encode_tool_result(tool_msg.tool_call_id, tool_msg.content)
                             
                     # CASE 3: Text Content
                     elif isinstance(last_msg, AIMessage) and last_msg.content:
                         text_content = self._extract_text(last_msg.content)
                         accumulated_response += text_content
                         
-                        # Stream Event '0'
-                        if text_content:
+                        # Stream Event '0' (only if the deltas were not already streamed)
+                        if text_content and not streamed_tokens:
+                            self._record_first_token(turn_start, ttft)
                             chunk_size = 5
                             for i in range(0, len(text_content), chunk_size):
-                                chunk = text_content[i:i+chunk_size]
-                                async for stream_chunk in stream_text(chunk):
-                                    yield stream_chunk
+                                yield encode_text(text_content[i:i+chunk_size])
+                    
+                    if node_name == "execution":
+                        streamed_tokens = False
+                        pending_deltas.clear()
 
             # 🔥 Persist Final Response
             if accumulated_response:
-                await self.repo.save_message(request.session_id, "assistant", accumulated_response)
+                turn_buffer.add("assistant", accumulated_response)
                 logger.info(f"[Orchestrator] Saved response ({len(accumulated_response)} chars)")
             else:
                 # 🛡️ Fallback: If agent finished without text/tools, it likely followed an error path
                 logger.warning("[Orchestrator] Agent finished without producing text or tool calls.")
                 fallback_msg = "Non sono riuscito a generare una risposta. Prova a riformulare la richiesta o controlla la connessione."
-                await self.repo.save_message(request.session_id, "assistant", fallback_msg)
-                async for chunk in stream_text(fallback_msg):
-                    yield chunk
+                turn_buffer.add("assistant", fallback_msg)
+                yield encode_text(fallback_msg)
+
+            if "ms" in ttft:
+                logger.info(f"[Orchestrator] Turn complete (TTFT {ttft['ms']}ms, total {round((time.perf_counter() - turn_start) * 1000, 2)}ms)")
 
+        except asyncio.CancelledError:
+            # 🛑 Client gone (StreamingResponse disconnect listener) or shutdown: the graph step is cancelled with us
+            self._record_cancellation(turn_buffer, work, accumulated_response + "".join(pending_deltas))
+            raise
         except Exception as e:
             await self._handle_error(e)
             yield await self._stream_safe_error(e)
+        finally:
+            # 🛡️ Runs on completion, error AND client disconnect (generator closed/cancelled)
+            if len(turn_buffer):
+                turn_buffer.flush_in_background()
+            if usage_turn is not None:
+                usage_accountant.finish_turn(usage_turn)
+
+    @staticmethod
+    def _track_work(work: WorkTracker, node_name: str, node_output: Any) -> None:
+        """Follows graph updates: LLM step -> tool calls -> tool results -> next LLM step."""
+        messages = node_output.get("messages") or [] if isinstance(node_output, dict) else []
+        for msg in messages:
+            if isinstance(msg, ToolMessage):
+                work.finish(msg.tool_call_id)
+        if node_name in ("reasoning", "execution"):
+            work.finish("llm")
+
+        last_msg = messages[-1] if messages else None
+        if isinstance(last_msg, AIMessage) and last_msg.tool_calls:
+            for tc in last_msg.tool_calls:
+                work.start(tc.get("id") or tc.get("name", "tool"), f"tool:{tc.get('name', 'unknown')}")
+        elif not work.inflight:
+            work.start("llm", "llm")
+
+    def _record_cancellation(self, turn_buffer: TurnMessageBuffer, work: WorkTracker, partial_response: str) -> None:
+        """Persists the "cancelled" marker and counts the model-seconds not spent."""
+        inflight = sorted(set(work.inflight.values()))
+        saved = round(work.remaining_seconds(), 3)
+        metrics.increment("chat.cancelled")
+        metrics.increment("chat.cancel.model_seconds_saved", saved)
+        turn_buffer.add(
+            "assistant",
+            partial_response,
+            metadata={"cancelled": True, "reason": "client_disconnect", "inflight": inflight}
+        )
+        logger.info(f"[Orchestrator] 🛑 Client disconnected: cancelled {inflight or 'nothing'} (~{saved}s saved)")
+
+    async def _load_checkpoint(self, agent_graph: Any, request: Any, history: List[Dict[str, Any]]):
+        """
+        Returns (config, messages prefix, resumed) for a checkpointed graph; (None, [], False) otherwise.
+        
+        The saved state is resumed only if its last reply is the last reply in the
+        Firestore history (a cancelled or failed turn leaves them apart); then only the
+        new message is sent, after dropping the oldest saved turns beyond
+        CHECKPOINT_MAX_MESSAGES. Otherwise the saved messages are replaced by the history.
+        """
+        if not isinstance(getattr(agent_graph, "checkpointer", None), BaseCheckpointSaver):
+            return None, [], False
+        
+        mode = getattr(request, "graph_mode", None) or settings.AGENT_GRAPH_MODE
+        config = {"configurable": {"thread_id": f"{request.session_id}:{mode}"}}
+        try:
+            snapshot = await agent_graph.aget_state(config)
+            saved = list((snapshot.values or {}).get("messages") or [])
+        except Exception as e:
+            logger.warning(f"⚠️ [Orchestrator] Checkpoint load failed, rebuilding from history: {e}")
+            saved = []
+        
+        last_reply = history[-1] if history else None
+        if saved and last_reply and last_reply.get("role") == "assistant" and not last_reply.get("tool_calls") \
+                and self._checkpoint_reply(saved) == last_reply.get("content", ""):
+            metrics.increment("agent.checkpoint.resumed")
+            logger.info(f"[Orchestrator] 💾 Resuming from checkpoint ({len(saved)} messages)")
+            return config, self._trim_checkpoint(saved, settings.CHECKPOINT_MAX_MESSAGES), True
+        
+        metrics.increment("agent.checkpoint.rebuilt")
+        return config, ([RemoveMessage(id=REMOVE_ALL_MESSAGES)] if saved else []), False
+
+    def _checkpoint_reply(self, messages: List[Any]) -> str:
+        """Final reply of the saved turn, as the orchestrator persisted it (text parts joined)."""
+        last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        return "".join(
+            self._extract_text(m.content)
+            for m in messages[last_human + 1:]
+            if isinstance(m, AIMessage) and not m.tool_calls and m.content
+        )
+
+    @staticmethod
+    def _trim_checkpoint(messages: List[Any], max_messages: int) -> List[RemoveMessage]:
+        """Removals for the oldest saved messages, cut at a user turn boundary."""
+        if len(messages) <= max_messages:
+            return []
+        keep_from = len(messages) - max_messages
+        while keep_from < len(messages) and not isinstance(messages[keep_from], HumanMessage):
+            keep_from += 1
+        return [RemoveMessage(id=m.id) for m in messages[:keep_from] if m.id]
+
+    async def _prefetch_history(self, session_id: str, timings: Dict[str, float]):
+        """Read-only bootstrap: session snapshot, then history (cache-validated by messageCount)."""
+        snapshot = await self._timed("session_read", timings, self.repo.load_session(session_id))
+        version = snapshot.data.get("messageCount") if snapshot and snapshot.data else None
+        # Every message not yet folded into the summary, so compaction sees turns as they age out
+        limit = self.compactor.history_window(snapshot.data if snapshot else None)
+        history = await self._timed(
+            "context", timings, self.repo.get_context(session_id, limit=limit, version=version)
+        )
+        return snapshot, history
+
+    @staticmethod
+    async def _timed(stage: str, timings: Dict[str, float], awaitable):
+        """Awaits `awaitable`, recording its duration (ms) under `stage`."""
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+
+    @staticmethod
+    def _record_bootstrap(turn_start: float, timings: Dict[str, float]) -> None:
+        """Emits per-stage pre-graph latency (log + chat.bootstrap.* metrics)."""
+        timings["total"] = round((time.perf_counter() - turn_start) * 1000, 2)
+        for stage, ms in timings.items():
+            metrics.observe(f"chat.bootstrap.{stage}_ms", ms)
+        logger.info(
+            "[Orchestrator] ⏱️ Bootstrap " + " ".join(f"{stage}={ms}ms" for stage, ms in timings.items())
+        )
+
+    @staticmethod
+    async def _as_updates(events):
+        """Adapts the legacy node-level stream to the (mode, payload) shape."""
+        async for event in events:
+            yield "updates", event
+
+    @staticmethod
+    def _record_first_token(turn_start: float, ttft: Dict[str, float]) -> None:
+        """Records Time-To-First-Token once per turn (keep-alive frame excluded)."""
+        if "ms" in ttft:
+            return
+        ttft["ms"] = round((time.perf_counter() - turn_start) * 1000, 2)
+        metrics.observe("chat.ttft_ms", ttft["ms"])
+        logger.info(f"[Orchestrator] ⚡ First token after {ttft['ms']}ms")
 
     def _process_attachments(self, request, user_id: str, base_content: str):
         """Handle legacy URLs and Native Video URIs."""
@@ -315,12 +557,31 @@ class AgentOrchestrator:
         self._background_tasks.add(task)
         task.add_done_callback(self._background_tasks.discard)
 
+    def _save_summary_bg(self, session_id: str, summary: str, summary_message_count: int):
+        """Persist the running summary off the streaming path."""
+        task = asyncio.create_task(
+            self.repo.save_session_summary(session_id, summary, summary_message_count)
+        )
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
     def _extract_text(self, content) -> str:
         if isinstance(content, str): return content
         if isinstance(content, list):
              return "\n".join([c if isinstance(c, str) else c.get("text", "") for c in content])
         return str(content)
 
+    def _extract_delta_text(self, content) -> str:
+        """Text of a streamed chunk: parts are concatenated as-is, non-text blocks skipped."""
+        if isinstance(content, str): return content
+        if isinstance(content, list):
+            return "".join(
+                c if isinstance(c, str) else c.get("text", "")
+                for c in content
+                if isinstance(c, str) or c.get("type", "text") == "text"
+            )
+        return ""
+
     def _parse_content(self, raw):
         return self._extract_text(raw).strip()
 
@@ -330,8 +591,7 @@ class AgentOrchestrator:
 
     async def _stream_safe_error(self, e: Exception):
         msg = str(e) if settings.ENV != "production" else "An internal error occurred."
-        async for chunk in stream_error(msg):
-            return chunk # async generator yield
+        return encode_error(msg)
 
 from fastapi import Depends
 def get_orchestrator(
@@ -0,0 +1,55 @@
+"""
+Client-Disconnect Cancellation
+
+When the browser drops /chat/stream, the graph must stop burning LLM quota and
+tool capacity (generate_render, video triage) for a response nobody reads.
+
+- Detection: StreamingResponse is the only reader of the ASGI receive channel. On
+  http.disconnect it cancels the response task; the StreamWriter cancels its pump,
+  which raises CancelledError inside the orchestrator's graph iteration and from
+  there into LangGraph and the in-flight ainvoke / tool coroutines. (Polling
+  request.is_disconnected() alongside would compete for the same message.)
+- WorkTracker: tracks in-flight model and tool work and keeps a moving average of
+  their durations, to estimate the model-seconds a cancellation saved.
+"""
+import time
+from typing import Dict, Tuple
+
+
+class WorkTracker:
+    """
+    In-flight model / tool work of one turn.
+
+    Durations are averaged per kind ("llm", "tool:<name>") across turns in the
+    shared `averages` dict; a cancellation saves the expected remainder of each
+    in-flight item (items with no history count as zero).
+    """
+
+    def __init__(self, averages: Dict[str, float], alpha: float = 0.2):
+        self.averages = averages
+        self.alpha = alpha
+        self._inflight: Dict[str, Tuple[str, float]] = {}
+
+    def start(self, key: str, kind: str) -> None:
+        self._inflight[key] = (kind, time.perf_counter())
+
+    def finish(self, key: str) -> None:
+        item = self._inflight.pop(key, None)
+        if item is None:
+            return
+        kind, started = item
+        duration = time.perf_counter() - started
+        previous = self.averages.get(kind)
+        self.averages[kind] = duration if previous is None else previous + self.alpha * (duration - previous)
+
+    @property
+    def inflight(self) -> Dict[str, str]:
+        return {key: kind for key, (kind, _) in self._inflight.items()}
+
+    def remaining_seconds(self) -> float:
+        """Expected seconds of work still pending across in-flight items."""
+        now = time.perf_counter()
+        return sum(
+            max(0.0, self.averages.get(kind, 0.0) - (now - started))
+            for kind, started in self._inflight.values()
+        )
@@ -0,0 +1,270 @@
+"""
+Context Compactor
+
+Bounds the prompt size of the agent in two stages:
+1. History compaction (per turn): keeps the last N turns verbatim and folds older
+   turns into an extractive running summary persisted on the session document.
+   The loaded window (history_window) covers every message not yet summarized,
+   so turns are folded as they leave the kept turns, not lost.
+2. Node budget (per LLM call): fits system prompt + messages into a token budget by
+   condensing older tool outputs / media first, then dropping whole older turns.
+   The current turn is never cut (a tool result without its call is rejected);
+   its tool outputs are condensed as a last resort.
+
+Token counts are estimates (~4 chars per token, fixed cost per media block).
+"""
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+MEDIA_BLOCK_TOKENS = 258  # Gemini bills a fixed token count per image
+CONDENSED_MARKER = "…[condensed]"
+
+
+def estimate_tokens(content: Any) -> int:
+    """Rough token count of a message content (str or multimodal block list)."""
+    if content is None:
+        return 0
+    if isinstance(content, str):
+        return len(content) // CHARS_PER_TOKEN
+    if isinstance(content, list):
+        total = 0
+        for part in content:
+            if isinstance(part, str):
+                total += len(part) // CHARS_PER_TOKEN
+            elif isinstance(part, dict) and part.get("type", "text") == "text":
+                total += len(part.get("text", "")) // CHARS_PER_TOKEN
+            else:
+                total += MEDIA_BLOCK_TOKENS
+        return total
+    return len(str(content)) // CHARS_PER_TOKEN
+
+
+def count_tokens(messages: List[Any]) -> int:
+    """Token estimate of LangChain messages or history dicts."""
+    total = 0
+    for msg in messages:
+        if isinstance(msg, dict):
+            total += estimate_tokens(msg.get("content"))
+            if msg.get("tool_calls"):
+                total += len(str(msg["tool_calls"])) // CHARS_PER_TOKEN
+        else:
+            total += estimate_tokens(msg.content)
+            if getattr(msg, "tool_calls", None):
+                total += len(str(msg.tool_calls)) // CHARS_PER_TOKEN
+    return total
+
+
+def _condense(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + CONDENSED_MARKER
+
+
+@dataclass
+class CompactionResult:
+    history: List[Dict[str, Any]]
+    summary: Optional[str]
+    summary_message_count: int
+    summary_changed: bool
+    tokens_before: int
+    tokens_after: int
+
+
+class ContextCompactor:
+    """Extractive history compaction and per-node token budgeting."""
+
+    def __init__(
+        self,
+        keep_turns: int = 3,
+        tool_output_max_chars: int = 1500,
+        summary_line_max_chars: int = 240,
+        summary_max_tokens: int = 800,
+        min_window: int = 16,
+        max_window: int = 60
+    ):
+        self.keep_turns = keep_turns
+        self.min_window = min_window
+        self.max_window = max_window
+        self.tool_output_max_chars = tool_output_max_chars
+        self.summary_line_max_chars = summary_line_max_chars
+        self.summary_max_tokens = summary_max_tokens
+
+    # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+    # 1. HISTORY COMPACTION (before the graph runs)
+    # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+    def history_window(self, session_data: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Messages to load for compaction: all those after summaryMessageCount, so no
+        turn leaves the window unsummarized (at least `min_window`, at most `max_window`).
+        """
+        session_data = session_data or {}
+        message_count = session_data.get("messageCount")
+        if message_count is None:
+            return self.min_window
+        pending = message_count - (session_data.get("summaryMessageCount", 0) or 0)
+        return max(self.min_window, min(self.max_window, pending))
+
+    def compact_history(
+        self,
+        history: List[Dict[str, Any]],
+        session_data: Optional[Dict[str, Any]] = None
+    ) -> CompactionResult:
+        """
+        Keeps the last `keep_turns` turns (a turn starts at a user message) verbatim and
+        folds the older messages of the window into the running summary.
+
+        `session_data` is the session document (messageCount, summary, summaryMessageCount).
+        Absolute positions come from messageCount, so a message is folded only once.
+        """
+        session_data = session_data or {}
+        summary = session_data.get("summary") or None
+        summarized_count = session_data.get("summaryMessageCount", 0) or 0
+        tokens_before = count_tokens(history)
+
+        # Bulky tool outputs of past turns are condensed; the current turn stays intact
+        last_turn = self._last_turn_start(history)
+        condensed = [self._condense_tool_output(m) if i < last_turn else m for i, m in enumerate(history)]
+
+        cut = self._turn_cut_index(history)
+        message_count = session_data.get("messageCount")
+        if message_count is None:
+            cut = 0  # Unknown absolute position: never fold, keep the window verbatim
+        kept = condensed[cut:]
+
+        summary_changed = False
+        if cut > 0:
+            window_start = max(0, message_count - len(history))
+            new_lines = [
+                self._summary_line(msg)
+                for offset, msg in enumerate(history[:cut])
+                if window_start + offset >= summarized_count
+            ]
+            new_lines = [line for line in new_lines if line]
+            if new_lines:
+                summary = self._append_to_summary(summary, new_lines)
+                summarized_count = window_start + cut
+                summary_changed = True
+
+        tokens_after = count_tokens(kept) + estimate_tokens(summary)
+        metrics.observe("context.history_tokens_before", tokens_before)
+        metrics.observe("context.history_tokens_after", tokens_after)
+        if summary_changed:
+            metrics.increment("context.summary_updates")
+
+        return CompactionResult(
+            history=kept,
+            summary=summary,
+            summary_message_count=summarized_count,
+            summary_changed=summary_changed,
+            tokens_before=tokens_before,
+            tokens_after=tokens_after,
+        )
+
+    def _turn_cut_index(self, history: List[Dict[str, Any]]) -> int:
+        """Index of the first message of the last `keep_turns` turns."""
+        user_indexes = [i for i, m in enumerate(history) if m.get("role") == "user"]
+        if len(user_indexes) <= self.keep_turns:
+            return 0
+        return user_indexes[-self.keep_turns]
+
+    @staticmethod
+    def _last_turn_start(history: List[Dict[str, Any]]) -> int:
+        for i in range(len(history) - 1, -1, -1):
+            if history[i].get("role") == "user":
+                return i
+        return 0
+
+    def _condense_tool_output(self, msg: Dict[str, Any]) -> Dict[str, Any]:
+        if msg.get("role") != "tool" or not isinstance(msg.get("content"), str):
+            return msg
+        if len(msg["content"]) <= self.tool_output_max_chars:
+            return msg
+        return {**msg, "content": _condense(msg["content"], self.tool_output_max_chars)}
+
+    def _summary_line(self, msg: Dict[str, Any]) -> str:
+        role = msg.get("role")
+        content = msg.get("content") or ""
+        if not isinstance(content, str):
+            content = str(content)
+        content = " ".join(content.split())
+        if role == "assistant" and msg.get("tool_calls"):
+            names = ", ".join(tc.get("name", "?") for tc in msg["tool_calls"])
+            content = f"{content} (called: {names})".strip()
+        if not content:
+            return ""
+        label = {"user": "User", "assistant": "Assistant", "tool": "Tool result"}.get(role, role)
+        return f"- {label}: {_condense(content, self.summary_line_max_chars)}"
+
+    def _append_to_summary(self, summary: Optional[str], lines: List[str]) -> str:
+        text = "\n".join(([summary] if summary else []) + lines)
+        max_chars = self.summary_max_tokens * CHARS_PER_TOKEN
+        if len(text) > max_chars:
+            # Keep the most recent facts
+            text = "…\n" + text[-max_chars:].split("\n", 1)[-1]
+        return text
+
+    # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+    # 2. NODE TOKEN BUDGET (per LLM call)
+    # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+    def fit_to_budget(
+        self,
+        system_prompt: str,
+        messages: List[BaseMessage],
+        budget_tokens: Optional[int],
+        node: str
+    ) -> List[BaseMessage]:
+        """
+        Returns `messages` trimmed so that system prompt + messages fit `budget_tokens`.
+        1. Condense tool outputs and media of the turns before the current one.
+        2. Drop whole older turns, oldest first (a turn starts at a user message), so
+           tool results never lose their tool call.
+        3. Still over budget: condense the current turn's tool outputs. Its messages
+           are never dropped.
+        """
+        system_tokens = estimate_tokens(system_prompt)
+        before = system_tokens + count_tokens(messages)
+        if not budget_tokens or before <= budget_tokens or not messages:
+            metrics.observe(f"context.{node}.tokens", before)
+            return messages
+
+        current_start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=0)
+        earlier = [self._condense_message(m) for m in messages[:current_start]]
+        current = list(messages[current_start:])
+
+        while earlier and system_tokens + count_tokens(earlier + current) > budget_tokens:
+            next_turn = next((i for i, m in enumerate(earlier) if i > 0 and isinstance(m, HumanMessage)), len(earlier))
+            del earlier[:next_turn]
+
+        if system_tokens + count_tokens(current) > budget_tokens:
+            current = [self._condense_message(m) if isinstance(m, ToolMessage) else m for m in current]
+
+        fitted = earlier + current
+        after = system_tokens + count_tokens(fitted)
+        metrics.observe(f"context.{node}.tokens", after)
+        metrics.increment(f"context.{node}.tokens_trimmed", before - after)
+        logger.info(f"✂️ [{node}] Context {before} -> {after} tokens (budget {budget_tokens}, {len(messages)} -> {len(fitted)} msgs)")
+        return fitted
+
+    def _condense_message(self, msg: BaseMessage) -> BaseMessage:
+        if isinstance(msg, ToolMessage) and isinstance(msg.content, str):
+            if len(msg.content) > self.tool_output_max_chars:
+                return msg.model_copy(update={"content": _condense(msg.content, self.tool_output_max_chars)})
+        elif isinstance(msg, (HumanMessage, AIMessage)) and isinstance(msg.content, list):
+            # Older media: keep the text (it carries the [Immagine allegata: url] markers)
+            text_parts = [
+                p if isinstance(p, str) else p.get("text", "")
+                for p in msg.content
+                if isinstance(p, str) or p.get("type", "text") == "text"
+            ]
+            return msg.model_copy(update={"content": "\n".join(t for t in text_parts if t)})
+        return msg
@@ -2,8 +2,15 @@ import logging
 from typing import List, Union, Dict, Any
 from langchain_core.messages import BaseMessage, HumanMessage
 
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.services.intent_router import get_intent_router
+
 logger = logging.getLogger(__name__)
 
+# Attachment markers added by the orchestrator to the user text
+MEDIA_MARKERS = ("[Immagine allegata:", "[Video allegato:")
+
 class IntentClassifier:
     """
     Service responsible for classifying the user's intent to determine
@@ -15,54 +22,73 @@ class IntentClassifier:
         """
         Determines if the request should go to 'reasoning' (slow/methodical)
         or 'execution' (fast/direct).
-        
+
         Hybrid Approach:
-        1. Fast Match: Regex/Heuristics (Zero Latency)
-        2. Slow Match: Small LLM (Fallback - To Be Implemented)
+        1. Media: uploads always need planning -> reasoning
+        2. Learned router: hashed n-gram model, execution only above the confidence threshold
+        3. Heuristics: greetings/acks (used when the model is not available)
         """
         if not messages: return "reasoning"
-        
+
         last_msg = messages[-1]
-        
+
         # Only analyze Human inputs for fast-tracking
         if isinstance(last_msg, HumanMessage) or (isinstance(last_msg, dict) and last_msg.get("type") == "human"):
             content = last_msg.content if hasattr(last_msg, "content") else last_msg.get("content", "")
-            
-            # 1. Normalize Content (Handle Multimodal List)
-            text_content = ""
-            if isinstance(content, str):
-                text_content = content
-            elif isinstance(content, list):
-                # Extract text parts
-                text_parts = []
-                for part in content:
-                    if isinstance(part, str):
-                         text_parts.append(part)
-                    elif isinstance(part, dict) and part.get("type") == "text":
-                         text_parts.append(part.get("text", ""))
-                text_content = " ".join(text_parts)
-            
-            # 2. Heuristic Checks
-            
-            # A. Complexity Check (Length)
-            # If > 5 words, likely needs reasoning.
-            if len(text_content.split()) > 5:
-                # If multimodal (list), default to reasoning as it implies complexity
-                if isinstance(content, list):
-                    return "reasoning"
+            text_content = IntentClassifier._text_of(content)
+
+            # 1. Media: images / videos need analysis
+            if IntentClassifier._has_media(content, text_content):
                 return "reasoning"
-                
-            # B. Simple interaction Check (Greetings/Ack)
-            greetings = ["ciao", "hello", "hi", "buongiorno", "buonasera", "grazie", "thank", "ok", "va bene"]
-            normalized = text_content.lower().strip()
-            
-            # Exact match or starts with greeting
-            if any(normalized.startswith(g) for g in greetings):
-                logger.info("🚀 IntentClassifier: Fast-tracking greeting -> Execution Node")
-                return "execution"
-        
-        # TODO: Implement Hybrid LLM Fallback here if needed
-        # if logic_is_ambiguous:
-        #      return await call_small_llm_classifier(messages)
-        
+
+            # 2. Learned router
+            router = get_intent_router()
+            if router is not None:
+                route, confidence = router.route(text_content, settings.INTENT_ROUTER_THRESHOLD)
+                metrics.increment(f"agent.intent.{route}")
+                metrics.observe("agent.intent.confidence", round(confidence, 3))
+                if route == "execution":
+                    logger.info(f"🚀 IntentClassifier: Fast-tracking (p={confidence:.2f}) -> Execution Node")
+                return route
+
+            # 3. Heuristic fallback
+            return IntentClassifier.heuristic_route(text_content)
+
         return "reasoning"
+
+    @staticmethod
+    def heuristic_route(text_content: str) -> str:
+        """Original rules: short greeting/acknowledgement -> execution."""
+        # A. Complexity Check (Length)
+        # If > 5 words, likely needs reasoning.
+        if len(text_content.split()) > 5:
+            return "reasoning"
+
+        # B. Simple interaction Check (Greetings/Ack)
+        greetings = ["ciao", "hello", "hi", "buongiorno", "buonasera", "grazie", "thank", "ok", "va bene"]
+        normalized = text_content.lower().strip()
+
+        # Exact match or starts with greeting
+        if any(normalized.startswith(g) for g in greetings):
+            logger.info("🚀 IntentClassifier: Fast-tracking greeting -> Execution Node")
+            return "execution"
+        return "reasoning"
+
+    @staticmethod
+    def _text_of(content: Union[str, List[Any]]) -> str:
+        """Normalize Content (Handle Multimodal List)."""
+        if isinstance(content, str):
+            return content
+        text_parts = []
+        for part in content or []:
+            if isinstance(part, str):
+                text_parts.append(part)
+            elif isinstance(part, dict) and part.get("type") == "text":
+                text_parts.append(part.get("text", ""))
+        return " ".join(text_parts)
+
+    @staticmethod
+    def _has_media(content: Union[str, List[Any]], text_content: str) -> bool:
+        if isinstance(content, list) and any(isinstance(p, dict) and p.get("type") != "text" for p in content):
+            return True
+        return any(marker in text_content for marker in MEDIA_MARKERS)
@@ -0,0 +1,189 @@
+"""
+Learned Intent Router
+
+CPU-only gatekeeper model: hashed character n-grams (+ word unigrams) and a
+logistic regression stored as a NumPy array. It scores P(execution) for the
+user's latest message; the gatekeeper sends the turn straight to `execution`
+only above a confidence threshold, everything else keeps the `reasoning` path.
+
+    execution: greetings, acknowledgements, confirmations, follow-up questions
+    reasoning: new requests that need planning or tools
+
+Trained offline (scripts/train_intent_router.py) from anonymized transcripts;
+evaluated with tests_manual/evaluate_intent_router.py.
+"""
+import json
+import logging
+import random
+import re
+import unicodedata
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Declared dependency; if missing, the gatekeeper keeps its heuristics (warned at load)
+    np = None
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LABELS = ("reasoning", "execution")  # index 1 = positive class
+DEFAULT_MODEL_PATH = Path(__file__).parent / "intent_data" / "intent_router.npz"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    """Lowercase, accents stripped ("sì" == "si"), whitespace collapsed."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.split())
+
+
+class HashedNgramFeaturizer:
+    """
+    Text -> sparse (indices, values), L2-normalized.
+    crc32 hashing is stable across processes (unlike hash()), so a model trained
+    offline matches the features computed at serving time.
+    """
+
+    def __init__(self, dim: int = 2 ** 14, ngram_min: int = 2, ngram_max: int = 4):
+        self.dim = dim
+        self.ngram_min = ngram_min
+        self.ngram_max = ngram_max
+
+    def tokens(self, text: str) -> List[str]:
+        words = _WORD_RE.findall(normalize(text))
+        features = [f"w:{w}" for w in words]
+        features.append(f"len:{min(len(words), 12)}")
+        if text.rstrip().endswith("?"):
+            features.append("q:?")
+        for word in words:
+            padded = f" {word} "
+            for n in range(self.ngram_min, self.ngram_max + 1):
+                features.extend(f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1))
+        return features
+
+    def transform(self, text: str) -> Tuple["np.ndarray", "np.ndarray"]:
+        counts: Dict[int, float] = {}
+        for token in self.tokens(text):
+            index = zlib.crc32(token.encode("utf-8")) % self.dim
+            counts[index] = counts.get(index, 0.0) + 1.0
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        norm = float(np.sqrt(values @ values)) or 1.0
+        return indices, values / norm
+
+
+class IntentRouter:
+    """Logistic regression over hashed n-grams; P(execution) = sigmoid(w·x + b)."""
+
+    def __init__(self, weights: "np.ndarray", bias: float, featurizer: Optional[HashedNgramFeaturizer] = None):
+        self.weights = weights.astype(np.float32)
+        self.bias = float(bias)
+        self.featurizer = featurizer or HashedNgramFeaturizer(dim=len(weights))
+
+    def predict_proba(self, text: str) -> float:
+        """Probability that the message can go straight to execution."""
+        indices, values = self.featurizer.transform(text)
+        logit = float(self.weights[indices] @ values) + self.bias
+        return float(1.0 / (1.0 + np.exp(-logit)))
+
+    def route(self, text: str, threshold: float = 0.8) -> Tuple[str, float]:
+        """(node, P(execution)); below the threshold the turn keeps the reasoning path."""
+        probability = self.predict_proba(text)
+        return ("execution" if probability >= threshold else "reasoning"), probability
+
+    # --- Training / persistence (offline) ---
+
+    @classmethod
+    def train(
+        cls,
+        texts: Sequence[str],
+        labels: Sequence[str],
+        featurizer: Optional[HashedNgramFeaturizer] = None,
+        epochs: int = 30,
+        learning_rate: float = 0.5,
+        l2: float = 1e-4,
+        seed: int = 13
+    ) -> "IntentRouter":
+        """SGD on the log loss, classes re-weighted to balance them."""
+        featurizer = featurizer or HashedNgramFeaturizer()
+        samples = [(featurizer.transform(text), float(LABELS.index(label))) for text, label in zip(texts, labels)]
+        positives = sum(y for _, y in samples)
+        class_weight = {
+            1.0: len(samples) / (2 * positives) if positives else 1.0,
+            0.0: len(samples) / (2 * (len(samples) - positives)) if positives < len(samples) else 1.0,
+        }
+
+        weights = np.zeros(featurizer.dim, dtype=np.float32)
+        bias = 0.0
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(samples)
+            rate = learning_rate / (1 + epoch * 0.1)
+            for (indices, values), y in samples:
+                probability = 1.0 / (1.0 + np.exp(-(float(weights[indices] @ values) + bias)))
+                gradient = (probability - y) * class_weight[y]
+                weights[indices] -= rate * (gradient * values + l2 * weights[indices])
+                bias -= rate * gradient
+        return cls(weights, bias, featurizer)
+
+    def save(self, path: Path) -> None:
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=np.float32(self.bias),
+            ngram_range=np.array([self.featurizer.ngram_min, self.featurizer.ngram_max]),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "IntentRouter":
+        with np.load(path) as data:
+            ngram_min, ngram_max = (int(n) for n in data["ngram_range"])
+            weights = data["weights"]
+            featurizer = HashedNgramFeaturizer(dim=len(weights), ngram_min=ngram_min, ngram_max=ngram_max)
+            return cls(weights, float(data["bias"]), featurizer)
+
+
+def load_dataset(paths: Iterable[Path]) -> Tuple[List[str], List[str]]:
+    """JSONL rows {"text": ..., "label": "execution" | "reasoning"}."""
+    texts, labels = [], []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if row.get("label") in LABELS and row.get("text", "").strip():
+                    texts.append(row["text"])
+                    labels.append(row["label"])
+    return texts, labels
+
+
+_router: Optional[IntentRouter] = None
+_router_loaded = False
+
+
+def get_intent_router() -> Optional[IntentRouter]:
+    """Lazy-loads the bundled (or configured) model; None if disabled or unavailable."""
+    global _router, _router_loaded
+    if _router_loaded:
+        return _router
+    _router_loaded = True
+
+    if not settings.INTENT_ROUTER_ENABLED:
+        return None
+    if np is None:
+        logger.warning("⚠️ NumPy not installed: intent router disabled (heuristic gatekeeper)")
+        return None
+    path = Path(settings.INTENT_ROUTER_MODEL_PATH) if settings.INTENT_ROUTER_MODEL_PATH else DEFAULT_MODEL_PATH
+    try:
+        _router = IntentRouter.load(path)
+        logger.info(f"🧭 Intent router loaded ({path.name}, {len(_router.weights)} features)")
+    except Exception as e:
+        logger.warning(f"⚠️ Intent router unavailable ({e}): heuristic gatekeeper")
+    return _router
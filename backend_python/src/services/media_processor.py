@@ -1,10 +1,10 @@
 import asyncio
 import logging
 from typing import BinaryIO, Optional, IO
-from google import genai
 from google.genai import types
 
 from src.core.config import settings
+from src.core.genai_clients import genai_registry
 
 logger = logging.getLogger(__name__)
 
@@ -25,14 +25,8 @@ class MediaProcessor:
         if not self.api_key:
              raise RuntimeError("GEMINI_API_KEY is not set in configuration.")
              
-        self.client = genai.Client(api_key=self.api_key, http_options={'api_version': 'v1beta'})
-
-    def __del__(self):
-        # Best effort cleanup
-        try:
-            self.client.close()
-        except:
-            pass
+        # Shared pooled client: resolving the dependency per request is free
+        self.client = genai_registry.client(api_version="v1beta")
 
     async def upload_video_for_analysis(self, file_stream: IO[bytes], mime_type: str, display_name: str) -> types.File:
         """
@@ -0,0 +1,212 @@
+"""
+Prompt Prefix Cache
+
+The system prompt is split by ContextBuilder into a byte-stable static prefix
+(persona, tools, rules: ~6.5k tokens) and a small per-turn dynamic suffix.
+
+- Implicit caching: the static prefix is always sent first and unchanged, so the
+  provider can reuse it across calls.
+- Explicit caching (PromptCache): a cached-content handle holding the static
+  prefix is created once per (model, prompt version) and reused until its TTL;
+  calls made with the handle send only the dynamic suffix and the conversation.
+  Used for calls without bound tools (the reasoning node): a cached-content
+  request cannot also carry tools / tool_config.
+
+Backends: GeminiPromptCacheBackend (google-genai caches API) and
+LocalPromptCacheBackend (in-process stand-in for tests and dev).
+
+PromptUsageRecorder reports prompt tokens billed vs cached per node from the
+responses' usage metadata (llm.<node>.prompt_tokens / _cached / _billed) and
+hands the full usage to the usage accountant (src/core/usage.py).
+"""
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Protocol, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.core.usage import TokenUsage, usage_accountant
+from src.services.context_compactor import estimate_tokens
+from src.utils.async_utils import run_blocking
+
+logger = logging.getLogger(__name__)
+
+
+def prompt_version(static_prefix: str) -> str:
+    """Short content hash: a new handle is created whenever the prefix changes."""
+    return hashlib.sha256(static_prefix.encode("utf-8")).hexdigest()[:12]
+
+
+class PromptCacheBackend(Protocol):
+    def create(self, model: str, system_instruction: str, ttl_s: float, display_name: str) -> str:
+        """Creates the cached content and returns its handle (resource name)."""
+        ...
+
+
+class GeminiPromptCacheBackend:
+    """Provider-side context caching (google-genai `client.caches`)."""
+
+    def __init__(self, client: Any = None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from src.core.genai_clients import genai_registry
+            self._client = genai_registry.client()
+        return self._client
+
+    def create(self, model: str, system_instruction: str, ttl_s: float, display_name: str) -> str:
+        from google.genai import types
+
+        model_name = model if model.startswith("models/") else f"models/{model}"
+        cache = self.client.caches.create(
+            model=model_name,
+            config=types.CreateCachedContentConfig(
+                system_instruction=system_instruction,
+                ttl=f"{int(ttl_s)}s",
+                display_name=display_name,
+            ),
+        )
+        return cache.name
+
+
+class LocalPromptCacheBackend:
+    """In-process stand-in: records what would be cached, returns fake handles."""
+
+    def __init__(self):
+        self.contents: Dict[str, Tuple[str, str]] = {}
+
+    def create(self, model: str, system_instruction: str, ttl_s: float, display_name: str) -> str:
+        name = f"cachedContents/local-{len(self.contents) + 1}-{display_name}"
+        self.contents[name] = (model, system_instruction)
+        return name
+
+
+@dataclass
+class _Handle:
+    name: Optional[str]  # None = creation failed, retry after expires_at
+    expires_at: float
+
+
+class PromptCache:
+    """
+    (model, prompt version) -> cached-content handle, created once and reused.
+
+    Handles are recreated `refresh_margin_s` before the provider TTL expires.
+    A failed creation is not retried for `retry_after_s` (calls go inline).
+    """
+
+    def __init__(
+        self,
+        backend: PromptCacheBackend,
+        ttl_s: float = 3600,
+        min_tokens: int = 1024,
+        refresh_margin_s: float = 60,
+        retry_after_s: float = 300
+    ):
+        self.backend = backend
+        self.ttl_s = ttl_s
+        self.min_tokens = min_tokens
+        self.refresh_margin_s = refresh_margin_s
+        self.retry_after_s = retry_after_s
+        self._handles: Dict[Tuple[str, str], _Handle] = {}
+        self._lock = threading.Lock()  # sync nodes run on worker threads
+
+    def lookup(self, model: str, static_prefix: str) -> Tuple[bool, Optional[str]]:
+        """(known, handle) without creating anything."""
+        entry = self._handles.get((model, prompt_version(static_prefix)))
+        if entry is None or entry.expires_at <= time.monotonic():
+            return False, None
+        return True, entry.name
+
+    def handle_for(self, model: str, static_prefix: str) -> Optional[str]:
+        """Returns the handle for this prefix, creating it if needed (blocking)."""
+        known, name = self.lookup(model, static_prefix)
+        if known:
+            if name:
+                metrics.increment("prompt_cache.hits")
+            return name
+        if estimate_tokens(static_prefix) < self.min_tokens:
+            metrics.increment("prompt_cache.skipped_small")
+            return None
+
+        version = prompt_version(static_prefix)
+        with self._lock:
+            known, name = self.lookup(model, static_prefix)  # Created while we waited
+            if known:
+                return name
+            try:
+                name = self.backend.create(model, static_prefix, self.ttl_s, f"syd-prompt-{version}")
+                expires_at = time.monotonic() + self.ttl_s - self.refresh_margin_s
+                metrics.increment("prompt_cache.created")
+                logger.info(f"🗄️ Prompt cache created for {model} (version {version}): {name}")
+            except Exception as e:
+                name, expires_at = None, time.monotonic() + self.retry_after_s
+                metrics.increment("prompt_cache.errors")
+                logger.warning(f"⚠️ Prompt cache creation failed ({model}, version {version}): {e}")
+            self._handles[(model, version)] = _Handle(name=name, expires_at=expires_at)
+            return name
+
+    async def ahandle_for(self, model: str, static_prefix: str) -> Optional[str]:
+        """Async variant: the (rare) creation runs on a worker thread."""
+        known, name = self.lookup(model, static_prefix)
+        if known:
+            if name:
+                metrics.increment("prompt_cache.hits")
+            return name
+        return await run_blocking(self.handle_for, model, static_prefix)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._handles.clear()
+
+
+class PromptUsageRecorder(BaseCallbackHandler):
+    """Counts prompt tokens billed vs read from cache, per graph node."""
+
+    def __init__(self, node: str):
+        self.node = node
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    self.record(usage, (getattr(message, "response_metadata", None) or {}).get("model_name"))
+
+    def record(self, usage: Dict[str, Any], model: Optional[str] = None) -> None:
+        prompt_tokens = usage.get("input_tokens") or 0
+        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        metrics.increment(f"llm.{self.node}.prompt_tokens", prompt_tokens)
+        metrics.increment(f"llm.{self.node}.prompt_tokens_cached", cached_tokens)
+        metrics.increment(f"llm.{self.node}.prompt_tokens_billed", prompt_tokens - cached_tokens)
+        usage_accountant.record(model, TokenUsage.from_langchain(usage), node=self.node)
+
+
+def model_name(llm: Any) -> str:
+    """Provider model id of a chat model (falls back to its type for fakes)."""
+    name = getattr(llm, "model", None) or getattr(llm, "model_name", None)
+    return name if isinstance(name, str) else llm._llm_type
+
+
+def build_prompt_cache(backend: Optional[str] = None) -> Optional[PromptCache]:
+    """PromptCache for settings.PROMPT_CACHE_BACKEND ("none" | "local" | "gemini")."""
+    backend = (backend or settings.PROMPT_CACHE_BACKEND).lower()
+    backends = {"gemini": GeminiPromptCacheBackend, "local": LocalPromptCacheBackend}
+    if backend not in backends:
+        if backend != "none":
+            logger.warning(f"⚠️ Unknown prompt cache backend '{backend}'. Explicit caching disabled.")
+        return None
+    return PromptCache(
+        backends[backend](),
+        ttl_s=settings.PROMPT_CACHE_TTL_S,
+        min_tokens=settings.PROMPT_CACHE_MIN_TOKENS,
+    )
@@ -1,9 +1,13 @@
+import asyncio
+import time
 from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Awaitable, Optional, Dict, Any, TypeVar
 from src.api.gemini_imagen import generate_image_t2i, generate_image_i2i
+from src.core.metrics import metrics
 from src.storage.upload import upload_base64_image
 from src.vision.triage import analyze_image_triage
+from src.utils.async_utils import run_blocking
 from src.utils.download import download_image_smart
 import logging
 
@@ -13,6 +17,8 @@ from src.models.project import ProjectUpdate, ProjectStatus
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 class GenerateRenderInput(BaseModel):
     """Input schema for generate_render tool."""
     prompt: str = Field(
@@ -40,6 +46,76 @@ class GenerateRenderInput(BaseModel):
         description="Elements to preserve in modification mode"
     )
 
+async def _timed(timings: Dict[str, float], step: str, awaitable: Awaitable[T]) -> T:
+    """Awaits one render step, recording its duration (tool result + render.<step>_ms)."""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        timings[f"{step}_ms"] = elapsed_ms
+        metrics.observe(f"render.{step}_ms", elapsed_ms)
+
+
+async def prepare_i2i_render(
+    source_bytes: bytes,
+    mime_type: str,
+    prompt: str,
+    room_type: str,
+    style: str,
+    keep_elements: list[str],
+    timings: Dict[str, float]
+) -> str:
+    """
+    Render preparation stage (I2I): triage and Architect run concurrently.
+
+    Architect does not depend on triage; the triaged room type only feeds the
+    fallback prompt used when Architect fails. A cached analysis of the same
+    photo (see triage_cache) returns immediately, so triage costs no model call.
+    """
+    async def triage_room_type() -> Optional[str]:
+        try:
+            analysis = await analyze_image_triage(source_bytes)
+            if analysis.get("success"):
+                return analysis.get("roomType")
+        except Exception:
+            pass  # Continue without analysis
+        return None
+
+    async def architect_prompt() -> Optional[str]:
+        # 🎨 USE ARCHITECT FOR ENHANCED PROMPT GENERATION
+        try:
+            from src.vision.architect import generate_architectural_prompt
+            
+            arch_output = await generate_architectural_prompt(
+                image_bytes=source_bytes,
+                target_style=style,
+                keep_elements=keep_elements,
+                mime_type=mime_type,
+                user_instructions=prompt
+            )
+            
+            # Combine structured fields into final prompt
+            return f"{arch_output.structural_skeleton} {arch_output.material_plan} {arch_output.furnishing_strategy} {arch_output.technical_notes}"
+            
+        except Exception as arch_error:
+            logger.warning(f"[Render] Architect failed, using fallback: {arch_error}")
+            return None
+
+    triaged_room_type, full_prompt = await _timed(timings, "prepare", asyncio.gather(
+        _timed(timings, "triage", triage_room_type()),
+        _timed(timings, "architect", architect_prompt()),
+    ))
+    
+    if full_prompt is None:
+        # Fallback to simple prompt if Architect fails
+        full_prompt = f"Transform this {triaged_room_type or room_type} to {style} style. {prompt}"
+    
+    # ✍️ DEBUG LOG: Log full prompt for verification
+    logger.info(f"[Render] 📝 FULL PROMPT (I2I):\n{'-'*40}\n{full_prompt}\n{'-'*40}")
+    return full_prompt
+
+
 async def generate_render_wrapper(
     prompt: str,
     room_type: str,
@@ -52,14 +128,17 @@ async def generate_render_wrapper(
     """
     Generate a photorealistic interior design rendering.
     Supports both creation (T2I) and modification (I2I) modes.
+    The result carries per-step timings (ms) of the render path.
     """
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
     try:
         negative_prompt = "low quality, blurry, distorted, cartoon"
         
         # MODE: MODIFICATION (I2I)
         if mode == "modification" and source_image_url:
             # Download source image (Smart Download)
-            source_bytes, source_mime_type = await download_image_smart(source_image_url)
+            source_bytes, source_mime_type = await _timed(timings, "download", download_image_smart(source_image_url))
             
             # VALIDATION: Check if we got an actual image (not error XML/HTML)
             if not source_mime_type.startswith("image/"):
@@ -69,45 +148,19 @@ async def generate_render_wrapper(
             
             logger.info(f"[Render] ✅ Image downloaded: {len(source_bytes)} bytes, MIME: {source_mime_type}")
             
-            # Analyze source image (optional, for context)
-            try:
-                analysis = await analyze_image_triage(source_bytes)
-                if analysis.get("success"):
-                    room_type = analysis.get("roomType", room_type)
-            except:
-                pass  # Continue without analysis
-            
-            # 🎨 USE ARCHITECT FOR ENHANCED PROMPT GENERATION
-            try:
-                from src.vision.architect import generate_architectural_prompt
-                
-                arch_output = await generate_architectural_prompt(
-                    image_bytes=source_bytes,
-                    target_style=style,
-                    keep_elements=keep_elements or [],
-                    mime_type=source_mime_type,
-                    user_instructions=prompt
-                )
-                
-                # Combine structured fields into final prompt
-                full_prompt = f"{arch_output.structural_skeleton} {arch_output.material_plan} {arch_output.furnishing_strategy} {arch_output.technical_notes}"
-                
-                # ✍️ DEBUG LOG: Log full prompt for verification
-                logger.info(f"[Render] 📝 FULL PROMPT (I2I):\n{'-'*40}\n{full_prompt}\n{'-'*40}")
-                
-            except Exception as arch_error:
-                # Fallback to simple prompt if Architect fails
-                logger.warning(f"[Render] Architect failed, using fallback: {arch_error}")
-                full_prompt = f"Transform this {room_type} to {style} style. {prompt}"
+            # Triage + Architect (concurrent)
+            full_prompt = await prepare_i2i_render(
+                source_bytes, source_mime_type, prompt, room_type, style, keep_elements or [], timings
+            )
             
             # Generate I2I
-            result = await generate_image_i2i(
+            result = await _timed(timings, "generate", generate_image_i2i(
                 source_image_bytes=source_bytes,
                 prompt=full_prompt,
                 keep_elements=keep_elements or [],
                 negative_prompt=negative_prompt,
                 mime_type=source_mime_type
-            )
+            ))
         
         # MODE: CREATION (T2I)
         else:
@@ -120,20 +173,21 @@ async def generate_render_wrapper(
                 "clean composition, 4K quality."
             )
             
-            result = await generate_image_t2i(
+            result = await _timed(timings, "generate", generate_image_t2i(
                 prompt=full_prompt,
                 negative_prompt=negative_prompt
-            )
+            ))
         
         if not result["success"]:
             return "Failed to generate image. Please try again."
         
-        # Upload to Firebase Storage
-        image_url = upload_base64_image(
+        # Upload to Firebase Storage (blocking SDK: worker thread)
+        image_url = await _timed(timings, "upload", run_blocking(
+            upload_base64_image,
             base64_data=f"data:{result['mime_type']};base64,{result['image_base64']}",
             session_id=session_id,
             prefix="renders"
-        )
+        ))
         
         mode_label = "transformed" if mode == "modification" else "generated"
         
@@ -161,6 +215,10 @@ async def generate_render_wrapper(
         except Exception as file_error:
              logger.warning(f"[Render] Failed to register file metadata: {file_error}")
 
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        metrics.observe(f"render.{mode_label}.total_ms", timings["total_ms"])
+        logger.info(f"[Render] ⏱️ Timings: {timings}")
+        
         # Return structured object for Frontend (ToolStatus.tsx)
         return {
             "imageUrl": image_url,
@@ -168,6 +226,7 @@ async def generate_render_wrapper(
             "status": "success",
             "mode": mode_label,
             "sourceImageId": source_image_url, # Using URL as ID mapping for now
+            "timings": timings,
         }
         
     except Exception as e:
@@ -7,9 +7,18 @@ from urllib.parse import unquote
 import firebase_admin
 from firebase_admin import storage
 
+from src.utils.singleflight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
+# Concurrent downloads of the same URL (duplicate tool calls, retried requests) share one transfer
+download_flights = SingleFlight("download")
+
 async def download_image_smart(url: str, timeout: float = 30.0) -> tuple[bytes, str]:
+    """download_image_smart, coalesced per URL with identical downloads already in flight."""
+    return await download_flights.do(url, _download_image_smart, url, timeout)
+
+async def _download_image_smart(url: str, timeout: float = 30.0) -> tuple[bytes, str]:
     """
     Download image from URL using the most robust method available.
     
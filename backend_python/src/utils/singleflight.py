@@ -0,0 +1,93 @@
+"""
+Request Coalescing (singleflight)
+
+Concurrent calls with the same key share one in-flight execution: the first
+caller (leader) starts it, duplicates await the same future. Nothing is cached
+once the call completes; the next call with that key runs again.
+
+- Keys: content_key() hashes the inputs (media bytes, prompt, model, ...).
+- Cancellation: a cancelled caller only stops waiting; the shared call is
+  cancelled (and forgotten, so later callers start afresh) when its last
+  waiter goes away.
+- The shared call runs in the leader's context (request / usage attribution).
+
+Metrics per flight group: singleflight.<name>.leaders / .collapsed counters and
+the .inflight gauge.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from src.core.metrics import metrics
+from src.utils.async_utils import run_blocking
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+OFFLOAD_HASH_BYTES = 1 << 20  # Hash larger payloads (videos) on a worker thread
+
+
+def content_key(*parts: Any) -> str:
+    """Stable hash of the inputs (bytes as-is, anything else as sorted JSON)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        data = part if isinstance(part, bytes) else json.dumps(part, sort_keys=True, default=str).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+async def acontent_key(*parts: Any) -> str:
+    """content_key() that keeps large payloads off the event loop."""
+    if sum(len(part) for part in parts if isinstance(part, bytes)) > OFFLOAD_HASH_BYTES:
+        return await run_blocking(content_key, *parts)
+    return content_key(*parts)
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapses concurrent duplicate calls (same key) into one execution."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        """Runs `fn(*args, **kwargs)`, or joins the identical call already in flight."""
+        call = self._calls.get(key)
+        if call is None or call.task.get_loop() is not asyncio.get_running_loop():
+            call = _Call(asyncio.ensure_future(fn(*args, **kwargs)))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _, key=key, call=call: self._forget(key, call))
+            metrics.increment(f"singleflight.{self.name}.leaders")
+            metrics.set_gauge(f"singleflight.{self.name}.inflight", len(self._calls))
+        else:
+            metrics.increment(f"singleflight.{self.name}.collapsed")
+            logger.info(f"🪢 [{self.name}] Joined in-flight call ({call.waiters} already waiting)")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()  # Every caller gave up
+                self._forget(key, call)  # Never join a call that is being cancelled
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        metrics.set_gauge(f"singleflight.{self.name}.inflight", len(self._calls))
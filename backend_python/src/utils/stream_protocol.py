@@ -1,35 +1,114 @@
-
 import json
-from typing import AsyncGenerator, Any, Dict, List, Union
+from json.encoder import encode_basestring_ascii
+from typing import AsyncGenerator, Any, Dict, Iterable, List, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # Optional accelerator
+    orjson = None
+
+# Below this length the C string encoder of `json` beats orjson (+ decode)
+ORJSON_MIN_CHARS = 256
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# SYNC ENCODERS (byte-identical to the json.dumps-based frames)
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+def _json_str(value: str) -> str:
+    """json.dumps(value) for a str (ensure_ascii=True)."""
+    # orjson writes non-ASCII and DEL raw: only pure ASCII strings are identical
+    if orjson is not None and len(value) >= ORJSON_MIN_CHARS and value.isascii() and "\x7f" not in value:
+        return orjson.dumps(value).decode()
+    return encode_basestring_ascii(value)
+
+
+def _json_value(value: Any) -> str:
+    if isinstance(value, str):
+        return _json_str(value)
+    return json.dumps(value)
+
+
+def encode_text(text: str) -> str:
+    """Event '0' (text part). Empty text encodes to an empty string."""
+    if not text:
+        return ""
+    return "0:" + _json_str(text) + "\n"
+
+
+def encode_data(data: Any) -> str:
+    """Event '2' (data part): the payload is wrapped in a JSON array."""
+    return "2:[" + _json_value(data) + "]\n"
+
+
+def encode_error(error: str) -> str:
+    """Event '3' (error part)."""
+    return "3:" + _json_value(error) + "\n"
+
+
+def encode_tool_call(tool_call_id: str, tool_name: str, args: Dict[str, Any]) -> str:
+    """Event '9' (tool call part)."""
+    return (
+        '9:{"toolCallId": ' + _json_value(tool_call_id)
+        + ', "toolName": ' + _json_value(tool_name)
+        + ', "args": ' + json.dumps(args) + "}\n"
+    )
+
+
+def encode_tool_result(tool_call_id: str, result: Any) -> str:
+    """Event 'a' (tool result part)."""
+    return 'a:{"toolCallId": ' + _json_value(tool_call_id) + ', "result": ' + _json_value(result) + "}\n"
+
+
+_ENCODERS = {
+    "text": encode_text,
+    "data": encode_data,
+    "error": encode_error,
+    "tool_call": encode_tool_call,
+    "tool_result": encode_tool_result,
+}
+
+
+def encode_batch(events: Iterable[Tuple[str, tuple]]) -> str:
+    """
+    Encodes several events into one buffer.
+    `events` are (kind, args) pairs, kind in text | data | error | tool_call | tool_result.
+    """
+    return "".join([_ENCODERS[kind](*args) for kind, args in events])
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# ASYNC GENERATORS (legacy API)
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 async def stream_text(text: str) -> AsyncGenerator[str, None]:
     """
     Formats text chunks according to the Vercel AI SDK Data Stream Protocol.
     Event '0': Text part.
-    
+
     Format: 0:"<text_chunk>"\n
     """
     if text:
-        yield f'0:{json.dumps(text)}\n'
+        yield encode_text(text)
 
 async def stream_data(data: Union[Dict[str, Any], List[Any], str, int, float, bool]) -> AsyncGenerator[str, None]:
     """
     Formats arbitrary data chunks (tools, metadata) for Vercel AI SDK.
     Event '2': Data part.
-    
+
     Format: 2:[<json_data>]\n
     """
     # Vercel expects a JSON array for the data part
-    yield f'2:{json.dumps([data])}\n'
+    yield encode_data(data)
 
 async def stream_error(error: str) -> AsyncGenerator[str, None]:
     """
     Formats error messages for the client.
     Event '3': Error part.
-    
+
     Format: 3:"<error_message>"\n
     """
-    yield f'3:{json.dumps(error)}\n'
+    yield encode_error(error)
 
 async def stream_tool_call(
     tool_call_id: str,
@@ -39,15 +118,10 @@ async def stream_tool_call(
     """
     Formats tool call events for Vercel AI SDK.
     Event '9': Tool Call part.
-    
+
     Format: 9:{"toolCallId":"...","toolName":"...","args":{...}}\n
     """
-    payload = {
-        "toolCallId": tool_call_id,
-        "toolName": tool_name,
-        "args": args
-    }
-    yield f'9:{json.dumps(payload)}\n'
+    yield encode_tool_call(tool_call_id, tool_name, args)
 
 async def stream_tool_result(
     tool_call_id: str,
@@ -56,11 +130,7 @@ async def stream_tool_result(
     """
     Formats tool result events for Vercel AI SDK.
     Event 'a': Tool Result part.
-    
+
     Format: a:{"toolCallId":"...","result":...}\n
     """
-    payload = {
-        "toolCallId": tool_call_id,
-        "result": result
-    }
-    yield f'a:{json.dumps(payload)}\n'
+    yield encode_tool_result(tool_call_id, result)
@@ -0,0 +1,138 @@
+"""
+Stream Writer
+
+Sits between the orchestrator's frame generator and StreamingResponse:
+1. Heartbeat: emits a `2:[{"type":"heartbeat",...}]` data frame after every
+   `heartbeat_interval` seconds of silence (long renders / video analysis), so
+   proxies and Vercel do not drop an idle connection.
+2. Backpressure: frames go through a bounded queue; when the transport is slow
+   (StreamingResponse blocked in send) the producer waits instead of buffering
+   the whole turn in memory.
+3. Coalescing: frames queued while the previous write was in flight are joined
+   into one write (up to `max_write_bytes`). No delay is added to a lone frame.
+
+Exposes chat.stream.* metrics (frames/s, bytes per turn, writes, heartbeats).
+"""
+import asyncio
+import logging
+import time
+from typing import AsyncGenerator, AsyncIterator, List, Optional
+
+from src.core.metrics import metrics
+from src.utils.stream_protocol import encode_data
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class StreamWriter:
+    """Heartbeat-multiplexing, backpressure-aware frame writer for one turn."""
+
+    def __init__(
+        self,
+        source: AsyncIterator[str],
+        heartbeat_interval: Optional[float] = 10.0,
+        queue_size: int = 64,
+        max_write_bytes: int = 16384,
+        metric_prefix: str = "chat.stream"
+    ):
+        self.source = source
+        self.heartbeat_interval = heartbeat_interval or None
+        self.queue_size = queue_size
+        self.max_write_bytes = max_write_bytes
+        self.metric_prefix = metric_prefix
+        self.frames = 0
+        self.writes = 0
+        self.heartbeats = 0
+        self.bytes = 0
+        self.backpressure_waits = 0
+
+    def __aiter__(self) -> AsyncGenerator[str, None]:
+        return self._run()
+
+    async def _run(self) -> AsyncGenerator[str, None]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        producer = asyncio.create_task(self._pump(queue))
+        started = time.perf_counter()
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    # 💓 Idle connection: keep proxies from timing it out
+                    self.heartbeats += 1
+                    yield self._write([self.heartbeat_frame(time.perf_counter() - started)], count_frames=False)
+                    continue
+
+                batch: List[str] = []
+                size = 0
+                terminal = None
+                while True:
+                    if item is _END or isinstance(item, BaseException):
+                        terminal = item
+                        break
+                    batch.append(item)
+                    size += len(item)
+                    if size >= self.max_write_bytes or queue.empty():
+                        break
+                    item = queue.get_nowait()
+
+                if batch:
+                    yield self._write(batch)
+                if terminal is _END:
+                    return
+                if terminal is not None:
+                    raise terminal
+        finally:
+            if not producer.done():
+                producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+            self._publish(time.perf_counter() - started)
+
+    async def _pump(self, queue: asyncio.Queue) -> None:
+        """Moves frames from the source into the queue (blocking while it is full)."""
+        try:
+            async for frame in self.source:
+                if not frame:
+                    continue
+                if queue.full():
+                    self.backpressure_waits += 1
+                await queue.put(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(e)
+            return
+        finally:
+            aclose = getattr(self.source, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception as e:
+                    logger.debug(f"[StreamWriter] Closing source failed: {e}")
+        await queue.put(_END)
+
+    def _write(self, frames: List[str], count_frames: bool = True) -> str:
+        chunk = frames[0] if len(frames) == 1 else "".join(frames)
+        if count_frames:
+            self.frames += len(frames)
+        self.writes += 1
+        self.bytes += len(chunk.encode("utf-8"))
+        return chunk
+
+    @staticmethod
+    def heartbeat_frame(elapsed_s: float) -> str:
+        """Data part ('2') carrying the turn's elapsed time, ignored by the chat UI."""
+        return encode_data({"type": "heartbeat", "elapsedMs": int(elapsed_s * 1000)})
+
+    def _publish(self, duration_s: float) -> None:
+        prefix = self.metric_prefix
+        metrics.increment(f"{prefix}.frames", self.frames)
+        metrics.increment(f"{prefix}.writes", self.writes)
+        metrics.increment(f"{prefix}.heartbeats", self.heartbeats)
+        metrics.increment(f"{prefix}.backpressure_waits", self.backpressure_waits)
+        metrics.observe(f"{prefix}.bytes_per_turn", self.bytes)
+        metrics.observe(f"{prefix}.frames_per_turn", self.frames)
+        if duration_s > 0:
+            metrics.observe(f"{prefix}.frames_per_s", round(self.frames / duration_s, 2))
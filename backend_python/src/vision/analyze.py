@@ -2,9 +2,8 @@ import os
 import json
 import logging
 from typing import List, Optional, Dict, Any
-from langchain_google_genai import ChatGoogleGenerativeAI
 from pydantic import BaseModel, Field
-from src.core.config import settings
+from src.core.genai_clients import genai_registry
 
 logger = logging.getLogger(__name__)
 
@@ -80,12 +79,8 @@ CRITICAL RULES:
 5. Ensure the JSON is valid and parseable"""
 
     try:
-        # Initialize Gemini LLM
-        llm = ChatGoogleGenerativeAI(
-            model=model_name,
-            google_api_key=settings.api_key,
-            temperature=0.1 # Low temperature for factual analysis
-        )
+        # Shared Gemini LLM (pooled client)
+        llm = genai_registry.chat_model(model_name, temperature=0.1) # Low temperature for factual analysis
         
         # Determine content block based on input type
         multimodal_block = {}
@@ -2,9 +2,9 @@ import os
 import json
 import logging
 from typing import List, Optional
-from langchain_google_genai import ChatGoogleGenerativeAI
 from pydantic import BaseModel
-from src.core.config import settings
+from src.core.genai_clients import genai_registry
+from src.core.usage import usage_accountant
 
 logger = logging.getLogger(__name__)
 
@@ -175,12 +175,8 @@ Respond with ONLY valid JSON. No markdown, no explanations:
 """
     
     try:
-        # Initialize Gemini LLM
-        llm = ChatGoogleGenerativeAI(
-            model=model_name,
-            google_api_key=settings.api_key,
-            temperature=0.4
-        )
+        # Shared Gemini LLM (pooled client)
+        llm = genai_registry.chat_model(model_name, temperature=0.4)
         
         # Convert image to base64
         import base64
@@ -201,6 +197,7 @@ Respond with ONLY valid JSON. No markdown, no explanations:
         
         # Generate response (Async)
         response = await llm.ainvoke([message])
+        usage_accountant.record_message(model_name, response, operation="generate_architectural_prompt")
         raw_output = response.content
         
         if not raw_output:
@@ -4,9 +4,9 @@ import io
 import ezdxf
 from typing import List, Optional, Tuple
 from pydantic import BaseModel, Field
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage
-from src.core.config import settings
+from src.core.genai_clients import genai_registry
+from src.core.usage import usage_accountant
 
 logger = logging.getLogger(__name__)
 
@@ -76,11 +76,7 @@ async def analyze_floorplan_vector(image_bytes: bytes) -> CadVectorData:
     """
 
     try:
-        llm = ChatGoogleGenerativeAI(
-            model=model_name,
-            google_api_key=settings.api_key,
-            temperature=0.1 # Bassissima temperatura per precisione
-        )
+        llm = genai_registry.chat_model(model_name, temperature=0.1) # Bassissima temperatura per precisione
 
         import base64
         base64_image = base64.b64encode(image_bytes).decode('utf-8')
@@ -93,6 +89,7 @@ async def analyze_floorplan_vector(image_bytes: bytes) -> CadVectorData:
         )
 
         response = await llm.ainvoke([message])
+        usage_accountant.record_message(model_name, response, operation="analyze_floorplan_vector")
         raw_output = response.content.replace("```json", "").replace("```", "").strip()
         
         parsed = json.loads(raw_output)
@@ -1,12 +1,17 @@
 import os
+import copy
 import logging
 import base64
 import json
 from typing import Dict, Any
-from google import genai
 from google.genai import types
 from src.utils.json_parser import extract_json_response
 from src.core.config import settings
+from src.core.admission import admission_controller
+from src.core.genai_clients import IMAGE_TOKENS, genai_registry
+from src.core.usage import usage_accountant
+from src.utils.singleflight import SingleFlight, acontent_key
+from src.vision.triage_cache import prompt_version, triage_cache, triage_key
 
 logger = logging.getLogger(__name__)
 
@@ -56,22 +61,43 @@ Provide your analysis:
 ```
 """
 
+TRIAGE_MODEL = "gemini-3-flash-preview"
+
+# Reserved against the TPM bucket: prompt + one image + answer
+TRIAGE_TOKENS = len(TRIAGE_PROMPT) // 4 + IMAGE_TOKENS + 1024
+
+# Cached results are invalidated by any prompt or model change
+TRIAGE_PROMPT_VERSION = prompt_version(TRIAGE_PROMPT, TRIAGE_MODEL)
+
+# Identical triage calls in flight (same media, metadata, prompt, model) share one analysis
+triage_flights = SingleFlight("triage")
+
 async def analyze_image_triage(image_data: bytes) -> Dict[str, Any]:
     """
     Perform initial triage analysis on an interior space image.
     Uses google-genai SDK with Gemini 3 Flash.
+    Successful results are cached by image content (see triage_cache).
     """
     if not GEMINI_API_KEY:
         raise Exception("GEMINI_API_KEY not configured")
     
+    cache_key = None
+    if settings.TRIAGE_CACHE_ENABLED:
+        cache_key = await triage_key(image_data, TRIAGE_PROMPT_VERSION)
+        cached = await triage_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Triage cache hit: {cached.get('roomType', 'unknown')} room")
+            return cached
+    
     try:
-        client = genai.Client(api_key=GEMINI_API_KEY)
+        client = genai_registry.client()
         
         logger.info("Performing triage analysis on image (Gemini 3 Flash)...")
         
-        try:
+        # Admitted per model (rate + concurrency) instead of bursting into 429s
+        async with admission_controller.slot(TRIAGE_MODEL, TRIAGE_TOKENS) as ticket:
             response = await client.aio.models.generate_content(
-                model="gemini-3-flash-preview",
+                model=TRIAGE_MODEL,
                 contents=[
                     types.Content(
                         parts=[
@@ -84,8 +110,8 @@ async def analyze_image_triage(image_data: bytes) -> Dict[str, Any]:
                     tools=[{"code_execution": {}}]
                 )
             )
-        finally:
-             client.close()
+            ticket.settle(response)
+        usage_accountant.record_genai(TRIAGE_MODEL, response, operation="analyze_image_triage")
         
         if not response.text:
             raise Exception("No response from vision model")
@@ -98,7 +124,7 @@ async def analyze_image_triage(image_data: bytes) -> Dict[str, Any]:
         
         logger.info(f"Triage complete: {analysis.get('roomType', 'unknown')} room detected")
         
-        return {
+        result = {
             "success": True,
             "roomType": analysis.get("roomType", "unknown"),
             "currentStyle": analysis.get("currentStyle", "contemporary"),
@@ -106,6 +132,9 @@ async def analyze_image_triage(image_data: bytes) -> Dict[str, Any]:
             "condition": analysis.get("condition", "good"),
             "renovationNotes": analysis.get("renovationNotes", "")
         }
+        if cache_key:
+            await triage_cache.put(cache_key, result)
+        return result
         
     except Exception as e:
         logger.error(f"Triage analysis failed: {str(e)}", exc_info=True)
@@ -143,14 +172,28 @@ async def analyze_media_triage(media_data: bytes, mime_type: str, metadata: Dict
     
     # Route based on MIME type
     if mime_type.startswith("image/"):
-        return await analyze_image_triage(media_data)
+        prompt, analyze = TRIAGE_PROMPT, _triage_image
     
     elif mime_type.startswith("video/"):
         # Import video module only when needed (avoid circular imports)
-        from src.vision.video_triage import analyze_video_triage
-        result = await analyze_video_triage(video_data=media_data, metadata=metadata)
-        # Convert VideoTriageResult to dict for compatibility
-        return result.model_dump()
+        from src.vision.video_triage import VIDEO_TRIAGE_PROMPT
+        prompt, analyze = VIDEO_TRIAGE_PROMPT, _triage_video
     
     else:
         raise ValueError(f"Unsupported media type: {mime_type}. Only image/* and video/* are supported.")
+    
+    # Concurrent duplicates (same tool call twice, retried request) await the same analysis
+    key = await acontent_key(TRIAGE_MODEL, prompt, mime_type, metadata, media_data)
+    result = await triage_flights.do(key, analyze, media_data, metadata)
+    return copy.deepcopy(result)  # Each caller gets its own dict
+
+
+async def _triage_image(media_data: bytes, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+    return await analyze_image_triage(media_data)
+
+
+async def _triage_video(media_data: bytes, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+    from src.vision.video_triage import analyze_video_triage
+    result = await analyze_video_triage(video_data=media_data, metadata=metadata)
+    # Convert VideoTriageResult to dict for compatibility
+    return result.model_dump()
@@ -0,0 +1,195 @@
+"""
+Triage Result Cache
+
+Content-addressed cache of successful image triage results, so the same photo
+(analyze_room, then generate_render in modification mode, then re-renders) is
+analyzed once.
+
+Key: SHA-256 of the image bytes + the prompt version (hash of TRIAGE_PROMPT and
+model): editing the prompt or switching model invalidates every entry.
+
+Tiers:
+- In-process LRU (event-loop confined, like the session context cache).
+- Persistent store, survives restarts: FileTriageStore (one JSON file per key)
+  or FirestoreTriageStore (one document per key), per settings.TRIAGE_CACHE_STORE.
+
+Fallback results ("success": False) are never cached.
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Protocol
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.utils.async_utils import run_blocking
+
+logger = logging.getLogger(__name__)
+
+OFFLOAD_HASH_BYTES = 1 << 20  # Hash larger images on a worker thread
+
+
+def prompt_version(prompt: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()[:12]
+
+
+async def triage_key(image_bytes: bytes, version: str) -> str:
+    """sha256(image)-<prompt version>."""
+    if len(image_bytes) > OFFLOAD_HASH_BYTES:
+        digest = await run_blocking(lambda: hashlib.sha256(image_bytes).hexdigest())
+    else:
+        digest = hashlib.sha256(image_bytes).hexdigest()
+    return f"{digest}-{version}"
+
+
+class TriageStore(Protocol):
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    async def put(self, key: str, result: Dict[str, Any], ttl_s: float) -> None:
+        ...
+
+
+class FileTriageStore:
+    """One JSON file per key; expiry from the recorded timestamp."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            entry = json.loads(self._path(key).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        if entry.get("expires_at", 0) < time.time():
+            self._path(key).unlink(missing_ok=True)
+            return None
+        return entry["result"]
+
+    def _write(self, key: str, result: Dict[str, Any], ttl_s: float) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"result": result, "expires_at": time.time() + ttl_s}), encoding="utf-8")
+        os.replace(tmp, path)  # Atomic: readers never see a partial file
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return await run_blocking(self._read, key)
+
+    async def put(self, key: str, result: Dict[str, Any], ttl_s: float) -> None:
+        await run_blocking(self._write, key, result, ttl_s)
+
+
+class FirestoreTriageStore:
+    """One document per key (`expires_at` can back a Firestore TTL policy)."""
+
+    def __init__(self, db: Any = None, collection: str = "triage_cache"):
+        self._db = db
+        self.collection = collection
+
+    @property
+    def db(self):
+        if self._db is None:
+            from src.db.firebase_client import get_async_firestore_client
+            self._db = get_async_firestore_client()
+        return self._db
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        snapshot = await self.db.collection(self.collection).document(key).get()
+        if not snapshot.exists:
+            return None
+        entry = snapshot.to_dict()
+        if entry.get("expires_at", 0) < time.time():
+            return None
+        return entry["result"]
+
+    async def put(self, key: str, result: Dict[str, Any], ttl_s: float) -> None:
+        await self.db.collection(self.collection).document(key).set({
+            "result": result,
+            "expires_at": time.time() + ttl_s,
+        })
+
+
+class TriageCache:
+    """LRU over an optional persistent store; store failures only cost a miss."""
+
+    def __init__(self, max_entries: int = 512, store: Optional[TriageStore] = None, ttl_s: float = 30 * 86400):
+        self.max_entries = max_entries
+        self.store = store
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """A copy of the cached result, or None."""
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+            metrics.increment("triage_cache.hits.memory")
+            return copy.deepcopy(result)
+
+        if self.store is not None:
+            try:
+                result = await self.store.get(key)
+            except Exception as e:
+                metrics.increment("triage_cache.store_errors")
+                logger.warning(f"⚠️ Triage cache store read failed: {e}")
+            if result is not None:
+                self._remember(key, result)
+                metrics.increment("triage_cache.hits.store")
+                return copy.deepcopy(result)
+
+        metrics.increment("triage_cache.misses")
+        return None
+
+    async def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Caches a successful result (fallbacks are skipped)."""
+        if result.get("success") is not True:
+            metrics.increment("triage_cache.skipped_failures")
+            return
+        result = copy.deepcopy(result)
+        self._remember(key, result)
+        if self.store is not None:
+            try:
+                await self.store.put(key, result, self.ttl_s)
+            except Exception as e:
+                metrics.increment("triage_cache.store_errors")
+                logger.warning(f"⚠️ Triage cache store write failed: {e}")
+
+    def _remember(self, key: str, result: Dict[str, Any]) -> None:
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        metrics.set_gauge("triage_cache.entries", len(self._entries))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        metrics.set_gauge("triage_cache.entries", 0)
+
+
+def build_triage_store(store: Optional[str] = None) -> Optional[TriageStore]:
+    """Persistent tier for settings.TRIAGE_CACHE_STORE ("none" | "file" | "firestore")."""
+    store = (store or settings.TRIAGE_CACHE_STORE).lower()
+    if store == "file":
+        return FileTriageStore(settings.TRIAGE_CACHE_DIR)
+    if store == "firestore":
+        return FirestoreTriageStore()
+    if store != "none":
+        logger.warning(f"⚠️ Unknown triage cache store '{store}'. In-process cache only.")
+    return None
+
+
+# Singleton instance (shared by every triage call of the worker)
+triage_cache = TriageCache(
+    max_entries=settings.TRIAGE_CACHE_MAX_ENTRIES,
+    store=build_triage_store(),
+    ttl_s=settings.TRIAGE_CACHE_TTL_S,
+)
@@ -12,11 +12,13 @@ import asyncio
 import subprocess
 from pathlib import Path
 from typing import Dict, Any, Optional
-from google import genai
 from google.genai import types
 from src.models.video_types import VideoMetadata, VideoTriageResult
 from src.utils.json_parser import extract_json_response
 from src.core.config import settings
+from src.core.admission import admission_controller
+from src.core.genai_clients import genai_registry
+from src.core.usage import usage_accountant
 
 logger = logging.getLogger(__name__)
 
@@ -211,6 +213,9 @@ def optimize_video(input_path: str, max_duration: float = 30.0, trim_start: Opti
         raise
 
 
+# Reserved against the TPM bucket: prompt + up to 30s of video (~300 tokens/s) + answer
+VIDEO_TRIAGE_TOKENS = len(VIDEO_TRIAGE_PROMPT) // 4 + 300 * 30 + 1024
+
 async def analyze_video_with_gemini(video_path: str) -> Dict[str, Any]:
     """
     Analyze video using Gemini 3 Flash multimodal capabilities.
@@ -226,7 +231,7 @@ async def analyze_video_with_gemini(video_path: str) -> Dict[str, Any]:
     if not GEMINI_API_KEY:
         raise Exception("GEMINI_API_KEY not configured")
     
-    client = genai.Client(api_key=GEMINI_API_KEY)
+    client = genai_registry.client()
     
     try:
         logger.info("Uploading video to Gemini File API...")
@@ -250,29 +255,32 @@ async def analyze_video_with_gemini(video_path: str) -> Dict[str, Any]:
         logger.info("Video ready. Performing multimodal analysis (visual + audio)...")
         
         # Generate content using video + prompt
-        response = await client.aio.models.generate_content(
-            model="gemini-3-flash-preview",
-            contents=[
-                types.Content(
-                    parts=[
-                        types.Part(text=VIDEO_TRIAGE_PROMPT),
-                        types.Part(file_data=types.FileData(
-                            file_uri=video_file.uri,
-                            mime_type=video_file.mime_type
-                        ))
-                    ]
+        async with admission_controller.slot("gemini-3-flash-preview", VIDEO_TRIAGE_TOKENS) as ticket:
+            response = await client.aio.models.generate_content(
+                model="gemini-3-flash-preview",
+                contents=[
+                    types.Content(
+                        parts=[
+                            types.Part(text=VIDEO_TRIAGE_PROMPT),
+                            types.Part(file_data=types.FileData(
+                                file_uri=video_file.uri,
+                                mime_type=video_file.mime_type
+                            ))
+                        ]
+                    )
+                ],
+                config=types.GenerateContentConfig(
+                    tools=[{"code_execution": {}}]
                 )
-            ],
-            config=types.GenerateContentConfig(
-                tools=[{"code_execution": {}}]
             )
-        )
+            ticket.settle(response)
         
         # Clean up uploaded file
         try:
             await client.aio.files.delete(name=video_file.name)
         except Exception:
             pass  # Non-critical
+        usage_accountant.record_genai("gemini-3-flash-preview", response, operation="analyze_video_triage")
         
         if not response.text:
             raise Exception("No response from Gemini vision model")
@@ -307,8 +315,6 @@ async def analyze_video_with_gemini(video_path: str) -> Dict[str, Any]:
             "renovationNotes": f"Unable to perform detailed video analysis: {str(e)}",
             "audioTranscript": None
         }
-    finally:
-        client.close()
 
 
 async def analyze_video_triage(video_data: bytes, metadata: Optional[Dict[str, Any]] = None) -> VideoTriageResult:
@@ -0,0 +1,93 @@
+"""
+Fake Gemini Server
+==================
+Local stand-in for the Generative Language REST API (generateContent /
+streamGenerateContent), used to exercise admission control without quota.
+
+It serves at most `capacity` concurrent requests and answers 429
+RESOURCE_EXHAUSTED beyond that, after `latency_s` of simulated work.
+Point a client at it with HttpOptions(base_url=server.url) (google-genai) or
+base_url=server.url (ChatGoogleGenerativeAI).
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # Bursts must reach the handler, not the listen backlog
+
+
+class FakeGeminiServer:
+    def __init__(self, capacity: int = 4, latency_s: float = 0.05):
+        self.capacity = capacity
+        self.latency_s = latency_s
+        self.ok = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "FakeGeminiServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _admit(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.throttled += 1
+                return False
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return True
+
+    def _done(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.ok += 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: dict, stream: bool = False) -> None:
+                payload = json.dumps(body)
+                data = (f"data: {payload}\r\n\r\n" if stream else payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "text/event-stream" if stream else "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if not server._admit():
+                    self._send(429, {"error": {"code": 429, "message": "Resource has been exhausted", "status": "RESOURCE_EXHAUSTED"}})
+                    return
+                try:
+                    time.sleep(server.latency_s)
+                finally:
+                    server._done()
+                self._send(200, {
+                    "candidates": [{"content": {"role": "model", "parts": [{"text": "ok"}]}, "finishReason": "STOP"}],
+                    "usageMetadata": {"promptTokenCount": 12, "candidatesTokenCount": 1, "totalTokenCount": 13},
+                    "modelVersion": self.path.split("/models/")[-1].split(":")[0],
+                }, stream="streamGenerateContent" in self.path)
+
+        return Handler
@@ -5,6 +5,7 @@ End-to-end tests for the generate_render tool (T2I and I2I modes).
 """
 import pytest
 from unittest.mock import patch, AsyncMock, MagicMock
+from src.core.metrics import metrics
 from src.tools.generate_render import generate_render_wrapper
 
 
@@ -177,3 +178,53 @@ class TestRenderGeneration:
         mock_i2i.assert_called_once()
         call_kwargs = mock_i2i.call_args.kwargs
         assert "Transform this kitchen to Modern style" in call_kwargs["prompt"]
+
+    @pytest.mark.asyncio
+    async def test_i2i_preparation_runs_triage_and_architect_concurrently(
+        self,
+        mock_env_development,
+        sample_image_bytes,
+        mock_gemini_imagen_response
+    ):
+        """GIVEN triage and Architect that each take 100ms (Architect then fails)
+        WHEN generate_render_wrapper runs in modification mode
+        THEN both run concurrently, the fallback prompt uses the triaged room type
+        and the result reports per-step timings
+        """
+        import asyncio
+        metrics.reset()
+
+        async def slow_triage(image_bytes):
+            await asyncio.sleep(0.1)
+            return {"success": True, "roomType": "bathroom"}
+
+        async def slow_architect(**kwargs):
+            await asyncio.sleep(0.1)
+            raise Exception("Vision API error")
+
+        with patch('src.tools.generate_render.download_image_smart', new_callable=AsyncMock) as mock_download, \
+                patch('src.tools.generate_render.analyze_image_triage', side_effect=slow_triage), \
+                patch('src.vision.architect.generate_architectural_prompt', side_effect=slow_architect), \
+                patch('src.tools.generate_render.generate_image_i2i', new_callable=AsyncMock) as mock_i2i, \
+                patch('src.tools.generate_render.upload_base64_image') as mock_upload:
+            mock_download.return_value = (sample_image_bytes, "image/jpeg")
+            mock_i2i.return_value = mock_gemini_imagen_response
+            mock_upload.return_value = "https://storage.googleapis.com/test/renders/image.jpg"
+
+            result = await generate_render_wrapper(
+                prompt="Modern style",
+                room_type="kitchen",
+                style="Modern",
+                session_id="test-session",
+                mode="modification",
+                source_image_url="https://example.com/source.jpg"
+            )
+
+        timings = result["timings"]
+        assert result["status"] == "success"
+        assert "Transform this bathroom to Modern style" in mock_i2i.call_args.kwargs["prompt"]
+        assert {"download_ms", "triage_ms", "architect_ms", "prepare_ms", "generate_ms", "upload_ms", "total_ms"} <= set(timings)
+        assert timings["triage_ms"] >= 100 and timings["architect_ms"] >= 100
+        assert timings["prepare_ms"] < timings["triage_ms"] + timings["architect_ms"]
+        assert metrics.snapshot()["summaries"]["render.upload_ms"]["count"] == 1
+        metrics.reset()
@@ -0,0 +1,191 @@
+"""
+Unit Tests - Model Admission Control
+====================================
+Tests for token buckets, AIMD concurrency and the deadline queue, against the
+local fake Gemini server.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+from google import genai
+from google.genai import types
+from langchain_core.messages import HumanMessage
+
+from src.core.admission import AdmissionController, AdmissionTimeout, AIMDLimit, TokenBucket, is_overload
+from src.core.genai_clients import GenAIClientRegistry
+from src.core.metrics import metrics
+from tests.fake_gemini_server import FakeGeminiServer
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class TestLimits:
+    """Test the bucket and AIMD primitives."""
+
+    def test_token_bucket_waits_for_refill(self):
+        bucket = TokenBucket(rate_per_s=10, capacity=10)
+        now = time.monotonic()
+
+        assert bucket.wait_for(10, now) == 0
+        bucket.take(10)
+        assert bucket.wait_for(5, now) == pytest.approx(0.5)
+        bucket.adjust(-5)  # Call used less than reserved
+        assert bucket.wait_for(5, now) == 0
+
+    def test_aimd_halves_once_per_window(self):
+        """GIVEN several in-flight calls started before an overload
+        WHEN all of them are throttled
+        THEN the limit is halved once, then grows back additively
+        """
+        limit = AIMDLimit(initial=8, maximum=8)
+        started = time.monotonic()
+
+        assert limit.on_overload(started) is True
+        assert limit.on_overload(started) is False
+        assert limit.value == 4
+
+        limit.on_success(0.1)
+        assert limit.value == pytest.approx(4.25)
+
+    def test_latency_over_target_shrinks_limit(self):
+        limit = AIMDLimit(initial=10, maximum=10, latency_target_s=1.0)
+
+        limit.on_success(5.0)
+
+        assert limit.value == pytest.approx(9.0)
+
+    def test_overload_detection_follows_wrapped_errors(self):
+        try:
+            try:
+                raise genai.errors.ClientError(429, {"error": {"status": "RESOURCE_EXHAUSTED"}})
+            except Exception as e:
+                raise RuntimeError("chat model failed") from e
+        except RuntimeError as wrapped:
+            assert is_overload(wrapped)
+        assert not is_overload(ValueError("bad json"))
+
+
+class TestAdmissionQueue:
+    """Test concurrency, deadlines and exported queue metrics."""
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_capped(self):
+        controller = AdmissionController(limits={"m": {"max_concurrency": 2}})
+        running, peak = 0, 0
+
+        async def call():
+            nonlocal running, peak
+            async with controller.slot("m"):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(call() for _ in range(10)))
+
+        assert peak == 2
+        assert metrics.get_counter("admission.m.admitted") == 10
+        assert metrics.snapshot()["summaries"]["admission.m.wait_ms"]["count"] == 10
+        assert metrics.get_gauge("admission.m.queue_depth") == 0
+
+    @pytest.mark.asyncio
+    async def test_deadline_rejects_and_leaves_queue(self):
+        """GIVEN the only slot is taken
+        WHEN another call waits longer than its deadline
+        THEN it fails with AdmissionTimeout and the queue is empty again
+        """
+        controller = AdmissionController(limits={"m": {"max_concurrency": 1}})
+
+        async with controller.slot("m"):
+            with pytest.raises(AdmissionTimeout):
+                async with controller.slot("m", deadline_s=0.05):
+                    pass
+
+        assert metrics.get_counter("admission.m.timeouts") == 1
+        assert controller.snapshot()["m"]["queue_depth"] == 0
+
+    @pytest.mark.asyncio
+    async def test_rpm_bucket_paces_calls(self):
+        controller = AdmissionController(limits={"m": {"rpm": 600}})  # 10/s, burst of 10
+        start = time.monotonic()
+
+        for _ in range(13):
+            async with controller.slot("m"):
+                pass
+
+        assert time.monotonic() - start >= 0.25
+
+    def test_sync_slots_share_the_limit_across_threads(self):
+        controller = AdmissionController(limits={"m": {"max_concurrency": 2}})
+        running, peak, lock = 0, 0, threading.Lock()
+
+        def call():
+            nonlocal running, peak
+            with controller.slot_sync("m"):
+                with lock:
+                    running += 1
+                    peak = max(peak, running)
+                time.sleep(0.01)
+                with lock:
+                    running -= 1
+
+        threads = [threading.Thread(target=call) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert peak == 2
+
+
+class TestFakeServer:
+    """Test admission end to end against the fake Gemini server."""
+
+    @pytest.mark.asyncio
+    async def test_admitted_chat_model_avoids_429s(self):
+        """GIVEN a server that throttles above 4 concurrent requests
+        WHEN a burst of 12 chat calls goes through a gate of 4
+        THEN every call succeeds and the server never sees more than 4
+        """
+        controller = AdmissionController(limits={"gemini-3-flash-preview": {"max_concurrency": 4}})
+        registry = GenAIClientRegistry(api_key="test-key", admission=controller)
+
+        with FakeGeminiServer(capacity=4) as server:
+            llm = registry.chat_model("gemini-3-flash-preview", base_url=server.url, max_retries=0)
+            responses = await asyncio.gather(*(llm.ainvoke([HumanMessage(content="hi")]) for _ in range(12)))
+
+        assert [r.text for r in responses] == ["ok"] * 12
+        assert server.throttled == 0 and server.max_in_flight <= 4
+
+    @pytest.mark.asyncio
+    async def test_429s_shrink_the_concurrency_limit(self):
+        """GIVEN a gate of 8 in front of a server that serves 2 at a time
+        WHEN bursts of raw google-genai calls are throttled
+        THEN the limit backs off and overloads are counted
+        """
+        model = "gemini-3-flash-preview"
+        controller = AdmissionController(limits={model: {"max_concurrency": 8}})
+
+        with FakeGeminiServer(capacity=2) as server:
+            client = genai.Client(api_key="test-key", http_options=types.HttpOptions(
+                base_url=server.url, retry_options=types.HttpRetryOptions(attempts=1),
+            ))
+
+            async def call():
+                async with controller.slot(model, 100) as ticket:
+                    ticket.settle(await client.aio.models.generate_content(model=model, contents="hi"))
+
+            for _ in range(3):
+                await asyncio.gather(*(call() for _ in range(8)), return_exceptions=True)
+            await client.aio.aclose()
+
+        assert server.throttled > 0
+        assert metrics.get_counter(f"admission.{model}.overloads") > 0
+        assert controller.snapshot()[model]["limit"] < 8
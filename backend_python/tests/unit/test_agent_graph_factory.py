@@ -0,0 +1,539 @@
+"""
+Unit Tests - Agent Graph Factory
+=================================
+Tests for the LangGraph agent topology built by AgentGraphFactory.
+"""
+import pytest
+from typing import Any, List, Optional
+from pydantic import Field
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from src.graph.context_builder import ContextBuilder
+from src.graph.factory import AgentGraphFactory
+from src.models.reasoning import ReasoningStep
+from src.services.prompt_cache import LocalPromptCacheBackend, PromptCache
+
+
+class FakeChatModel(BaseChatModel):
+    """Scripted chat model recording every call (sync vs async, bound tools)."""
+
+    responses: List[AIMessage] = Field(default_factory=list)
+    plan: Optional[ReasoningStep] = None
+    calls: List[dict] = Field(default_factory=list)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _next_response(self, kind: str, messages, kwargs: dict) -> ChatResult:
+        tools = kwargs.get("tools") or []
+        self.calls.append({
+            "kind": kind,
+            "messages": messages,
+            "tools": sorted(t.name for t in tools),
+            "tool_choice": kwargs.get("tool_choice"),
+        })
+        message = self.responses.pop(0) if self.responses else AIMessage(content="ok")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return self._next_response("sync", messages, kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return self._next_response("async", messages, kwargs)
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.bind(tools=list(tools), tool_choice=tool_choice, **kwargs)
+
+    def with_structured_output(self, schema, **kwargs):
+        cached_content = getattr(self, "cached_content", None)
+
+        def _plan(messages):
+            self.calls.append({"kind": "plan-sync", "messages": messages, "cached_content": cached_content})
+            return self.plan
+
+        async def _aplan(messages):
+            self.calls.append({"kind": "plan-async", "messages": messages, "cached_content": cached_content})
+            return self.plan
+
+        return RunnableLambda(_plan, afunc=_aplan)
+
+
+def ask_user_plan() -> ReasoningStep:
+    return ReasoningStep(analysis="User wants advice", action="ask_user", confidence_score=0.9)
+
+
+def long_message() -> HumanMessage:
+    return HumanMessage(content="Vorrei ristrutturare completamente la cucina di casa mia")
+
+
+def initial_state(message) -> dict:
+    return {"messages": [message], "session_id": "s-1", "user_id": "u-1"}
+
+
+class TestNodeVariants:
+    """Test sync vs async node variants."""
+
+    @pytest.mark.asyncio
+    async def test_async_nodes_never_use_blocking_invoke(self):
+        """GIVEN use_async_nodes=True
+        WHEN a reasoning + execution turn runs
+        THEN both model calls go through the async path
+        """
+        llm = FakeChatModel(responses=[AIMessage(content="Certo!")])
+        reasoning_llm = FakeChatModel(plan=ask_user_plan())
+        graph = AgentGraphFactory(llm, reasoning_llm, tools=[], use_async_nodes=True).create_graph()
+
+        result = await graph.ainvoke(initial_state(long_message()))
+
+        assert result["messages"][-1].content == "Certo!"
+        assert [c["kind"] for c in reasoning_llm.calls] == ["plan-async"]
+        assert [c["kind"] for c in llm.calls] == ["async"]
+
+    @pytest.mark.asyncio
+    async def test_sync_nodes_remain_available(self):
+        """GIVEN use_async_nodes=False
+        WHEN a reasoning + execution turn runs
+        THEN the legacy blocking variants are used with identical output
+        """
+        llm = FakeChatModel(responses=[AIMessage(content="Certo!")])
+        reasoning_llm = FakeChatModel(plan=ask_user_plan())
+        graph = AgentGraphFactory(llm, reasoning_llm, tools=[], use_async_nodes=False).create_graph()
+
+        result = await graph.ainvoke(initial_state(long_message()))
+
+        assert result["messages"][-1].content == "Certo!"
+        assert [c["kind"] for c in reasoning_llm.calls] == ["plan-sync"]
+        assert [c["kind"] for c in llm.calls] == ["sync"]
+
+    @pytest.mark.asyncio
+    async def test_reasoning_failure_terminates(self):
+        """GIVEN the reasoning model raises
+        WHEN the graph runs
+        THEN the plan is 'terminate' and execution is skipped
+        """
+        llm = FakeChatModel()
+        reasoning_llm = FakeChatModel(plan=None)  # .model_dump() on None raises inside the node
+        graph = AgentGraphFactory(llm, reasoning_llm, tools=[]).create_graph()
+
+        result = await graph.ainvoke(initial_state(long_message()))
+
+        assert result["internal_plan"][-1]["action"] == "terminate"
+        assert llm.calls == []
+
+
+class TestToolBindingCache:
+    """Test the tool-bound model cache."""
+
+    def make_tools(self):
+        from langchain_core.tools import tool
+
+        @tool
+        def analyze_room(image_url: str) -> str:
+            """Analyze a room photo."""
+            return "ok"
+
+        @tool
+        def generate_render(prompt: str) -> str:
+            """Generate a render."""
+            return "ok"
+
+        return analyze_room, generate_render
+
+    def test_same_tool_set_reuses_binding(self):
+        """GIVEN the same tool set requested twice (in any order)
+        WHEN the execution model is bound
+        THEN the second lookup hits the cache and returns the same runnable
+        """
+        analyze_room, generate_render = self.make_tools()
+        factory = AgentGraphFactory(FakeChatModel(), FakeChatModel(), tools=[])
+
+        first = factory._bind_tools_cached([analyze_room, generate_render])
+        second = factory._bind_tools_cached([generate_render, analyze_room])
+
+        assert first is second
+        assert factory.tool_binding_cache_stats()["hits"] == 1
+        assert factory.tool_binding_cache_stats()["misses"] == 1
+
+    def test_tool_choice_is_part_of_the_key(self):
+        """GIVEN a forced tool call and a free choice over the same tool
+        WHEN both are bound
+        THEN they are cached as distinct entries
+        """
+        analyze_room, _ = self.make_tools()
+        factory = AgentGraphFactory(FakeChatModel(), FakeChatModel(), tools=[])
+
+        free = factory._bind_tools_cached([analyze_room])
+        forced = factory._bind_tools_cached([analyze_room], tool_choice="analyze_room")
+
+        assert free is not forced
+        assert factory.tool_binding_cache_stats()["size"] == 2
+
+    def test_cache_is_bounded_lru(self):
+        """GIVEN a cache of size 1
+        WHEN two tool sets alternate
+        THEN the oldest binding is evicted
+        """
+        analyze_room, generate_render = self.make_tools()
+        factory = AgentGraphFactory(FakeChatModel(), FakeChatModel(), tools=[], tool_binding_cache_size=1)
+
+        factory._bind_tools_cached([analyze_room])
+        factory._bind_tools_cached([generate_render])
+        factory._bind_tools_cached([analyze_room])
+
+        stats = factory.tool_binding_cache_stats()
+        assert stats["size"] == 1
+        assert stats["misses"] == 3
+
+    @pytest.mark.asyncio
+    async def test_repeated_turns_hit_the_cache(self):
+        """GIVEN two conversational turns
+        WHEN the execution node binds the SOP tool set
+        THEN only the first turn builds the binding
+        """
+        llm = FakeChatModel(responses=[AIMessage(content="Uno"), AIMessage(content="Due")])
+        reasoning_llm = FakeChatModel(plan=ask_user_plan())
+        factory = AgentGraphFactory(llm, reasoning_llm, tools=[])
+        graph = factory.create_graph()
+
+        await graph.ainvoke(initial_state(long_message()))
+        await graph.ainvoke(initial_state(long_message()))
+
+        stats = factory.tool_binding_cache_stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+
+    def test_cached_reasoning_models_are_thread_safe_lru(self):
+        """GIVEN sync nodes resolving cached-content handles on worker threads
+        WHEN many threads ask for rotating handles
+        THEN each handle maps to one model and only the most recent handles are kept
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from src.graph.factory import CACHED_REASONING_MODELS_MAX
+
+        factory = AgentGraphFactory(FakeChatModel(), FakeChatModel(), tools=[])
+        handles = [f"cachedContents/{i}" for i in range(CACHED_REASONING_MODELS_MAX + 2)]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(factory._cached_reasoning_model, handles * 20))
+        latest = factory._cached_reasoning_model(handles[-1])
+
+        assert latest is factory._cached_reasoning_model(handles[-1])
+        assert len(factory._cached_reasoning_models) == CACHED_REASONING_MODELS_MAX
+        assert handles[-1] in factory._cached_reasoning_models
+
+
+class TestFastPlanMode:
+    """Test the single-pass 'fast' topology."""
+
+    @pytest.mark.asyncio
+    async def test_conversational_turn_is_one_llm_call(self):
+        """GIVEN mode='fast'
+        WHEN a non-greeting conversational turn runs
+        THEN a single tool-calling call answers and records an ask_user plan
+        """
+        llm = FakeChatModel(responses=[AIMessage(content="Certo!")])
+        reasoning_llm = FakeChatModel(plan=ask_user_plan())
+        graph = AgentGraphFactory(llm, reasoning_llm, tools=[]).create_graph(mode="fast")
+
+        result = await graph.ainvoke(initial_state(long_message()))
+
+        assert result["messages"][-1].content == "Certo!"
+        assert result["internal_plan"][-1]["action"] == "ask_user"
+        assert reasoning_llm.calls == []
+        assert len(llm.calls) == 1
+        assert "generate_render" in llm.calls[0]["tools"]
+
+    @pytest.mark.asyncio
+    async def test_tool_turn_loops_back_to_execution(self):
+        """GIVEN the model calls a tool in fast mode
+        WHEN the tool returns
+        THEN execution runs again without a reasoning round trip
+        """
+        from langchain_core.tools import tool
+
+        @tool
+        def analyze_room(image_url: str) -> str:
+            """Analyze a room photo."""
+            return '{"roomType": "kitchen"}'
+
+        tool_call = {"id": "call-1", "name": "analyze_room", "args": {"image_url": "https://x/y.jpg"}}
+        llm = FakeChatModel(responses=[
+            AIMessage(content="", tool_calls=[tool_call]),
+            AIMessage(content="È una cucina."),
+        ])
+        reasoning_llm = FakeChatModel(plan=ask_user_plan())
+        graph = AgentGraphFactory(llm, reasoning_llm, tools=[analyze_room]).create_graph(mode="fast")
+
+        result = await graph.ainvoke(initial_state(long_message()))
+
+        assert result["messages"][-1].content == "È una cucina."
+        assert result["messages"][-2].content == '{"roomType": "kitchen"}'
+        assert result["internal_plan"][-1]["action"] == "ask_user"
+        assert reasoning_llm.calls == []
+        assert len(llm.calls) == 2
+
+    def test_tool_call_response_becomes_call_tool_plan(self):
+        """GIVEN a fast-mode response with a tool call
+        WHEN the plan is derived
+        THEN it carries the tool name and arguments
+        """
+        factory = AgentGraphFactory(FakeChatModel(), FakeChatModel(), tools=[])
+        response = AIMessage(content="", tool_calls=[
+            {"id": "call-1", "name": "analyze_room", "args": {"image_url": "https://x/y.jpg"}}
+        ])
+
+        plan = factory._fast_plan_update(response)["internal_plan"][-1]
+
+        assert plan["action"] == "call_tool"
+        assert plan["tool_name"] == "analyze_room"
+        assert plan["tool_args"] == {"image_url": "https://x/y.jpg"}
+
+    @pytest.mark.asyncio
+    async def test_unknown_mode_falls_back_to_two_tier(self):
+        """GIVEN an unknown mode
+        WHEN the graph is built
+        THEN the two-tier topology is used
+        """
+        llm = FakeChatModel(responses=[AIMessage(content="Certo!")])
+        reasoning_llm = FakeChatModel(plan=ask_user_plan())
+        graph = AgentGraphFactory(llm, reasoning_llm, tools=[]).create_graph(mode="turbo")
+
+        await graph.ainvoke(initial_state(long_message()))
+
+        assert [c["kind"] for c in reasoning_llm.calls] == ["plan-async"]
+
+
+class TestSpeculativeExecution:
+    """Test speculative conversational execution during reasoning."""
+
+    @pytest.fixture(autouse=True)
+    def clean_metrics(self):
+        from src.core.metrics import metrics
+        metrics.reset()
+        yield metrics
+
+    @pytest.mark.asyncio
+    async def test_ask_user_commits_speculative_reply(self, clean_metrics):
+        """GIVEN speculation enabled and a plan that says ask_user
+        WHEN the turn runs
+        THEN the speculative reply is returned and no second execution call is made
+        """
+        llm = FakeChatModel(responses=[AIMessage(content="Certo!")])
+        reasoning_llm = FakeChatModel(plan=ask_user_plan())
+        graph = AgentGraphFactory(llm, reasoning_llm, tools=[], speculative_execution=True).create_graph()
+
+        result = await graph.ainvoke(initial_state(long_message()))
+
+        assert result["messages"][-1].content == "Certo!"
+        assert result["speculative_message"] is None
+        assert len(llm.calls) == 1
+        snapshot = clean_metrics.snapshot()
+        assert snapshot["counters"]["agent.speculation.committed"] == 1
+        assert snapshot["summaries"]["agent.speculation.latency_saved_ms"]["count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_other_plans_cancel_and_count_waste(self, clean_metrics):
+        """GIVEN speculation enabled and a plan that terminates
+        WHEN the turn runs
+        THEN the speculative reply is discarded and its tokens counted as wasted
+        """
+        llm = FakeChatModel(responses=[AIMessage(content="Non dovrebbe apparire")])
+        reasoning_llm = FakeChatModel(
+            plan=ReasoningStep(analysis="Stop", action="terminate", confidence_score=1.0)
+        )
+        graph = AgentGraphFactory(llm, reasoning_llm, tools=[], speculative_execution=True).create_graph()
+
+        result = await graph.ainvoke(initial_state(long_message()))
+
+        assert all(m.content != "Non dovrebbe apparire" for m in result["messages"])
+        counters = clean_metrics.snapshot()["counters"]
+        assert counters["agent.speculation.cancelled"] == 1
+        assert counters["agent.speculation.wasted_tokens"] > 0
+        assert "agent.speculation.committed" not in counters
+
+    @pytest.mark.asyncio
+    async def test_disabled_by_default(self, clean_metrics):
+        """GIVEN the default factory
+        WHEN a reasoning turn runs
+        THEN no speculative call is started
+        """
+        llm = FakeChatModel(responses=[AIMessage(content="Certo!")])
+        graph = AgentGraphFactory(llm, FakeChatModel(plan=ask_user_plan()), tools=[]).create_graph()
+
+        await graph.ainvoke(initial_state(long_message()))
+
+        assert "agent.speculation.started" not in clean_metrics.snapshot()["counters"]
+
+
+class TestToolResultMemo:
+    """Test memoized tool execution in the tools node."""
+
+    @pytest.mark.asyncio
+    async def test_repeated_call_is_answered_from_memo(self):
+        """GIVEN the model calls analyze_room twice with the same arguments
+        WHEN the turn runs with a tool memo
+        THEN the tool runs once and the second result is served from the memo
+        """
+        from langchain_core.tools import tool
+        from src.graph.tool_memo import ToolResultMemo
+
+        runs = []
+
+        @tool
+        def analyze_room(image_url: str) -> str:
+            """Analyze a room photo."""
+            runs.append(image_url)
+            return '{"roomType": "kitchen"}'
+
+        args = {"image_url": "https://x/y.jpg"}
+        llm = FakeChatModel(responses=[
+            AIMessage(content="", tool_calls=[{"id": "call-1", "name": "analyze_room", "args": args}]),
+            AIMessage(content="", tool_calls=[{"id": "call-2", "name": "analyze_room", "args": dict(args)}]),
+            AIMessage(content="È una cucina."),
+        ])
+        memo = ToolResultMemo(ttls={"analyze_room": 60})
+        factory = AgentGraphFactory(llm, FakeChatModel(plan=ask_user_plan()), tools=[analyze_room], tool_memo=memo)
+
+        result = await factory.create_graph(mode="fast").ainvoke(initial_state(long_message()))
+
+        assert runs == ["https://x/y.jpg"]
+        tool_results = [m for m in result["messages"] if m.type == "tool"]
+        assert [m.tool_call_id for m in tool_results] == ["call-1", "call-2"]
+        assert tool_results[1].content == '{"roomType": "kitchen"}'
+        assert tool_results[1].additional_kwargs == {"memo_hit": True}
+        assert memo.stats()["hits_by_tool"] == {"analyze_room": 1}
+
+    @pytest.mark.asyncio
+    async def test_memo_is_scoped_to_the_user(self):
+        """GIVEN a file listing memoized for user u-1 in session s-1
+        WHEN another user posts the same session id
+        THEN the tool runs again (with that user's ownership checks)
+        """
+        from langchain_core.tools import tool
+        from src.graph.tool_memo import ToolResultMemo
+
+        callers = []
+
+        @tool
+        def list_project_files(session_id: str) -> str:
+            """List project files."""
+            callers.append(session_id)
+            return "3 files"
+
+        call = {"id": "list", "name": "list_project_files", "args": {"session_id": "s-1"}}
+        llm = FakeChatModel(responses=[
+            AIMessage(content="", tool_calls=[call]), AIMessage(content="Ecco."),
+            AIMessage(content="", tool_calls=[call]), AIMessage(content="Ecco."),
+        ])
+        memo = ToolResultMemo(ttls={"list_project_files": 60})
+        graph = AgentGraphFactory(
+            llm, FakeChatModel(plan=ask_user_plan()), tools=[list_project_files], tool_memo=memo
+        ).create_graph(mode="fast")
+
+        await graph.ainvoke(initial_state(long_message()))
+        await graph.ainvoke({**initial_state(long_message()), "user_id": "u-2"})
+
+        assert len(callers) == 2
+        assert memo.stats()["hits"] == 0
+
+    @pytest.mark.asyncio
+    async def test_render_invalidates_file_listing(self):
+        """GIVEN a memoized file listing
+        WHEN generate_render runs in the same session
+        THEN the next listing call executes the tool again
+        """
+        from langchain_core.tools import tool
+        from src.graph.tool_memo import LISTING_TOOLS, ToolResultMemo
+
+        listings = []
+
+        @tool
+        def list_project_files(session_id: str) -> str:
+            """List project files."""
+            listings.append(session_id)
+            return f"{len(listings)} files"
+
+        @tool
+        def generate_render(prompt: str) -> str:
+            """Generate a render."""
+            return "✅ Render generato"
+
+        list_call = lambda i: {"id": f"list-{i}", "name": "list_project_files", "args": {"session_id": "s-1"}}
+        llm = FakeChatModel(responses=[
+            AIMessage(content="", tool_calls=[list_call(1)]),
+            AIMessage(content="", tool_calls=[{"id": "render", "name": "generate_render", "args": {"prompt": "bagno"}}]),
+            AIMessage(content="", tool_calls=[list_call(2)]),
+            AIMessage(content="Fatto."),
+        ])
+        memo = ToolResultMemo(
+            ttls={"list_project_files": 60},
+            invalidations={"generate_render": LISTING_TOOLS}
+        )
+        factory = AgentGraphFactory(
+            llm, FakeChatModel(plan=ask_user_plan()),
+            tools=[list_project_files, generate_render], tool_memo=memo
+        )
+
+        result = await factory.create_graph(mode="fast").ainvoke(initial_state(long_message()))
+
+        assert len(listings) == 2
+        assert [m.content for m in result["messages"] if m.type == "tool"][-1] == "2 files"
+
+
+class TestPromptPrefixCache:
+    """Test the static/dynamic prompt split and the reasoning cached-content handle."""
+
+    @pytest.mark.asyncio
+    async def test_static_prefix_is_byte_stable_across_turns(self):
+        """GIVEN two turns of different sessions
+        WHEN the execution node builds its prompt
+        THEN the first system message is identical and only the dynamic suffix differs
+        """
+        llm = FakeChatModel()
+        graph = AgentGraphFactory(llm, FakeChatModel(), tools=[]).create_graph(mode="fast")
+
+        await graph.ainvoke(initial_state(long_message()))
+        await graph.ainvoke({**initial_state(HumanMessage(content="E il bagno?")), "session_id": "s-2", "is_authenticated": True})
+
+        first, second = (call["messages"] for call in llm.calls)
+        assert isinstance(first[0], SystemMessage) and first[0].content == second[0].content
+        assert first[0].content == ContextBuilder.static_prefix()
+
+    @pytest.mark.asyncio
+    async def test_reasoning_reads_prefix_from_cached_content(self):
+        """GIVEN a prompt cache with the local backend
+        WHEN two reasoning turns run
+        THEN one handle is created, the reasoning model carries it and no system message is sent
+        """
+        backend = LocalPromptCacheBackend()
+        reasoning_llm = FakeChatModel(plan=ask_user_plan())
+        factory = AgentGraphFactory(
+            FakeChatModel(), reasoning_llm, tools=[], prompt_cache=PromptCache(backend, min_tokens=0)
+        )
+        graph = factory.create_graph()
+
+        await graph.ainvoke(initial_state(long_message()))
+        await graph.ainvoke(initial_state(long_message()))
+
+        plans = [c for c in reasoning_llm.calls if c["kind"] == "plan-async"]
+        handle = next(iter(backend.contents))
+        assert len(backend.contents) == 1
+        assert backend.contents[handle][1] == ContextBuilder.static_prefix()
+        assert [c["cached_content"] for c in plans] == [handle, handle]
+        assert not any(isinstance(m, SystemMessage) for m in plans[0]["messages"])
+        assert plans[0]["messages"][0].content.startswith("[[CONTEXT]]")
+
+    @pytest.mark.asyncio
+    async def test_reasoning_without_cache_sends_the_prefix(self):
+        reasoning_llm = FakeChatModel(plan=ask_user_plan())
+        graph = AgentGraphFactory(FakeChatModel(), reasoning_llm, tools=[]).create_graph()
+
+        await graph.ainvoke(initial_state(long_message()))
+
+        plan_call = reasoning_llm.calls[0]
+        assert plan_call["cached_content"] is None
+        assert plan_call["messages"][0].content == ContextBuilder.static_prefix()
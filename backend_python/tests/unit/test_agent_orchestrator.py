@@ -0,0 +1,550 @@
+"""
+Unit Tests - Agent Orchestrator
+================================
+Tests for the chat streaming pipeline (graph events -> Vercel frames).
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langgraph.graph import END, StateGraph
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.graph.checkpointer import SQLiteCheckpointSaver
+from src.graph.state import AgentState
+from src.repositories.message_buffer import drain_pending_flushes
+from src.services.agent_orchestrator import AgentOrchestrator
+from src.utils.stream_writer import StreamWriter
+
+
+def make_request(content: str = "Ciao, vorrei ristrutturare la cucina"):
+    return SimpleNamespace(
+        messages=[{"role": "user", "content": content}],
+        session_id="session-123",
+        media_urls=None,
+        image_urls=None,
+        media_types=None,
+        media_metadata=None,
+        video_file_uris=None,
+    )
+
+
+def make_repo():
+    repo = MagicMock()
+    repo.load_session = AsyncMock(return_value=None)
+    repo.ensure_session = AsyncMock(return_value=None)
+    repo.get_context = AsyncMock(return_value=[])
+    repo.save_message = AsyncMock(return_value=None)
+    repo.save_messages_batch = AsyncMock(return_value=None)
+    repo.save_file_metadata = AsyncMock(return_value=None)
+    repo.save_session_summary = AsyncMock(return_value=None)
+    return repo
+
+
+class FakeGraph:
+    """Replays a scripted list of (mode, payload) events."""
+
+    def __init__(self, events):
+        self.events = events
+        self.stream_mode = None
+
+    async def astream(self, state, stream_mode=None, **kwargs):
+        self.stream_mode = stream_mode
+        self.state = state
+        for mode, payload in self.events:
+            if stream_mode is None:
+                if mode == "updates":
+                    yield payload
+            else:
+                yield mode, payload
+
+
+async def collect(orchestrator, request):
+    user = SimpleNamespace(uid="user-1")
+    frames = []
+    with patch("src.auth.jwt_handler.verify_token", return_value=user):
+        async for frame in orchestrator.stream_chat(request, credentials=None):
+            frames.append(frame)
+    await drain_pending_flushes()
+    return frames
+
+
+def persisted(repo) -> list:
+    """All messages written by batch flushes, in order."""
+    return [m for call in repo.save_messages_batch.await_args_list for m in call.args[1]]
+
+
+class TestTokenStreaming:
+    """Test token-level streaming from the Execution Node."""
+
+    @pytest.fixture(autouse=True)
+    def token_mode(self):
+        metrics.reset()
+        with patch.object(settings, "CHAT_STREAM_MODE", "tokens"):
+            yield
+
+    @pytest.mark.asyncio
+    async def test_execution_deltas_are_streamed_verbatim(self):
+        """GIVEN the execution node streams token deltas
+        WHEN stream_chat runs
+        THEN each delta is emitted once as a '0:' frame and the full text is persisted
+        """
+        final = AIMessage(content="Ciao! Come posso aiutarti?")
+        graph = FakeGraph([
+            ("messages", (AIMessageChunk(content="Ciao! "), {"langgraph_node": "execution"})),
+            ("messages", (AIMessageChunk(content="Come posso aiutarti?"), {"langgraph_node": "execution"})),
+            ("updates", {"execution": {"messages": [final]}}),
+        ])
+        repo = make_repo()
+
+        with patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph):
+            frames = await collect(AgentOrchestrator(repo), make_request())
+
+        assert graph.stream_mode == ["messages", "updates", "custom"]
+        assert frames == ['0:"..."\n', '0:"Ciao! "\n', '0:"Come posso aiutarti?"\n']
+        assert persisted(repo)[-1]["content"] == "Ciao! Come posso aiutarti?"
+        assert metrics.snapshot()["summaries"]["chat.ttft_ms"]["count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_reasoning_deltas_are_not_streamed(self):
+        """GIVEN the reasoning node emits structured-output chunks
+        WHEN stream_chat runs
+        THEN they never reach the client
+        """
+        graph = FakeGraph([
+            ("messages", (AIMessageChunk(content="internal plan"), {"langgraph_node": "reasoning"})),
+            ("updates", {"reasoning": {"internal_plan": [{"action": "ask_user"}]}}),
+            ("messages", (AIMessageChunk(content="Risposta"), {"langgraph_node": "execution"})),
+            ("updates", {"execution": {"messages": [AIMessage(content="Risposta")]}}),
+        ])
+
+        with patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph):
+            frames = await collect(AgentOrchestrator(make_repo()), make_request())
+
+        assert "internal plan" not in "".join(frames)
+        assert frames[1:] == ['0:"Risposta"\n']
+
+    @pytest.mark.asyncio
+    async def test_tool_call_and_result_framing(self):
+        """GIVEN a tool-calling turn
+        WHEN stream_chat runs
+        THEN '9:' and 'a:' frames are emitted and persisted in order
+        """
+        tool_call = {"id": "call-1", "name": "analyze_room", "args": {"image_url": "https://x/y.jpg"}}
+        graph = FakeGraph([
+            ("updates", {"execution": {"messages": [AIMessage(content="", tool_calls=[tool_call])]}}),
+            ("updates", {"tools": {"messages": [ToolMessage(content='{"roomType": "kitchen"}', tool_call_id="call-1")]}}),
+            ("messages", (AIMessageChunk(content="Cucina!"), {"langgraph_node": "execution"})),
+            ("updates", {"execution": {"messages": [AIMessage(content="Cucina!")]}}),
+        ])
+        repo = make_repo()
+
+        with patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph):
+            frames = await collect(AgentOrchestrator(repo), make_request())
+
+        assert frames[1].startswith('9:{"toolCallId": "call-1", "toolName": "analyze_room"')
+        assert frames[2].startswith('a:{"toolCallId": "call-1"')
+        assert frames[3] == '0:"Cucina!"\n'
+        roles = [m["role"] for m in persisted(repo)]
+        assert roles == ["user", "assistant", "tool", "assistant"]
+
+    @pytest.mark.asyncio
+    async def test_parallel_results_stream_on_completion(self):
+        """GIVEN two parallel tool calls whose results arrive on the custom channel out of order
+        WHEN stream_chat runs
+        THEN results are streamed in completion order, once, and persisted in call order
+        """
+        calls = [
+            {"id": "call-1", "name": "analyze_room", "args": {"image_url": "a.jpg"}},
+            {"id": "call-2", "name": "analyze_room", "args": {"image_url": "b.jpg"}},
+        ]
+        graph = FakeGraph([
+            ("updates", {"execution": {"messages": [AIMessage(content="", tool_calls=calls)]}}),
+            ("custom", {"event": "tool_result", "tool_call_id": "call-2", "name": "analyze_room", "content": "bagno"}),
+            ("custom", {"event": "tool_result", "tool_call_id": "call-1", "name": "analyze_room", "content": "cucina"}),
+            ("updates", {"tools": {"messages": [
+                ToolMessage(content="cucina", tool_call_id="call-1"),
+                ToolMessage(content="bagno", tool_call_id="call-2"),
+            ]}}),
+            ("updates", {"execution": {"messages": [AIMessage(content="Fatto")]}}),
+        ])
+        repo = make_repo()
+
+        with patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph):
+            frames = await collect(AgentOrchestrator(repo), make_request())
+
+        results = [f for f in frames if f.startswith("a:")]
+        assert results == [
+            'a:{"toolCallId": "call-2", "result": "bagno"}\n',
+            'a:{"toolCallId": "call-1", "result": "cucina"}\n',
+        ]
+        tools = [m for m in persisted(repo) if m["role"] == "tool"]
+        assert [m["tool_call_id"] for m in tools] == ["call-1", "call-2"]
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_whole_message_without_deltas(self):
+        """GIVEN the model did not stream any delta
+        WHEN the execution update arrives
+        THEN its text is still streamed
+        """
+        graph = FakeGraph([
+            ("updates", {"execution": {"messages": [AIMessage(content="Salve")]}}),
+        ])
+
+        with patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph):
+            frames = await collect(AgentOrchestrator(make_repo()), make_request())
+
+        assert "".join(frames[1:]) == '0:"Salve"\n'
+
+
+class TestWriteBehindPersistence:
+    """Test per-turn batched message persistence."""
+
+    @pytest.mark.asyncio
+    async def test_turn_is_flushed_in_one_batch(self):
+        """GIVEN a turn with a tool call
+        WHEN the stream completes
+        THEN all messages are batch-written in order and save_message is never awaited
+        """
+        tool_call = {"id": "call-1", "name": "analyze_room", "args": {}}
+        graph = FakeGraph([
+            ("updates", {"execution": {"messages": [AIMessage(content="", tool_calls=[tool_call])]}}),
+            ("updates", {"tools": {"messages": [ToolMessage(content="ok", tool_call_id="call-1")]}}),
+            ("updates", {"execution": {"messages": [AIMessage(content="Fatto")]}}),
+        ])
+        repo = make_repo()
+
+        with patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph):
+            await collect(AgentOrchestrator(repo), make_request())
+
+        assert repo.save_messages_batch.await_count <= 2  # early user-message flush + end of turn
+        repo.save_message.assert_not_awaited()
+        timestamps = [m["timestamp"] for m in persisted(repo)]
+        assert timestamps == sorted(timestamps) and len(set(timestamps)) == 4
+
+    @pytest.mark.asyncio
+    async def test_disconnect_still_flushes(self):
+        """GIVEN the client disconnects mid-stream
+        WHEN the generator is closed
+        THEN the buffered messages are still persisted
+        """
+        graph = FakeGraph([
+            ("updates", {"execution": {"messages": [AIMessage(content="Uno")]}}),
+        ])
+        repo = make_repo()
+
+        with patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph), \
+             patch("src.auth.jwt_handler.verify_token", return_value=SimpleNamespace(uid="user-1")):
+            stream = AgentOrchestrator(repo).stream_chat(make_request(), credentials=None)
+            await stream.__anext__()  # keep-alive
+            await stream.__anext__()  # first text frame
+            await stream.aclose()
+        await drain_pending_flushes()
+
+        assert [m["role"] for m in persisted(repo)] == ["user"]
+
+
+class TestBootstrap:
+    """Test the concurrent pre-graph stage."""
+
+    @pytest.fixture(autouse=True)
+    def clean_metrics(self):
+        metrics.reset()
+
+    @pytest.mark.asyncio
+    async def test_stage_timings_are_emitted(self):
+        """GIVEN a normal turn
+        WHEN stream_chat runs
+        THEN each bootstrap stage is timed
+        """
+        graph = FakeGraph([("updates", {"execution": {"messages": [AIMessage(content="Ok")]}})])
+
+        with patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph):
+            await collect(AgentOrchestrator(make_repo()), make_request())
+
+        summaries = metrics.snapshot()["summaries"]
+        for stage in ("auth", "session_read", "context", "session_write", "prefetch", "total"):
+            assert summaries[f"chat.bootstrap.{stage}_ms"]["count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_history_version_comes_from_prefetched_session(self):
+        """GIVEN a prefetched session snapshot
+        WHEN stream_chat runs
+        THEN get_context is validated with its messageCount and ensure_session reuses it
+        """
+        from src.repositories.conversation_repository import SessionSnapshot
+
+        snapshot = SessionSnapshot(data={"messageCount": 7}, project_exists=True)
+        repo = make_repo()
+        repo.load_session = AsyncMock(return_value=snapshot)
+        graph = FakeGraph([("updates", {"execution": {"messages": [AIMessage(content="Ok")]}})])
+
+        with patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph):
+            await collect(AgentOrchestrator(repo), make_request())
+
+        assert repo.get_context.await_args.kwargs["version"] == 7
+        assert repo.ensure_session.await_args.kwargs["snapshot"] is snapshot
+
+    @pytest.mark.asyncio
+    async def test_auth_failure_writes_nothing(self):
+        """GIVEN an invalid token
+        WHEN stream_chat runs
+        THEN an error frame is sent and no session/message write happens
+        """
+        repo = make_repo()
+
+        with patch("src.auth.jwt_handler.verify_token", side_effect=RuntimeError("bad token")):
+            frames = [f async for f in AgentOrchestrator(repo).stream_chat(make_request(), credentials=None)]
+
+        assert frames[-1].startswith("3:")
+        repo.ensure_session.assert_not_awaited()
+        repo.save_messages_batch.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_user_message_flush_overlaps_graph_start(self):
+        """GIVEN a graph that yields to the loop before producing output
+        WHEN stream_chat runs
+        THEN the user message is already being persisted while the graph runs
+        """
+        repo = make_repo()
+        seen = {}
+
+        class SlowGraph(FakeGraph):
+            async def astream(self, state, stream_mode=None, **kwargs):
+                await asyncio.sleep(0.01)
+                seen["batches"] = [m["role"] for c in repo.save_messages_batch.await_args_list for m in c.args[1]]
+                async for event in super().astream(state, stream_mode, **kwargs):
+                    yield event
+
+        graph = SlowGraph([("updates", {"execution": {"messages": [AIMessage(content="Ok")]}})])
+        with patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph):
+            await collect(AgentOrchestrator(repo), make_request())
+
+        assert seen["batches"] == ["user"]
+
+
+class TestHistoryCompaction:
+    """Test the compaction stage before the graph runs."""
+
+    @pytest.mark.asyncio
+    async def test_older_turns_are_summarized_and_persisted(self):
+        """GIVEN a history longer than CONTEXT_KEEP_TURNS turns
+        WHEN stream_chat runs
+        THEN the graph sees the recent turns plus a summary, which is persisted
+        """
+        history = []
+        for i in range(5):
+            history += [{"role": "user", "content": f"domanda {i}"}, {"role": "assistant", "content": f"risposta {i}"}]
+        repo = make_repo()
+        repo.ensure_session = AsyncMock(return_value={"messageCount": 10})
+        repo.get_context = AsyncMock(return_value=history)
+        graph = FakeGraph([("updates", {"execution": {"messages": [AIMessage(content="Ok")]}})])
+
+        with patch.object(settings, "CONTEXT_KEEP_TURNS", 2), \
+             patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph):
+            orchestrator = AgentOrchestrator(repo)
+            await collect(orchestrator, make_request())
+            for task in list(orchestrator._background_tasks):
+                await task
+
+        assert len(graph.state["messages"]) == 5  # 2 kept turns + current user message
+        assert "domanda 0" in graph.state["conversation_summary"]
+        repo.save_session_summary.assert_awaited_once()
+        assert repo.save_session_summary.await_args.args[2] == 6
+
+
+class TestNodeStreaming:
+    """Test the legacy node-level mode."""
+
+    @pytest.mark.asyncio
+    async def test_legacy_mode_slices_final_message(self):
+        """GIVEN CHAT_STREAM_MODE=nodes
+        WHEN stream_chat runs
+        THEN the final message is re-sliced into 5-char frames
+        """
+        graph = FakeGraph([
+            ("updates", {"execution": {"messages": [AIMessage(content="Buongiorno")]}}),
+        ])
+
+        with patch.object(settings, "CHAT_STREAM_MODE", "nodes"), \
+             patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph):
+            frames = await collect(AgentOrchestrator(make_repo()), make_request())
+
+        assert graph.stream_mode is None
+        assert frames[1:] == ['0:"Buong"\n', '0:"iorno"\n']
+
+
+class StallingGraph:
+    """Requests a tool call, then stalls inside the tool until cancelled."""
+
+    def __init__(self):
+        self.tool_cancelled = False
+
+    async def astream(self, state, stream_mode=None, **kwargs):
+        tool_call = {"id": "call-1", "name": "generate_render", "args": {}}
+        yield "updates", {"execution": {"messages": [AIMessage(content="", tool_calls=[tool_call])]}}
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            self.tool_cancelled = True
+            raise
+        yield "updates", {"tools": {"messages": [ToolMessage(content="ok", tool_call_id="call-1")]}}
+
+
+class TestClientDisconnect:
+    """Test graph cancellation when the client goes away."""
+
+    @pytest.fixture(autouse=True)
+    def render_history(self):
+        metrics.reset()
+        with patch.dict("src.services.agent_orchestrator._work_duration_averages", {"tool:generate_render": 20.0}):
+            yield
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_inflight_tool(self):
+        """GIVEN a render tool in flight
+        WHEN the client disconnects (StreamingResponse cancels the streaming task)
+        THEN the tool is cancelled, a cancelled marker is persisted and the saved time counted
+        """
+        graph, repo = StallingGraph(), make_repo()
+        frames = []
+        tool_started = asyncio.Event()
+
+        async def respond():
+            async for frame in StreamWriter(AgentOrchestrator(repo).stream_chat(make_request(), credentials=None)):
+                frames.append(frame)
+                if "9:" in frame:
+                    tool_started.set()
+
+        with patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph), \
+             patch("src.auth.jwt_handler.verify_token", return_value=SimpleNamespace(uid="user-1")):
+            response = asyncio.create_task(respond())
+            await tool_started.wait()
+            response.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await response
+        await drain_pending_flushes()
+
+        assert graph.tool_cancelled
+        assert not any(f.startswith(("a:", "3:")) for f in frames)
+        marker = persisted(repo)[-1]
+        assert marker["role"] == "assistant"
+        assert marker["metadata"]["cancelled"] is True
+        assert marker["metadata"]["inflight"] == ["tool:generate_render"]
+        counters = metrics.snapshot()["counters"]
+        assert counters["chat.cancelled"] == 1
+        assert 19 < counters["chat.cancel.model_seconds_saved"] <= 20
+
+    @pytest.mark.asyncio
+    async def test_connected_client_streams_normally(self):
+        """GIVEN a client that stays connected
+        WHEN the graph completes
+        THEN the turn is streamed and persisted without a cancelled marker
+        """
+        graph = FakeGraph([
+            ("messages", (AIMessageChunk(content="Ciao"), {"langgraph_node": "execution"})),
+            ("updates", {"execution": {"messages": [AIMessage(content="Ciao")]}}),
+        ])
+        repo = make_repo()
+
+        with patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph), \
+             patch("src.auth.jwt_handler.verify_token", return_value=SimpleNamespace(uid="user-1")):
+            frames = [f async for f in AgentOrchestrator(repo).stream_chat(make_request(), credentials=None)]
+        await drain_pending_flushes()
+
+        assert frames[1:] == ['0:"Ciao"\n']
+        assert all("metadata" not in m for m in persisted(repo))
+        assert "chat.cancelled" not in metrics.snapshot()["counters"]
+
+
+def checkpointed_graph(seen):
+    """Real graph on an in-memory SQLite checkpointer; records what the node receives."""
+    async def execution(state: AgentState):
+        seen.append([m.content for m in state["messages"]])
+        return {
+            "messages": [AIMessage(content=f"Risposta {len(seen)}")],
+            "internal_plan": [{"action": "ask_user", "analysis": f"turn {len(seen)}"}],
+        }
+
+    workflow = StateGraph(AgentState)
+    workflow.add_node("execution", execution)
+    workflow.set_entry_point("execution")
+    workflow.add_edge("execution", END)
+    return workflow.compile(checkpointer=SQLiteCheckpointSaver())
+
+
+class TestCheckpointResume:
+    """Test resuming turns from the graph checkpoint instead of the history."""
+
+    @pytest.fixture(autouse=True)
+    def clean_metrics(self):
+        metrics.reset()
+
+    async def run_turn(self, graph, history, content):
+        repo = make_repo()
+        repo.get_context = AsyncMock(return_value=history)
+        with patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph):
+            await collect(AgentOrchestrator(repo), make_request(content))
+        return persisted(repo)
+
+    @pytest.mark.asyncio
+    async def test_next_turn_sends_only_the_new_message(self):
+        """GIVEN a checkpoint whose last reply matches the stored history
+        WHEN the next turn runs
+        THEN the graph resumes from it (only the new message is sent) and the plan survives
+        """
+        seen = []
+        graph = checkpointed_graph(seen)
+        await self.run_turn(graph, [], "Ciao")
+        history = [{"role": "user", "content": "Ciao"}, {"role": "assistant", "content": "Risposta 1"}]
+
+        saved = await self.run_turn(graph, history, "Bagno moderno")
+
+        assert seen[-1] == ["Ciao", "Risposta 1", "Bagno moderno"]
+        assert saved[-1]["content"] == "Risposta 2"
+        state = (await graph.aget_state({"configurable": {"thread_id": "session-123:two_tier"}})).values
+        assert [step["action"] for step in state["internal_plan"]] == ["new_turn", "ask_user", "new_turn", "ask_user"]
+        counters = metrics.snapshot()["counters"]
+        assert counters["agent.checkpoint.resumed"] == 1
+        assert metrics.snapshot()["summaries"]["chat.bootstrap.checkpoint_ms"]["count"] == 2
+
+    @pytest.mark.asyncio
+    async def test_diverged_checkpoint_is_rebuilt_from_history(self):
+        """GIVEN a checkpoint that does not end with the stored last reply (e.g. a cancelled turn)
+        WHEN the next turn runs
+        THEN the saved messages are replaced by the history
+        """
+        seen = []
+        graph = checkpointed_graph(seen)
+        await self.run_turn(graph, [], "Ciao")
+        history = [{"role": "user", "content": "Ciao"}, {"role": "assistant", "content": "Risposta parz"}]
+
+        await self.run_turn(graph, history, "Bagno moderno")
+
+        assert seen[-1] == ["Ciao", "Risposta parz", "Bagno moderno"]
+        assert metrics.snapshot()["counters"]["agent.checkpoint.rebuilt"] == 2
+
+    @pytest.mark.asyncio
+    async def test_oldest_turns_are_trimmed(self):
+        """GIVEN more checkpointed messages than CHECKPOINT_MAX_MESSAGES
+        WHEN the next turn resumes
+        THEN the oldest turns are dropped at a user-message boundary
+        """
+        seen = []
+        graph = checkpointed_graph(seen)
+        history = []
+        with patch.object(settings, "CHECKPOINT_MAX_MESSAGES", 3):
+            for turn in range(1, 4):
+                await self.run_turn(graph, history, f"Domanda {turn}")
+                history = [{"role": "user", "content": f"Domanda {turn}"}, {"role": "assistant", "content": f"Risposta {turn}"}]
+
+        assert seen[-1] == ["Domanda 2", "Risposta 2", "Domanda 3"]
+
+    def test_trim_keeps_whole_turns(self):
+        messages = [HumanMessage(content="a", id="1"), AIMessage(content="b", id="2"),
+                    HumanMessage(content="c", id="3"), AIMessage(content="d", id="4")]
+
+        assert [m.id for m in AgentOrchestrator._trim_checkpoint(messages, 3)] == ["1", "2"]
+        assert AgentOrchestrator._trim_checkpoint(messages, 4) == []
@@ -36,7 +36,7 @@ class TestArchitectPromptGeneration:
         mock_llm = MagicMock()
         mock_llm.ainvoke = AsyncMock(return_value=mock_llm_response)
         
-        with patch('src.vision.architect.ChatGoogleGenerativeAI', return_value=mock_llm):
+        with patch('src.vision.architect.genai_registry.chat_model', return_value=mock_llm):
             # Act
             result = await generate_architectural_prompt(
                 image_bytes=sample_image_bytes,
@@ -72,7 +72,7 @@ class TestArchitectPromptGeneration:
         mock_llm = MagicMock()
         mock_llm.ainvoke = AsyncMock(return_value=mock_llm_response)
         
-        with patch('src.vision.architect.ChatGoogleGenerativeAI', return_value=mock_llm):
+        with patch('src.vision.architect.genai_registry.chat_model', return_value=mock_llm):
             # Act
             result = await generate_architectural_prompt(
                 image_bytes=sample_image_bytes,
@@ -101,7 +101,7 @@ class TestArchitectPromptGeneration:
         mock_llm = MagicMock()
         mock_llm.ainvoke = AsyncMock(return_value=mock_llm_response)
         
-        with patch('src.vision.architect.ChatGoogleGenerativeAI', return_value=mock_llm):
+        with patch('src.vision.architect.genai_registry.chat_model', return_value=mock_llm):
             # Act
             result = await generate_architectural_prompt(
                 image_bytes=sample_image_bytes,
@@ -132,7 +132,7 @@ class TestArchitectPromptGeneration:
         mock_llm = MagicMock()
         mock_llm.ainvoke = AsyncMock(return_value=mock_llm_response)
         
-        with patch('src.vision.architect.ChatGoogleGenerativeAI', return_value=mock_llm):
+        with patch('src.vision.architect.genai_registry.chat_model', return_value=mock_llm):
             # Act
             await generate_architectural_prompt(
                 image_bytes=sample_image_bytes,
@@ -0,0 +1,297 @@
+"""
+Unit Tests - Agent Graph Checkpointers
+======================================
+Tests for the SQLite and Firestore checkpoint savers.
+"""
+import asyncio
+import copy
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, StateGraph
+
+from src.graph.checkpointer import FirestoreCheckpointSaver, SQLiteCheckpointSaver, build_checkpointer
+from src.graph.state import AgentState
+from src.utils.async_utils import run_blocking
+
+
+def planning_graph(checkpointer):
+    """execution node: replies and appends a plan step, like the agent nodes."""
+    async def execution(state: AgentState):
+        turn = sum(isinstance(m, HumanMessage) for m in state["messages"])
+        return {
+            "messages": [AIMessage(content=f"Risposta {turn}")],
+            "internal_plan": [{"action": "ask_user", "analysis": f"turn {turn}"}],
+            "phase": "DESIGN",
+        }
+
+    workflow = StateGraph(AgentState)
+    workflow.add_node("execution", execution)
+    workflow.set_entry_point("execution")
+    workflow.add_edge("execution", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def thread(thread_id="session-1:two_tier"):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+class TestSQLiteCheckpointSaver:
+    """Test the local-file saver through a real graph."""
+
+    @pytest.mark.asyncio
+    async def test_turns_resume_with_plan_state(self):
+        """GIVEN a graph compiled with the SQLite saver
+        WHEN two turns run on the same thread, the second sending only its new message
+        THEN the second turn sees the first one's messages and the plan accumulates
+        """
+        graph = planning_graph(SQLiteCheckpointSaver())
+
+        await graph.ainvoke({"messages": [HumanMessage(content="Ciao")]}, thread())
+        result = await graph.ainvoke({"messages": [HumanMessage(content="Bagno moderno")]}, thread())
+
+        assert [m.content for m in result["messages"]] == ["Ciao", "Risposta 1", "Bagno moderno", "Risposta 2"]
+        assert [step["analysis"] for step in result["internal_plan"]] == ["turn 1", "turn 2"]
+        assert result["phase"] == "DESIGN"
+
+    @pytest.mark.asyncio
+    async def test_threads_are_isolated(self):
+        graph = planning_graph(SQLiteCheckpointSaver())
+
+        await graph.ainvoke({"messages": [HumanMessage(content="Ciao")]}, thread("a"))
+        result = await graph.ainvoke({"messages": [HumanMessage(content="Salve")]}, thread("b"))
+
+        assert [m.content for m in result["messages"]] == ["Salve", "Risposta 1"]
+
+    @pytest.mark.asyncio
+    async def test_state_survives_reopening_the_file(self, tmp_path):
+        """GIVEN a checkpoint written to a SQLite file
+        WHEN a new saver opens the same file
+        THEN the latest state is loaded from it
+        """
+        path = str(tmp_path / "checkpoints.sqlite")
+        saver = SQLiteCheckpointSaver(path)
+        await planning_graph(saver).ainvoke({"messages": [HumanMessage(content="Ciao")]}, thread())
+        saver.close()
+
+        snapshot = await planning_graph(SQLiteCheckpointSaver(path)).aget_state(thread())
+
+        assert [m.content for m in snapshot.values["messages"]] == ["Ciao", "Risposta 1"]
+        assert snapshot.values["internal_plan"][-1]["analysis"] == "turn 1"
+
+    @pytest.mark.asyncio
+    async def test_keeps_only_last_checkpoints(self):
+        """GIVEN keep_last=2
+        WHEN several turns run
+        THEN only the two newest checkpoints (and their parent link) remain
+        """
+        saver = SQLiteCheckpointSaver(keep_last=2)
+        graph = planning_graph(saver)
+        for text in ("uno", "due", "tre"):
+            await graph.ainvoke({"messages": [HumanMessage(content=text)]}, thread())
+
+        checkpoints = list(saver.list(thread()))
+        latest = saver.get_tuple(thread())
+
+        assert len(checkpoints) == 2
+        assert checkpoints[0].config == latest.config
+        assert latest.parent_config == checkpoints[1].config
+        assert len(list(saver.list(thread(), limit=1))) == 1
+        assert list(saver.list(thread(), before=latest.config)) == checkpoints[1:]
+
+    @pytest.mark.asyncio
+    async def test_pending_writes_are_ordered_and_not_duplicated(self):
+        """GIVEN writes for one checkpoint from two tasks (one retried)
+        WHEN the checkpoint is read
+        THEN writes come back once each, ordered by (task_path, task_id, idx)
+        """
+        saver = SQLiteCheckpointSaver()
+        graph = planning_graph(saver)
+        await graph.ainvoke({"messages": [HumanMessage(content="Ciao")]}, thread())
+        config = saver.get_tuple(thread()).config
+
+        saver.put_writes(config, [("messages", "b0"), ("phase", "b1")], task_id="task-b", task_path="~1")
+        saver.put_writes(config, [("messages", "a0")], task_id="task-a", task_path="~0")
+        saver.put_writes(config, [("messages", "retry")], task_id="task-a", task_path="~0")
+
+        writes = saver.get_tuple(config).pending_writes
+        assert writes == [("task-a", "messages", "a0"), ("task-b", "messages", "b0"), ("task-b", "phase", "b1")]
+
+    @pytest.mark.asyncio
+    async def test_delete_thread(self):
+        saver = SQLiteCheckpointSaver()
+        await planning_graph(saver).ainvoke({"messages": [HumanMessage(content="Ciao")]}, thread())
+
+        saver.delete_thread(thread()["configurable"]["thread_id"])
+
+        assert saver.get_tuple(thread()) is None
+
+    def test_build_checkpointer(self):
+        assert build_checkpointer("none") is None
+        assert build_checkpointer("bogus") is None
+        assert isinstance(build_checkpointer("firestore"), FirestoreCheckpointSaver)
+
+
+# ━━━ Minimal in-memory stand-in for the async Firestore client ━━━
+
+def deep_merge(target: dict, data: dict) -> dict:
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            deep_merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+    return target
+
+
+class FakeSnapshot:
+    def __init__(self, ref, data):
+        self.reference, self._data = ref, data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+
+class FakeDocument:
+    def __init__(self, store, path):
+        self.store, self.path = store, path
+
+    def collection(self, name):
+        return FakeCollection(self.store, f"{self.path}/{name}")
+
+    async def get(self):
+        return FakeSnapshot(self, self.store.get(self.path))
+
+    async def set(self, data, merge=False):
+        current = self.store.get(self.path) if merge else None
+        self.store[self.path] = deep_merge(current or {}, data)
+
+    async def delete(self):
+        self.store.pop(self.path, None)
+
+
+class FakeCollection:
+    def __init__(self, store, path, filters=()):
+        self.store, self.path, self.filters = store, path, filters
+
+    def document(self, doc_id):
+        return FakeDocument(self.store, f"{self.path}/{doc_id}")
+
+    def where(self, *, filter):
+        assert filter.op_string == "=="
+        return FakeCollection(self.store, self.path, self.filters + ((filter.field_path, filter.value),))
+
+    async def stream(self):
+        prefix = f"{self.path}/"
+        for path, data in list(self.store.items()):
+            if path.startswith(prefix) and "/" not in path[len(prefix):] \
+                    and all(data.get(f) == v for f, v in self.filters):
+                yield FakeSnapshot(FakeDocument(self.store, path), data)
+
+
+class FakeBatch:
+    def __init__(self):
+        self.ops = []
+
+    def set(self, ref, data, merge=False):
+        self.ops.append(ref.set(data, merge=merge))
+
+    def delete(self, ref):
+        self.ops.append(ref.delete())
+
+    async def commit(self):
+        for op in self.ops:
+            await op
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.store = {}
+
+    def collection(self, name):
+        return FakeCollection(self.store, name)
+
+    def batch(self):
+        return FakeBatch()
+
+
+class TestFirestoreCheckpointSaver:
+    """Test the Firestore saver layout and semantics (in-memory client)."""
+
+    @pytest.mark.asyncio
+    async def test_turns_resume_with_plan_state(self):
+        """GIVEN a graph compiled with the Firestore saver
+        WHEN two turns run on the same thread
+        THEN the second resumes from the first and the thread doc points at the latest
+        """
+        db = FakeFirestore()
+        saver = FirestoreCheckpointSaver(db=db, keep_last=2)
+        graph = planning_graph(saver)
+
+        await graph.ainvoke({"messages": [HumanMessage(content="Ciao")]}, thread())
+        result = await graph.ainvoke({"messages": [HumanMessage(content="Bagno moderno")]}, thread())
+
+        assert [m.content for m in result["messages"]] == ["Ciao", "Risposta 1", "Bagno moderno", "Risposta 2"]
+        assert [step["analysis"] for step in result["internal_plan"]] == ["turn 1", "turn 2"]
+
+        thread_doc = db.store["agent_checkpoints/session-1:two_tier"]
+        latest = await saver.aget_tuple(thread())
+        assert thread_doc["latest"]["__root__"] == latest.config["configurable"]["checkpoint_id"]
+        assert len(thread_doc["recent"]["__root__"]) == 2
+        assert len([p for p in db.store if "/checkpoints/" in p]) == 2
+
+    @pytest.mark.asyncio
+    async def test_list_and_pending_writes(self):
+        db = FakeFirestore()
+        saver = FirestoreCheckpointSaver(db=db)
+        await planning_graph(saver).ainvoke({"messages": [HumanMessage(content="Ciao")]}, thread())
+        latest = await saver.aget_tuple(thread())
+
+        await saver.aput_writes(latest.config, [("phase", "QUOTE")], task_id="t1", task_path="~0")
+        await saver.aput_writes(latest.config, [("phase", "retry")], task_id="t1", task_path="~0")
+        listed = [t async for t in saver.alist(thread())]
+
+        assert (await saver.aget_tuple(latest.config)).pending_writes == [("t1", "phase", "retry")]
+        assert listed[0].config == latest.config
+        ids = [t.config["configurable"]["checkpoint_id"] for t in listed]
+        assert ids == sorted(ids, reverse=True)
+        assert len(ids) == len([p for p in db.store if "/checkpoints/" in p])
+        assert listed[0].parent_config == listed[1].config
+
+    @pytest.mark.asyncio
+    async def test_missing_thread(self):
+        saver = FirestoreCheckpointSaver(db=FakeFirestore())
+        assert await saver.aget_tuple(thread("nope")) is None
+
+    def test_sync_graph_runs_on_private_loop(self):
+        """GIVEN a Firestore saver never used from async code
+        WHEN a graph is invoked synchronously
+        THEN the sync API bridges to a background loop and turns resume
+        """
+        def execution(state: AgentState):
+            return {"messages": [AIMessage(content=f"Risposta {len(state['messages'])}")]}
+
+        saver = FirestoreCheckpointSaver(db=FakeFirestore())
+        workflow = StateGraph(AgentState)
+        workflow.add_node("execution", execution)
+        workflow.set_entry_point("execution")
+        workflow.add_edge("execution", END)
+        graph = workflow.compile(checkpointer=saver)
+
+        graph.invoke({"messages": [HumanMessage(content="Ciao")]}, thread())
+        result = graph.invoke({"messages": [HumanMessage(content="Bagno moderno")]}, thread())
+
+        assert [m.content for m in result["messages"]] == ["Ciao", "Risposta 1", "Bagno moderno", "Risposta 3"]
+        assert saver.get_tuple(thread()).checkpoint["id"] == list(saver.list(thread()))[0].checkpoint["id"]
+
+    @pytest.mark.asyncio
+    async def test_sync_api_from_worker_thread_uses_the_client_loop(self):
+        saver = FirestoreCheckpointSaver(db=FakeFirestore())
+        await planning_graph(saver).ainvoke({"messages": [HumanMessage(content="Ciao")]}, thread())
+
+        latest = await run_blocking(saver.get_tuple, thread())
+        await run_blocking(saver.delete_thread, "session-1:two_tier")
+
+        assert latest.checkpoint["id"] == latest.config["configurable"]["checkpoint_id"]
+        assert await saver.aget_tuple(thread()) is None
+        with pytest.raises(asyncio.InvalidStateError):
+            saver.get_tuple(thread())
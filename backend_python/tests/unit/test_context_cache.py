@@ -0,0 +1,198 @@
+"""
+Unit Tests - Session Context Cache
+==================================
+Tests for the per-session recent-message cache and its repository integration.
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.repositories.context_cache import SessionContextCache
+from src.repositories.conversation_repository import ConversationRepository
+
+
+def msgs(n, start=0):
+    return [{"role": "user", "content": f"m{i}"} for i in range(start, start + n)]
+
+
+class TestSessionContextCache:
+    """Test LRU, TTL, versioning and windowing."""
+
+    def test_hit_returns_most_recent_window(self):
+        """GIVEN a cached window
+        WHEN a smaller limit is read with the same version
+        THEN the most recent messages are returned
+        """
+        cache = SessionContextCache(window=5)
+        cache.put("s", msgs(5), version=12, exhaustive=False)
+
+        assert [m["content"] for m in cache.get("s", 3, version=12)] == ["m2", "m3", "m4"]
+        assert cache.stats()["hits"] == 1
+
+    def test_version_mismatch_falls_through(self):
+        """GIVEN a cached window at version 12
+        WHEN the session reports version 13
+        THEN the read misses and the entry is dropped
+        """
+        cache = SessionContextCache(window=5)
+        cache.put("s", msgs(5), version=12, exhaustive=False)
+
+        assert cache.get("s", 3, version=13) is None
+        assert cache.stats()["sessions"] == 0
+
+    def test_append_keeps_window_and_bumps_version(self):
+        """GIVEN a full window
+        WHEN two messages are appended
+        THEN the oldest are evicted and the version follows messageCount
+        """
+        cache = SessionContextCache(window=3)
+        cache.put("s", msgs(3), version=3, exhaustive=True)
+
+        cache.append("s", msgs(2, start=3))
+
+        assert [m["content"] for m in cache.get("s", 3, version=5)] == ["m2", "m3", "m4"]
+
+    def test_ttl_expiry(self):
+        """GIVEN an entry past its TTL
+        WHEN it is read
+        THEN it misses
+        """
+        cache = SessionContextCache(ttl_seconds=0)
+        cache.put("s", msgs(1), version=1, exhaustive=True)
+
+        assert cache.get("s", 1, version=1) is None
+
+    def test_short_window_only_served_when_exhaustive(self):
+        """GIVEN a 2-message window
+        WHEN 10 messages are requested
+        THEN it is served only if the window is the whole session
+        """
+        cache = SessionContextCache()
+        cache.put("whole", msgs(2), version=2, exhaustive=True)
+        cache.put("partial", msgs(2), version=2, exhaustive=False)
+
+        assert len(cache.get("whole", 10, version=2)) == 2
+        assert cache.get("partial", 10, version=2) is None
+
+    def test_unversioned_reads_and_writes_bypass_the_cache(self):
+        """GIVEN a cached window
+        WHEN it is read without a version (messageCount unknown)
+        THEN it is a miss (freshness cannot be checked) and unversioned windows are not stored
+        """
+        cache = SessionContextCache()
+        cache.put("s", msgs(3), version=3, exhaustive=True)
+        cache.put("legacy", msgs(3), version=None, exhaustive=True)
+
+        assert cache.get("s", 3) is None
+        assert len(cache.get("s", 3, version=3)) == 3
+        assert cache.get("legacy", 3, version=3) is None
+        assert cache.stats()["sessions"] == 1
+
+    def test_lru_eviction_and_memory_accounting(self):
+        """GIVEN max_sessions=1
+        WHEN a second session is cached
+        THEN the first is evicted and size_bytes tracks only the survivor
+        """
+        cache = SessionContextCache(max_sessions=1)
+        cache.put("a", msgs(3), version=3, exhaustive=True)
+        cache.put("b", msgs(1), version=1, exhaustive=True)
+
+        stats = cache.stats()
+        assert stats["sessions"] == 1
+        assert stats["size_bytes"] == len(str(msgs(1)[0]))
+        assert cache.get("a", 1, version=3) is None
+
+
+class TestRepositoryContext:
+    """Test get_context cache integration."""
+
+    def make_db(self, stored):
+        """Fake async Firestore returning `stored` newest-first (up to the query limit)."""
+        def limit(n):
+            async def stream():
+                for data in list(reversed(stored))[:n]:
+                    doc = MagicMock()
+                    doc.to_dict.return_value = data
+                    yield doc
+
+            query = MagicMock()
+            query.stream = stream
+            return query
+
+        db = MagicMock()
+        messages_ref = db.collection.return_value.document.return_value.collection.return_value
+        messages_ref.order_by.return_value.limit.side_effect = limit
+        batch = db.batch.return_value
+        batch.commit = AsyncMock()
+        return db, messages_ref
+
+    @pytest.mark.asyncio
+    async def test_queries_newest_first_then_serves_from_cache(self):
+        """GIVEN a 30-message session
+        WHEN get_context runs twice with the same version
+        THEN Firestore is queried once (DESC) and the latest 10 are returned in order
+        """
+        stored = msgs(30)
+        db, messages_ref = self.make_db(stored)
+        repo = ConversationRepository()
+        repo.context_cache = SessionContextCache(window=20)
+
+        with patch.object(repo, "_get_db", return_value=db):
+            first = await repo.get_context("s", limit=10, version=30)
+            second = await repo.get_context("s", limit=10, version=30)
+
+        assert [m["content"] for m in first] == [f"m{i}" for i in range(20, 30)]
+        assert first == second
+        assert messages_ref.order_by.call_args.kwargs["direction"] == "DESCENDING"
+        assert messages_ref.order_by.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_large_history_window_hits_on_the_next_turn(self):
+        """GIVEN a long session read with a compaction-sized limit (30, default window)
+        WHEN the turn is saved and the next turn reads a larger window (34)
+        THEN it is served from cache without a second query
+        """
+        db, messages_ref = self.make_db(msgs(80))
+        repo = ConversationRepository()
+        repo.context_cache = SessionContextCache()
+
+        with patch.object(repo, "_get_db", return_value=db):
+            await repo.get_context("s", limit=30, version=80)
+            await repo.save_messages_batch("s", [{"id": f"n{i}", "role": "user", "content": f"n{i}"} for i in range(4)])
+            history = await repo.get_context("s", limit=34, version=84)
+
+        assert [m["content"] for m in history] == [f"m{i}" for i in range(50, 80)] + [f"n{i}" for i in range(4)]
+        assert messages_ref.order_by.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_read_above_the_window_is_cached_whole(self):
+        db, messages_ref = self.make_db(msgs(80))
+        repo = ConversationRepository()
+        repo.context_cache = SessionContextCache(window=20)
+
+        with patch.object(repo, "_get_db", return_value=db):
+            first = await repo.get_context("s", limit=30, version=80)
+            second = await repo.get_context("s", limit=30, version=80)
+
+        assert first == second and len(second) == 30
+        assert messages_ref.order_by.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_save_appends_to_cache(self):
+        """GIVEN a cached session
+        WHEN a turn is saved with save_messages_batch
+        THEN the next read (new version) is served from cache including the turn
+        """
+        db, messages_ref = self.make_db(msgs(2))
+        repo = ConversationRepository()
+        repo.context_cache = SessionContextCache()
+
+        with patch.object(repo, "_get_db", return_value=db):
+            await repo.get_context("s", limit=10, version=2)
+            await repo.save_messages_batch("s", [
+                {"id": "x", "role": "user", "content": "nuovo"},
+                {"id": "y", "role": "assistant", "content": "risposta"},
+            ])
+            history = await repo.get_context("s", limit=10, version=4)
+
+        assert [m["content"] for m in history] == ["m0", "m1", "nuovo", "risposta"]
+        assert messages_ref.order_by.call_count == 1
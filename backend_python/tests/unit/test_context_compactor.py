@@ -0,0 +1,183 @@
+"""
+Unit Tests - Context Compactor
+==============================
+Tests for history folding into the running summary and per-node token budgets.
+"""
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.services.context_compactor import ContextCompactor, count_tokens, estimate_tokens
+
+
+def turn(i, tool_output=None):
+    msgs = [{"role": "user", "content": f"domanda {i}"}]
+    if tool_output is not None:
+        msgs.append({"role": "assistant", "content": "", "tool_calls": [{"id": f"c{i}", "name": "analyze_room", "args": {}}]})
+        msgs.append({"role": "tool", "content": tool_output, "tool_call_id": f"c{i}"})
+    msgs.append({"role": "assistant", "content": f"risposta {i}"})
+    return msgs
+
+
+class TestHistoryCompaction:
+    """Test extractive folding of older turns."""
+
+    def test_short_history_is_untouched(self):
+        """GIVEN fewer turns than keep_turns
+        WHEN compacting
+        THEN history and summary are unchanged
+        """
+        history = turn(0) + turn(1)
+        result = ContextCompactor(keep_turns=3).compact_history(history, {"messageCount": 4})
+
+        assert result.history == history
+        assert result.summary is None
+        assert result.summary_changed is False
+
+    def test_older_turns_fold_into_summary(self):
+        """GIVEN 5 turns and keep_turns=2
+        WHEN compacting
+        THEN the last 2 turns stay verbatim and the first 3 become summary lines
+        """
+        history = [m for i in range(5) for m in turn(i)]
+        result = ContextCompactor(keep_turns=2).compact_history(history, {"messageCount": 10})
+
+        assert result.history == history[6:]
+        assert "- User: domanda 0" in result.summary
+        assert "- Assistant: risposta 2" in result.summary
+        assert result.summary_message_count == 6
+        assert result.tokens_after < result.tokens_before + estimate_tokens(result.summary)
+
+    def test_already_summarized_messages_are_not_folded_twice(self):
+        """GIVEN a summary covering the first 4 messages
+        WHEN the same window is compacted again
+        THEN only the newer folded messages are appended
+        """
+        history = [m for i in range(5) for m in turn(i)]
+        session = {"messageCount": 10, "summary": "- User: domanda 0\n- Assistant: risposta 0", "summaryMessageCount": 4}
+
+        result = ContextCompactor(keep_turns=2).compact_history(history, session)
+
+        assert result.summary.count("domanda 0") == 1
+        assert result.summary.count("domanda 1") == 0  # covered by summaryMessageCount, not re-added
+        assert "domanda 2" in result.summary
+
+    def test_bulky_tool_output_of_past_turns_is_condensed(self):
+        """GIVEN a 5000-char tool output in an older kept turn
+        WHEN compacting
+        THEN it is condensed while the latest turn stays intact
+        """
+        bulky = "x" * 5000
+        history = turn(0, tool_output=bulky) + turn(1, tool_output=bulky)
+        result = ContextCompactor(keep_turns=3, tool_output_max_chars=100).compact_history(history, {"messageCount": 8})
+
+        assert len(result.history[2]["content"]) < 200
+        assert result.history[6]["content"] == bulky
+
+    def test_unknown_message_count_never_folds(self):
+        """GIVEN no messageCount
+        WHEN compacting a long history
+        THEN nothing is folded
+        """
+        history = [m for i in range(5) for m in turn(i)]
+        result = ContextCompactor(keep_turns=2).compact_history(history, None)
+
+        assert result.history == history
+        assert result.summary_changed is False
+
+    def test_summary_is_capped(self):
+        """GIVEN a tiny summary budget
+        WHEN many lines are folded
+        THEN the summary keeps the most recent lines within the cap
+        """
+        history = [m for i in range(20) for m in turn(i)]
+        result = ContextCompactor(keep_turns=1, summary_max_tokens=20).compact_history(history, {"messageCount": 40})
+
+        assert len(result.summary) <= 20 * 4 + 2
+        assert "risposta 18" in result.summary
+
+    def test_window_covers_unsummarized_tool_turns(self):
+        """GIVEN 5 tool turns (4 messages each) and nothing summarized yet
+        WHEN loading history_window() messages and compacting
+        THEN the window holds every turn and the 2 beyond keep_turns are folded
+        """
+        compactor = ContextCompactor(keep_turns=3, min_window=10, max_window=60)
+        all_messages = [m for i in range(5) for m in turn(i, tool_output=f"esito {i}")]
+        session = {"messageCount": len(all_messages)}
+
+        window = compactor.history_window(session)
+        result = compactor.compact_history(all_messages[-window:], session)
+
+        assert window == 20
+        assert result.history == all_messages[8:]
+        assert "domanda 1" in result.summary and "domanda 2" not in result.summary
+        assert result.summary_message_count == 8
+
+    def test_window_shrinks_once_summarized(self):
+        compactor = ContextCompactor(min_window=16, max_window=60)
+
+        assert compactor.history_window(None) == 16
+        assert compactor.history_window({"messageCount": 200, "summaryMessageCount": 190}) == 16
+        assert compactor.history_window({"messageCount": 200}) == 60
+
+
+class TestNodeBudget:
+    """Test per-node token budgets."""
+
+    def test_within_budget_is_identity(self):
+        messages = [HumanMessage(content="ciao")]
+        assert ContextCompactor().fit_to_budget("sys", messages, 1000, "execution") == messages
+
+    def test_oldest_messages_dropped_and_last_kept(self):
+        """GIVEN a history exceeding the budget
+        WHEN fitting
+        THEN older messages are dropped, the result starts at a user message and fits
+        """
+        messages = []
+        for i in range(10):
+            messages += [
+                HumanMessage(content="d" * 400),
+                AIMessage(content="", tool_calls=[{"id": f"c{i}", "name": "analyze_room", "args": {}}]),
+                ToolMessage(content="t" * 400, tool_call_id=f"c{i}"),
+            ]
+        messages.append(HumanMessage(content="ultima domanda"))
+
+        fitted = ContextCompactor(tool_output_max_chars=50).fit_to_budget("s" * 400, messages, 500, "reasoning")
+
+        assert fitted[-1].content == "ultima domanda"
+        assert isinstance(fitted[0], HumanMessage)
+        assert estimate_tokens("s" * 400) + count_tokens(fitted) <= 500
+
+    def test_older_media_blocks_are_condensed_first(self):
+        """GIVEN an old multimodal message
+        WHEN the budget is tight
+        THEN its image block is dropped but its text marker kept
+        """
+        old = HumanMessage(content=[
+            {"type": "text", "text": "[Immagine allegata: https://x/y.jpg]"},
+            {"type": "image_url", "image_url": {"url": "https://x/y.jpg"}},
+        ])
+        messages = [old, AIMessage(content="ok"), HumanMessage(content="e ora?")]
+
+        fitted = ContextCompactor().fit_to_budget("", messages, 100, "execution")
+
+        assert fitted[0].content == "[Immagine allegata: https://x/y.jpg]"
+
+    def test_current_turn_is_never_split(self):
+        """GIVEN a current turn (user, tool call, bulky tool result) over budget on its own
+        WHEN fitting
+        THEN older turns are dropped whole and the current turn keeps every message,
+        with its tool output condensed
+        """
+        messages = [HumanMessage(content="vecchia " * 100), AIMessage(content="ok " * 100)]
+        current = [
+            HumanMessage(content="rendi la cucina moderna"),
+            AIMessage(content="", tool_calls=[{"id": "c1", "name": "generate_render", "args": {}}]),
+            ToolMessage(content="r" * 4000, tool_call_id="c1"),
+        ]
+
+        fitted = ContextCompactor(tool_output_max_chars=100).fit_to_budget("", messages + current, 200, "execution")
+
+        assert [type(m) for m in fitted] == [HumanMessage, AIMessage, ToolMessage]
+        assert fitted[0].content == "rendi la cucina moderna"
+        assert fitted[1].tool_calls[0]["id"] == fitted[2].tool_call_id == "c1"
+        assert len(fitted[2].content) < 200
@@ -0,0 +1,55 @@
+"""
+Unit Tests - GenAI Client Registry
+==================================
+Tests for the shared, pooled google-genai clients and chat models.
+"""
+import pytest
+
+from src.core.genai_clients import GenAIClientRegistry
+
+
+@pytest.fixture
+def registry():
+    return GenAIClientRegistry(
+        api_key="test-key",
+        model_config={"gemini-3-flash-preview": {"timeout": 60.0, "max_retries": 2}},
+        max_keepalive=4,
+    )
+
+
+class TestGenAIClientRegistry:
+    """Test sharing, per-model configuration and lifecycle."""
+
+    def test_client_is_shared_per_api_version(self, registry):
+        assert registry.client() is registry.client()
+        assert registry.client("v1beta") is registry.client("v1beta")
+        assert registry.client("v1beta") is not registry.client()
+        assert registry.stats()["clients"] == 2
+
+    def test_client_uses_keep_alive_pool(self, registry):
+        pool = registry.client()._api_client._httpx_client._transport._pool
+
+        assert pool._max_keepalive_connections == 4
+
+    def test_chat_model_applies_model_config_and_overrides(self, registry):
+        """GIVEN per-model defaults for gemini-3-flash-preview
+        WHEN chat models are requested with and without overrides
+        THEN identical configurations share one instance and defaults are applied
+        """
+        llm = registry.chat_model("gemini-3-flash-preview", temperature=0.4)
+
+        assert registry.chat_model("gemini-3-flash-preview", temperature=0.4) is llm
+        assert registry.chat_model("gemini-3-flash-preview", temperature=0.1) is not llm
+        assert llm.timeout == 60.0 and llm.max_retries == 2 and llm.temperature == 0.4
+        assert registry.chat_model("gemini-2.5-flash").max_retries != 2
+
+    @pytest.mark.asyncio
+    async def test_aclose_releases_and_recreates_lazily(self, registry):
+        client = registry.client()
+        llm = registry.chat_model("gemini-2.5-flash", temperature=0.0)
+
+        await registry.aclose()
+
+        assert registry.stats() == {"clients": 0, "chat_models": 0}
+        assert registry.client() is not client
+        assert registry.chat_model("gemini-2.5-flash", temperature=0.0) is not llm
@@ -0,0 +1,99 @@
+"""
+Unit Tests - Intent Router
+==========================
+Tests for the learned gatekeeper model and its use in IntentClassifier.
+"""
+import numpy as np
+import pytest
+from unittest.mock import patch
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.core.config import settings
+from src.services.intent_classifier import IntentClassifier
+from src.services.intent_router import DEFAULT_MODEL_PATH, HashedNgramFeaturizer, IntentRouter
+
+
+@pytest.fixture(scope="module")
+def bundled():
+    return IntentRouter.load(DEFAULT_MODEL_PATH)
+
+
+class TestIntentRouter:
+    """Test features, training and the bundled model."""
+
+    def test_features_are_stable_and_accent_insensitive(self):
+        """GIVEN the same text with and without accents
+        WHEN featurized by two featurizer instances
+        THEN the sparse vectors are identical and unit-norm
+        """
+        a_idx, a_val = HashedNgramFeaturizer().transform("Sì, procedi")
+        b_idx, b_val = HashedNgramFeaturizer().transform("si, procedi")
+
+        assert np.array_equal(a_idx, b_idx) and np.allclose(a_val, b_val)
+        assert np.isclose(np.linalg.norm(a_val), 1.0)
+
+    def test_train_save_load_round_trip(self, tmp_path):
+        texts = ["ok grazie", "perfetto", "sì certo", "genera un render", "fammi un preventivo", "analizza la foto"]
+        labels = ["execution"] * 3 + ["reasoning"] * 3
+        router = IntentRouter.train(texts, labels, featurizer=HashedNgramFeaturizer(dim=2 ** 10))
+        path = tmp_path / "router.npz"
+
+        router.save(path)
+        loaded = IntentRouter.load(path)
+
+        assert loaded.featurizer.dim == 2 ** 10
+        assert loaded.predict_proba("ok grazie") == pytest.approx(router.predict_proba("ok grazie"))
+        assert loaded.route("ok grazie", 0.5)[0] == "execution"
+        assert loaded.route("genera un render", 0.5)[0] == "reasoning"
+
+    @pytest.mark.parametrize("text", ["Ciao!", "grazie mille", "sì, procedi", "va bene", "cosa intendi?", "il secondo"])
+    def test_bundled_model_fast_tracks_simple_turns(self, bundled, text):
+        assert bundled.route(text, settings.INTENT_ROUTER_THRESHOLD)[0] == "execution"
+
+    @pytest.mark.parametrize("text", [
+        "genera un render del bagno in stile moderno",
+        "fammi un preventivo per la cucina di 12 mq",
+        "mostrami i file del progetto",
+        "ok, genera il render con il parquet",
+    ])
+    def test_bundled_model_keeps_requests_on_reasoning(self, bundled, text):
+        assert bundled.route(text, settings.INTENT_ROUTER_THRESHOLD)[0] == "reasoning"
+
+
+class TestGatekeeper:
+    """Test IntentClassifier routing with the router."""
+
+    @pytest.mark.asyncio
+    async def test_confirmation_goes_to_execution(self):
+        messages = [AIMessage(content="Vuoi che generi il render?"), HumanMessage(content="sì, procedi")]
+        assert await IntentClassifier.classify_intent(messages) == "execution"
+
+    @pytest.mark.asyncio
+    async def test_low_confidence_falls_back_to_reasoning(self):
+        """GIVEN a threshold no prediction reaches
+        WHEN a greeting is classified
+        THEN the turn keeps the reasoning path
+        """
+        with patch.object(settings, "INTENT_ROUTER_THRESHOLD", 1.01):
+            assert await IntentClassifier.classify_intent([HumanMessage(content="ciao")]) == "reasoning"
+
+    @pytest.mark.asyncio
+    async def test_media_always_goes_to_reasoning(self):
+        image = HumanMessage(content=[
+            {"type": "text", "text": "ok"},
+            {"type": "image_url", "image_url": {"url": "https://x/a.jpg"}},
+        ])
+        marker = HumanMessage(content="ok\n\n[Immagine allegata: https://x/a.jpg]")
+
+        assert await IntentClassifier.classify_intent([image]) == "reasoning"
+        assert await IntentClassifier.classify_intent([marker]) == "reasoning"
+
+    @pytest.mark.asyncio
+    async def test_heuristics_without_model(self):
+        """GIVEN the router is unavailable (disabled / NumPy missing)
+        WHEN messages are classified
+        THEN the original greeting heuristics apply
+        """
+        with patch("src.services.intent_classifier.get_intent_router", return_value=None):
+            assert await IntentClassifier.classify_intent([HumanMessage(content="grazie")]) == "execution"
+            assert await IntentClassifier.classify_intent([HumanMessage(content="cosa intendi?")]) == "reasoning"
@@ -0,0 +1,52 @@
+"""
+Unit Tests - Event Loop Lag Monitor
+===================================
+Tests for the event loop responsiveness probe.
+"""
+import asyncio
+import time
+import pytest
+
+from src.core.loop_monitor import LoopLagMonitor
+from src.core.metrics import metrics
+
+
+class TestLoopLagMonitor:
+    """Test lag detection."""
+
+    @pytest.fixture(autouse=True)
+    def clean_metrics(self):
+        metrics.reset()
+
+    @pytest.mark.asyncio
+    async def test_blocking_call_is_detected(self):
+        """GIVEN a running probe
+        WHEN a sync call blocks the loop for 200ms
+        THEN the measured lag reflects the block
+        """
+        monitor = LoopLagMonitor(interval=0.01, metric_name="test.lag_ms")
+        monitor.start()
+        await asyncio.sleep(0.03)
+
+        time.sleep(0.2)  # blocking call on the loop
+        await asyncio.sleep(0.03)
+        await monitor.stop()
+
+        assert monitor.max_lag_ms >= 150
+        assert metrics.snapshot()["summaries"]["test.lag_ms"]["max"] >= 150
+
+    @pytest.mark.asyncio
+    async def test_responsive_loop_has_low_lag(self):
+        """GIVEN only non-blocking awaits
+        WHEN the probe runs
+        THEN lag stays small
+        """
+        monitor = LoopLagMonitor(interval=0.01, metric_name="test.lag_ms")
+        monitor.start()
+
+        await asyncio.gather(*(asyncio.sleep(0.05) for _ in range(50)))
+        await monitor.stop()
+
+        assert monitor.samples > 0
+        assert monitor.max_lag_ms < 50
+        assert not monitor.running
@@ -0,0 +1,68 @@
+"""
+Unit Tests - Media Index
+========================
+Tests for media references indexed once per turn and read by ContextBuilder.
+"""
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.graph.context_builder import ContextBuilder
+from src.graph.media_index import extract_media, index_media, latest_media
+
+IMAGE = "https://storage.example/bagno.jpg"
+
+
+def image_message(url: str = IMAGE) -> HumanMessage:
+    return HumanMessage(content=[
+        {"type": "text", "text": "Ecco la foto"},
+        {"type": "image_url", "image_url": {"url": url}},
+    ])
+
+
+class TestExtractMedia:
+    """Test per-message extraction."""
+
+    def test_markers_and_parts(self):
+        marker = HumanMessage(content=f"ok\n\n[Immagine allegata: {IMAGE}]\n[Video allegato: https://x/v.mp4]")
+
+        assert extract_media(marker) == [IMAGE, "https://x/v.mp4"]
+        assert extract_media(image_message()) == [IMAGE]
+        assert extract_media(HumanMessage(content=[{"type": "image_url", "image_url": IMAGE}])) == [IMAGE]
+        assert extract_media(AIMessage(content="Nessun allegato")) == []
+
+
+class TestMediaIndex:
+    """Test the index carried on AgentState."""
+
+    def test_latest_message_with_media_wins(self):
+        messages = [image_message("https://x/old.jpg"), AIMessage(content="Bello!"), image_message(), AIMessage(content="Ok")]
+
+        index = index_media(messages)
+
+        assert index["urls"] == [IMAGE]
+        assert index["last_id"] == messages[-1].id
+
+    def test_lookup_stops_at_indexed_message(self):
+        """GIVEN an index built at turn start
+        WHEN the graph appends messages and the history before it is dropped
+        THEN the lookup only scans the new messages and keeps the indexed media
+        """
+        messages = [image_message(), AIMessage(content="Bello!"), HumanMessage(content="Rendilo moderno")]
+        index = index_media(messages)
+        appended = [AIMessage(content="", tool_calls=[{"name": "t", "args": {}, "id": "c1"}]), ToolMessage(content="{}", tool_call_id="c1")]
+
+        assert latest_media(messages[-1:] + appended, index) == [IMAGE]
+        assert latest_media(messages[-1:] + [image_message("https://x/new.jpg")], index) == ["https://x/new.jpg"]
+
+    def test_unknown_anchor_rescans(self):
+        index = {"urls": ["https://x/stale.jpg"], "last_id": "gone"}
+
+        assert latest_media([HumanMessage(content="ciao", id="m1")], index) == []
+
+    def test_context_builder_uses_the_index(self):
+        messages = [image_message(), HumanMessage(content="Rendilo moderno")]
+        state = {"messages": messages, "media_index": index_media(messages)}
+
+        context = ContextBuilder._build_media_context(state)
+
+        assert f'LAST_UPLOADED_IMAGE_URL="{IMAGE}"' in context
+        assert ContextBuilder._build_media_context({"messages": messages}) == context
@@ -0,0 +1,114 @@
+"""
+Unit Tests - Turn Message Buffer
+================================
+Tests for write-behind, batched chat persistence.
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.repositories.message_buffer import TurnMessageBuffer, drain_pending_flushes
+
+
+def make_repo(side_effect=None):
+    repo = MagicMock()
+    repo.save_messages_batch = AsyncMock(return_value=None, side_effect=side_effect)
+    return repo
+
+
+class TestTurnMessageBuffer:
+    """Test buffering, ordering and retries."""
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_once_in_order(self):
+        """GIVEN three buffered messages
+        WHEN flush runs
+        THEN one batch carries them in order with strictly increasing timestamps
+        """
+        repo = make_repo()
+        buffer = TurnMessageBuffer(repo, "s-1")
+        buffer.add("user", "Ciao")
+        buffer.add("assistant", "", tool_calls=[{"id": "c1", "name": "analyze_room", "args": {}}])
+        buffer.add("tool", "ok", tool_call_id="c1")
+
+        assert await buffer.flush() is True
+
+        session_id, batch = repo.save_messages_batch.await_args.args
+        assert session_id == "s-1"
+        assert [m["role"] for m in batch] == ["user", "assistant", "tool"]
+        assert batch[0]["timestamp"] < batch[1]["timestamp"] < batch[2]["timestamp"]
+        assert len({m["id"] for m in batch}) == 3
+        assert len(buffer) == 0
+
+    @pytest.mark.asyncio
+    async def test_flush_retries_transient_errors(self):
+        """GIVEN a batch that fails once
+        WHEN flush runs
+        THEN it retries the same messages (same ids) and succeeds
+        """
+        repo = make_repo(side_effect=[RuntimeError("unavailable"), None])
+        buffer = TurnMessageBuffer(repo, "s-1", retry_base_delay=0)
+        buffer.add("user", "Ciao")
+
+        assert await buffer.flush() is True
+
+        first, second = [c.args[1] for c in repo.save_messages_batch.await_args_list]
+        assert first[0]["id"] == second[0]["id"]
+
+    @pytest.mark.asyncio
+    async def test_flush_keeps_messages_when_retries_exhausted(self):
+        """GIVEN a batch that always fails
+        WHEN flush runs
+        THEN it reports failure and keeps the messages pending
+        """
+        repo = make_repo(side_effect=RuntimeError("down"))
+        buffer = TurnMessageBuffer(repo, "s-1", max_retries=2, retry_base_delay=0)
+        buffer.add("user", "Ciao")
+
+        assert await buffer.flush() is False
+        assert repo.save_messages_batch.await_count == 2
+        assert len(buffer) == 1
+
+    @pytest.mark.asyncio
+    async def test_background_flush_is_drained(self):
+        """GIVEN a background flush
+        WHEN drain_pending_flushes runs
+        THEN the batch has been written
+        """
+        repo = make_repo()
+        buffer = TurnMessageBuffer(repo, "s-1")
+        buffer.add("user", "Ciao")
+
+        buffer.flush_in_background()
+        await drain_pending_flushes()
+
+        repo.save_messages_batch.assert_awaited_once()
+
+
+class TestRepositoryBatch:
+    """Test ConversationRepository.save_messages_batch."""
+
+    @pytest.mark.asyncio
+    async def test_single_batch_and_single_increment(self):
+        """GIVEN two messages
+        WHEN save_messages_batch runs
+        THEN both docs and one session update (Increment(2)) are committed together
+        """
+        from src.repositories.conversation_repository import ConversationRepository
+
+        db = MagicMock()
+        batch = db.batch.return_value
+        batch.commit = AsyncMock()
+        repo = ConversationRepository()
+        messages = [
+            {"id": "m1", "role": "user", "content": "Ciao"},
+            {"id": "m2", "role": "assistant", "content": "Salve"},
+        ]
+
+        with patch.object(repo, "_get_db", return_value=db), \
+             patch("src.repositories.conversation_repository.firestore.Increment") as increment:
+            await repo.save_messages_batch("s-1", messages)
+
+        assert batch.set.call_count == 3
+        increment.assert_called_once_with(2)
+        batch.commit.assert_awaited_once()
+        db.collection.return_value.document.return_value.collection.return_value.document.assert_any_call("m1")
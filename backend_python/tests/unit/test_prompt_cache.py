@@ -0,0 +1,118 @@
+"""
+Unit Tests - Prompt Cache
+=========================
+Tests for cached-content handles of the static prompt prefix and the
+billed vs cached prompt-token accounting.
+"""
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from src.core.metrics import metrics
+from src.services.prompt_cache import (
+    LocalPromptCacheBackend,
+    PromptCache,
+    PromptUsageRecorder,
+    prompt_version,
+)
+
+STATIC = "Sei SYD, l'assistente per ristrutturazioni. " * 400
+
+
+class FailingBackend:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, model, system_instruction, ttl_s, display_name):
+        self.calls += 1
+        raise RuntimeError("quota exceeded")
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+
+
+class TestPromptCache:
+    """Test handle creation and reuse."""
+
+    def test_handle_created_once_per_version(self):
+        """GIVEN the same static prefix on repeated turns
+        WHEN handles are requested
+        THEN the backend creates one cached content and later turns reuse it
+        """
+        backend = LocalPromptCacheBackend()
+        cache = PromptCache(backend)
+
+        handles = {cache.handle_for("gemini-x", STATIC) for _ in range(5)}
+
+        assert len(handles) == 1 and len(backend.contents) == 1
+        assert backend.contents[handles.pop()] == ("gemini-x", STATIC)
+        counters = metrics.snapshot()["counters"]
+        assert counters["prompt_cache.created"] == 1
+        assert counters["prompt_cache.hits"] == 4
+
+    def test_new_prefix_or_model_gets_new_handle(self):
+        cache = PromptCache(LocalPromptCacheBackend())
+
+        first = cache.handle_for("gemini-x", STATIC)
+
+        assert cache.handle_for("gemini-x", STATIC + " v2") != first
+        assert cache.handle_for("gemini-y", STATIC) != first
+        assert prompt_version(STATIC) != prompt_version(STATIC + " v2")
+
+    def test_expired_handle_is_recreated(self):
+        backend = LocalPromptCacheBackend()
+        cache = PromptCache(backend, ttl_s=60, refresh_margin_s=60)  # Expires immediately
+
+        cache.handle_for("gemini-x", STATIC)
+        cache.handle_for("gemini-x", STATIC)
+
+        assert len(backend.contents) == 2
+
+    def test_small_prefix_is_not_cached(self):
+        backend = LocalPromptCacheBackend()
+        cache = PromptCache(backend, min_tokens=1024)
+
+        assert cache.handle_for("gemini-x", "Prompt breve") is None
+        assert backend.contents == {}
+
+    def test_failure_backs_off(self):
+        """GIVEN a backend that fails
+        WHEN handles are requested repeatedly
+        THEN calls go inline (None) and creation is not retried until retry_after_s
+        """
+        backend = FailingBackend()
+        cache = PromptCache(backend, retry_after_s=300)
+
+        assert cache.handle_for("gemini-x", STATIC) is None
+        assert cache.handle_for("gemini-x", STATIC) is None
+        assert backend.calls == 1
+        assert metrics.snapshot()["counters"]["prompt_cache.errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_async_lookup(self):
+        cache = PromptCache(LocalPromptCacheBackend())
+
+        created = await cache.ahandle_for("gemini-x", STATIC)
+
+        assert await cache.ahandle_for("gemini-x", STATIC) == created
+
+
+class TestPromptUsageRecorder:
+    """Test billed vs cached prompt tokens."""
+
+    def test_usage_metadata_is_split(self):
+        message = AIMessage(content="ok", usage_metadata={
+            "input_tokens": 7000, "output_tokens": 50, "total_tokens": 7050,
+            "input_token_details": {"cache_read": 6500},
+        })
+        recorder = PromptUsageRecorder("reasoning")
+
+        recorder.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+        recorder.on_llm_end(LLMResult(generations=[[ChatGeneration(message=AIMessage(content="no usage"))]]))
+
+        counters = metrics.snapshot()["counters"]
+        assert counters["llm.reasoning.prompt_tokens"] == 7000
+        assert counters["llm.reasoning.prompt_tokens_cached"] == 6500
+        assert counters["llm.reasoning.prompt_tokens_billed"] == 500
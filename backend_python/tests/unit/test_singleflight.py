@@ -0,0 +1,169 @@
+"""
+Unit Tests - Request Coalescing
+===============================
+Tests for SingleFlight and its use in media triage and downloads.
+"""
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src.core.metrics import metrics
+from src.utils.singleflight import SingleFlight, acontent_key, content_key
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def slow(result, delay: float = 0.05):
+    async def call(*args, **kwargs):
+        await asyncio.sleep(delay)
+        return result
+    return AsyncMock(side_effect=call)
+
+
+class TestSingleFlight:
+    """Test sharing, errors and cancellation of in-flight calls."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_duplicates_share_one_call(self):
+        """GIVEN three concurrent calls with the same key and one with another key
+        WHEN they run
+        THEN the work runs once per key and duplicates are counted as collapsed
+        """
+        flights = SingleFlight("test")
+        fn = slow("done")
+
+        results = await asyncio.gather(
+            flights.do("a", fn, 1), flights.do("a", fn, 1), flights.do("a", fn, 1), flights.do("b", fn, 2),
+        )
+
+        assert results == ["done"] * 4
+        assert fn.await_count == 2
+        assert metrics.get_counter("singleflight.test.leaders") == 2
+        assert metrics.get_counter("singleflight.test.collapsed") == 2
+        assert len(flights) == 0
+
+    @pytest.mark.asyncio
+    async def test_completed_calls_are_not_cached(self):
+        flights = SingleFlight("test")
+        fn = slow("done", delay=0)
+
+        await flights.do("a", fn)
+        await flights.do("a", fn)
+
+        assert fn.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_every_waiter(self):
+        flights = SingleFlight("test")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("model down")
+
+        results = await asyncio.gather(flights.do("a", fail), flights.do("a", fail), return_exceptions=True)
+
+        assert all(isinstance(r, ValueError) for r in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_shared_call(self):
+        """GIVEN two callers waiting on the same call
+        WHEN the first is cancelled (client disconnect)
+        THEN the second still gets the result; cancelling both cancels the call
+        """
+        flights = SingleFlight("test")
+        fn = slow("done", delay=0.05)
+
+        first = asyncio.create_task(flights.do("a", fn))
+        second = asyncio.create_task(flights.do("a", fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        assert await second == "done"
+
+        started = asyncio.Event()
+
+        async def forever():
+            started.set()
+            await asyncio.sleep(10)
+
+        only = asyncio.create_task(flights.do("b", forever))
+        await started.wait()
+        shared = flights._calls["b"].task
+        only.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await only
+        await asyncio.sleep(0)
+        assert shared.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_call_after_cancellation_starts_a_new_leader(self):
+        """GIVEN a shared call cancelled because its only waiter went away
+        WHEN the same key is requested before the cancellation completes
+        THEN a new call runs instead of joining the cancelled one
+        """
+        flights = SingleFlight("test")
+        started = asyncio.Event()
+
+        async def slow_once():
+            if not started.is_set():
+                started.set()
+                await asyncio.sleep(10)
+            return "fresh"
+
+        only = asyncio.create_task(flights.do("a", slow_once))
+        await started.wait()
+        only.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await only
+
+        assert await flights.do("a", slow_once) == "fresh"
+        assert metrics.get_counter("singleflight.test.leaders") == 2
+        assert len(flights) == 0
+
+    @pytest.mark.asyncio
+    async def test_content_key_covers_every_input(self):
+        image = b"\xff\xd8" * 10
+        key = content_key("model-a", "prompt v1", "image/jpeg", None, image)
+
+        assert key == await acontent_key("model-a", "prompt v1", "image/jpeg", None, image)
+        assert key != content_key("model-b", "prompt v1", "image/jpeg", None, image)
+        assert key != content_key("model-a", "prompt v2", "image/jpeg", None, image)
+        assert key != content_key("model-a", "prompt v1", "image/jpeg", {"trimRange": [0, 5]}, image)
+        assert key != content_key("model-a", "prompt v1", "image/jpeg", None, image + b"\x00")
+
+
+class TestCoalescedVisionCalls:
+    """Test coalescing of media triage and downloads."""
+
+    @pytest.mark.asyncio
+    async def test_identical_triage_calls_run_once(self):
+        from src.vision.triage import analyze_media_triage
+
+        analysis = {"success": True, "roomType": "kitchen", "keyFeatures": ["island"]}
+        with patch("src.vision.triage.analyze_image_triage", slow(analysis)) as mock_triage:
+            first, second = await asyncio.gather(
+                analyze_media_triage(b"image", "image/jpeg"),
+                analyze_media_triage(b"image", "image/jpeg"),
+            )
+            await analyze_media_triage(b"other image", "image/jpeg")
+
+        assert mock_triage.await_count == 2
+        assert first == second == analysis
+        assert first is not second and first["keyFeatures"] is not second["keyFeatures"]
+        assert metrics.get_counter("singleflight.triage.collapsed") == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_downloads_of_one_url_share_the_transfer(self):
+        from src.utils.download import download_image_smart
+
+        with patch("src.utils.download._download_image_smart", slow((b"bytes", "image/png"))) as mock_download:
+            results = await asyncio.gather(*(download_image_smart("https://x/room.png") for _ in range(3)))
+
+        assert results == [(b"bytes", "image/png")] * 3
+        assert mock_download.await_count == 1
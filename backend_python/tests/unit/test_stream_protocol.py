@@ -0,0 +1,101 @@
+"""
+Unit Tests - Stream Protocol
+============================
+The sync encoders must be byte-identical to the original json.dumps frames.
+"""
+import json
+import pytest
+from unittest.mock import patch
+
+from src.utils import stream_protocol
+from src.utils.stream_protocol import (
+    encode_batch,
+    encode_data,
+    encode_error,
+    encode_text,
+    encode_tool_call,
+    encode_tool_result,
+    stream_text,
+)
+
+SAMPLES = [
+    "Ciao",
+    "Perfetto! Ecco il render del tuo bagno in stile moderno 🛁",
+    'virgolette "doppie" e \\ backslash',
+    "righe\nmultiple\r\n\ttab\b\f",
+    "controllo \x00\x01\x1f e DEL \x7f",
+    "è à ù ò — “curly” … €",
+    "a" * 300,
+    ("Il bagno misura 3x2 metri, \"piastrelle\" grigie.\n" * 40),
+    ("Il bagno misura 3x2 metri.\x7f" * 40),
+    ("Soggiorno luminoso, parquet in rovere. " * 20) + "è",
+]
+
+
+def reference_frames(text):
+    """The original (pre-encoder) frame construction."""
+    return {
+        "text": f'0:{json.dumps(text)}\n',
+        "data": f'2:{json.dumps([{"message": text}])}\n',
+        "error": f'3:{json.dumps(text)}\n',
+        "tool_call": f'9:{json.dumps({"toolCallId": "call-1", "toolName": "generate_render", "args": {"prompt": text, "n": 1}})}\n',
+        "tool_result": f'a:{json.dumps({"toolCallId": "call-1", "result": text})}\n',
+    }
+
+
+class TestSyncEncoders:
+    """Test byte-for-byte compatibility with the json.dumps frames."""
+
+    @pytest.mark.parametrize("text", SAMPLES)
+    def test_frames_are_byte_identical(self, text):
+        """GIVEN ASCII, unicode, control-char and long payloads
+        WHEN encoded with the sync encoders
+        THEN every frame matches the json.dumps reference exactly
+        """
+        expected = reference_frames(text)
+
+        assert encode_text(text) == expected["text"]
+        assert encode_data({"message": text}) == expected["data"]
+        assert encode_error(text) == expected["error"]
+        assert encode_tool_call("call-1", "generate_render", {"prompt": text, "n": 1}) == expected["tool_call"]
+        assert encode_tool_result("call-1", text) == expected["tool_result"]
+
+    @pytest.mark.parametrize("text", SAMPLES)
+    def test_identical_without_orjson(self, text):
+        """GIVEN orjson is not installed
+        WHEN frames are encoded
+        THEN the output does not change
+        """
+        with patch.object(stream_protocol, "orjson", None):
+            assert encode_text(text) == reference_frames(text)["text"]
+
+    @pytest.mark.parametrize("result", [{"status": "ok", "url": "https://x/y.png"}, ["a", 1, None], 42, None, True])
+    def test_non_string_results(self, result):
+        assert encode_tool_result("c", result) == f'a:{json.dumps({"toolCallId": "c", "result": result})}\n'
+        assert encode_data(result) == f'2:{json.dumps([result])}\n'
+
+    def test_empty_text_is_not_framed(self):
+        assert encode_text("") == ""
+
+    def test_batch_concatenates_frames(self):
+        """GIVEN a mixed batch of events
+        WHEN encoded as one buffer
+        THEN it equals the concatenation of the single frames
+        """
+        events = [
+            ("text", ("Ecco ",)),
+            ("tool_call", ("c1", "analyze_room", {"image_url": "https://x/a.jpg"})),
+            ("tool_call", ("c2", "get_market_prices", {"query": "piastrelle"})),
+            ("tool_result", ("c1", "✅ Analisi completata")),
+            ("data", ({"type": "heartbeat"},)),
+        ]
+
+        buffer = encode_batch(events)
+
+        assert buffer == "".join(getattr(stream_protocol, f"encode_{kind}")(*args) for kind, args in events)
+        assert buffer.count("\n") == len(events)
+
+    @pytest.mark.asyncio
+    async def test_async_helpers_delegate(self):
+        frames = [chunk async for chunk in stream_text("Salve")]
+        assert frames == ['0:"Salve"\n']
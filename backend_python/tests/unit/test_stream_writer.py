@@ -0,0 +1,130 @@
+"""
+Unit Tests - Stream Writer
+==========================
+Tests for heartbeats, coalescing and backpressure of the chat stream writer.
+"""
+import asyncio
+import json
+import pytest
+
+from src.core.metrics import metrics
+from src.utils.stream_writer import StreamWriter
+
+
+async def frames_from(items, delay: float = 0.0, log=None):
+    try:
+        for item in items:
+            if delay:
+                await asyncio.sleep(delay)
+            if log is not None:
+                log.append(item)
+            yield item
+    finally:
+        if log is not None:
+            log.append("closed")
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class TestStreamWriter:
+    """Test the heartbeat / backpressure / coalescing writer."""
+
+    @pytest.mark.asyncio
+    async def test_frames_pass_through_in_order(self):
+        """GIVEN a source of frames consumed promptly
+        WHEN the writer drains it
+        THEN the concatenated output is identical to the source
+        """
+        source = [f'0:"tok{i}"\n' for i in range(20)]
+        out = [chunk async for chunk in StreamWriter(frames_from(source, delay=0.001))]
+
+        assert "".join(out) == "".join(source)
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_during_silence(self):
+        """GIVEN a source silent for longer than the heartbeat interval
+        WHEN the writer is consumed
+        THEN heartbeat data frames are interleaved and the real frame still arrives
+        """
+        async def slow_tool():
+            yield '0:"..."\n'
+            await asyncio.sleep(0.12)
+            yield 'a:{"toolCallId":"c1","result":"ok"}\n'
+
+        out = [chunk async for chunk in StreamWriter(slow_tool(), heartbeat_interval=0.03)]
+
+        heartbeats = [c for c in out if c.startswith("2:")]
+        assert len(heartbeats) >= 2
+        assert json.loads(heartbeats[0][2:])[0]["type"] == "heartbeat"
+        assert out[0] == '0:"..."\n' and out[-1].startswith("a:")
+        assert metrics.snapshot()["counters"]["chat.stream.heartbeats"] == len(heartbeats)
+
+    @pytest.mark.asyncio
+    async def test_slow_transport_coalesces_and_applies_backpressure(self):
+        """GIVEN a consumer slower than the producer and a small queue
+        WHEN 50 frames are streamed
+        THEN frames are coalesced into fewer writes and the producer waits on the queue
+        """
+        source = [f'0:"t{i}"\n' for i in range(50)]
+        writer = StreamWriter(frames_from(source), queue_size=4)
+        out = []
+        async for chunk in writer:
+            out.append(chunk)
+            await asyncio.sleep(0.002)  # transport send
+
+        assert "".join(out) == "".join(source)
+        assert len(out) < 50
+        assert writer.backpressure_waits > 0
+        counters = metrics.snapshot()["counters"]
+        assert counters["chat.stream.frames"] == 50
+        assert counters["chat.stream.writes"] == len(out)
+
+    @pytest.mark.asyncio
+    async def test_write_size_is_bounded(self):
+        """GIVEN many queued frames
+        WHEN they are coalesced
+        THEN no write grows past max_write_bytes plus one frame
+        """
+        source = ["0:\"" + "x" * 100 + "\"\n"] * 40
+        writer = StreamWriter(frames_from(source), queue_size=64, max_write_bytes=500)
+        out = []
+        async for chunk in writer:
+            out.append(chunk)
+            await asyncio.sleep(0.005)
+
+        assert max(len(c) for c in out) < 500 + len(source[0])
+
+    @pytest.mark.asyncio
+    async def test_consumer_close_closes_source(self):
+        """GIVEN the client goes away after the first write
+        WHEN the writer is closed
+        THEN the source generator is closed too (its finally runs)
+        """
+        log = []
+        stream = StreamWriter(frames_from([f"0:\"{i}\"\n" for i in range(100)], delay=0.001, log=log), queue_size=2).__aiter__()
+        await stream.__anext__()
+        await stream.aclose()
+
+        assert log[-1] == "closed"
+        assert len(log) < 100
+
+    @pytest.mark.asyncio
+    async def test_source_error_propagates(self):
+        """GIVEN a source that raises
+        WHEN the writer is consumed
+        THEN the frames before the error are delivered and the error re-raised
+        """
+        async def failing():
+            yield '0:"a"\n'
+            raise RuntimeError("boom")
+
+        out = []
+        with pytest.raises(RuntimeError, match="boom"):
+            async for chunk in StreamWriter(failing()):
+                out.append(chunk)
+        assert out == ['0:"a"\n']
@@ -0,0 +1,190 @@
+"""
+Unit Tests - Tool Executor
+==========================
+Tests for parallel, concurrency-bounded tool execution in the graph.
+"""
+import asyncio
+import time
+import pytest
+from typing import Annotated, TypedDict
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.tools import tool
+from langgraph.graph import END, StateGraph, add_messages
+
+from src.graph.tool_executor import ToolExecutor
+
+
+class ToolState(TypedDict, total=False):
+    messages: Annotated[list, add_messages]
+    session_id: str
+    user_id: str
+
+
+def tool_calls_state(calls, user_id="u-1"):
+    tool_calls = [{"id": f"call-{i}", "name": name, "args": args} for i, (name, args) in enumerate(calls)]
+    return {"messages": [AIMessage(content="", tool_calls=tool_calls)], "session_id": "s-1", "user_id": user_id}
+
+
+def tools_graph(executor):
+    workflow = StateGraph(ToolState)
+    workflow.add_node("tools", executor)
+    workflow.set_entry_point("tools")
+    workflow.add_edge("tools", END)
+    return workflow.compile()
+
+
+class ConcurrencyProbe:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def run(self, seconds):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.running -= 1
+
+
+class TestToolExecutor:
+    """Test fan-out, limits, ordering and streaming."""
+
+    @pytest.mark.asyncio
+    async def test_calls_run_concurrently_and_keep_call_order(self):
+        """GIVEN two tool calls where the first is slower
+        WHEN the executor runs them
+        THEN they overlap and the output keeps the tool-call order
+        """
+        @tool
+        async def analyze_room(image_url: str, delay: float) -> str:
+            """Analyze a room photo."""
+            await asyncio.sleep(delay)
+            return f"analyzed {image_url}"
+
+        executor = ToolExecutor([analyze_room])
+        start = time.perf_counter()
+        result = await tools_graph(executor).ainvoke(tool_calls_state([
+            ("analyze_room", {"image_url": "a.jpg", "delay": 0.15}),
+            ("analyze_room", {"image_url": "b.jpg", "delay": 0.05}),
+        ]))
+        elapsed = time.perf_counter() - start
+
+        tool_msgs = [m for m in result["messages"] if isinstance(m, ToolMessage)]
+        assert [m.tool_call_id for m in tool_msgs] == ["call-0", "call-1"]
+        assert tool_msgs[0].content == "analyzed a.jpg"
+        assert elapsed < 0.19
+
+    @pytest.mark.asyncio
+    async def test_results_stream_in_completion_order(self):
+        """GIVEN a slow and a fast call
+        WHEN the graph is streamed
+        THEN the fast result is emitted first on the custom channel
+        """
+        @tool
+        async def analyze_room(image_url: str, delay: float) -> str:
+            """Analyze a room photo."""
+            await asyncio.sleep(delay)
+            return image_url
+
+        graph = tools_graph(ToolExecutor([analyze_room]))
+        events = [
+            payload async for mode, payload in graph.astream(tool_calls_state([
+                ("analyze_room", {"image_url": "slow", "delay": 0.1}),
+                ("analyze_room", {"image_url": "fast", "delay": 0.01}),
+            ]), stream_mode=["custom", "updates"])
+            if mode == "custom"
+        ]
+
+        assert [e["content"] for e in events] == ["fast", "slow"]
+        assert events[0]["event"] == "tool_result" and events[0]["tool_call_id"] == "call-1"
+
+    @pytest.mark.asyncio
+    async def test_per_user_limit_serializes_expensive_tool(self):
+        """GIVEN generate_render limited to 1 per user
+        WHEN one user requests three renders at once
+        THEN they never overlap, while another user's render is not blocked
+        """
+        probe = ConcurrencyProbe()
+
+        @tool
+        async def generate_render(prompt: str) -> str:
+            """Generate a render."""
+            await probe.run(0.03)
+            return f"✅ {prompt}"
+
+        executor = ToolExecutor([generate_render], user_limits={"generate_render": 1})
+        graph = tools_graph(executor)
+        renders = [("generate_render", {"prompt": p}) for p in ("a", "b", "c")]
+
+        result = await graph.ainvoke(tool_calls_state(renders))
+        assert probe.peak == 1
+        assert [m.content for m in result["messages"][1:]] == ["✅ a", "✅ b", "✅ c"]
+
+        probe.peak = 0
+        await asyncio.gather(
+            graph.ainvoke(tool_calls_state(renders[:1], user_id="u-1")),
+            graph.ainvoke(tool_calls_state(renders[:1], user_id="u-2")),
+        )
+        assert probe.peak == 2
+
+    @pytest.mark.asyncio
+    async def test_process_and_tool_limits(self):
+        """GIVEN a global limit of 3 and a per-tool limit of 1 for generate_cad
+        WHEN many calls are issued
+        THEN neither bound is exceeded
+        """
+        total, cad = ConcurrencyProbe(), ConcurrencyProbe()
+
+        @tool
+        async def analyze_room(image_url: str) -> str:
+            """Analyze a room photo."""
+            await total.run(0.02)
+            return "ok"
+
+        @tool
+        async def generate_cad(image_url: str) -> str:
+            """Generate a CAD file."""
+            await asyncio.gather(total.run(0.02), cad.run(0.02))
+            return "ok"
+
+        executor = ToolExecutor([analyze_room, generate_cad], max_concurrency=3, tool_limits={"generate_cad": 1})
+        calls = [("analyze_room", {"image_url": str(i)}) for i in range(6)]
+        calls += [("generate_cad", {"image_url": str(i)}) for i in range(3)]
+
+        await tools_graph(executor).ainvoke(tool_calls_state(calls))
+
+        assert cad.peak == 1
+        assert total.peak == 3
+
+    @pytest.mark.asyncio
+    async def test_failing_tool_cancels_siblings(self):
+        """GIVEN a tool that raises while a slow sibling runs
+        WHEN the executor gathers them
+        THEN the error propagates (as with ToolNode) and the sibling is cancelled
+        """
+        cancelled = []
+
+        @tool
+        async def get_market_prices(query: str) -> str:
+            """Market prices."""
+            raise ValueError("upstream down")
+
+        @tool
+        async def generate_render(prompt: str) -> str:
+            """Generate a render."""
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(prompt)
+                raise
+            return "✅"
+
+        graph = tools_graph(ToolExecutor([get_market_prices, generate_render]))
+        with pytest.raises(ValueError, match="upstream down"):
+            await graph.ainvoke(tool_calls_state([
+                ("generate_render", {"prompt": "bagno"}),
+                ("get_market_prices", {"query": "parquet"}),
+            ]))
+
+        assert cancelled == ["bagno"]
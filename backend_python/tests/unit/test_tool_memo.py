@@ -0,0 +1,107 @@
+"""
+Unit Tests - Tool Result Memo
+=============================
+Tests for the per-session memo of idempotent tool results.
+"""
+import pytest
+from unittest.mock import patch
+from langchain_core.messages import ToolMessage
+
+from src.core.metrics import metrics
+from src.graph.tool_memo import ToolResultMemo, canonical_args
+
+
+def result(content, status="success"):
+    return ToolMessage(content=content, tool_call_id="call-1", status=status)
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class TestToolResultMemo:
+    """Test memo keys, TTLs, failures and invalidation."""
+
+    def test_args_are_canonicalized(self):
+        """GIVEN the same arguments in a different order
+        WHEN looked up
+        THEN they hit the same entry
+        """
+        memo = ToolResultMemo(ttls={"get_market_prices": 60})
+        memo.put("u-1", "s-1", "get_market_prices", {"query": "parquet", "user_id": "u"}, result("35 €/m²"))
+
+        assert memo.get("u-1", "s-1", "get_market_prices", {"user_id": "u", "query": "parquet"}) == "35 €/m²"
+        assert canonical_args({"b": 1, "a": 2}) == canonical_args({"a": 2, "b": 1})
+        assert metrics.snapshot()["counters"]["agent.tool_memo.hits.get_market_prices"] == 1
+
+    def test_sessions_are_isolated(self):
+        memo = ToolResultMemo(ttls={"analyze_room": 60})
+        memo.put("u-1", "s-1", "analyze_room", {"image_url": "u"}, result("kitchen"))
+
+        assert memo.get("u-1", "s-2", "analyze_room", {"image_url": "u"}) is None
+
+    def test_users_sharing_a_session_id_are_isolated(self):
+        """GIVEN a listing memoized for user A in session s-1
+        WHEN user B posts the same session id
+        THEN B misses (the tool runs with B's ownership checks)
+        """
+        memo = ToolResultMemo(ttls={"list_project_files": 60})
+        memo.put("user-a", "s-1", "list_project_files", {"session_id": "s-1"}, result("3 files"))
+
+        assert memo.get("user-b", "s-1", "list_project_files", {"session_id": "s-1"}) is None
+        assert memo.get("user-a", "s-1", "list_project_files", {"session_id": "s-1"}) == "3 files"
+
+        memo.invalidate("user-b", "s-1")
+        assert memo.get("user-a", "s-1", "list_project_files", {"session_id": "s-1"}) == "3 files"
+
+    def test_tools_without_ttl_are_never_memoized(self):
+        """GIVEN a tool with no TTL (e.g. generate_render)
+        WHEN its result is stored
+        THEN it is rejected and lookups bypass the memo
+        """
+        memo = ToolResultMemo(ttls={"analyze_room": 60, "generate_render": 0})
+
+        assert memo.put("u-1", "s-1", "generate_render", {"prompt": "x"}, result("✅")) is False
+        assert memo.get("u-1", "s-1", "generate_render", {"prompt": "x"}) is None
+        assert memo.stats()["misses"] == 0
+
+    def test_failures_are_not_memoized(self):
+        memo = ToolResultMemo(ttls={"get_market_prices": 60})
+
+        assert memo.put("u-1", "s-1", "get_market_prices", {"query": "a"}, result("❌ Errore: timeout")) is False
+        assert memo.put("u-1", "s-1", "get_market_prices", {"query": "b"}, result("boom", status="error")) is False
+
+    def test_entries_expire_after_ttl(self):
+        memo = ToolResultMemo(ttls={"list_project_files": 10})
+        with patch("src.graph.tool_memo.time.monotonic", return_value=100.0):
+            memo.put("u-1", "s-1", "list_project_files", {"session_id": "s-1"}, result("3 files"))
+        with patch("src.graph.tool_memo.time.monotonic", return_value=111.0):
+            assert memo.get("u-1", "s-1", "list_project_files", {"session_id": "s-1"}) is None
+
+    def test_invalidation_by_mutating_tool(self):
+        """GIVEN memoized listing and analysis results
+        WHEN a render runs in the session
+        THEN only the listing results are dropped
+        """
+        memo = ToolResultMemo(
+            ttls={"list_project_files": 60, "analyze_room": 60},
+            invalidations={"generate_render": ["list_project_files"]}
+        )
+        memo.put("u-1", "s-1", "list_project_files", {}, result("3 files"))
+        memo.put("u-1", "s-1", "analyze_room", {"image_url": "u"}, result("kitchen"))
+
+        memo.record_execution("u-1", "s-1", "generate_render")
+
+        assert memo.get("u-1", "s-1", "list_project_files", {}) is None
+        assert memo.get("u-1", "s-1", "analyze_room", {"image_url": "u"}) == "kitchen"
+
+    def test_sessions_are_bounded_lru(self):
+        memo = ToolResultMemo(ttls={"analyze_room": 60}, max_sessions=2)
+        for session in ("s-1", "s-2", "s-3"):
+            memo.put("u-1", session, "analyze_room", {}, result(session))
+
+        assert memo.get("u-1", "s-1", "analyze_room", {}) is None
+        assert memo.stats()["sessions"] == 2
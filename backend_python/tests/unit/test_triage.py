@@ -7,6 +7,15 @@ import pytest
 import json
 from unittest.mock import MagicMock, patch, AsyncMock
 from src.vision.triage import analyze_image_triage
+from src.vision.triage_cache import triage_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_triage_cache():
+    """Every test analyzes the same sample image: start from an empty cache."""
+    triage_cache.clear()
+    yield
+    triage_cache.clear()
 
 
 class TestImageTriage:
@@ -40,7 +49,7 @@ class TestImageTriage:
         
         # Patch both the Client and the module-level API key constant
         with patch('src.vision.triage.GEMINI_API_KEY', 'test-key'):
-            with patch('src.vision.triage.genai.Client', return_value=mock_client):
+            with patch('src.vision.triage.genai_registry.client', return_value=mock_client):
                 # Act
                 result = await analyze_image_triage(sample_image_bytes)
         
@@ -81,7 +90,7 @@ class TestImageTriage:
         mock_client.aio.models = mock_models
         
         with patch('src.vision.triage.GEMINI_API_KEY', 'test-key'):
-            with patch('src.vision.triage.genai.Client', return_value=mock_client):
+            with patch('src.vision.triage.genai_registry.client', return_value=mock_client):
                 # Act
                 result = await analyze_image_triage(sample_image_bytes)
         
@@ -108,7 +117,7 @@ class TestImageTriage:
         mock_client.aio.models = mock_models
         
         with patch('src.vision.triage.GEMINI_API_KEY', 'test-key'):
-            with patch('src.vision.triage.genai.Client', return_value=mock_client):
+            with patch('src.vision.triage.genai_registry.client', return_value=mock_client):
                 # Act
                 result = await analyze_image_triage(sample_image_bytes)
         
@@ -138,7 +147,7 @@ class TestImageTriage:
         mock_client.aio.models = mock_models
         
         with patch('src.vision.triage.GEMINI_API_KEY', 'test-key'):
-            with patch('src.vision.triage.genai.Client', return_value=mock_client):
+            with patch('src.vision.triage.genai_registry.client', return_value=mock_client):
                 # Act
                 result = await analyze_image_triage(sample_image_bytes)
         
@@ -167,7 +176,7 @@ class TestImageTriage:
         mock_client.aio.models = mock_models
         
         with patch('src.vision.triage.GEMINI_API_KEY', 'test-key'):
-            with patch('src.vision.triage.genai.Client', return_value=mock_client):
+            with patch('src.vision.triage.genai_registry.client', return_value=mock_client):
                 # Act
                 result = await analyze_image_triage(sample_image_bytes)
         
@@ -199,7 +208,7 @@ class TestImageTriage:
         mock_client.aio.models = mock_models
         
         with patch('src.vision.triage.GEMINI_API_KEY', 'test-key'):
-            with patch('src.vision.triage.genai.Client', return_value=mock_client):
+            with patch('src.vision.triage.genai_registry.client', return_value=mock_client):
                 # Act
                 result = await analyze_image_triage(sample_image_bytes)
         
@@ -0,0 +1,134 @@
+"""
+Unit Tests - Triage Cache
+=========================
+Tests for the content-addressed triage result cache and its tiers.
+"""
+import json
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.core.metrics import metrics
+from src.vision.triage import analyze_image_triage
+from src.vision.triage_cache import FileTriageStore, TriageCache, prompt_version, triage_cache, triage_key
+
+ANALYSIS = {"success": True, "roomType": "bathroom", "currentStyle": "classic", "keyFeatures": ["tub"]}
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    metrics.reset()
+    triage_cache.clear()
+    yield
+    triage_cache.clear()
+    metrics.reset()
+
+
+def gemini_client(payload: dict) -> MagicMock:
+    response = MagicMock()
+    response.text = json.dumps(payload)
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(return_value=response)
+    return client
+
+
+class TestTriageCache:
+    """Test keys, tiers and what gets cached."""
+
+    @pytest.mark.asyncio
+    async def test_key_depends_on_image_and_prompt_version(self):
+        v1 = prompt_version("prompt", "gemini-3-flash-preview")
+
+        assert await triage_key(b"img", v1) == await triage_key(b"img", v1)
+        assert await triage_key(b"img", v1) != await triage_key(b"img2", v1)
+        assert await triage_key(b"img", v1) != await triage_key(b"img", prompt_version("prompt v2", "gemini-3-flash-preview"))
+        assert v1 != prompt_version("prompt", "gemini-2.5-flash")
+
+    @pytest.mark.asyncio
+    async def test_failures_are_never_cached(self):
+        cache = TriageCache()
+
+        await cache.put("k", {**ANALYSIS, "success": False})
+
+        assert await cache.get("k") is None
+        assert metrics.get_counter("triage_cache.skipped_failures") == 1
+
+    @pytest.mark.asyncio
+    async def test_hits_are_copies_and_lru_evicts(self):
+        cache = TriageCache(max_entries=2)
+        await cache.put("a", ANALYSIS)
+
+        hit = await cache.get("a")
+        hit["keyFeatures"].append("mutated")
+        await cache.put("b", ANALYSIS)
+        await cache.put("c", ANALYSIS)
+
+        assert await cache.get("a") is None
+        assert (await cache.get("b"))["keyFeatures"] == ["tub"]
+
+    @pytest.mark.asyncio
+    async def test_file_store_survives_restart(self, tmp_path):
+        """GIVEN a result cached with a file store
+        WHEN a new cache (fresh process) reads the same directory
+        THEN the result comes from the store and is promoted to memory
+        """
+        await TriageCache(store=FileTriageStore(str(tmp_path))).put("k", ANALYSIS)
+        restarted = TriageCache(store=FileTriageStore(str(tmp_path)))
+
+        assert await restarted.get("k") == ANALYSIS
+        assert await restarted.get("k") == ANALYSIS
+        assert metrics.get_counter("triage_cache.hits.store") == 1
+        assert metrics.get_counter("triage_cache.hits.memory") == 1
+
+    @pytest.mark.asyncio
+    async def test_expired_file_entries_are_misses(self, tmp_path):
+        store = FileTriageStore(str(tmp_path))
+        await store.put("k", ANALYSIS, ttl_s=-1)
+
+        assert await store.get("k") is None
+        assert not list(tmp_path.iterdir())
+
+    @pytest.mark.asyncio
+    async def test_store_errors_degrade_to_misses(self):
+        store = MagicMock()
+        store.get = AsyncMock(side_effect=RuntimeError("firestore down"))
+        store.put = AsyncMock(side_effect=RuntimeError("firestore down"))
+        cache = TriageCache(store=store)
+
+        await cache.put("k", ANALYSIS)
+
+        assert await cache.get("k") == ANALYSIS  # Still in memory
+        assert await cache.get("other") is None
+        assert metrics.get_counter("triage_cache.store_errors") == 2
+
+
+class TestCachedTriage:
+    """Test analyze_image_triage with the cache."""
+
+    @pytest.mark.asyncio
+    async def test_same_image_is_analyzed_once(self, sample_image_bytes):
+        """GIVEN an image analyzed once (analyze_room)
+        WHEN it is triaged again (generate_render in modification mode)
+        THEN the model is not called again
+        """
+        client = gemini_client({"roomType": "bathroom", "currentStyle": "classic"})
+
+        with patch("src.vision.triage.GEMINI_API_KEY", "test-key"), \
+                patch("src.vision.triage.genai_registry.client", return_value=client):
+            first = await analyze_image_triage(sample_image_bytes)
+            second = await analyze_image_triage(sample_image_bytes)
+
+        assert client.aio.models.generate_content.await_count == 1
+        assert first == second and second["roomType"] == "bathroom"
+
+    @pytest.mark.asyncio
+    async def test_fallback_results_are_retried(self, sample_image_bytes):
+        client = MagicMock()
+        client.aio.models.generate_content = AsyncMock(side_effect=RuntimeError("429 RESOURCE_EXHAUSTED"))
+
+        with patch("src.vision.triage.GEMINI_API_KEY", "test-key"), \
+                patch("src.vision.triage.genai_registry.client", return_value=client):
+            assert (await analyze_image_triage(sample_image_bytes))["success"] is False
+            assert (await analyze_image_triage(sample_image_bytes))["success"] is False
+
+        assert client.aio.models.generate_content.await_count == 2
@@ -0,0 +1,163 @@
+"""
+Unit Tests - Usage Accounting
+=============================
+Tests for token/cost attribution per turn, node and tool, and rollup flushing.
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.tools import tool
+from langgraph.graph import END, StateGraph
+
+from src.core.metrics import metrics
+from src.core.usage import TokenUsage, UsageAccountant, UsageFlusher, usage_accountant, usage_scope
+from src.graph.state import AgentState
+from src.graph.tool_executor import ToolExecutor
+from src.services.prompt_cache import PromptUsageRecorder
+
+PRICES = {"gemini-x": [1.0, 0.1, 10.0]}
+
+
+def usage(input_tokens=1000, cached=0, output=100) -> TokenUsage:
+    return TokenUsage(calls=1, input_tokens=input_tokens, cached_tokens=cached, output_tokens=output)
+
+
+class RecordingSink:
+    def __init__(self, fail=False):
+        self.rows = []
+        self.fail = fail
+
+    async def write(self, rows):
+        if self.fail:
+            raise RuntimeError("sink down")
+        self.rows.extend(rows)
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    usage_accountant.drain()
+
+
+class TestTokenUsage:
+    """Test provider usage normalization."""
+
+    def test_genai_usage_folds_thoughts_and_tool_prompts(self):
+        raw = SimpleNamespace(
+            prompt_token_count=900, tool_use_prompt_token_count=100, cached_content_token_count=400,
+            candidates_token_count=50, thoughts_token_count=30,
+        )
+
+        parsed = TokenUsage.from_genai(raw)
+
+        assert (parsed.input_tokens, parsed.cached_tokens, parsed.output_tokens, parsed.thoughts_tokens) == (1000, 400, 80, 30)
+        assert TokenUsage.from_genai(None) is None
+
+    def test_cost_bills_cached_tokens_at_cached_price(self):
+        accountant = UsageAccountant(prices=PRICES)
+
+        assert accountant.cost("gemini-x", usage(1000, cached=400, output=100)) == pytest.approx((600 * 1.0 + 400 * 0.1 + 100 * 10.0) / 1e6)
+        assert accountant.cost("unknown-model", usage()) == 0.0
+
+
+class TestAttribution:
+    """Test turn, node and tool attribution."""
+
+    def test_turn_totals_and_dimensions(self):
+        """GIVEN an open turn
+        WHEN a node call and a tool call are recorded
+        THEN the turn totals, per-dimension counters and rollups see both
+        """
+        accountant = UsageAccountant(prices=PRICES)
+        turn = accountant.start_turn("s-1", "u-1")
+
+        accountant.record("models/gemini-x", usage(), node="reasoning")
+        with usage_scope(node="tools", tool="generate_render"):
+            accountant.record("gemini-x", usage(2000, output=500), operation="generate_image_i2i")
+        accountant.finish_turn(turn)
+
+        assert turn.total.calls == 2 and turn.total.total_tokens == 3600
+        assert set(turn.by_step) == {"reasoning", "generate_render"}
+        counters = metrics.snapshot()["counters"]
+        assert counters["usage.tool.generate_render.input_tokens"] == 2000
+        assert counters["usage.node.reasoning.output_tokens"] == 100
+        assert counters["usage.model.gemini-x.cost_usd"] == pytest.approx(turn.total.cost_usd)
+        assert metrics.snapshot()["summaries"]["usage.turn.total_tokens"]["max"] == 3600
+
+        rows = accountant.drain()
+        i2i = next(r for r in rows if r["operation"] == "generate_image_i2i")
+        assert (i2i["session_id"], i2i["user_id"], i2i["node"], i2i["tool"]) == ("s-1", "u-1", "tools", "generate_render")
+        assert accountant.drain() == []
+
+    def test_execution_callback_feeds_the_accountant(self):
+        message = AIMessage(content="ok", response_metadata={"model_name": "gemini-2.5-flash"}, usage_metadata={
+            "input_tokens": 500, "output_tokens": 20, "total_tokens": 520,
+        })
+
+        PromptUsageRecorder("execution").on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+
+        counters = metrics.snapshot()["counters"]
+        assert counters["usage.node.execution.input_tokens"] == 500
+        assert counters["usage.model.gemini-2.5-flash.output_tokens"] == 20
+
+    @pytest.mark.asyncio
+    async def test_tool_executor_scopes_model_calls_to_the_tool(self):
+        @tool
+        async def analyze_room(image_url: str) -> str:
+            """Analyze a room image."""
+            usage_accountant.record("gemini-x", usage(), operation="analyze_image_triage")
+            return "living room"
+
+        workflow = StateGraph(AgentState)
+        workflow.add_node("tools", ToolExecutor([analyze_room]))
+        workflow.set_entry_point("tools")
+        workflow.add_edge("tools", END)
+        await workflow.compile().ainvoke({
+            "messages": [AIMessage(content="", tool_calls=[{"id": "c1", "name": "analyze_room", "args": {"image_url": "u"}}])],
+            "session_id": "s-1", "user_id": "u-1",
+        })
+
+        rows = usage_accountant.drain()
+        assert [(r["node"], r["tool"], r["operation"]) for r in rows] == [("tools", "analyze_room", "analyze_image_triage")]
+
+
+class TestUsageFlusher:
+    """Test periodic flushing to the sink."""
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_rollups(self):
+        accountant = UsageAccountant(prices=PRICES)
+        sink = RecordingSink()
+        accountant.record("gemini-x", usage(), node="execution")
+        accountant.record("gemini-x", usage(), node="execution")
+
+        assert await UsageFlusher(accountant, sink).flush() == 1
+        assert sink.rows[0]["calls"] == 2 and sink.rows[0]["input_tokens"] == 2000
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_rows(self):
+        accountant = UsageAccountant(prices=PRICES)
+        accountant.record("gemini-x", usage(), node="execution")
+        flusher = UsageFlusher(accountant, RecordingSink(fail=True))
+
+        assert await flusher.flush() == 0
+        flusher.sink = RecordingSink()
+        assert await flusher.flush() == 1
+        assert metrics.snapshot()["counters"]["usage.flush.errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_background_task_flushes_on_stop(self):
+        accountant = UsageAccountant(prices=PRICES)
+        sink = RecordingSink()
+        flusher = UsageFlusher(accountant, sink, interval=0.01)
+        flusher.start()
+        accountant.record("gemini-x", usage(), node="execution")
+
+        await asyncio.sleep(0.05)
+        accountant.record("gemini-x", usage(), node="reasoning")
+        await flusher.stop()
+
+        assert sum(r["calls"] for r in sink.rows) == 2
+        assert not flusher.running
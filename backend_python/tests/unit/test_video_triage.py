@@ -145,7 +145,7 @@ class TestGeminiVideoAnalysis:
         mock_client.aio.files.delete = AsyncMock()
         
         with patch('src.vision.video_triage.GEMINI_API_KEY', 'test-key'):
-            with patch('src.vision.video_triage.genai.Client', return_value=mock_client):
+            with patch('src.vision.video_triage.genai_registry.client', return_value=mock_client):
                 result = await analyze_video_with_gemini(str(video_file))
         
         # Assert
@@ -164,8 +164,8 @@ class TestGeminiVideoAnalysis:
         video_file.write_bytes(b"fake video")
         
         with patch('src.vision.video_triage.GEMINI_API_KEY', 'test-key'):
-            with patch('src.vision.video_triage.genai.Client') as mock_client_class:
-                mock_client = mock_client_class.return_value
+            with patch('src.vision.video_triage.genai_registry.client') as mock_get_client:
+                mock_client = mock_get_client.return_value
                 mock_client.aio.files.upload = AsyncMock(side_effect=Exception("API Error"))
                 
                 result = await analyze_video_with_gemini(str(video_file))
@@ -0,0 +1,102 @@
+"""
+Benchmark: burst of Gemini calls against a throttling model, with and without
+admission control.
+
+Runs against the local fake Gemini server (tests/fake_gemini_server.py),
+which serves `--capacity` concurrent requests and answers 429 above that.
+
+- "unthrottled": every call goes straight to the model (what triage did:
+                 a 429 becomes the canned "contemporary / good" fallback).
+- "admitted":    calls go through AdmissionController; the AIMD limit starts
+                 at --start-limit and adapts to the 429s.
+
+Usage:
+    python tests_manual/benchmark_admission.py [--calls 60] [--capacity 4] [--start-limit 16]
+"""
+import argparse
+import asyncio
+import contextlib
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from google import genai
+from google.genai import types
+
+from src.core.admission import AdmissionController
+from src.core.metrics import metrics
+from tests.fake_gemini_server import FakeGeminiServer
+
+MODEL = "gemini-3-flash-preview"
+
+
+async def burst(server: FakeGeminiServer, calls: int, controller=None) -> dict:
+    client = genai.Client(api_key="bench-key", http_options=types.HttpOptions(
+        base_url=server.url, retry_options=types.HttpRetryOptions(attempts=1),
+    ))
+    outcomes = {"ok": 0, "throttled": 0, "timeouts": 0}
+    latencies = []
+
+    async def call():
+        start = time.perf_counter()
+        slot = controller.slot(MODEL, 500) if controller else contextlib.nullcontext()
+        try:
+            async with slot:
+                await client.aio.models.generate_content(model=MODEL, contents="hi")
+            outcomes["ok"] += 1
+        except genai.errors.ClientError:
+            outcomes["throttled"] += 1
+        except Exception:
+            outcomes["timeouts"] += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(calls)))
+    elapsed = time.perf_counter() - start
+    await client.aio.aclose()
+    latencies.sort()
+    return {
+        **outcomes,
+        "elapsed_s": elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+def report(label: str, result: dict) -> None:
+    print(
+        f"  {label:<12} ok {result['ok']:4d} | 429 {result['throttled']:4d} | timeouts {result['timeouts']:3d}"
+        f" | p50 {result['p50']:7.1f}ms | p95 {result['p95']:7.1f}ms | total {result['elapsed_s']:.2f}s"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=60)
+    parser.add_argument("--capacity", type=int, default=4, help="Concurrent requests the fake model serves")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per fake request")
+    parser.add_argument("--start-limit", type=int, default=16, help="Initial (and max) AIMD concurrency")
+    parser.add_argument("--deadline", type=float, default=30.0)
+    args = parser.parse_args()
+
+    print(f"\n🚦 Burst of {args.calls} calls, model capacity {args.capacity}, {args.latency * 1000:.0f}ms per call\n")
+
+    with FakeGeminiServer(capacity=args.capacity, latency_s=args.latency) as server:
+        report("unthrottled", await burst(server, args.calls))
+
+        controller = AdmissionController(
+            limits={MODEL: {"max_concurrency": args.start_limit}}, deadline_s=args.deadline,
+        )
+        for wave in (1, 2):
+            report(f"admitted #{wave}", await burst(server, args.calls, controller))
+
+    wait = metrics.snapshot()["summaries"].get(f"admission.{MODEL}.wait_ms", {})
+    print(f"\n  Queue wait: p50 {wait.get('p50', 0):.1f}ms | p95 {wait.get('p95', 0):.1f}ms")
+    print(f"  Final AIMD limit: {controller.snapshot()[MODEL]['limit']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
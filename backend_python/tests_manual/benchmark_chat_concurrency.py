@@ -0,0 +1,158 @@
+"""
+Benchmark: concurrent /chat/stream sessions per uvicorn worker.
+
+Drives the real FastAPI app in-process (httpx ASGITransport, one event loop =
+one uvicorn worker) with a fake Gemini model that holds every call for
+--latency seconds. Each turn goes Reasoning -> Execution (2 model calls).
+
+Compares the blocking (sync .invoke) and non-blocking (async .ainvoke) graph
+nodes. A concurrency level is "sustained" when the p95 turn latency stays
+within --slo x the ideal latency (2 x model latency).
+
+Usage:
+    python tests_manual/benchmark_chat_concurrency.py [--latency 0.5] [--threads 5]
+
+--threads emulates the worker's default thread pool (min(32, cpus + 4); a
+1-vCPU Cloud Run instance gets 5).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-key")
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from src.graph.factory import AgentGraphFactory
+from src.models.reasoning import ReasoningStep
+
+LATENCY_S = 0.5
+PLAN = ReasoningStep(analysis="benchmark", action="ask_user", confidence_score=1.0)
+
+
+class SlowFakeGemini(BaseChatModel):
+    """Holds each call for LATENCY_S: time.sleep on the sync path, asyncio.sleep on the async path."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake-gemini"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(LATENCY_S)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="Risposta di prova."))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(LATENCY_S)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="Risposta di prova."))])
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self
+
+    def with_structured_output(self, schema, **kwargs):
+        def _plan(messages):
+            time.sleep(LATENCY_S)
+            return PLAN
+
+        async def _aplan(messages):
+            await asyncio.sleep(LATENCY_S)
+            return PLAN
+
+        return RunnableLambda(_plan, afunc=_aplan)
+
+
+def make_repo() -> MagicMock:
+    """In-memory repository stand-in (Firestore is out of scope here)."""
+    repo = MagicMock()
+    repo.load_session = AsyncMock(return_value=None)
+    repo.ensure_session = AsyncMock(return_value={"messageCount": 0})
+    repo.get_context = AsyncMock(return_value=[])
+    repo.save_messages_batch = AsyncMock(return_value=None)
+    repo.save_file_metadata = AsyncMock(return_value=None)
+    repo.save_session_summary = AsyncMock(return_value=None)
+    return repo
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int) -> list[float]:
+    payload = {
+        "messages": [{"role": "user", "content": "Vorrei un consiglio per ristrutturare il bagno di casa"}],
+        "sessionId": "benchmark-session",
+    }
+
+    async def one_turn() -> float:
+        start = time.perf_counter()
+        async with client.stream("POST", "/chat/stream", json=payload) as response:
+            async for _ in response.aiter_bytes():
+                pass
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(one_turn() for _ in range(concurrency)))
+
+
+async def benchmark(use_async_nodes: bool, levels: list[int], threads: int, slo: float) -> int:
+    with patch("src.core.logger.setup_logging"):  # keep server_debug.log untouched
+        from main import app
+    from src.services.agent_orchestrator import AgentOrchestrator, get_orchestrator
+
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=threads))
+    logging.basicConfig(level=logging.ERROR, force=True)
+
+    graph = AgentGraphFactory(
+        SlowFakeGemini(), SlowFakeGemini(), tools=[], use_async_nodes=use_async_nodes
+    ).create_graph()
+    app.dependency_overrides[get_orchestrator] = lambda: AgentOrchestrator(make_repo())
+
+    label = "async nodes" if use_async_nodes else "sync nodes "
+    ideal = 2 * LATENCY_S
+    sustained = 0
+    transport = httpx.ASGITransport(app=app)
+    with patch("src.services.agent_orchestrator.get_agent_graph", return_value=graph):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for level in levels:
+                wall_start = time.perf_counter()
+                durations = sorted(await run_level(client, level))
+                wall = time.perf_counter() - wall_start
+                p95 = durations[min(len(durations) - 1, int(0.95 * len(durations)))]
+                ok = p95 <= slo * ideal
+                if ok:
+                    sustained = level
+                print(
+                    f"  [{label}] concurrency={level:4d}  p50={statistics.median(durations):6.2f}s  "
+                    f"p95={p95:6.2f}s  throughput={level / wall:7.1f} turns/s  {'OK' if ok else 'SATURATED'}"
+                )
+    app.dependency_overrides.clear()
+    return sustained
+
+
+def main():
+    global LATENCY_S
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated Gemini latency per call (s)")
+    parser.add_argument("--threads", type=int, default=min(32, (os.cpu_count() or 1) + 4))
+    parser.add_argument("--slo", type=float, default=1.5, help="Allowed p95 / ideal latency ratio")
+    parser.add_argument("--levels", type=str, default="1,4,8,16,32,64,128,256")
+    args = parser.parse_args()
+
+    LATENCY_S = args.latency
+    levels = [int(x) for x in args.levels.split(",")]
+
+    print(f"🏁 /chat/stream concurrency benchmark (latency={LATENCY_S}s/call, threads={args.threads})")
+    before = asyncio.run(benchmark(False, levels, args.threads, args.slo))
+    after = asyncio.run(benchmark(True, levels, args.threads, args.slo))
+    print(f"\n📊 Sustained concurrent sessions per worker: sync={before}  async={after}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: agent graph checkpoint read/write latency.
+
+Runs a conversation through a one-node graph compiled with each checkpointer
+and reports the saver latencies recorded by the savers themselves:
+- agent.checkpoint.put_ms: write of one checkpoint (several per turn)
+- agent.checkpoint.get_ms: load of the latest checkpoint (once per turn)
+
+Messages are sized like real turns (user text + a few hundred characters of
+reply), so the checkpoint grows until CHECKPOINT_MAX_MESSAGES-style trimming
+would kick in.
+
+Backends: sqlite in memory, sqlite on a file (WAL), and, with --firestore,
+the Firestore saver against the configured project (needs credentials).
+
+Usage:
+    python tests_manual/benchmark_checkpointer.py [--turns 50] [--firestore]
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, StateGraph
+
+from src.core.metrics import metrics
+from src.graph.checkpointer import FirestoreCheckpointSaver, SQLiteCheckpointSaver
+from src.graph.state import AgentState
+
+REPLY = "Per un bagno moderno di 3x2 metri suggerisco piastrelle in gres grigio chiaro, doccia walk-in e mobile sospeso. " * 4
+
+
+def build_graph(checkpointer):
+    async def execution(state: AgentState):
+        return {
+            "messages": [AIMessage(content=REPLY)],
+            "internal_plan": [{"action": "ask_user", "analysis": "Rispondo con una proposta di layout."}],
+            "thought_log": ["L'utente vuole un bagno moderno."],
+        }
+
+    workflow = StateGraph(AgentState)
+    workflow.add_node("execution", execution)
+    workflow.set_entry_point("execution")
+    workflow.add_edge("execution", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+async def run(label: str, checkpointer, turns: int) -> None:
+    metrics.reset()
+    graph = build_graph(checkpointer)
+    config = {"configurable": {"thread_id": f"bench-{time.time_ns()}"}}
+
+    start = time.perf_counter()
+    for turn in range(turns):
+        await graph.aget_state(config)  # What the orchestrator does at turn start
+        await graph.ainvoke({"messages": [HumanMessage(content=f"Domanda {turn}: e il pavimento?")]}, config)
+    elapsed = time.perf_counter() - start
+
+    summaries = metrics.snapshot()["summaries"]
+    put, get = summaries["agent.checkpoint.put_ms"], summaries["agent.checkpoint.get_ms"]
+    print(f"  {label:<14} put avg {put['avg']:6.2f}ms p95 {put['p95']:6.2f}ms | "
+          f"get avg {get['avg']:6.2f}ms p95 {get['p95']:6.2f}ms | "
+          f"{elapsed / turns * 1000:6.2f}ms/turn ({put['count']} puts)")
+    if isinstance(checkpointer, FirestoreCheckpointSaver):
+        await checkpointer.adelete_thread(config["configurable"]["thread_id"])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--firestore", action="store_true", help="Also benchmark the Firestore saver (real project)")
+    args = parser.parse_args()
+
+    print(f"🏁 Checkpoint latency, {args.turns} turns ({args.turns * 2} messages at the end)")
+    await run("sqlite memory", SQLiteCheckpointSaver(), args.turns)
+    with tempfile.TemporaryDirectory() as tmp:
+        saver = SQLiteCheckpointSaver(str(Path(tmp) / "checkpoints.sqlite"))
+        await run("sqlite file", saver, args.turns)
+        saver.close()
+    if args.firestore:
+        await run("firestore", FirestoreCheckpointSaver(collection="agent_checkpoints_bench"), args.turns)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""
+Benchmark: per-call GenAI client overhead, fresh client vs shared registry.
+
+- "fresh":  what the vision / imagen modules did per call: build a
+            genai.Client (or ChatGoogleGenerativeAI), use it, close it.
+- "shared": genai_registry.client() / chat_model(): built once, pooled.
+
+Offline (default) it measures client construction + teardown only. With
+--live it also times a cheap real request (count_tokens) N times each way,
+which adds the TLS handshake a fresh client pays on every call (needs
+GEMINI_API_KEY and network).
+
+Usage:
+    python tests_manual/benchmark_genai_clients.py [--calls 50] [--live]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from google import genai
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from src.core.genai_clients import GenAIClientRegistry
+
+MODEL = "gemini-2.5-flash"
+
+
+def report(label: str, samples_ms: list) -> None:
+    samples_ms = sorted(samples_ms)
+    p95 = samples_ms[min(len(samples_ms) - 1, int(0.95 * (len(samples_ms) - 1)))]
+    print(f"  {label:<30} avg {statistics.mean(samples_ms):8.2f}ms | p50 {statistics.median(samples_ms):8.2f}ms | p95 {p95:8.2f}ms")
+
+
+async def timed(calls: int, fn) -> list:
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--live", action="store_true", help="Also time a real count_tokens request")
+    args = parser.parse_args()
+
+    api_key = "bench-key"
+    if args.live:
+        from src.core.config import settings
+        api_key = settings.api_key
+    registry = GenAIClientRegistry(api_key=api_key)
+
+    async def fresh_client():
+        client = genai.Client(api_key=api_key)
+        if args.live:
+            await client.aio.models.count_tokens(model=MODEL, contents="ciao")
+        await client.aio.aclose()
+        client.close()
+
+    async def shared_client():
+        client = registry.client()
+        if args.live:
+            await client.aio.models.count_tokens(model=MODEL, contents="ciao")
+
+    async def fresh_chat_model():
+        llm = ChatGoogleGenerativeAI(model=MODEL, google_api_key=api_key, temperature=0.1)
+        if args.live:
+            await asyncio.to_thread(llm.get_num_tokens, "ciao")
+        await llm.aclose()
+
+    async def shared_chat_model():
+        llm = registry.chat_model(MODEL, temperature=0.1)
+        if args.live:
+            await asyncio.to_thread(llm.get_num_tokens, "ciao")
+
+    await shared_client()
+    await shared_chat_model()  # Registry warm-up (paid once per process)
+
+    print(f"🔌 GenAI client overhead per call ({args.calls} calls, {'live count_tokens' if args.live else 'construction only'})")
+    report("genai.Client fresh", await timed(args.calls, fresh_client))
+    report("genai.Client shared", await timed(args.calls, shared_client))
+    report("ChatGoogleGenerativeAI fresh", await timed(args.calls, fresh_chat_model))
+    report("ChatGoogleGenerativeAI shared", await timed(args.calls, shared_chat_model))
+    await registry.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
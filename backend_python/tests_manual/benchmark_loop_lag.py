@@ -0,0 +1,160 @@
+"""
+Benchmark: event loop lag under concurrent chat streams.
+
+Runs N concurrent AgentOrchestrator.stream_chat turns against a fake Firestore
+whose every call takes --latency seconds, while LoopLagMonitor probes the loop.
+
+- "blocking": calls sleep with time.sleep (a sync client used inside async def).
+- "async":    calls sleep with asyncio.sleep (the AsyncClient port).
+
+Usage:
+    python tests_manual/benchmark_loop_lag.py [--streams 50] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-key")
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from src.core.loop_monitor import LoopLagMonitor
+from src.core.metrics import metrics
+from src.repositories.conversation_repository import ConversationRepository
+from src.repositories.message_buffer import drain_pending_flushes
+from src.services.agent_orchestrator import AgentOrchestrator
+
+
+class FakeDoc:
+    exists = True
+    id = "doc"
+
+    def to_dict(self):
+        return {"role": "user", "content": "Messaggio precedente", "userId": "user-1"}
+
+
+class FakeRef:
+    """Collections, documents and queries collapse into one chainable object."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def collection(self, *args, **kwargs):
+        return self
+
+    document = order_by = limit = where = collection
+
+    async def get(self):
+        await self.db.io()
+        return FakeDoc()
+
+    async def set(self, *args, **kwargs):
+        await self.db.io()
+
+    async def add(self, *args, **kwargs):
+        await self.db.io()
+
+    async def stream(self):
+        await self.db.io()
+        for _ in range(10):
+            yield FakeDoc()
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+
+    def set(self, *args, **kwargs):
+        pass
+
+    async def commit(self):
+        await self.db.io()
+
+
+class FakeFirestore:
+    def __init__(self, latency: float, blocking: bool):
+        self.latency = latency
+        self.blocking = blocking
+
+    async def io(self):
+        if self.blocking:
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+
+    def collection(self, *args, **kwargs):
+        return FakeRef(self)
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+class FakeGraph:
+    """Streams 20 token deltas, 10ms apart."""
+
+    async def astream(self, state, stream_mode=None, **kwargs):
+        for i in range(20):
+            await asyncio.sleep(0.01)
+            yield "messages", (AIMessageChunk(content=f"tok{i} "), {"langgraph_node": "execution"})
+        yield "updates", {"execution": {"messages": [AIMessage(content="risposta")]}}
+
+
+def make_request(i: int):
+    return SimpleNamespace(
+        messages=[{"role": "user", "content": "Vorrei ristrutturare il bagno"}],
+        session_id=f"bench-{i}",
+        media_urls=None, image_urls=None, media_types=None,
+        media_metadata=None, video_file_uris=None,
+    )
+
+
+async def run(blocking: bool, streams: int, latency: float) -> None:
+    metrics.reset()
+    monitor = LoopLagMonitor(interval=0.01, warn_threshold_ms=float("inf"))
+    repo = ConversationRepository()
+    fake_db = FakeFirestore(latency, blocking)
+
+    async def one_stream(i: int):
+        async for _ in AgentOrchestrator(repo).stream_chat(make_request(i), credentials=None):
+            pass
+
+    with patch.object(ConversationRepository, "_get_db", return_value=fake_db), \
+         patch("src.services.agent_orchestrator.get_agent_graph", return_value=FakeGraph()), \
+         patch("src.auth.jwt_handler.verify_token", return_value=SimpleNamespace(uid="user-1")):
+        await one_stream(-1)  # warm-up (lazy imports, first-call setup)
+        monitor.start()
+        start = time.perf_counter()
+        await asyncio.gather(*(one_stream(i) for i in range(streams)))
+        await drain_pending_flushes()
+        wall = time.perf_counter() - start
+        await monitor.stop()
+
+    lag = metrics.snapshot()["summaries"]["event_loop.lag_ms"]
+    label = "blocking" if blocking else "async   "
+    print(
+        f"  [{label}] streams={streams}  wall={wall:6.2f}s  "
+        f"lag p50={lag['p50']:7.1f}ms  p95={lag['p95']:7.1f}ms  max={lag['max']:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated Firestore latency per call (s)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR, force=True)
+    print(f"🏁 Event loop lag with {args.streams} concurrent streams (Firestore latency={args.latency}s)")
+    asyncio.run(run(True, args.streams, args.latency))
+    asyncio.run(run(False, args.streams, args.latency))
+
+
+if __name__ == "__main__":
+    main()
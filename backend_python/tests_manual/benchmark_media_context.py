@@ -0,0 +1,80 @@
+"""
+Benchmark: media-context extraction in ContextBuilder.
+
+Compares, for histories of 10 / 100 / 1000 messages with one image uploaded
+near the start (worst case for the reverse scan):
+- "scan":    the previous implementation (reverse walk, uncompiled re.findall)
+- "indexed": ContextBuilder with the media_index built when messages load,
+             plus the 2 messages a node typically appends during the turn
+
+Each prompt build runs twice per graph step (reasoning + execution), so the
+per-call figure is paid at least twice per turn.
+
+Usage:
+    python tests_manual/benchmark_media_context.py [--repeat 2000]
+"""
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.graph.context_builder import ContextBuilder
+from src.graph.media_index import index_media
+
+SIZES = (10, 100, 1000)
+
+
+def legacy_scan(messages) -> list:
+    found_images = []
+    for msg in reversed(messages):
+        if hasattr(msg, 'content') and isinstance(msg.content, str):
+            found_images.extend(re.findall(r'\[(?:Immagine|Video) allegat[oa]: (https?://[^\]]+)\]', msg.content))
+        elif hasattr(msg, 'content') and isinstance(msg.content, list):
+            for part in msg.content:
+                if isinstance(part, dict) and part.get("type") == "image_url":
+                    url_data = part.get("image_url")
+                    found_images.append(url_data.get("url") if isinstance(url_data, dict) else url_data)
+        if found_images: break
+    return found_images
+
+
+def history(size: int) -> list:
+    messages = [HumanMessage(content=[
+        {"type": "text", "text": "Ecco il mio bagno\n\n[Immagine allegata: https://storage.example/bagno.jpg]"},
+        {"type": "image_url", "image_url": {"url": "https://storage.example/bagno.jpg"}},
+    ])]
+    while len(messages) < size:
+        messages.append(AIMessage(content="Vedo un bagno di circa 6 mq con piastrelle beige e una vasca da bagno. " * 3))
+        messages.append(HumanMessage(content="Mi piacerebbe un aspetto più moderno, con doccia walk-in e colori chiari."))
+    return messages[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"🖼️ Media context extraction, µs per prompt build ({args.repeat} runs)")
+    for size in SIZES:
+        messages = history(size)
+        state = {"messages": messages, "media_index": index_media(messages)}
+        # Messages appended by the graph after the index was built
+        state["messages"] = messages + [
+            AIMessage(content="", tool_calls=[{"name": "list_project_files", "args": {}, "id": "c1"}]),
+            ToolMessage(content="[]", tool_call_id="c1"),
+        ]
+        assert ContextBuilder._build_media_context(state).count("bagno.jpg") == 2
+
+        scan = timeit.timeit(lambda: legacy_scan(state["messages"]), number=args.repeat) / args.repeat * 1e6
+        indexed = timeit.timeit(lambda: ContextBuilder._build_media_context(state), number=args.repeat) / args.repeat * 1e6
+        build = timeit.timeit(lambda: index_media(messages), number=max(1, args.repeat // 10)) / max(1, args.repeat // 10) * 1e6
+        print(f"  {size:>5} messages | scan {scan:9.1f} | indexed {indexed:6.1f} | index build (once/turn) {build:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
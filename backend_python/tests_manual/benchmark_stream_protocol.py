@@ -0,0 +1,134 @@
+"""
+Benchmark: Vercel data-stream frame encoding.
+
+Compares frames per second of:
+- "async gen": the original pattern (async generator + json.dumps per frame,
+               consumed with `async for`, as the orchestrator used to do).
+- "sync":      the sync encoders (encode_text / encode_tool_call / ...).
+- "batch":     encode_batch of a whole burst of events into one buffer.
+- "sync (no orjson)": the sync encoders with the orjson accelerator disabled.
+
+The workload mimics a turn: many short token deltas, a few tool calls and
+a few long tool results.
+
+Usage:
+    python tests_manual/benchmark_stream_protocol.py [--turns 2000]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils import stream_protocol
+from src.utils.stream_protocol import encode_batch, encode_text, encode_tool_call, encode_tool_result
+
+
+# ━━━ Original implementation (kept here as the baseline) ━━━
+
+async def legacy_text(text: str) -> AsyncGenerator[str, None]:
+    if text:
+        yield f'0:{json.dumps(text)}\n'
+
+async def legacy_tool_call(tool_call_id: str, tool_name: str, args: Dict[str, Any]) -> AsyncGenerator[str, None]:
+    yield f'9:{json.dumps({"toolCallId": tool_call_id, "toolName": tool_name, "args": args})}\n'
+
+async def legacy_tool_result(tool_call_id: str, result: Any) -> AsyncGenerator[str, None]:
+    yield f'a:{json.dumps({"toolCallId": tool_call_id, "result": result})}\n'
+
+
+def make_turn():
+    deltas = [f"parola{i} " if i % 7 else "è " for i in range(120)]
+    calls = [("call-1", "analyze_room", {"image_url": "https://storage.example/room.jpg"}),
+             ("call-2", "generate_render", {"prompt": "bagno moderno, piastrelle grigie", "style": "moderno"})]
+    results = [("call-1", "Stanza: bagno 3x2m, piastrelle bianche, luce naturale. " * 30),
+               ("call-2", "✅ Render generato: https://storage.example/render.png")]
+    return deltas, calls, results
+
+
+async def run_legacy(turns: int) -> int:
+    deltas, calls, results = make_turn()
+    frames = 0
+    for _ in range(turns):
+        for delta in deltas:
+            async for _chunk in legacy_text(delta):
+                frames += 1
+        for call in calls:
+            async for _chunk in legacy_tool_call(*call):
+                frames += 1
+        for result in results:
+            async for _chunk in legacy_tool_result(*result):
+                frames += 1
+    return frames
+
+
+def run_sync(turns: int) -> int:
+    deltas, calls, results = make_turn()
+    frames = 0
+    for _ in range(turns):
+        for delta in deltas:
+            encode_text(delta)
+            frames += 1
+        for call in calls:
+            encode_tool_call(*call)
+            frames += 1
+        for result in results:
+            encode_tool_result(*result)
+            frames += 1
+    return frames
+
+
+def run_batch(turns: int) -> int:
+    deltas, calls, results = make_turn()
+    events = (
+        [("text", (d,)) for d in deltas]
+        + [("tool_call", c) for c in calls]
+        + [("tool_result", r) for r in results]
+    )
+    for _ in range(turns):
+        encode_batch(events)
+    return turns * len(events)
+
+
+def report(label: str, frames: int, seconds: float, baseline: float = None) -> float:
+    fps = frames / seconds
+    speedup = f"  x{fps / baseline:4.1f}" if baseline else ""
+    print(f"  {label:<18} {fps:12,.0f} frames/s{speedup}")
+    return fps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Sanity: identical bytes
+    deltas, calls, results = make_turn()
+    assert encode_text(deltas[1]) == f'0:{json.dumps(deltas[1])}\n'
+
+    print(f"🏁 Frame encoding, {args.turns} turns")
+    start = time.perf_counter()
+    frames = asyncio.run(run_legacy(args.turns))
+    baseline = report("async gen", frames, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    frames = run_sync(args.turns)
+    report("sync", frames, time.perf_counter() - start, baseline)
+
+    start = time.perf_counter()
+    frames = run_batch(args.turns)
+    report("batch", frames, time.perf_counter() - start, baseline)
+
+    with patch.object(stream_protocol, "orjson", None):
+        start = time.perf_counter()
+        frames = run_sync(args.turns)
+        report("sync (no orjson)", frames, time.perf_counter() - start, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Offline evaluation: gatekeeper routing accuracy and LLM calls saved.
+
+Compares, on a labeled JSONL set ({"text", "label"}):
+- "heuristic": the original rules (≤5 words starting with a greeting/ack).
+- "router@T":  the learned router at confidence threshold T.
+
+Without --model, the router is evaluated with k-fold cross-validation on the
+data itself (train on k-1 folds, score the held-out one); with --model, the
+given weights are scored on the whole set.
+
+Reported per method:
+- accuracy:        routed node == label
+- fast-tracked:    share of turns sent straight to execution
+- false fast:      reasoning turns sent to execution (quality risk)
+- calls saved/100: reasoning LLM calls skipped per 100 turns (a two_tier turn
+                   routed to execution skips at least the reasoning call)
+
+Usage:
+    python tests_manual/evaluate_intent_router.py [--data transcripts.jsonl] [--model path.npz] [--folds 5]
+"""
+import argparse
+import random
+import sys
+from pathlib import Path
+from typing import Callable, List, Sequence
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.services.intent_classifier import IntentClassifier
+from src.services.intent_router import DEFAULT_MODEL_PATH, IntentRouter, load_dataset
+
+SEED_DATA = DEFAULT_MODEL_PATH.parent / "seed_intents.jsonl"
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9)
+
+
+def report(label: str, routes: Sequence[str], labels: Sequence[str]) -> None:
+    n = len(labels)
+    correct = sum(r == l for r, l in zip(routes, labels))
+    fast = sum(r == "execution" for r in routes)
+    false_fast = sum(r == "execution" and l == "reasoning" for r, l in zip(routes, labels))
+    reasoning_total = labels.count("reasoning") or 1
+    print(f"  {label:<14} accuracy {correct / n:6.1%} | fast-tracked {fast / n:6.1%} | "
+          f"false fast {false_fast / reasoning_total:6.1%} | calls saved/100 {fast / n * 100:5.1f}")
+
+
+def cross_validated_probabilities(texts: List[str], labels: List[str], folds: int) -> List[float]:
+    order = list(range(len(texts)))
+    random.Random(7).shuffle(order)
+    probabilities = [0.0] * len(texts)
+    for fold in range(folds):
+        held_out = set(order[fold::folds])
+        train = [i for i in order if i not in held_out]
+        router = IntentRouter.train([texts[i] for i in train], [labels[i] for i in train])
+        for i in held_out:
+            probabilities[i] = router.predict_proba(texts[i])
+    return probabilities
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", action="append", type=Path, help="Labeled JSONL (repeatable; default: bundled seed set)")
+    parser.add_argument("--model", type=Path, help="Score these weights instead of cross-validating")
+    parser.add_argument("--folds", type=int, default=5)
+    args = parser.parse_args()
+
+    texts, labels = load_dataset(args.data or [SEED_DATA])
+    print(f"🧭 Gatekeeper routing, {len(texts)} turns "
+          f"({labels.count('execution')} execution / {labels.count('reasoning')} reasoning)")
+
+    report("heuristic", [IntentClassifier.heuristic_route(t) for t in texts], labels)
+
+    if args.model:
+        router = IntentRouter.load(args.model)
+        probabilities = [router.predict_proba(t) for t in texts]
+    else:
+        probabilities = cross_validated_probabilities(texts, labels, args.folds)
+
+    for threshold in THRESHOLDS:
+        routes = ["execution" if p >= threshold else "reasoning" for p in probabilities]
+        report(f"router@{threshold}", routes, labels)
+
+
+if __name__ == "__main__":
+    main()